@@ -95,6 +95,9 @@ try:
     from blueprints.reset_database import reset_db_bp
     # ADDED: 2025-09-05 - Schedule Preferences blueprint
     from blueprints.schedule_preferences import schedule_preferences_bp
+    # Staffing API (coverage gaps, time off impact, overtime) and overtime posting
+    from blueprints.staffing_api import staffing_api_bp
+    from blueprints.overtime import overtime_bp
     
     logger.info("All blueprints imported successfully")
 except ImportError as e:
@@ -111,16 +114,90 @@ app.register_blueprint(employee_import_bp)
 app.register_blueprint(reset_db_bp)
 # ADDED: 2025-09-05 - Register Schedule Preferences blueprint
 app.register_blueprint(schedule_preferences_bp)
+app.register_blueprint(staffing_api_bp)
+app.register_blueprint(overtime_bp)
+
+# Keep the materialized coverage_gap table current on every commit
+gap_maintainer = None
+try:
+    from engines.coverage_gap_maintainer import CoverageGapMaintainer
+    from models import (
+        VacationCalendar, CoverageGap, CoverageGapWindow, PositionCoverage,
+        ShiftPattern, CrewDutyCalendar
+    )
+    gap_maintainer = CoverageGapMaintainer(db, {
+        'Employee': Employee,
+        'Schedule': Schedule,
+        'Position': Position,
+        'PositionCoverage': PositionCoverage,
+        'VacationCalendar': VacationCalendar,
+        'TimeOffRequest': TimeOffRequest,
+        'CoverageGap': CoverageGap,
+        'CoverageGapWindow': CoverageGapWindow,
+        'ShiftPattern': ShiftPattern,
+        'CrewDutyCalendar': CrewDutyCalendar
+    })
+    gap_maintainer.install()
+except Exception as e:
+    logger.warning(f"Coverage gap maintenance not available: {e}")
+
+# Keep rolling 13-week overtime totals current when overtime history is written
+overtime_rollup = None
+try:
+    from engines.overtime_rollup import OvertimeRollupMaintainer
+    from models import OvertimeRollup
+    overtime_rollup = OvertimeRollupMaintainer(db, {
+        'OvertimeHistory': OvertimeHistory,
+        'OvertimeRollup': OvertimeRollup
+    })
+    overtime_rollup.install()
+except Exception as e:
+    logger.warning(f"Overtime rollup maintenance not available: {e}")
+
+# Deliver queued notifications from a background thread in this process
+if os.environ.get('NOTIFICATION_WORKER', '1') != '0':
+    try:
+        from engines.notification_outbox import start_notification_worker
+        from models import CoverageNotification, NotificationOutbox
+        start_notification_worker(app, db, {
+            'Employee': Employee,
+            'CoverageNotification': CoverageNotification,
+            'NotificationOutbox': NotificationOutbox
+        })
+    except Exception as e:
+        logger.warning(f"Notification worker not available: {e}")
 
 # Import Pitman schedule functionality
 try:
-    from utils.real_pitman_schedule import RealPitmanSchedule, generate_pitman_for_production
+    from utils.real_pitman_schedule import RealPitmanSchedule, pitman_job
     PITMAN_AVAILABLE = True
     logger.info("Pitman schedule system loaded successfully")
 except ImportError as e:
     PITMAN_AVAILABLE = False
     logger.warning(f"Pitman schedule system not available: {e}")
 
+# Run schedule generation as background jobs (JOB_WORKERS=0 runs them in the request)
+from engines.job_runner import JobRunner, register_job, start_job_workers
+from models import BackgroundJob
+try:
+    from utils.pattern_generators import pattern_job
+    register_job('pattern', pattern_job)
+    if PITMAN_AVAILABLE:
+        register_job('pitman', pitman_job)
+    if gap_maintainer is not None:
+        # Extend coverage_gap as the maintained window moves forward
+        from engines.coverage_gap_maintainer import REFRESH_SECONDS
+        register_job('coverage_gaps', gap_maintainer.materialize_job, every_seconds=REFRESH_SECONDS)
+    if overtime_rollup is not None:
+        # Move the 13-week window forward once a day, outside user requests
+        from engines.overtime_rollup import ROLL_FORWARD_SECONDS
+        register_job('overtime_rollup', overtime_rollup.roll_forward_job,
+                     every_seconds=ROLL_FORWARD_SECONDS)
+    if os.environ.get('JOB_WORKERS', '2') != '0':
+        start_job_workers(app, db, {'BackgroundJob': BackgroundJob})
+except Exception as e:
+    logger.warning(f"Background job workers not available: {e}")
+
 # ==========================================
 # PITMAN SCHEDULE ROUTES
 # ==========================================
@@ -192,50 +269,25 @@ def generate_pitman():
             return jsonify({'success': False, 'error': 'Start date cannot be in the past'})
         
         # Validate weeks
-        if weeks < 2 or weeks > 52:
-            return jsonify({'success': False, 'error': 'Number of weeks must be between 2 and 52'})
-        
-        # Generate schedules
-        results = generate_pitman_for_production(
-            start_date_str=start_date,
-            weeks=weeks,
-            variation=variation,
-            supervisor_id=current_user.id
-        )
+        if weeks < 2 or weeks > 260:
+            return jsonify({'success': False, 'error': 'Number of weeks must be between 2 and 260'})
+        
+        # Generate, validate and save in a background job; past a year the
+        # job streams the pattern in committed chunks
+        job = JobRunner(db, {'BackgroundJob': BackgroundJob}).dispatch('pitman', {
+            'start_date': start_date,
+            'weeks': weeks,
+            'variation': variation,
+            'supervisor_id': current_user.id,
+            'replace_existing': replace_existing
+        }, created_by_id=current_user.id)
         
-        # Check validation
-        if not results['validation']['valid']:
-            return jsonify({
-                'success': False, 
-                'error': 'Schedule validation failed',
-                'issues': results['validation']['issues']
-            })
-        
-        # Check for warnings
-        if results['validation']['warnings']:
-            logger.warning(f"Schedule warnings: {results['validation']['warnings']}")
-        
-        # Save to database
-        pitman = RealPitmanSchedule()
-        save_results = pitman.commit_schedules_to_database(
-            results['schedules'], 
-            replace_existing=replace_existing
-        )
-        
-        if save_results['success']:
-            logger.info(f"Successfully generated {save_results['schedules_saved']} Pitman schedules")
-            
-            return jsonify({
-                'success': True,
-                'schedules_created': save_results['schedules_saved'],
-                'statistics': results['statistics'],
-                'date_range': save_results['date_range'],
-                'validation': results['validation'],
-                'pattern_info': results['pattern_info']
-            })
-        else:
-            logger.error(f"Failed to save schedules: {save_results['error']}")
-            return jsonify({'success': False, 'error': f"Failed to save schedules: {save_results['error']}"})
+        return jsonify({
+            'success': True,
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': url_for('schedule.job_status', job_id=job.id)
+        }), 202
             
     except ValueError as e:
         logger.error(f"Validation error in Pitman generation: {e}")
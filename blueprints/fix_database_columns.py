@@ -84,6 +84,112 @@ def fix_database_schema():
         if add_column_if_missing('shift_swap_request', 'target_shift', 'VARCHAR(20)'):
             fixes_applied += 1
         
+        # Fix PositionCoverage table (read by the coverage gap engine)
+        logger.info("Checking position_coverage table...")
+
+        if add_column_if_missing('position_coverage', 'shift_type', "VARCHAR(20) DEFAULT 'day'"):
+            fixes_applied += 1
+
+        if add_column_if_missing('position_coverage', 'min_required', 'INTEGER DEFAULT 1'):
+            fixes_applied += 1
+        
+        # Fix CoverageGap table (materialized gap rows)
+        logger.info("Checking coverage_gap table...")
+        
+        for column_name in ['available_count', 'absent_count', 'gap_count']:
+            if add_column_if_missing('coverage_gap', column_name, 'INTEGER DEFAULT 0'):
+                fixes_applied += 1
+        
+        if add_column_if_missing('coverage_gap', 'crews_on_duty', 'VARCHAR(10)'):
+            fixes_applied += 1
+        
+        if add_column_if_missing('coverage_gap', 'computed_at', 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP'):
+            fixes_applied += 1
+        
+        # One row per (position, date, shift) cell: drop duplicates (keeping
+        # a filled row, else the oldest) before making the index unique
+        try:
+            db.session.execute(text("""
+                DELETE FROM coverage_gap WHERE id IN (
+                    SELECT a.id FROM coverage_gap a
+                    JOIN coverage_gap b
+                      ON a.position_id = b.position_id
+                     AND a.date = b.date
+                     AND a.shift_type = b.shift_type
+                     AND a.id <> b.id
+                    WHERE (COALESCE(b.is_filled, FALSE) AND NOT COALESCE(a.is_filled, FALSE))
+                       OR (COALESCE(b.is_filled, FALSE) = COALESCE(a.is_filled, FALSE) AND b.id < a.id)
+                )
+            """))
+            db.session.execute(text("DROP INDEX IF EXISTS ix_coverage_gap_cell"))
+            db.session.execute(text("""
+                CREATE UNIQUE INDEX IF NOT EXISTS uq_coverage_gap_cell
+                ON coverage_gap (position_id, date, shift_type)
+            """))
+            db.session.commit()
+        except Exception as e:
+            logger.warning(f"Could not create unique coverage_gap index: {e}")
+            db.session.rollback()
+        
+        # Fix ShiftPattern table (active pattern for the crew calendar)
+        logger.info("Checking shift_pattern table...")
+        
+        for column_name, column_type in [
+            ('cycle_days', 'INTEGER'),
+            ('start_date', 'DATE'),
+            ('end_date', 'DATE'),
+            ('is_active', 'BOOLEAN DEFAULT FALSE'),
+            ('created_at', 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP'),
+            ('pattern_key', 'VARCHAR(50)'),
+            ('is_virtual', 'BOOLEAN DEFAULT FALSE')
+        ]:
+            if add_column_if_missing('shift_pattern', column_name, column_type):
+                fixes_applied += 1
+        
+        # Fix OvertimeOpportunity and CoverageNotification tables (overtime posting)
+        logger.info("Checking overtime_opportunity and coverage_notification tables...")
+        
+        for column_name, column_type in [
+            ('shift_type', 'VARCHAR(20)'),
+            ('urgency', "VARCHAR(20) DEFAULT 'standard'"),
+            ('urgent', 'BOOLEAN DEFAULT FALSE'),
+            ('notes', 'TEXT'),
+            ('posted_by_id', 'INTEGER'),
+            ('posted_at', 'TIMESTAMP'),
+            ('response_deadline', 'TIMESTAMP'),
+            ('notified_employees', 'TEXT'),
+            ('filled_by_id', 'INTEGER'),
+            ('filled_at', 'TIMESTAMP')
+        ]:
+            if add_column_if_missing('overtime_opportunity', column_name, column_type):
+                fixes_applied += 1
+        
+        for column_name, column_type in [
+            ('coverage_request_id', 'INTEGER'),
+            ('notification_type', 'VARCHAR(50)'),
+            ('sent_to_type', 'VARCHAR(20)'),
+            ('sent_to_employee_id', 'INTEGER'),
+            ('sent_by_id', 'INTEGER'),
+            ('message', 'TEXT'),
+            ('sent_at', 'TIMESTAMP'),
+            ('created_at', 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP')
+        ]:
+            if add_column_if_missing('coverage_notification', column_name, column_type):
+                fixes_applied += 1
+        
+        # Date-range overtime reports filter on week_start_date
+        logger.info("Checking overtime_history indexes...")
+        
+        try:
+            db.session.execute(text("""
+                CREATE INDEX IF NOT EXISTS ix_overtime_history_week_start
+                ON overtime_history (week_start_date)
+            """))
+            db.session.commit()
+        except Exception as e:
+            logger.warning(f"Could not create overtime_history index: {e}")
+            db.session.rollback()
+        
         # Ensure status columns exist and have defaults
         logger.info("Ensuring status columns have proper defaults...")
         
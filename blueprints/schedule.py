@@ -1,12 +1,17 @@
 # blueprints/schedule.py
 # COMPLETE FILE - Pattern Generation Now Working
-# Last Updated: 2025-10-08
+# Last Updated: 2026-10-16 - Pattern generation runs as a background job
 
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app, Response
 from flask_login import login_required, current_user
-from models import db, Employee, Schedule, Position
+from models import (db, Employee, Schedule, Position, ShiftPattern, ScheduleException,
+                    ScheduleGenerationRun, BackgroundJob)
+from engines.virtual_schedule import VirtualSchedule
+from engines.job_runner import JobRunner
 from datetime import datetime, date, timedelta
 from sqlalchemy import func, and_
+import csv
+import io
 import json
 import logging
 
@@ -14,6 +19,15 @@ logger = logging.getLogger(__name__)
 
 schedule_bp = Blueprint('schedule', __name__)
 
+
+def virtual_schedule():
+    return VirtualSchedule(db, {
+        'Employee': Employee,
+        'Schedule': Schedule,
+        'ShiftPattern': ShiftPattern,
+        'ScheduleException': ScheduleException
+    })
+
 @schedule_bp.route('/schedule/select')
 @login_required
 def schedule_select():
@@ -163,19 +177,12 @@ def view_schedules():
         else:
             end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
         
-        query = Schedule.query.filter(
-            Schedule.date >= start_date,
-            Schedule.date <= end_date
+        # Stored rows merged with the virtual rotation, if one is active
+        schedules = virtual_schedule().shifts(
+            start_date, end_date,
+            crew=crew if crew in ['A', 'B', 'C', 'D'] else None
         )
         
-        if crew != 'all' and crew in ['A', 'B', 'C', 'D']:
-            crew_employees = Employee.query.filter_by(crew=crew).all()
-            employee_ids = [e.id for e in crew_employees]
-            if employee_ids:
-                query = query.filter(Schedule.employee_id.in_(employee_ids))
-        
-        schedules = query.order_by(Schedule.date, Schedule.shift_type).all()
-        
         schedule_grid = {}
         dates = []
         current = start_date
@@ -263,12 +270,17 @@ def create_pattern_schedule():
         if start_date > end_date:
             return jsonify({'success': False, 'error': 'Start date must be before end date'})
         
-        if (end_date - start_date).days > 365:
-            return jsonify({'success': False, 'error': 'Schedule period cannot exceed 1 year'})
+        # Overtime, fatigue, coverage and the dashboards read stored Schedule
+        # rows only, so a virtual rotation would look unscheduled to them
+        if data.get('virtual'):
+            return jsonify({
+                'success': False,
+                'error': 'Virtual rotations are not available yet'
+            }), 400
         
         # Import pattern generator
         try:
-            from utils.pattern_generators import get_pattern_generator
+            from utils.pattern_generators import get_pattern_generator, MAX_STREAM_DAYS
         except ImportError as e:
             logger.error(f"Could not import pattern generators: {e}")
             return jsonify({
@@ -285,39 +297,196 @@ def create_pattern_schedule():
                 'error': f'Pattern "{pattern}" with variation "{variation}" is not yet implemented'
             })
         
-        # Generate schedules
-        logger.info(f"Creating {pattern} ({variation}) schedule from {start_date} to {end_date}")
-        
-        result = generator.generate(
-            start_date=start_date,
-            end_date=end_date,
-            created_by_id=current_user.id,
-            replace_existing=replace_existing
-        )
-        
-        if result['success']:
-            logger.info(f"Successfully created {result['schedules_saved']} schedules")
-            return jsonify({
-                'success': True,
-                'message': f'Successfully created {result["schedules_saved"]} schedule entries',
-                'schedules_created': result['schedules_saved'],
-                'date_range': result['date_range'],
-                'statistics': result.get('statistics', {}),
-                'redirect': url_for('schedule.view_schedules', 
-                                   start_date=start_date.isoformat(),
-                                   end_date=end_date.isoformat())
-            })
-        else:
-            logger.error(f"Schedule generation failed: {result.get('error')}")
+        if (end_date - start_date).days > MAX_STREAM_DAYS:
             return jsonify({
                 'success': False,
-                'error': result.get('error', 'Unknown error occurred')
+                'error': 'Schedule period cannot exceed 5 years'
             })
         
+        # Generate in a background job; the UI polls status_url
+        logger.info(f"Queueing {pattern} ({variation}) schedule from {start_date} to {end_date}")
+        
+        job = JobRunner(db, {'BackgroundJob': BackgroundJob}).dispatch('pattern', {
+            'pattern': pattern,
+            'variation': variation,
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat(),
+            'created_by_id': current_user.id,
+            'replace_existing': replace_existing
+        }, created_by_id=current_user.id)
+        
+        return jsonify({
+            'success': True,
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': url_for('schedule.job_status', job_id=job.id),
+            'redirect': url_for('schedule.view_schedules', 
+                               start_date=start_date.isoformat(),
+                               end_date=end_date.isoformat())
+        }), 202
+        
     except Exception as e:
         logger.error(f"Error creating pattern schedule: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@schedule_bp.route('/schedule/api/shifts')
+@login_required
+def schedule_shifts():
+    """
+    Shifts in a date range, merged from the virtual rotation, stored
+    schedules and exceptions. ?format=csv exports them.
+    """
+    try:
+        start_date = datetime.strptime(request.args['start_date'], '%Y-%m-%d').date()
+        end_date = datetime.strptime(request.args['end_date'], '%Y-%m-%d').date()
+    except (KeyError, ValueError):
+        return jsonify({'success': False, 'error': 'start_date and end_date (YYYY-MM-DD) are required'}), 400
+    
+    if start_date > end_date:
+        return jsonify({'success': False, 'error': 'Start date must be before end date'}), 400
+    
+    employee_id = request.args.get('employee_id', type=int)
+    if not current_user.is_supervisor:
+        employee_id = current_user.id
+    
+    try:
+        shifts = virtual_schedule().shifts(
+            start_date, end_date,
+            employee_ids=[employee_id] if employee_id else None,
+            crew=request.args.get('crew') or None
+        )
+        rows = [shift.to_dict() for shift in shifts]
+        
+        if request.args.get('format') == 'csv':
+            buffer = io.StringIO()
+            columns = ['date', 'shift_type', 'employee_id', 'employee_name', 'crew',
+                       'start_time', 'end_time', 'hours', 'position_id',
+                       'is_overtime', 'is_training', 'source']
+            writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(rows)
+            return Response(
+                buffer.getvalue(),
+                mimetype='text/csv',
+                headers={'Content-Disposition':
+                         f'attachment; filename=schedule_{start_date}_{end_date}.csv'}
+            )
+        
+        return jsonify({'success': True, 'count': len(rows), 'shifts': rows})
+        
+    except Exception as e:
+        logger.error(f"Error reading schedule shifts: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@schedule_bp.route('/schedule/api/exceptions', methods=['POST'])
+@login_required
+def record_schedule_exception():
+    """
+    Record a deviation from the rotation for one employee and date:
+    an overtime/swap/training shift, or {"is_removed": true} for a day off.
+    {"clear": true} drops the deviation again.
+    """
+    if not current_user.is_supervisor:
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+    
+    try:
+        data = request.get_json() or {}
+        employee_id = int(data['employee_id'])
+        day = datetime.strptime(data['date'], '%Y-%m-%d').date()
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'employee_id and date (YYYY-MM-DD) are required'}), 400
+    
+    try:
+        schedules = virtual_schedule()
+        if data.get('clear'):
+            removed = schedules.clear_exception(employee_id, day)
+            db.session.commit()
+            return jsonify({'success': True, 'cleared': removed})
+        
+        fields = {key: data[key] for key in ('shift_type', 'hours', 'position_id', 'is_overtime',
+                                             'is_training', 'is_removed', 'reason') if key in data}
+        for key in ('start_time', 'end_time'):
+            if data.get(key):
+                fields[key] = datetime.strptime(data[key], '%H:%M').time()
+        fields['created_by_id'] = current_user.id
+        
+        exception = schedules.record_exception(employee_id, day, **fields)
+        db.session.commit()
+        return jsonify({'success': True, 'exception_id': exception.id})
+        
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error recording schedule exception: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@schedule_bp.route('/schedule/api/jobs/<int:job_id>')
+@login_required
+def job_status(job_id):
+    """Status, progress and (once finished) result of a background job"""
+    runner = JobRunner(db, {'BackgroundJob': BackgroundJob})
+    job = runner.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    if not current_user.is_supervisor and job.created_by_id != current_user.id:
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+    
+    return jsonify({'success': True, **runner.to_dict(job)})
+
+@schedule_bp.route('/schedule/api/generation-runs/<int:run_id>')
+@login_required
+def generation_run_status(run_id):
+    """Checkpoint of a streamed generation"""
+    if not current_user.is_supervisor:
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+    
+    run = db.session.get(ScheduleGenerationRun, run_id)
+    if run is None:
+        return jsonify({'success': False, 'error': 'Generation run not found'}), 404
+    
+    total_days = (run.end_date - run.start_date).days + 1
+    done_days = total_days if run.next_date is None else (run.next_date - run.start_date).days
+    return jsonify({
+        'success': True,
+        'run_id': run.id,
+        'pattern_key': run.pattern_key,
+        'status': run.status,
+        'start_date': run.start_date.isoformat(),
+        'end_date': run.end_date.isoformat(),
+        'next_date': run.next_date.isoformat() if run.next_date else None,
+        'percent_complete': round(100.0 * done_days / total_days, 1),
+        'schedules_saved': run.rows_written or 0,
+        'error': run.error
+    })
+
+@schedule_bp.route('/schedule/api/generation-runs/<int:run_id>/resume', methods=['POST'])
+@login_required
+def resume_generation_run(run_id):
+    """Continue a failed or interrupted streamed generation from its checkpoint"""
+    if not current_user.is_supervisor:
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+    
+    run = db.session.get(ScheduleGenerationRun, run_id)
+    if run is None:
+        return jsonify({'success': False, 'error': 'Generation run not found'}), 404
+    
+    try:
+        job = JobRunner(db, {'BackgroundJob': BackgroundJob}).dispatch('pattern', {
+            'pattern_key': run.pattern_key,
+            'run_id': run.id
+        }, created_by_id=current_user.id)
+        return jsonify({
+            'success': True,
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': url_for('schedule.job_status', job_id=job.id)
+        }), 202
+    except Exception as e:
+        logger.error(f"Error resuming generation run {run_id}: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @schedule_bp.route('/schedule/api/preview-pattern', methods=['POST'])
 @login_required
 def preview_pattern():
@@ -10,6 +10,8 @@ from flask_login import login_required, current_user
 from models import db, Employee, Schedule, Position, ShiftPreference
 from datetime import datetime, date, timedelta
 from sqlalchemy import func, and_, or_
+from shift_algorithm import ShiftPatternAlgorithm
+import numpy as np
 import json
 import logging
 
@@ -181,7 +183,8 @@ def preferences_report():
                              top_schedules=top_schedules,
                              shift_length_avg=shift_length_avg,
                              rotation_avg=rotation_avg,
-                             preferences=preferences)
+                             preferences=preferences,
+                             pattern_fit=get_pattern_fit())
                              
     except Exception as e:
         logger.error(f"Error generating preferences report: {e}")
@@ -301,6 +304,45 @@ def get_aggregate_preferences():
         logger.error(f"Error getting aggregate preferences: {e}")
         return None
 
+def get_pattern_fit():
+    """
+    Score every library pattern for every active preference at once
+    (shift_algorithm.ShiftPatternAlgorithm.score_workforce), with
+    satisfaction broken down by crew and by site (department)
+    """
+    try:
+        rows = db.session.query(
+            ShiftPreference.shift_length_pref,
+            ShiftPreference.work_pattern_pref,
+            ShiftPreference.weekend_pref,
+            ShiftPreference.schedule_type_pref,
+            Employee.crew,
+            Employee.department
+        ).join(
+            Employee,
+            ShiftPreference.employee_id == Employee.id
+        ).filter(
+            ShiftPreference.is_active == True,
+            Employee.is_active == True
+        ).all()
+        
+        if not rows:
+            return None
+        
+        # Columns in shift_algorithm.PREFERENCE_KEYS order, 0-100 -> 0-1
+        values = np.array([
+            [50 if value is None else value for value in row[:4]] for row in rows
+        ], dtype=float) / 100.0
+        
+        return ShiftPatternAlgorithm().score_workforce(values, {
+            'crew': [row.crew for row in rows],
+            'site': [row.department for row in rows]
+        })
+        
+    except Exception as e:
+        logger.error(f"Error scoring patterns against preferences: {e}")
+        return None
+
 def get_top_schedule_selections(preferences):
     """Get the most popular schedule selections"""
     schedule_counts = {}
@@ -368,6 +410,34 @@ def api_preferences_summary():
             'error': str(e)
         }), 500
 
+@schedule_preferences_bp.route('/api/preferences/pattern-fit')
+@login_required
+def api_pattern_fit():
+    """Satisfaction with each library pattern across all active preferences"""
+    try:
+        if not current_user.is_supervisor:
+            return jsonify({'error': 'Access denied'}), 403
+        
+        fit = get_pattern_fit()
+        
+        if not fit:
+            return jsonify({
+                'success': False,
+                'message': 'No preferences submitted yet'
+            })
+        
+        return jsonify({
+            'success': True,
+            'data': fit
+        })
+        
+    except Exception as e:
+        logger.error(f"Error in API pattern fit: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @schedule_preferences_bp.route('/api/preferences/employee/<int:employee_id>')
 @login_required
 def api_employee_preference(employee_id):
@@ -5,11 +5,14 @@ from flask_login import login_required, current_user
 from datetime import datetime, timedelta, date
 from models import (
     db, Employee, Schedule, Position, PositionCoverage, VacationCalendar,
-    OvertimeHistory, OvertimeOpportunity, EmployeeSkill, CoverageGap,
-    OvertimeResponse, CoverageNotification
+    OvertimeHistory, OvertimeOpportunity, EmployeeSkill, CoverageGap, CoverageGapWindow,
+    OvertimeResponse, CoverageNotification, TimeOffRequest, TimeOffStatus,
+    ShiftPattern, CrewDutyCalendar, NotificationOutbox, ScheduleException
 )
 from engines.coverage_gap_engine import CoverageGapDetectionEngine
+from engines.coverage_gap_maintainer import CoverageGapMaintainer
 from engines.overtime_assignment_engine import OvertimeAssignmentEngine
+from engines.notification_outbox import NotificationOutbox as Outbox
 
 staffing_api_bp = Blueprint('staffing_api', __name__, url_prefix='/api/staffing')
 
@@ -24,12 +27,34 @@ def get_engines():
         'OvertimeHistory': OvertimeHistory,
         'OvertimeOpportunity': OvertimeOpportunity,
         'EmployeeSkill': EmployeeSkill,
-        'CoverageGap': CoverageGap
+        'CoverageGap': CoverageGap,
+        'TimeOffRequest': TimeOffRequest,
+        'ShiftPattern': ShiftPattern,
+        'CrewDutyCalendar': CrewDutyCalendar,
+        'ScheduleException': ScheduleException,
+        'CoverageNotification': CoverageNotification,
+        'NotificationOutbox': NotificationOutbox
     }
     gap_engine = CoverageGapDetectionEngine(db, models)
     ot_engine = OvertimeAssignmentEngine(db, models)
     return gap_engine, ot_engine
 
+def get_gap_maintainer():
+    """Maintainer for the materialized coverage_gap table"""
+    models = {
+        'Employee': Employee,
+        'Schedule': Schedule,
+        'Position': Position,
+        'PositionCoverage': PositionCoverage,
+        'VacationCalendar': VacationCalendar,
+        'TimeOffRequest': TimeOffRequest,
+        'CoverageGap': CoverageGap,
+        'CoverageGapWindow': CoverageGapWindow,
+        'ShiftPattern': ShiftPattern,
+        'CrewDutyCalendar': CrewDutyCalendar
+    }
+    return CoverageGapMaintainer(db, models)
+
 @staffing_api_bp.route('/coverage-gaps/current')
 @login_required
 def get_current_gaps():
@@ -63,9 +88,15 @@ def get_future_gaps():
         return jsonify({'error': 'Unauthorized'}), 403
     
     days_ahead = request.args.get('days', 14, type=int)
-    gap_engine, _ = get_engines()
+    maintainer = get_gap_maintainer()
     
-    gaps = gap_engine.detect_future_gaps(days_ahead=days_ahead)
+    # Served from the materialized coverage_gap table; fall back to a live
+    # scan for horizons beyond the maintained window
+    if days_ahead <= maintainer.days_ahead:
+        gaps = maintainer.get_future_gaps(days_ahead=days_ahead)
+    else:
+        gap_engine, _ = get_engines()
+        gaps = gap_engine.detect_future_gaps(days_ahead=days_ahead)
     
     # Group by urgency
     urgency_groups = {
@@ -93,11 +124,60 @@ def get_gap_summary():
     if not current_user.is_supervisor:
         return jsonify({'error': 'Unauthorized'}), 403
     
+    days_ahead = min(max(request.args.get('days', 14, type=int), 1), 366)
     gap_engine, _ = get_engines()
-    summary = gap_engine.get_gap_summary()
+    maintainer = get_gap_maintainer()
+    
+    # Future gaps come from the materialized coverage_gap table; horizons
+    # beyond the maintained window build the tensor live
+    future_gaps = None
+    if days_ahead <= maintainer.days_ahead:
+        future_gaps = maintainer.get_future_gaps(days_ahead=days_ahead)
+    summary = gap_engine.get_gap_summary(future_gaps=future_gaps, days_ahead=days_ahead)
     
     return jsonify(summary)
 
+@staffing_api_bp.route('/coverage-gaps/heatmap')
+@login_required
+def get_gap_heatmap():
+    """Get a date x shift x position coverage grid for heatmap display"""
+    if not current_user.is_supervisor:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    days_ahead = min(max(request.args.get('days', 28, type=int), 1), 366)
+    metric = request.args.get('metric', 'gap')
+    
+    gap_engine, _ = get_engines()
+    tensor = gap_engine.build_coverage_tensor(
+        date.today() + timedelta(days=1),
+        date.today() + timedelta(days=days_ahead)
+    )
+    
+    try:
+        heatmap = tensor.heatmap(metric)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    heatmap['statistics'] = tensor.statistics()
+    heatmap['urgency_counts'] = tensor.urgency_counts()
+    
+    return jsonify(heatmap)
+
+@staffing_api_bp.route('/coverage-gaps/rebuild', methods=['POST'])
+@login_required
+def rebuild_coverage_gaps():
+    """Recompute the materialized coverage_gap table for the maintained window"""
+    if not current_user.is_supervisor:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    try:
+        result = get_gap_maintainer().rebuild()
+        db.session.commit()
+        return jsonify({'success': True, **result})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 @staffing_api_bp.route('/coverage-gaps/check-time-off', methods=['POST'])
 @login_required
 def check_time_off_impact():
@@ -115,6 +195,32 @@ def check_time_off_impact():
     
     return jsonify(impact)
 
+@staffing_api_bp.route('/coverage-gaps/check-time-off/batch', methods=['POST'])
+@login_required
+def check_time_off_impact_batch():
+    """Check coverage impact of several time off requests, alone and combined"""
+    if not current_user.is_supervisor:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    data = request.json or {}
+    request_ids = data.get('request_ids')
+    
+    # Default to the whole pending queue
+    if not request_ids:
+        request_ids = [r.id for r in TimeOffRequest.query.filter_by(
+            status=TimeOffStatus.PENDING
+        ).all()]
+    
+    try:
+        request_ids = [int(rid) for rid in request_ids]
+    except (TypeError, ValueError):
+        return jsonify({'error': 'request_ids must be a list of integers'}), 400
+    
+    gap_engine, _ = get_engines()
+    impact = gap_engine.check_time_off_impact_batch(request_ids)
+    
+    return jsonify(impact)
+
 @staffing_api_bp.route('/overtime/eligible-employees')
 @login_required
 def get_eligible_for_overtime():
@@ -125,6 +231,7 @@ def get_eligible_for_overtime():
     position_id = request.args.get('position_id', type=int)
     date_str = request.args.get('date')
     shift_type = request.args.get('shift_type', 'day')
+    crew = request.args.get('crew')
     
     if not position_id or not date_str:
         return jsonify({'error': 'Missing required parameters'}), 400
@@ -132,7 +239,9 @@ def get_eligible_for_overtime():
     date_needed = datetime.strptime(date_str, '%Y-%m-%d').date()
     
     _, ot_engine = get_engines()
-    eligible = ot_engine.get_eligible_employees(position_id, date_needed, shift_type)
+    eligible = ot_engine.get_eligible_employees(
+        position_id, date_needed, shift_type, crews_to_consider=[crew] if crew else None
+    )
     
     # Format for response
     formatted = []
@@ -245,6 +354,54 @@ def assign_mandatory_overtime():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@staffing_api_bp.route('/overtime/assign-period', methods=['POST'])
+@login_required
+def assign_overtime_for_period():
+    """Fill all open gaps in a date range with one optimal assignment"""
+    if not current_user.is_supervisor:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    data = request.json or {}
+    start_str = data.get('start_date')
+    end_str = data.get('end_date')
+    
+    if not start_str or not end_str:
+        return jsonify({'error': 'Missing required parameters'}), 400
+    
+    start_date = datetime.strptime(start_str, '%Y-%m-%d').date()
+    end_date = datetime.strptime(end_str, '%Y-%m-%d').date()
+    if end_date < start_date or (end_date - start_date).days > 31:
+        return jsonify({'error': 'Date range must be 1 to 32 days'}), 400
+    
+    _, ot_engine = get_engines()
+    
+    try:
+        plan = ot_engine.assign_overtime_for_period(
+            start_date, end_date,
+            assigned_by_id=current_user.id,
+            max_shifts_per_employee=data.get('max_shifts_per_employee', 3),
+            dry_run=bool(data.get('dry_run', False))
+        )
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+    
+    for row in plan['assignments'] + plan['unfilled']:
+        row['date'] = row['date'].isoformat()
+    
+    return jsonify({
+        'success': True,
+        'start_date': start_str,
+        'end_date': end_str,
+        'dry_run': bool(data.get('dry_run', False)),
+        'assigned_count': len(plan['assignments']),
+        'unfilled_count': sum(u['count'] for u in plan['unfilled']),
+        'assignments': plan['assignments'],
+        'unfilled': plan['unfilled'],
+        'total_cost': plan['total_cost'],
+        'elapsed_ms': plan['elapsed_ms']
+    })
+
 @staffing_api_bp.route('/overtime/distribution-report')
 @login_required
 def get_overtime_distribution():
@@ -252,14 +409,60 @@ def get_overtime_distribution():
     if not current_user.is_supervisor:
         return jsonify({'error': 'Unauthorized'}), 403
     
-    weeks = request.args.get('weeks', 13, type=int)
-    start_date = date.today() - timedelta(weeks=weeks)
+    # Explicit start/end dates take precedence over a trailing number of weeks
+    try:
+        start_str = request.args.get('start_date')
+        end_str = request.args.get('end_date')
+        end_date = datetime.strptime(end_str, '%Y-%m-%d').date() if end_str else date.today()
+        if start_str:
+            start_date = datetime.strptime(start_str, '%Y-%m-%d').date()
+        else:
+            weeks = request.args.get('weeks', 13, type=int)
+            start_date = end_date - timedelta(weeks=weeks)
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
     
     _, ot_engine = get_engines()
-    report = ot_engine.get_overtime_distribution_report(start_date=start_date)
+    report = ot_engine.get_overtime_distribution_report(start_date=start_date, end_date=end_date)
     
     return jsonify(report)
 
+@staffing_api_bp.route('/notifications/outbox')
+@login_required
+def get_notification_outbox():
+    """Get delivery status counts for queued notifications"""
+    if not current_user.is_supervisor:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    outbox = Outbox(db, {
+        'NotificationOutbox': NotificationOutbox,
+        'CoverageNotification': CoverageNotification,
+        'Employee': Employee
+    })
+    return jsonify(outbox.get_status_counts())
+
+@staffing_api_bp.route('/notifications/drain', methods=['POST'])
+@login_required
+def drain_notification_outbox():
+    """Deliver due notifications now (for deployments without the worker)"""
+    if not current_user.is_supervisor:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    max_batches = (request.get_json(silent=True) or {}).get('max_batches', 10)
+    outbox = Outbox(db, {
+        'NotificationOutbox': NotificationOutbox,
+        'CoverageNotification': CoverageNotification,
+        'Employee': Employee
+    })
+    
+    try:
+        result = outbox.drain(max_batches=max_batches)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+    
+    return jsonify({'success': True, **result})
+
 @staffing_api_bp.route('/overtime/respond', methods=['POST'])
 @login_required
 def respond_to_overtime():
@@ -363,7 +566,7 @@ def check_employee_fatigue(employee_id):
     
     # Calculate fatigue metrics
     consecutive = ot_engine._calculate_consecutive_days(employee_id, check_date)
-    fatigue_score = ot_engine._calculate_fatigue_score(employee_id, check_date, 'day', consecutive)
+    fatigue_score = ot_engine._calculate_fatigue_score(employee_id, check_date, 'day')
     
     employee = Employee.query.get(employee_id)
     
@@ -376,3 +579,38 @@ def check_employee_fatigue(employee_id):
         'fatigue_level': 'high' if fatigue_score > 7 else 'medium' if fatigue_score > 4 else 'low',
         'warnings': []
     })
+
+@staffing_api_bp.route('/fatigue/heatmap')
+@login_required
+def get_fatigue_heatmap():
+    """Get an employee x date fatigue grid for the workforce"""
+    if not current_user.is_supervisor:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    days_ahead = min(max(request.args.get('days', 14, type=int), 1), 62)
+    shift_type = request.args.get('shift_type', 'day')
+    crew = request.args.get('crew')
+    position_id = request.args.get('position_id', type=int)
+    
+    query = Employee.query.filter(
+        Employee.is_active == True,
+        Employee.is_supervisor == False
+    )
+    if crew:
+        query = query.filter(Employee.crew == crew)
+    if position_id:
+        query = query.filter(Employee.position_id == position_id)
+    employees = query.order_by(Employee.crew, Employee.name).all()
+    
+    _, ot_engine = get_engines()
+    start_date = date.today()
+    fatigue = ot_engine.build_fatigue_matrix(
+        [e.id for e in employees], start_date, start_date + timedelta(days=days_ahead - 1)
+    )
+    
+    heatmap = fatigue.heatmap(shift_type, employees={
+        e.id: {'name': e.name, 'crew': e.crew, 'position_id': e.position_id}
+        for e in employees
+    })
+    
+    return jsonify(heatmap)
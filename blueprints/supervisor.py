@@ -13,6 +13,7 @@ from datetime import date, datetime, timedelta
 from sqlalchemy import func, and_, or_, text
 from sqlalchemy.exc import ProgrammingError, OperationalError, IntegrityError
 from functools import wraps
+from engines.worked_day_index import WorkedDayIndex
 import logging
 
 # Set up logging
@@ -411,11 +412,47 @@ def shift_swaps():
         flash('Error loading shift swaps.', 'danger')
         return redirect(url_for('supervisor.dashboard'))
 
+def get_swap_issues(swap_id):
+    """Consecutive-day and double-booking problems the swap would create"""
+    try:
+        row = db.session.execute(text("""
+            SELECT ssr.requester_id, ssr.requested_with_id, rs.date, ws.date
+            FROM shift_swap_request ssr
+            JOIN schedule rs ON ssr.requester_schedule_id = rs.id
+            JOIN schedule ws ON ssr.requested_schedule_id = ws.id
+            WHERE ssr.id = :swap_id
+        """), {'swap_id': swap_id}).first()
+        
+        if not row:
+            return []
+        
+        requester_id, requested_with_id, requester_date, requested_date = row
+        if isinstance(requester_date, str):
+            requester_date = date.fromisoformat(requester_date[:10])
+        if isinstance(requested_date, str):
+            requested_date = date.fromisoformat(requested_date[:10])
+        
+        index = WorkedDayIndex(db, {'Schedule': Schedule})
+        return index.check_swap(requester_id, requester_date, requested_with_id, requested_date)
+    
+    except Exception as e:
+        logger.warning(f"Could not validate swap {swap_id}: {e}")
+        db.session.rollback()
+        return []
+
 @supervisor_bp.route('/supervisor/approve-swap/<int:swap_id>')
 @login_required
 @supervisor_required
 def approve_swap(swap_id):
     """Approve a shift swap request with error handling"""
+    crew = request.args.get('crew', session.get('selected_crew', 'all'))
+    
+    issues = get_swap_issues(swap_id)
+    if issues:
+        for issue in issues:
+            flash(f"Cannot approve swap: {issue['issue']} ({issue['date']})", 'danger')
+        return redirect(url_for('supervisor.shift_swaps', crew=crew))
+    
     try:
         def approve_swap_func():
             # Use raw SQL to avoid ORM issues
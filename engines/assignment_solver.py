@@ -0,0 +1,98 @@
+import numpy as np
+
+
+def min_cost_assignment(cost):
+    """
+    Minimum-cost assignment of rows to distinct columns.
+    
+    cost is a 2-D array; np.inf marks a forbidden pair. Every row that can
+    be matched is matched (a row is only left out when it cannot be placed
+    without displacing another), and among those matchings the total cost
+    is minimal. Returns a list of (row, column) pairs.
+    
+    Shortest augmenting path with row/column potentials (the
+    Jonker-Volgenant scheme), vectorized over columns with NumPy.
+    """
+    cost = np.asarray(cost, dtype=float)
+    if cost.ndim != 2 or cost.size == 0:
+        return []
+    
+    num_rows, num_cols = cost.shape
+    allowed = np.isfinite(cost)
+    if not allowed.any():
+        return []
+    
+    # Some optimal matching gives every row one of its num_rows cheapest
+    # columns (the others can hold at most num_rows - 1 of them), so
+    # columns outside every row's shortlist can be dropped
+    if num_cols > 2 * num_rows:
+        shortlist = np.argpartition(cost, num_rows - 1, axis=1)[:, :num_rows]
+        keep = np.unique(shortlist)
+        if len(keep) < num_cols:
+            return [(row, int(keep[col])) for row, col in min_cost_assignment(cost[:, keep])]
+    
+    # One private "unfilled" column per row whose cost outweighs any real
+    # matching, so the problem is always feasible and fill count comes first
+    finite = cost[allowed]
+    spread = float(finite.max() - min(finite.min(), 0.0)) + 1.0
+    unfilled_cost = spread * (num_rows + 1)
+    forbidden_cost = unfilled_cost * (num_rows + 1)
+    
+    padded = np.full((num_rows, num_cols + num_rows), forbidden_cost)
+    padded[:, :num_cols] = np.where(allowed, cost, forbidden_cost)
+    padded[np.arange(num_rows), num_cols + np.arange(num_rows)] = unfilled_cost
+    
+    width = padded.shape[1]
+    u = np.zeros(num_rows)
+    v = np.zeros(width)
+    row_for_col = np.full(width, -1, dtype=np.int64)
+    col_for_row = np.full(num_rows, -1, dtype=np.int64)
+    
+    for start_row in range(num_rows):
+        shortest = np.full(width, np.inf)
+        candidates = np.full(width, np.inf)  # shortest, for columns not yet scanned
+        path = np.full(width, -1, dtype=np.int64)
+        remaining = np.ones(width, dtype=bool)
+        visited_rows = np.zeros(num_rows, dtype=bool)
+        min_value = 0.0
+        row = start_row
+        sink = -1
+        
+        while sink < 0:
+            visited_rows[row] = True
+            reduced = min_value + padded[row] - u[row] - v
+            better = remaining & (reduced < candidates)
+            path[better] = row
+            candidates[better] = reduced[better]
+            
+            col = int(np.argmin(candidates))
+            min_value = candidates[col]
+            shortest[col] = min_value
+            candidates[col] = np.inf
+            remaining[col] = False
+            if row_for_col[col] < 0:
+                sink = col
+            else:
+                row = row_for_col[col]
+        
+        # Update potentials
+        u[start_row] += min_value
+        others = visited_rows.copy()
+        others[start_row] = False
+        u[others] += min_value - shortest[col_for_row[others]]
+        done = ~remaining
+        v[done] -= min_value - shortest[done]
+        
+        # Augment along the path back to start_row
+        col = sink
+        while True:
+            row = path[col]
+            row_for_col[col] = row
+            col_for_row[row], col = col, col_for_row[row]
+            if row == start_row:
+                break
+    
+    return [
+        (row, int(col)) for row, col in enumerate(col_for_row)
+        if col < num_cols and allowed[row, col]
+    ]
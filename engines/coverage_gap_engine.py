@@ -1,8 +1,13 @@
 from datetime import datetime, timedelta, date
 from sqlalchemy import func, and_, or_
 from collections import defaultdict
+import numpy as np
 import json
 
+from engines.coverage_tensor import CoverageTensor
+from engines.crew_calendar import CrewCalendar
+from engines.virtual_schedule import VirtualSchedule
+
 class CoverageGapDetectionEngine:
     """
     Detects and analyzes coverage gaps in real-time and for future shifts.
@@ -17,7 +22,10 @@ class CoverageGapDetectionEngine:
         self.PositionCoverage = models['PositionCoverage']
         self.VacationCalendar = models['VacationCalendar']
         self.CoverageGap = models.get('CoverageGap')
-        
+        self.TimeOffRequest = models.get('TimeOffRequest')
+        self.crew_calendar = CrewCalendar(db, models)
+        self.virtual_schedule = VirtualSchedule(db, models)
+    
     def detect_current_gaps(self, crews_on_duty=['A', 'B'], shift_type='day'):
         """
         Detect coverage gaps for the current shift.
@@ -31,6 +39,15 @@ class CoverageGapDetectionEngine:
             self.Position.requires_coverage == True
         ).all()
         
+        # A virtual rotation has no stored rows to count; count its computed shifts
+        virtual_counts = None
+        if self.virtual_schedule.active_pattern() is not None:
+            virtual_counts = defaultdict(int)
+            for shift in self.virtual_schedule.shifts(today, today):
+                if (getattr(shift.shift_type, 'value', shift.shift_type) == shift_type and
+                        shift.employee is not None and shift.employee.crew in crews_on_duty):
+                    virtual_counts[shift.employee.position_id] += 1
+        
         for position in positions:
             # Get coverage requirements for this position
             coverage_req = self.PositionCoverage.query.filter_by(
@@ -44,14 +61,17 @@ class CoverageGapDetectionEngine:
             required_count = coverage_req.min_required
             
             # Count scheduled employees for this position
-            scheduled = self.db.session.query(func.count(self.Schedule.id)).join(
-                self.Employee
-            ).filter(
-                self.Schedule.date == today,
-                self.Schedule.shift_type == shift_type,
-                self.Employee.position_id == position.id,
-                self.Employee.crew.in_(crews_on_duty)
-            ).scalar() or 0
+            if virtual_counts is not None:
+                scheduled = virtual_counts[position.id]
+            else:
+                scheduled = self.db.session.query(func.count(self.Schedule.id)).join(
+                    self.Employee, self.Schedule.employee_id == self.Employee.id
+                ).filter(
+                    self.Schedule.date == today,
+                    self.Schedule.shift_type == shift_type,
+                    self.Employee.position_id == position.id,
+                    self.Employee.crew.in_(crews_on_duty)
+                ).scalar() or 0
             
             # Count absences (vacation, sick, etc.)
             absences = self.db.session.query(func.count(self.VacationCalendar.id)).join(
@@ -83,11 +103,18 @@ class CoverageGapDetectionEngine:
         
         return gaps
     
-    def detect_future_gaps(self, days_ahead=14):
+    def detect_future_gaps(self, days_ahead=14, bulk=True):
         """
         Detect coverage gaps for future shifts.
         Analyzes approved time off and known scheduling gaps.
+        
+        bulk=True loads headcounts and absences with grouped queries and
+        builds the gap list in memory; bulk=False walks every
+        date x shift x position with per-cell queries.
         """
+        if bulk:
+            return self._detect_future_gaps_bulk(days_ahead)
+        
         future_gaps = []
         start_date = date.today() + timedelta(days=1)
         end_date = date.today() + timedelta(days=days_ahead)
@@ -159,26 +186,97 @@ class CoverageGapDetectionEngine:
         
         return future_gaps
     
+    def _detect_future_gaps_bulk(self, days_ahead):
+        """
+        Set-based version of detect_future_gaps.
+        Issues a fixed number of queries regardless of the horizon length.
+        """
+        start_date = date.today() + timedelta(days=1)
+        end_date = date.today() + timedelta(days=days_ahead)
+        
+        return self.build_coverage_tensor(start_date, end_date).gaps()
+    
+    def build_coverage_tensor(self, start_date, end_date):
+        """
+        Build a CoverageTensor of required/on-roster/absent counts indexed
+        by [date, shift, position] for every position requiring coverage.
+        """
+        positions = self.Position.query.filter(
+            self.Position.requires_coverage == True
+        ).order_by(self.Position.id).all()
+        
+        if positions and start_date <= end_date:
+            position_ids = [p.id for p in positions]
+            requirements = self._load_coverage_requirements(position_ids)
+            headcounts = self._load_headcounts(position_ids)
+            absences = self._load_absences(start_date, end_date, position_ids)
+        else:
+            requirements, headcounts, absences = {}, {}, {}
+        
+        return CoverageTensor.build(
+            positions, requirements, headcounts, absences,
+            start_date, end_date, self._get_crews_on_duty
+        )
+    
+    def _load_coverage_requirements(self, position_ids):
+        """
+        Map (position_id, shift_type) -> PositionCoverage.
+        Keeps the first row per key, matching filter_by(...).first().
+        """
+        requirements = {}
+        rows = self.PositionCoverage.query.filter(
+            self.PositionCoverage.position_id.in_(position_ids)
+        ).order_by(self.PositionCoverage.id).all()
+        
+        for req in rows:
+            requirements.setdefault((req.position_id, req.shift_type), req)
+        
+        return requirements
+    
+    def _load_headcounts(self, position_ids):
+        """Map (position_id, crew) -> number of active employees."""
+        rows = self.db.session.query(
+            self.Employee.position_id,
+            self.Employee.crew,
+            func.count(self.Employee.id)
+        ).filter(
+            self.Employee.position_id.in_(position_ids),
+            self.Employee.is_active == True
+        ).group_by(
+            self.Employee.position_id,
+            self.Employee.crew
+        ).all()
+        
+        return {(position_id, crew): count for position_id, crew, count in rows}
+    
+    def _load_absences(self, start_date, end_date, position_ids):
+        """Map (date, position_id, crew) -> approved VacationCalendar entries."""
+        rows = self.db.session.query(
+            self.VacationCalendar.date,
+            self.Employee.position_id,
+            self.Employee.crew,
+            func.count(self.VacationCalendar.id)
+        ).join(
+            self.Employee
+        ).filter(
+            self.VacationCalendar.date >= start_date,
+            self.VacationCalendar.date <= end_date,
+            self.VacationCalendar.status == 'approved',
+            self.Employee.position_id.in_(position_ids)
+        ).group_by(
+            self.VacationCalendar.date,
+            self.Employee.position_id,
+            self.Employee.crew
+        ).all()
+        
+        return {(day, position_id, crew): count for day, position_id, crew, count in rows}
+    
     def _get_crews_on_duty(self, check_date, shift_type):
         """
-        Determine which crews are on duty for a given date and shift.
-        This should match your rotation pattern logic.
+        Determine which crews are on duty for a given date and shift,
+        from the crew calendar of the generated pattern.
         """
-        # This is a simplified example - replace with your actual rotation logic
-        # For now, assuming a simple 2-on-2-off pattern
-        days_from_start = (check_date - date(2024, 1, 1)).days
-        cycle_day = days_from_start % 4
-        
-        if shift_type == 'day':
-            if cycle_day in [0, 1]:
-                return ['A', 'B']
-            else:
-                return ['C', 'D']
-        else:  # night
-            if cycle_day in [0, 1]:
-                return ['C', 'D']
-            else:
-                return ['A', 'B']
+        return self.crew_calendar.crews_on_duty(check_date, shift_type)
     
     def _calculate_urgency(self, days_until):
         """Calculate urgency level based on time until gap occurs."""
@@ -193,17 +291,31 @@ class CoverageGapDetectionEngine:
         else:
             return 'low'
     
-    def get_gap_summary(self):
+    def get_gap_summary(self, future_gaps=None, days_ahead=14):
         """
         Get a summary of all coverage gaps for dashboard display.
+        Future buckets and statistics are derived from a coverage tensor;
+        pass precomputed future_gaps (e.g. from the coverage_gap table)
+        to have those scattered into the tensor instead of rebuilding it.
         """
         current_gaps = self.detect_current_gaps()
-        future_gaps = self.detect_future_gaps()
+        current_critical = len([g for g in current_gaps if g['critical']])
+        current_positions = set(g['position_id'] for g in current_gaps)
+        
+        start_date = date.today() + timedelta(days=1)
+        end_date = date.today() + timedelta(days=days_ahead)
+        if future_gaps is None:
+            tensor = self.build_coverage_tensor(start_date, end_date)
+        else:
+            tensor = CoverageTensor.from_gaps(future_gaps, start_date, end_date)
         
-        # Group future gaps by urgency
         urgency_groups = defaultdict(list)
-        for gap in future_gaps:
+        for gap in tensor.gaps():
             urgency_groups[gap['urgency']].append(gap)
+        stats = tensor.statistics()
+        total_future_gaps = stats['total_gaps']
+        future_critical = stats['critical_gaps']
+        future_positions = set(stats['position_ids_affected'])
         
         summary = {
             'current_shift': {
@@ -217,9 +329,9 @@ class CoverageGapDetectionEngine:
             'next_14_days': urgency_groups.get('low', []),
             'statistics': {
                 'total_current_gaps': len(current_gaps),
-                'total_future_gaps': len(future_gaps),
-                'critical_gaps': len([g for g in current_gaps + future_gaps if g['critical']]),
-                'positions_affected': len(set(g['position_id'] for g in current_gaps + future_gaps))
+                'total_future_gaps': total_future_gaps,
+                'critical_gaps': current_critical + future_critical,
+                'positions_affected': len(current_positions | future_positions)
             }
         }
         
@@ -295,6 +407,155 @@ class CoverageGapDetectionEngine:
             'creates_gaps': any(i['creates_gap'] for i in impacts)
         }
     
+    def check_time_off_impact_batch(self, request_ids):
+        """
+        Check the coverage impact of several time off requests at once.
+        
+        Loads the requests, headcounts and absences for the union of their
+        date ranges once, evaluates each request the same way as
+        check_time_off_impact, and reports the combined impact on cells
+        where more than one request would be granted together.
+        """
+        rows = self.db.session.query(self.TimeOffRequest, self.Employee).join(
+            self.Employee, self.TimeOffRequest.employee_id == self.Employee.id
+        ).filter(
+            self.TimeOffRequest.id.in_(request_ids)
+        ).order_by(self.TimeOffRequest.start_date, self.TimeOffRequest.id).all()
+        
+        found_ids = set(req.id for req, _ in rows)
+        not_found = [rid for rid in request_ids if rid not in found_ids]
+        rows = [(req, emp) for req, emp in rows if emp.position_id and req.start_date <= req.end_date]
+        
+        if not rows:
+            return {
+                'requests': [],
+                'combined': {'impacts': [], 'total_days_affected': 0, 'creates_gaps': False},
+                'not_found': not_found
+            }
+        
+        start_date = min(req.start_date for req, _ in rows)
+        end_date = max(req.end_date for req, _ in rows)
+        
+        position_ids = sorted(set(emp.position_id for _, emp in rows))
+        positions = self.Position.query.filter(
+            self.Position.id.in_(position_ids)
+        ).order_by(self.Position.id).all()
+        position_index = {p.id: i for i, p in enumerate(positions)}
+        
+        tensor = CoverageTensor.build(
+            positions,
+            self._load_coverage_requirements(position_ids),
+            self._load_headcounts(position_ids),
+            self._load_absences(start_date, end_date, position_ids),
+            start_date, end_date, self._get_crews_on_duty
+        )
+        projected = tensor.projected
+        
+        # Requesters' own approved days are already in the absence counts
+        employee_ids = set(emp.id for _, emp in rows)
+        already_off = set(self.db.session.query(
+            self.VacationCalendar.employee_id,
+            self.VacationCalendar.date
+        ).filter(
+            self.VacationCalendar.employee_id.in_(employee_ids),
+            self.VacationCalendar.date >= start_date,
+            self.VacationCalendar.date <= end_date,
+            self.VacationCalendar.status == 'approved'
+        ).all())
+        
+        # removed[d, s, p]: distinct requesters who would leave the cell
+        removed = np.zeros(tensor.shape, dtype=np.int32)
+        contributors = defaultdict(set)
+        employee_masks = {}
+        results = []
+        
+        for req, emp in rows:
+            p = position_index[emp.position_id]
+            first = (req.start_date - start_date).days
+            last = (req.end_date - start_date).days
+            
+            # on_duty[d, s]: requester's crew works this shift
+            on_duty = np.zeros(tensor.shape[:2], dtype=bool)
+            own_off = np.zeros(tensor.shape[:2], dtype=np.int32)
+            for d in range(first, last + 1):
+                for s in range(len(tensor.shift_types)):
+                    on_duty[d, s] = emp.crew in tensor.crews_on_duty[d][s]
+                if (emp.id, tensor.dates[d]) in already_off:
+                    own_off[d, :] = 1
+            
+            # Same figures as check_time_off_impact: coverage without this employee
+            would_have = (projected[:, :, p] - (1 if emp.is_active else 0) + own_off)
+            required = tensor.required[:, :, p]
+            flagged = on_duty & tensor.has_requirement[:, :, p] & (would_have <= required)
+            
+            impacts = []
+            for d, s in np.argwhere(flagged):
+                creates_gap = bool(would_have[d, s] < required[d, s])
+                impacts.append({
+                    'date': tensor.dates[d],
+                    'shift_type': tensor.shift_types[s],
+                    'position': positions[p].name,
+                    'required': int(required[d, s]),
+                    'would_have': int(would_have[d, s]),
+                    'creates_gap': creates_gap,
+                    'severity': 'high' if creates_gap else 'medium'
+                })
+            
+            results.append({
+                'request_id': req.id,
+                'employee_id': emp.id,
+                'employee': emp.name,
+                'position': positions[p].name,
+                'crew': emp.crew,
+                'start_date': req.start_date,
+                'end_date': req.end_date,
+                'status': getattr(req.status, 'value', req.status),
+                'impacts': impacts,
+                'total_days_affected': len(impacts),
+                'creates_gaps': any(i['creates_gap'] for i in impacts)
+            })
+            
+            # Count each employee once per cell even if their requests overlap
+            leaves = on_duty & (own_off == 0) if emp.is_active else np.zeros_like(on_duty)
+            key = (emp.id, p)
+            employee_masks[key] = employee_masks.get(key, np.zeros_like(on_duty)) | leaves
+            for d, s in np.argwhere(on_duty):
+                contributors[(d, s, p)].add(req.id)
+        
+        for (employee_id, p), leaves in employee_masks.items():
+            removed[:, :, p] += leaves
+        
+        combined_would_have = projected - removed
+        combined = []
+        for (d, s, p), req_ids in sorted(contributors.items()):
+            if len(req_ids) < 2 or not tensor.has_requirement[d, s, p]:
+                continue
+            required = int(tensor.required[d, s, p])
+            would_have = int(combined_would_have[d, s, p])
+            if would_have <= required:
+                creates_gap = would_have < required
+                combined.append({
+                    'date': tensor.dates[d],
+                    'shift_type': tensor.shift_types[s],
+                    'position': positions[p].name,
+                    'required': required,
+                    'would_have': would_have,
+                    'request_ids': sorted(req_ids),
+                    'creates_gap': creates_gap,
+                    'severity': 'high' if creates_gap else 'medium'
+                })
+        
+        return {
+            'requests': results,
+            'combined': {
+                'impacts': combined,
+                'total_days_affected': len(combined),
+                'creates_gaps': any(i['creates_gap'] for i in combined)
+            },
+            'date_range': {'start': start_date, 'end': end_date},
+            'not_found': not_found
+        }
+    
     def get_recommended_actions(self, gaps):
         """
         Generate recommended actions for each gap based on urgency and severity.
@@ -0,0 +1,467 @@
+from datetime import datetime, timedelta, date
+from sqlalchemy import event, inspect
+import logging
+
+from engines.coverage_gap_engine import CoverageGapDetectionEngine
+
+logger = logging.getLogger(__name__)
+
+# Days ahead (from today) that are kept materialized in coverage_gap
+MAINTAINED_DAYS = 90
+
+# How often the background job extends the table as the window moves
+REFRESH_SECONDS = 6 * 3600
+
+SHIFT_TYPES = ['day', 'night']
+
+# Session.info key used to collect changes between flush and commit
+PENDING_KEY = 'coverage_gap_pending'
+
+_installed_sessions = set()
+
+
+def note_bulk_schedule_write(session, position_ids, start_date, end_date):
+    """
+    Queue the cells of a Core bulk Schedule write (which fires no flush
+    events) for the pre-commit refresh: every maintained date of the
+    written range, for each position the rows carry.
+    """
+    if not _installed_sessions or start_date is None:
+        return
+    
+    today = date.today()
+    first = max(start_date, today + timedelta(days=1))
+    last = min(end_date, today + timedelta(days=MAINTAINED_DAYS))
+    
+    pending = session.info.setdefault(PENDING_KEY, {
+        'employee_dates': set(),
+        'positions': set()
+    })
+    day = first
+    while day <= last:
+        for position_id in position_ids:
+            if position_id is not None:
+                pending.setdefault('position_dates', set()).add((position_id, day))
+        day += timedelta(days=1)
+
+
+def note_crew_calendar_write(session):
+    """
+    Queue every maintained cell after the crew duty calendar is rewritten
+    (engines/crew_calendar.py): a new active pattern changes the crews on
+    duty for generated and projected dates alike.
+    """
+    if not _installed_sessions:
+        return
+    
+    pending = session.info.setdefault(PENDING_KEY, {
+        'employee_dates': set(),
+        'positions': set()
+    })
+    pending['crew_calendar'] = True
+
+
+class CoverageGapMaintainer:
+    """
+    Keeps the coverage_gap table in sync with the data it is derived from.
+    
+    Changes to Schedule, VacationCalendar, TimeOffRequest, Employee
+    (crew/position/active), PositionCoverage and Position (requires_coverage)
+    rows are collected on flush and, just before commit, only the affected
+    (date, shift, position) cells are recomputed and upserted; a rewritten
+    crew calendar recomputes the whole window. Readers can then serve future
+    gaps straight from coverage_gap instead of rescanning.
+    
+    How far ahead the table has been computed is stored in
+    coverage_gap_window, so every process and every rebuild sees the same
+    watermark. Reads never write: dates past the watermark are computed
+    live, and extend() (run as a recurring background job) moves it.
+    """
+    
+    def __init__(self, db, models, days_ahead=MAINTAINED_DAYS):
+        self.db = db
+        self.days_ahead = days_ahead
+        self.Employee = models['Employee']
+        self.Schedule = models['Schedule']
+        self.Position = models['Position']
+        self.PositionCoverage = models.get('PositionCoverage')
+        self.VacationCalendar = models['VacationCalendar']
+        self.TimeOffRequest = models.get('TimeOffRequest')
+        self.CoverageGap = models['CoverageGap']
+        self.CoverageGapWindow = models.get('CoverageGapWindow')
+        self.gap_engine = CoverageGapDetectionEngine(db, models)
+        self.shift_enum = self.CoverageGap.__table__.c.shift_type.type.enum_class
+    
+    # ==========================================
+    # SESSION HOOKS
+    # ==========================================
+    
+    def install(self):
+        """Register flush/commit listeners on the application session (once)."""
+        key = id(self.db.session)
+        if key in _installed_sessions:
+            return
+        
+        event.listen(self.db.session, 'after_flush', self._after_flush)
+        event.listen(self.db.session, 'before_commit', self._before_commit)
+        _installed_sessions.add(key)
+        logger.info("Coverage gap maintenance installed")
+    
+    def _after_flush(self, session, flush_context):
+        """Record which employees/dates/positions the flushed rows touch."""
+        pending = session.info.setdefault(PENDING_KEY, {
+            'employee_dates': set(),
+            'positions': set()
+        })
+        
+        added_or_removed = set(session.new) | set(session.deleted)
+        for obj in added_or_removed | set(session.dirty):
+            try:
+                self._collect_changes(obj, pending, obj in added_or_removed)
+            except Exception as e:
+                logger.warning(f"Could not track coverage change for {obj!r}: {e}")
+    
+    def _collect_changes(self, obj, pending, added_or_removed=False):
+        """Translate one changed ORM object into pending cell keys."""
+        window_start, window_end = self._window()
+        
+        if isinstance(obj, (self.Schedule, self.VacationCalendar)):
+            for day in self._attribute_values(obj, 'date'):
+                if window_start <= day <= window_end:
+                    for employee_id in self._attribute_values(obj, 'employee_id'):
+                        pending['employee_dates'].add((employee_id, day))
+        
+        elif self.TimeOffRequest is not None and isinstance(obj, self.TimeOffRequest):
+            starts = self._attribute_values(obj, 'start_date')
+            ends = self._attribute_values(obj, 'end_date')
+            if not starts or not ends:
+                return
+            
+            first = max(min(starts), window_start)
+            last = min(max(ends), window_end)
+            for employee_id in self._attribute_values(obj, 'employee_id'):
+                day = first
+                while day <= last:
+                    pending['employee_dates'].add((employee_id, day))
+                    day += timedelta(days=1)
+        
+        elif isinstance(obj, self.Employee):
+            state = inspect(obj)
+            changed = added_or_removed or any(
+                state.attrs[attr].history.has_changes()
+                for attr in ('crew', 'position_id', 'is_active')
+            )
+            if changed:
+                for position_id in self._attribute_values(obj, 'position_id'):
+                    pending['positions'].add(position_id)
+        
+        elif self.PositionCoverage is not None and isinstance(obj, self.PositionCoverage):
+            state = inspect(obj)
+            changed = added_or_removed or any(
+                state.attrs[attr].history.has_changes()
+                for attr in ('position_id', 'shift_type', 'min_required')
+            )
+            if changed:
+                pending['positions'].update(self._attribute_values(obj, 'position_id'))
+        
+        elif isinstance(obj, self.Position):
+            if added_or_removed or inspect(obj).attrs.requires_coverage.history.has_changes():
+                pending['positions'].add(obj.id)
+    
+    @staticmethod
+    def _attribute_values(obj, attr):
+        """Current and previous (pre-flush) non-null values of an attribute."""
+        history = inspect(obj).attrs[attr].history
+        values = set(history.added or ()) | set(history.unchanged or ()) | set(history.deleted or ())
+        if not values:
+            value = getattr(obj, attr, None)
+            values = {value}
+        return {v for v in values if v is not None}
+    
+    def _before_commit(self, session):
+        """Recompute the cells touched in this transaction before it commits."""
+        # Commit flushes after this hook runs; flush now so every change
+        # in the transaction has been collected by _after_flush
+        session.flush()
+        pending = session.info.pop(PENDING_KEY, None)
+        if not pending or not (pending['employee_dates'] or pending['positions'] or
+                               pending.get('position_dates') or pending.get('crew_calendar')):
+            return
+        
+        try:
+            with session.begin_nested():
+                if pending.get('crew_calendar'):
+                    self.rebuild()
+                else:
+                    cells = self._resolve_cells(pending)
+                    if cells:
+                        self.refresh_cells(cells)
+            session.info.pop(PENDING_KEY, None)
+        except Exception as e:
+            # Never block the user's commit; a rebuild will repair the table
+            logger.warning(f"Coverage gap maintenance skipped: {e}")
+    
+    def _resolve_cells(self, pending):
+        """Expand pending employee/date and position keys into cells."""
+        cells = set()
+        
+        employee_ids = {employee_id for employee_id, _ in pending['employee_dates']}
+        positions_by_employee = {}
+        if employee_ids:
+            rows = self.db.session.query(
+                self.Employee.id, self.Employee.position_id
+            ).filter(self.Employee.id.in_(employee_ids)).all()
+            positions_by_employee = dict(rows)
+        
+        for employee_id, day in pending['employee_dates']:
+            position_id = positions_by_employee.get(employee_id)
+            if position_id is None:
+                continue
+            for shift_type in SHIFT_TYPES:
+                cells.add((day, shift_type, position_id))
+        
+        for position_id, day in pending.get('position_dates', ()):
+            for shift_type in SHIFT_TYPES:
+                cells.add((day, shift_type, position_id))
+        
+        if pending['positions']:
+            window_start, window_end = self._window()
+            day = window_start
+            while day <= window_end:
+                for position_id in pending['positions']:
+                    for shift_type in SHIFT_TYPES:
+                        cells.add((day, shift_type, position_id))
+                day += timedelta(days=1)
+        
+        return cells
+    
+    # ==========================================
+    # RECOMPUTATION
+    # ==========================================
+    
+    def _window(self):
+        """Date window kept materialized: tomorrow .. today + days_ahead."""
+        today = date.today()
+        return today + timedelta(days=1), today + timedelta(days=self.days_ahead)
+    
+    def rebuild(self, start_date=None, end_date=None):
+        """Recompute every cell in a date range (defaults to the whole window)."""
+        window_start, window_end = self._window()
+        start_date = start_date or window_start
+        end_date = end_date or window_end
+        
+        position_ids = [
+            p.id for p in self.Position.query.filter(
+                self.Position.requires_coverage == True
+            ).all()
+        ]
+        
+        cells = set()
+        day = start_date
+        while day <= end_date:
+            for position_id in position_ids:
+                for shift_type in SHIFT_TYPES:
+                    cells.add((day, shift_type, position_id))
+            day += timedelta(days=1)
+        
+        # Drop rows for positions that no longer require coverage
+        stale = self.CoverageGap.query.filter(
+            self.CoverageGap.date >= start_date,
+            self.CoverageGap.date <= end_date,
+            self.CoverageGap.is_filled == False
+        )
+        if position_ids:
+            stale = stale.filter(~self.CoverageGap.position_id.in_(position_ids))
+        stale.delete(synchronize_session=False)
+        
+        result = self.refresh_cells(cells)
+        
+        # The watermark only moves over a contiguous computed range
+        through = self.materialized_through()
+        if through is None or through < window_start - timedelta(days=1):
+            through = window_start - timedelta(days=1)
+        if start_date <= through + timedelta(days=1) and end_date > through:
+            self._set_materialized_through(end_date)
+        
+        return result
+    
+    def refresh_cells(self, cells):
+        """
+        Recompute the given (date, shift_type, position_id) cells and upsert
+        them into coverage_gap. Cells without a gap have their unfilled row
+        removed. Uses a fixed number of queries per call.
+        """
+        if not cells:
+            return {'cells': 0, 'gaps': 0}
+        
+        position_ids = sorted({position_id for _, _, position_id in cells})
+        start_date = min(day for day, _, _ in cells)
+        end_date = max(day for day, _, _ in cells)
+        
+        positions = {
+            p.id: p for p in self.Position.query.filter(
+                self.Position.id.in_(position_ids),
+                self.Position.requires_coverage == True
+            ).all()
+        }
+        requirements = self.gap_engine._load_coverage_requirements(position_ids)
+        headcounts = self.gap_engine._load_headcounts(position_ids)
+        absences = self.gap_engine._load_absences(start_date, end_date, position_ids)
+        
+        existing = {}
+        for row in self.CoverageGap.query.filter(
+            self.CoverageGap.position_id.in_(position_ids),
+            self.CoverageGap.date >= start_date,
+            self.CoverageGap.date <= end_date
+        ).all():
+            existing[(row.date, self._shift_value(row.shift_type), row.position_id)] = row
+        
+        now = datetime.utcnow()
+        gaps = 0
+        
+        for cell in cells:
+            day, shift_type, position_id = cell
+            row = existing.get(cell)
+            coverage_req = requirements.get((position_id, shift_type))
+            
+            if position_id not in positions or not coverage_req:
+                if row is not None and not row.is_filled:
+                    self.db.session.delete(row)
+                continue
+            
+            crews_on_duty = self.gap_engine._get_crews_on_duty(day, shift_type)
+            available = sum(headcounts.get((position_id, crew), 0) for crew in crews_on_duty)
+            absent = sum(absences.get((day, position_id, crew), 0) for crew in crews_on_duty)
+            projected = available - absent
+            gap_count = coverage_req.min_required - projected
+            
+            if gap_count <= 0:
+                if row is not None and not row.is_filled:
+                    self.db.session.delete(row)
+                continue
+            
+            if row is None:
+                row = self.CoverageGap(
+                    position_id=position_id,
+                    date=day,
+                    shift_type=self.shift_enum(shift_type)
+                )
+                self.db.session.add(row)
+            
+            row.required_count = coverage_req.min_required
+            row.scheduled_count = projected
+            row.available_count = available
+            row.absent_count = absent
+            row.gap_count = gap_count
+            row.crews_on_duty = ''.join(crews_on_duty)
+            row.computed_at = now
+            gaps += 1
+        
+        return {'cells': len(cells), 'gaps': gaps}
+    
+    def materialized_through(self):
+        """Last date computed into coverage_gap, as stored in coverage_gap_window."""
+        if self.CoverageGapWindow is None:
+            return None
+        row = self.CoverageGapWindow.query.order_by(self.CoverageGapWindow.id).first()
+        return row.materialized_through if row else None
+    
+    def _set_materialized_through(self, end_date):
+        """Record the watermark in the caller's transaction."""
+        if self.CoverageGapWindow is None:
+            return
+        row = self.CoverageGapWindow.query.order_by(self.CoverageGapWindow.id).first()
+        if row is None:
+            row = self.CoverageGapWindow()
+            self.db.session.add(row)
+        row.materialized_through = end_date
+        row.updated_at = datetime.utcnow()
+    
+    def extend(self, end_date=None):
+        """
+        Compute the dates between the stored watermark and end_date (default
+        the end of the window). The caller commits. Changes to dates already
+        computed are kept current by the session hooks.
+        """
+        window_start, window_end = self._window()
+        end_date = min(end_date or window_end, window_end)
+        
+        through = self.materialized_through()
+        start_date = window_start
+        if through is not None and through >= window_start:
+            start_date = through + timedelta(days=1)
+        
+        if start_date > end_date:
+            return {'cells': 0, 'gaps': 0}
+        return self.rebuild(start_date, end_date)
+    
+    def materialize_job(self, params, report):
+        """engines/job_runner.py handler: extend the table to the window end."""
+        report(0, "Computing coverage gaps")
+        result = self.extend()
+        self.db.session.commit()
+        return {'success': True, 'materialized_through': self.materialized_through(), **result}
+    
+    # ==========================================
+    # READ PATH
+    # ==========================================
+    
+    def get_future_gaps(self, days_ahead=14):
+        """
+        Read precomputed future gaps in the same shape as
+        CoverageGapDetectionEngine.detect_future_gaps. Dates past the
+        stored watermark (not yet computed) are detected live, without
+        writing anything.
+        """
+        days_ahead = min(days_ahead, self.days_ahead)
+        start_date = date.today() + timedelta(days=1)
+        end_date = date.today() + timedelta(days=days_ahead)
+        
+        through = self.materialized_through()
+        if through is None or through < start_date:
+            return self.gap_engine.build_coverage_tensor(start_date, end_date).gaps()
+        
+        rows = self.db.session.query(self.CoverageGap, self.Position).join(
+            self.Position, self.CoverageGap.position_id == self.Position.id
+        ).filter(
+            self.CoverageGap.date >= start_date,
+            self.CoverageGap.date <= min(end_date, through),
+            self.CoverageGap.gap_count > 0,
+            self.CoverageGap.is_filled == False
+        ).order_by(
+            self.CoverageGap.date,
+            self.CoverageGap.shift_type,
+            self.CoverageGap.position_id
+        ).all()
+        
+        gaps = [self._row_to_gap(row, position) for row, position in rows]
+        if through < end_date:
+            gaps.extend(self.gap_engine.build_coverage_tensor(
+                through + timedelta(days=1), end_date
+            ).gaps())
+        return gaps
+    
+    def _row_to_gap(self, row, position):
+        """Format a coverage_gap row like a detect_future_gaps entry."""
+        days_until = (row.date - date.today()).days
+        
+        return {
+            'position_id': position.id,
+            'position_name': position.name,
+            'shift_type': self._shift_value(row.shift_type),
+            'date': row.date,
+            'crews_affected': list(row.crews_on_duty or ''),
+            'required': row.required_count,
+            'available': row.available_count,
+            'time_off': row.absent_count,
+            'projected': row.scheduled_count,
+            'gap': row.gap_count,
+            'critical': row.gap_count >= 2,
+            'days_until': days_until,
+            'urgency': self.gap_engine._calculate_urgency(days_until),
+            'skills_required': position.skills_required
+        }
+    
+    @staticmethod
+    def _shift_value(shift_type):
+        return getattr(shift_type, 'value', shift_type)
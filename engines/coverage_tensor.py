@@ -0,0 +1,271 @@
+from datetime import date, timedelta
+from types import SimpleNamespace
+import numpy as np
+
+SHIFT_TYPES = ['day', 'night']
+
+# Urgency labels in bucket order, matching CoverageGapDetectionEngine._calculate_urgency
+URGENCY_LEVELS = ['immediate', 'urgent', 'high', 'medium', 'low']
+
+
+class CoverageTensor:
+    """
+    Dense coverage counts indexed by [date, shift, position].
+    
+    Holds required, on-roster and absent counts for every cell of a date
+    range so gaps, urgency buckets, critical flags and heatmaps can be
+    derived with array operations instead of per-cell Python loops.
+    Build one with CoverageGapDetectionEngine.build_coverage_tensor().
+    """
+    
+    def __init__(self, dates, positions, crews_on_duty, required, has_requirement,
+                 on_roster, absent, today=None):
+        self.dates = dates
+        self.shift_types = list(SHIFT_TYPES)
+        self.positions = positions
+        self.crews_on_duty = crews_on_duty  # [date][shift] -> list of crews
+        self.required = required
+        self.has_requirement = has_requirement
+        self.on_roster = on_roster
+        self.absent = absent
+        self.today = today or date.today()
+    
+    @classmethod
+    def build(cls, positions, requirements, headcounts, absences, start_date, end_date,
+              crews_for, today=None):
+        """
+        Assemble the tensor from the grouped loader results of
+        CoverageGapDetectionEngine (no queries).
+        
+        crews_for(check_date, shift_type) returns the crews on duty.
+        """
+        num_days = max((end_date - start_date).days + 1, 0)
+        dates = [start_date + timedelta(days=i) for i in range(num_days)]
+        position_index = {p.id: i for i, p in enumerate(positions)}
+        
+        crews_on_duty = [[crews_for(day, shift) for shift in SHIFT_TYPES] for day in dates]
+        crews = sorted(
+            {crew for _, crew in headcounts} |
+            {crew for _, _, crew in absences} |
+            {crew for row in crews_on_duty for shift_crews in row for crew in shift_crews},
+            key=str
+        )
+        crew_index = {crew: i for i, crew in enumerate(crews)}
+        
+        shape = (num_days, len(SHIFT_TYPES), len(positions))
+        
+        # duty[d, s, c] = 1 when crew c works shift s on date d
+        duty = np.zeros((num_days, len(SHIFT_TYPES), len(crews)), dtype=np.int32)
+        for d, row in enumerate(crews_on_duty):
+            for s, shift_crews in enumerate(row):
+                for crew in shift_crews:
+                    duty[d, s, crew_index[crew]] = 1
+        
+        # roster[p, c] = active employees of position p on crew c
+        roster = np.zeros((len(positions), len(crews)), dtype=np.int32)
+        for (position_id, crew), count in headcounts.items():
+            if position_id in position_index:
+                roster[position_index[position_id], crew_index[crew]] = count
+        
+        # off[d, p, c] = approved absences on date d
+        off = np.zeros((num_days, len(positions), len(crews)), dtype=np.int32)
+        for (day, position_id, crew), count in absences.items():
+            d = (day - start_date).days
+            if 0 <= d < num_days and position_id in position_index:
+                off[d, position_index[position_id], crew_index[crew]] = count
+        
+        required = np.zeros(shape[1:], dtype=np.int32)
+        has_requirement = np.zeros(shape[1:], dtype=bool)
+        for s, shift in enumerate(SHIFT_TYPES):
+            for p, position in enumerate(positions):
+                coverage_req = requirements.get((position.id, shift))
+                if coverage_req:
+                    required[s, p] = coverage_req.min_required or 0
+                    has_requirement[s, p] = True
+        
+        on_roster = np.einsum('dsc,pc->dsp', duty, roster)
+        absent = np.einsum('dsc,dpc->dsp', duty, off)
+        
+        return cls(
+            dates, positions, crews_on_duty,
+            np.broadcast_to(required, shape),
+            np.broadcast_to(has_requirement, shape),
+            on_roster, absent, today=today
+        )
+    
+    @classmethod
+    def from_gaps(cls, gaps, start_date, end_date, today=None):
+        """
+        Scatter gap dicts (detect_future_gaps shape, e.g. rows read from
+        the coverage_gap table) back into a tensor over start_date ..
+        end_date, so they are bucketed and counted like a built tensor.
+        Cells without a gap row have no requirement.
+        """
+        num_days = max((end_date - start_date).days + 1, 0)
+        dates = [start_date + timedelta(days=i) for i in range(num_days)]
+        
+        positions = {}
+        for gap in gaps:
+            positions.setdefault(gap['position_id'], SimpleNamespace(
+                id=gap['position_id'],
+                name=gap['position_name'],
+                skills_required=gap.get('skills_required')
+            ))
+        positions = [positions[position_id] for position_id in sorted(positions)]
+        position_index = {p.id: i for i, p in enumerate(positions)}
+        shift_index = {shift: i for i, shift in enumerate(SHIFT_TYPES)}
+        
+        shape = (num_days, len(SHIFT_TYPES), len(positions))
+        required = np.zeros(shape, dtype=np.int32)
+        has_requirement = np.zeros(shape, dtype=bool)
+        on_roster = np.zeros(shape, dtype=np.int32)
+        absent = np.zeros(shape, dtype=np.int32)
+        crews_on_duty = [[[] for _ in SHIFT_TYPES] for _ in dates]
+        
+        for gap in gaps:
+            d = (gap['date'] - start_date).days
+            s = shift_index.get(gap['shift_type'])
+            if not 0 <= d < num_days or s is None:
+                continue
+            p = position_index[gap['position_id']]
+            required[d, s, p] = gap['required']
+            has_requirement[d, s, p] = True
+            on_roster[d, s, p] = gap['available']
+            absent[d, s, p] = gap['time_off']
+            crews_on_duty[d][s] = list(gap['crews_affected'])
+        
+        return cls(dates, positions, crews_on_duty, required, has_requirement,
+                   on_roster, absent, today=today)
+    
+    # ==========================================
+    # DERIVED ARRAYS
+    # ==========================================
+    
+    @property
+    def shape(self):
+        return self.on_roster.shape
+    
+    @property
+    def projected(self):
+        return self.on_roster - self.absent
+    
+    @property
+    def gap(self):
+        """Positive where a requirement exists and projected coverage falls short."""
+        gap = self.required - self.projected
+        return np.where(self.has_requirement & (gap > 0), gap, 0)
+    
+    @property
+    def critical(self):
+        return self.gap >= 2
+    
+    @property
+    def days_until(self):
+        """Days from today for each date index."""
+        if not self.dates:
+            return np.zeros(0, dtype=np.int32)
+        offset = (self.dates[0] - self.today).days
+        return np.arange(len(self.dates), dtype=np.int32) + offset
+    
+    @property
+    def urgency_codes(self):
+        """Index into URGENCY_LEVELS for each date index."""
+        days_until = self.days_until
+        return np.select(
+            [days_until == 0, days_until <= 1, days_until <= 3, days_until <= 7],
+            [0, 1, 2, 3],
+            default=4
+        )
+    
+    # ==========================================
+    # SUMMARIES
+    # ==========================================
+    
+    def gaps(self, urgency=None):
+        """
+        Gap cells as dicts in the shape of detect_future_gaps, ordered by
+        date, shift, position. Optionally limited to one urgency level.
+        """
+        gap = self.gap
+        mask = gap > 0
+        if urgency is not None:
+            level = URGENCY_LEVELS.index(urgency)
+            mask = mask & (self.urgency_codes == level)[:, None, None]
+        
+        days_until = self.days_until
+        urgency_codes = self.urgency_codes
+        projected = self.projected
+        results = []
+        for d, s, p in np.argwhere(mask):
+            position = self.positions[p]
+            results.append({
+                'position_id': position.id,
+                'position_name': position.name,
+                'shift_type': self.shift_types[s],
+                'date': self.dates[d],
+                'crews_affected': self.crews_on_duty[d][s],
+                'required': int(self.required[d, s, p]),
+                'available': int(self.on_roster[d, s, p]),
+                'time_off': int(self.absent[d, s, p]),
+                'projected': int(projected[d, s, p]),
+                'gap': int(gap[d, s, p]),
+                'critical': bool(gap[d, s, p] >= 2),
+                'days_until': int(days_until[d]),
+                'urgency': URGENCY_LEVELS[urgency_codes[d]],
+                'skills_required': position.skills_required
+            })
+        
+        return results
+    
+    def urgency_counts(self):
+        """Number of gap cells per urgency level."""
+        per_date = (self.gap > 0).sum(axis=(1, 2))
+        counts = np.bincount(self.urgency_codes, weights=per_date, minlength=len(URGENCY_LEVELS))
+        return {level: int(count) for level, count in zip(URGENCY_LEVELS, counts)}
+    
+    def statistics(self):
+        """Aggregate gap statistics over the whole tensor."""
+        gap = self.gap
+        return {
+            'total_gaps': int((gap > 0).sum()),
+            'total_shortfall': int(gap.sum()),
+            'critical_gaps': int((gap >= 2).sum()),
+            'position_ids_affected': [
+                self.positions[p].id for p in np.flatnonzero((gap > 0).any(axis=(0, 1)))
+            ]
+        }
+    
+    def heatmap(self, metric='gap'):
+        """
+        Serializable [date][shift][position] grid for one metric:
+        gap, projected, required, absent, on_roster or coverage_pct.
+        """
+        if metric == 'coverage_pct':
+            required = self.required.astype(float)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                values = np.where(
+                    self.has_requirement & (required > 0),
+                    np.round(100.0 * self.projected / required, 1),
+                    np.nan
+                )
+            grid = [[[None if np.isnan(v) else float(v) for v in row] for row in day]
+                    for day in values]
+        else:
+            arrays = {
+                'gap': self.gap,
+                'projected': self.projected,
+                'required': self.required,
+                'absent': self.absent,
+                'on_roster': self.on_roster
+            }
+            if metric not in arrays:
+                raise ValueError(f"Unknown heatmap metric: {metric}")
+            grid = arrays[metric].tolist()
+        
+        return {
+            'metric': metric,
+            'dates': [d.isoformat() for d in self.dates],
+            'shift_types': self.shift_types,
+            'positions': [{'id': p.id, 'name': p.name} for p in self.positions],
+            'values': grid
+        }
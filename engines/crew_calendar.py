@@ -0,0 +1,295 @@
+from datetime import timedelta, date
+from collections import OrderedDict, defaultdict
+from sqlalchemy import func
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Month blocks kept in the in-process LRU
+CACHE_MONTHS = 36
+
+# The stored calendar generation is compared at most this often, so other
+# worker processes pick up a newly generated pattern within this long
+GENERATION_CHECK_SECONDS = 5
+
+_month_cache = OrderedDict()  # (year, month) -> {(date, shift_type): tuple(crews)}
+_active_pattern = {}  # 'value' -> (id, start_date, end_date, cycle_days) or None
+_cache_lock = threading.Lock()
+_generation = [None]  # Generation the cache was loaded at
+_checked_at = [None]  # monotonic time of the last generation check; None forces one
+
+
+def invalidate_crew_calendar():
+    """Drop every cached calendar block (call after a pattern is generated)."""
+    with _cache_lock:
+        _month_cache.clear()
+        _active_pattern.clear()
+        _generation[0] = None
+        _checked_at[0] = None
+
+
+def default_crews_on_duty(check_date, shift_type):
+    """
+    Fallback rotation used when no generated pattern covers a date:
+    the 2-on-2-off cycle anchored at 2024-01-01.
+    """
+    days_from_start = (check_date - date(2024, 1, 1)).days
+    cycle_day = days_from_start % 4
+    
+    if shift_type == 'day':
+        if cycle_day in [0, 1]:
+            return ['A', 'B']
+        else:
+            return ['C', 'D']
+    else:  # night
+        if cycle_day in [0, 1]:
+            return ['C', 'D']
+        else:
+            return ['A', 'B']
+
+
+class CrewCalendar:
+    """
+    Crew-on-duty calendar derived from the generated shift pattern.
+    
+    When a pattern is saved, the crews working each (date, shift) are written
+    to crew_duty_calendar. Lookups are served from month blocks held in an
+    in-process LRU; dates past the generated range are projected forward by
+    the active pattern's cycle, and anything else falls back to
+    default_crews_on_duty.
+    
+    Every rewrite adds a ShiftPattern row, so the newest ShiftPattern id is
+    the calendar's generation: a process whose cache was loaded at an older
+    generation drops it.
+    """
+    
+    def __init__(self, db, models):
+        self.db = db
+        self.Employee = models['Employee']
+        self.ShiftPattern = models.get('ShiftPattern')
+        self.CrewDutyCalendar = models.get('CrewDutyCalendar')
+    
+    @property
+    def enabled(self):
+        return self.ShiftPattern is not None and self.CrewDutyCalendar is not None
+    
+    # ==========================================
+    # LOOKUP
+    # ==========================================
+    
+    def crews_on_duty(self, check_date, shift_type):
+        """Crews working the given date and shift."""
+        shift_type = getattr(shift_type, 'value', shift_type)
+        if not self.enabled:
+            return default_crews_on_duty(check_date, shift_type)
+        
+        try:
+            crews = self._lookup(check_date, shift_type)
+            if crews is None:
+                crews = self._project(check_date, shift_type)
+        except Exception as e:
+            logger.warning(f"Crew calendar lookup failed for {check_date} {shift_type}: {e}")
+            crews = None
+        
+        if crews is None:
+            return default_crews_on_duty(check_date, shift_type)
+        return list(crews)
+    
+    def _lookup(self, check_date, shift_type):
+        """Calendar entry for (date, shift), or None if not generated."""
+        block = self._month_block(check_date.year, check_date.month)
+        return block.get((check_date, shift_type))
+    
+    def _project(self, check_date, shift_type):
+        """Map dates after the generated range back onto its last full cycle."""
+        pattern = self._get_active_pattern()
+        if not pattern:
+            return None
+        
+        _, start_date, end_date, cycle_days = pattern
+        if not cycle_days or not end_date or check_date <= end_date:
+            return None
+        if (end_date - start_date).days + 1 < cycle_days:
+            return None
+        
+        cycles_back = -(-(check_date - end_date).days // cycle_days)
+        return self._lookup(check_date - timedelta(days=cycles_back * cycle_days), shift_type)
+    
+    def _month_block(self, year, month):
+        """Load (or fetch from the LRU) every calendar row of one month."""
+        key = (year, month)
+        self._check_generation()
+        with _cache_lock:
+            block = _month_cache.get(key)
+            if block is not None:
+                _month_cache.move_to_end(key)
+                return block
+        
+        first = date(year, month, 1)
+        last = (first + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        rows = self.db.session.query(
+            self.CrewDutyCalendar.date,
+            self.CrewDutyCalendar.shift_type,
+            self.CrewDutyCalendar.crews
+        ).filter(
+            self.CrewDutyCalendar.date >= first,
+            self.CrewDutyCalendar.date <= last
+        ).all()
+        block = {(day, shift): tuple(crews or '') for day, shift, crews in rows}
+        
+        with _cache_lock:
+            _month_cache[key] = block
+            _month_cache.move_to_end(key)
+            while len(_month_cache) > CACHE_MONTHS:
+                _month_cache.popitem(last=False)
+        
+        return block
+    
+    def _get_active_pattern(self):
+        self._check_generation()
+        with _cache_lock:
+            if 'value' in _active_pattern:
+                return _active_pattern['value']
+        
+        pattern = self.ShiftPattern.query.filter_by(
+            is_active=True
+        ).order_by(self.ShiftPattern.id.desc()).first()
+        value = None
+        if pattern:
+            value = (pattern.id, pattern.start_date, pattern.end_date, pattern.cycle_days)
+        
+        with _cache_lock:
+            _active_pattern['value'] = value
+        return value
+    
+    def _check_generation(self):
+        """Drop the cache if the calendar was rewritten since it was loaded."""
+        now = time.monotonic()
+        with _cache_lock:
+            if _checked_at[0] is not None and now - _checked_at[0] < GENERATION_CHECK_SECONDS:
+                return
+            _checked_at[0] = now
+        
+        generation = self.db.session.query(func.max(self.ShiftPattern.id)).scalar()
+        with _cache_lock:
+            if generation != _generation[0]:
+                _month_cache.clear()
+                _active_pattern.clear()
+                _generation[0] = generation
+    
+    # ==========================================
+    # BUILD
+    # ==========================================
+    
+    def record_pattern(self, pattern_name, schedules, cycle_days=None):
+        """
+        Derive the crew calendar from freshly generated schedules and make
+        their pattern the active one. Adds rows to the current session;
+        the caller commits.
+        """
+        if not self.enabled or not schedules:
+            return None
+        
+        employee_ids = set(s.employee_id for s in schedules)
+        with self.db.session.no_autoflush:
+            crew_by_employee = dict(self.db.session.query(
+                self.Employee.id, self.Employee.crew
+            ).filter(self.Employee.id.in_(employee_ids)).all())
+        
+        table = defaultdict(set)
+        shift_types = set()
+        for schedule in schedules:
+            crew = crew_by_employee.get(schedule.employee_id)
+            shift_type = getattr(schedule.shift_type, 'value', schedule.shift_type)
+            shift_types.add(shift_type)
+            if crew:
+                table[(schedule.date, shift_type)].add(crew)
+        
+        return self.record_duty_table(
+            pattern_name, table, shift_types,
+            min(s.date for s in schedules), max(s.date for s in schedules), cycle_days
+        )
+    
+    def record_duty_table(self, pattern_name, table, shift_types, start_date, end_date,
+                          cycle_days=None, pattern_key=None, is_virtual=False):
+        """
+        Make pattern_name the active pattern with table ((date, shift type)
+        -> crews) as its calendar. is_virtual marks a pattern whose shifts
+        are computed on read (engines/virtual_schedule.py) from pattern_key.
+        Adds rows to the current session; the caller commits.
+        """
+        if not self.enabled or not table:
+            return None
+        
+        cycle_days = self._detect_cycle(table, shift_types, start_date, end_date, cycle_days)
+        
+        self.ShiftPattern.query.filter_by(is_active=True).update(
+            {'is_active': False}, synchronize_session=False
+        )
+        pattern = self.ShiftPattern(
+            name=pattern_name,
+            pattern_key=pattern_key,
+            cycle_days=cycle_days,
+            start_date=start_date,
+            end_date=end_date,
+            is_active=True,
+            is_virtual=is_virtual
+        )
+        self.db.session.add(pattern)
+        self.db.session.flush()
+        
+        self.CrewDutyCalendar.query.filter(
+            self.CrewDutyCalendar.date >= start_date,
+            self.CrewDutyCalendar.date <= end_date
+        ).delete(synchronize_session=False)
+        
+        rows = []
+        day = start_date
+        while day <= end_date:
+            for shift_type in sorted(shift_types):
+                rows.append({
+                    'date': day,
+                    'shift_type': shift_type,
+                    'crews': ''.join(sorted(table.get((day, shift_type), ()))),
+                    'pattern_id': pattern.id
+                })
+            day += timedelta(days=1)
+        self.db.session.execute(self.CrewDutyCalendar.__table__.insert(), rows)
+        
+        invalidate_crew_calendar()
+        
+        # Materialized coverage gaps depend on who is on duty
+        from engines.coverage_gap_maintainer import note_crew_calendar_write
+        note_crew_calendar_write(self.db.session)
+        logger.info(f"Crew calendar rebuilt from {pattern_name}: {start_date} to {end_date}, "
+                    f"cycle {cycle_days} days")
+        
+        return {'pattern_id': pattern.id, 'days': (end_date - start_date).days + 1,
+                'cycle_days': cycle_days}
+    
+    @staticmethod
+    def _detect_cycle(table, shift_types, start_date, end_date, preferred=None):
+        """
+        Shortest period that repeats over the tail of the generated range,
+        trying the generator's declared cycle first. Staggered crew starts
+        make the head of a range irregular, so only the tail is compared.
+        """
+        num_days = (end_date - start_date).days + 1
+        
+        def key(offset):
+            day = start_date + timedelta(days=offset)
+            return tuple(frozenset(table.get((day, shift), ())) for shift in sorted(shift_types))
+        
+        def repeats(period):
+            if period < 1 or 2 * period > num_days:
+                return False
+            return all(key(i) == key(i - period) for i in range(num_days - period, num_days))
+        
+        if preferred and repeats(preferred):
+            return preferred
+        for period in range(1, num_days // 2 + 1):
+            if repeats(period):
+                return period
+        return None
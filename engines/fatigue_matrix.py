@@ -0,0 +1,180 @@
+from datetime import timedelta
+import numpy as np
+
+# Shift codes stored in the matrix; 0 is a day off
+SHIFT_CODES = {'day': 1, 'evening': 2, 'night': 3}
+
+# Past days that feed the rotation and recent-overtime terms
+LOOKBACK_DAYS = 7
+
+# Extra days loaded on each side so run lengths near the ends are exact
+# up to the longest consecutive-day limit
+RUN_MARGIN = 14
+
+FATIGUE_LEVELS = ['low', 'medium', 'high']
+
+
+class FatigueMatrix:
+    """
+    Shift codes and overtime hours indexed by [employee, day].
+    
+    Scores every (employee, candidate date) at once with array operations:
+    consecutive days including the candidate date, a rotation penalty when
+    the past week mixes shift types, a night multiplier and recent overtime
+    hours. Build one with OvertimeAssignmentEngine.build_fatigue_matrix().
+    """
+    
+    def __init__(self, employee_ids, first_day, codes, overtime, overtime_hours,
+                 start_date, end_date):
+        self.employee_ids = list(employee_ids)
+        self.employee_index = {e: i for i, e in enumerate(self.employee_ids)}
+        self.first_day = first_day
+        self.codes = codes                    # int8 [employee, day]
+        self.overtime = overtime              # bool [employee, day]
+        self.overtime_hours = overtime_hours  # float [employee, day]
+        self.start_date = start_date
+        self.end_date = end_date
+    
+    @classmethod
+    def build(cls, employee_ids, rows, start_date, end_date):
+        """
+        Assemble the matrix from Schedule rows of (employee_id, date,
+        shift_type, hours, is_overtime) covering matrix_range() (no queries).
+        """
+        first_day, last_day = cls.matrix_range(start_date, end_date)
+        num_days = (last_day - first_day).days + 1
+        employee_index = {e: i for i, e in enumerate(employee_ids)}
+        
+        codes = np.zeros((len(employee_ids), num_days), dtype=np.int8)
+        overtime = np.zeros(codes.shape, dtype=bool)
+        overtime_hours = np.zeros(codes.shape)
+        
+        for employee_id, day, shift_type, hours, is_overtime in rows:
+            e = employee_index.get(employee_id)
+            d = (day - first_day).days
+            if e is None or not 0 <= d < num_days:
+                continue
+            codes[e, d] = SHIFT_CODES.get(getattr(shift_type, 'value', shift_type), 1)
+            if is_overtime:
+                overtime[e, d] = True
+                overtime_hours[e, d] = hours or 0
+        
+        return cls(employee_ids, first_day, codes, overtime, overtime_hours,
+                   start_date, end_date)
+    
+    @staticmethod
+    def matrix_range(start_date, end_date):
+        """Days that must be loaded to score start_date..end_date."""
+        return (start_date - timedelta(days=LOOKBACK_DAYS + RUN_MARGIN),
+                end_date + timedelta(days=RUN_MARGIN))
+    
+    # ==========================================
+    # DERIVED ARRAYS ([employee, candidate date])
+    # ==========================================
+    
+    @property
+    def dates(self):
+        return [self.start_date + timedelta(days=i)
+                for i in range((self.end_date - self.start_date).days + 1)]
+    
+    @property
+    def _candidates(self):
+        """Matrix columns of the candidate dates."""
+        offset = (self.start_date - self.first_day).days
+        return np.arange(offset, offset + len(self.dates))
+    
+    def _window_sum(self, values):
+        """Sum over the LOOKBACK_DAYS before each candidate date."""
+        cumulative = np.concatenate(
+            [np.zeros(values.shape[:-1] + (1,)), np.cumsum(values, axis=-1)], axis=-1
+        )
+        columns = self._candidates
+        return cumulative[..., columns] - cumulative[..., columns - LOOKBACK_DAYS]
+    
+    @property
+    def consecutive(self):
+        """Consecutive days worked if each candidate date is worked too."""
+        worked = self.codes > 0
+        num_days = worked.shape[1]
+        positions = np.arange(num_days)
+        
+        # Days worked in a row ending at / starting at each column
+        last_off = np.maximum.accumulate(np.where(worked, -1, positions), axis=1)
+        ending = positions - last_off
+        next_off = np.minimum.accumulate(
+            np.where(worked, num_days, positions)[:, ::-1], axis=1
+        )[:, ::-1]
+        starting = next_off - positions
+        
+        columns = self._candidates
+        return ending[:, columns - 1] + 1 + starting[:, columns + 1]
+    
+    @property
+    def rotating(self):
+        """Past week mixed more than one shift type."""
+        kinds = np.stack([self.codes == code for code in SHIFT_CODES.values()], axis=1)
+        return (self._window_sum(kinds) > 0).sum(axis=1) > 1
+    
+    @property
+    def recent_overtime_hours(self):
+        return self._window_sum(self.overtime_hours)
+    
+    @property
+    def recent_overtime_shifts(self):
+        return self._window_sum(self.overtime).astype(int)
+    
+    @property
+    def recent_night_shifts(self):
+        return self._window_sum(self.codes == SHIFT_CODES['night']).astype(int)
+    
+    def shifts_on(self, check_date):
+        """Shift type each employee works on check_date (None when off)."""
+        names = {code: name for name, code in SHIFT_CODES.items()}
+        return [names.get(code) for code in self.codes[:, (check_date - self.first_day).days]]
+    
+    def scores(self, shift_type='day'):
+        """Fatigue score (0-10) for working shift_type on each candidate date."""
+        score = np.minimum(self.consecutive * 0.7, 5)
+        score = score + np.where(self.rotating, 2, 0)
+        if getattr(shift_type, 'value', shift_type) == 'night':
+            score = score * 1.3
+        score = score + np.minimum(self.recent_overtime_hours / 24, 3)
+        return np.minimum(score, 10)
+    
+    def score(self, employee_id, check_date, shift_type='day'):
+        """Fatigue score for one employee and date."""
+        e = self.employee_index[employee_id]
+        d = (check_date - self.start_date).days
+        return float(self.scores(shift_type)[e, d])
+    
+    @staticmethod
+    def levels(scores):
+        """Index into FATIGUE_LEVELS: high above 7, medium above 4."""
+        return np.select([scores > 7, scores > 4], [2, 1], default=0)
+    
+    # ==========================================
+    # SUMMARIES
+    # ==========================================
+    
+    def heatmap(self, shift_type='day', employees=None):
+        """
+        Serializable [employee][date] grid of fatigue scores with per-date
+        level counts. employees maps id -> dict of display fields.
+        """
+        scores = np.round(self.scores(shift_type), 2)
+        levels = self.levels(scores)
+        employees = employees or {}
+        
+        return {
+            'shift_type': getattr(shift_type, 'value', shift_type),
+            'dates': [d.isoformat() for d in self.dates],
+            'employees': [
+                dict(employees.get(e, {}), id=e) for e in self.employee_ids
+            ],
+            'values': scores.tolist(),
+            'level_counts': {
+                level: (levels == i).sum(axis=0).tolist()
+                for i, level in enumerate(FATIGUE_LEVELS)
+            },
+            'average': np.round(scores.mean(axis=0), 2).tolist() if len(scores) else []
+        }
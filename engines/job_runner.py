@@ -0,0 +1,304 @@
+from datetime import datetime, timedelta
+from sqlalchemy import update, or_
+import json
+import logging
+import os
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Worker threads per process; SQLite allows one writer, so it gets one
+WORKERS = 2
+
+# Idle workers check for queued jobs this often even without a wake-up
+POLL_SECONDS = 15
+
+# A running job not updated for this long (its process died) is queued again
+STALE_SECONDS = 900
+
+JOB_HANDLERS = {}  # kind -> handler(params, report) -> result dict
+RECURRING_JOBS = {}  # kind -> seconds between runs
+
+_wake = threading.Event()
+_workers = [None]
+
+
+def register_job(kind, handler, every_seconds=None):
+    """
+    Make handler run jobs of this kind. It is called as
+    handler(params, report) inside an app context and returns a JSON-able
+    result; {'success': False, 'error': ...} fails the job. report(percent,
+    message=None, **checkpoint) records progress and merges checkpoint into
+    the job's params, so a job that is queued again can resume. It writes
+    on its own connection and never commits the handler's session.
+    
+    With every_seconds the workers also queue a job of this kind (with
+    empty params) whenever none has run within that interval.
+    """
+    JOB_HANDLERS[kind] = handler
+    if every_seconds:
+        RECURRING_JOBS[kind] = every_seconds
+
+
+def wake_job_workers():
+    _wake.set()
+
+
+def job_workers_running():
+    return _workers[0] is not None
+
+
+class JobRunner:
+    """
+    Persisted background jobs: submit() queues a BackgroundJob row,
+    workers claim queued rows with a single UPDATE (safe across gunicorn
+    workers) and run the registered handler, recording progress, result
+    and errors on the row for the status endpoint to poll.
+    """
+    
+    def __init__(self, db, models):
+        self.db = db
+        self.BackgroundJob = models['BackgroundJob']
+    
+    def submit(self, kind, params, created_by_id=None):
+        """Queue a job, commit and wake the workers. Returns the job."""
+        if kind not in JOB_HANDLERS:
+            raise ValueError(f"No handler registered for {kind} jobs")
+        now = datetime.utcnow()
+        job = self.BackgroundJob(
+            kind=kind,
+            params=dict(params),
+            status='queued',
+            progress=0.0,
+            created_by_id=created_by_id,
+            created_at=now,
+            updated_at=now
+        )
+        self.db.session.add(job)
+        self.db.session.commit()
+        wake_job_workers()
+        logger.info(f"Queued {kind} job {job.id}")
+        return job
+    
+    def dispatch(self, kind, params, created_by_id=None):
+        """
+        submit() the job; without workers in this process (JOB_WORKERS=0)
+        run it here before returning.
+        """
+        job = self.submit(kind, params, created_by_id)
+        if not job_workers_running() and self.claim(job.id):
+            job = self.run(job.id)
+        return job
+    
+    def get(self, job_id):
+        return self.db.session.get(self.BackgroundJob, job_id)
+    
+    @staticmethod
+    def to_dict(job):
+        return {
+            'job_id': job.id,
+            'kind': job.kind,
+            'status': job.status,
+            'progress': round(job.progress or 0.0, 1),
+            'message': job.message,
+            'result': job.result,
+            'error': job.error,
+            'created_at': job.created_at.isoformat() if job.created_at else None,
+            'started_at': job.started_at.isoformat() if job.started_at else None,
+            'finished_at': job.finished_at.isoformat() if job.finished_at else None
+        }
+    
+    # ==========================================
+    # EXECUTION
+    # ==========================================
+    
+    def claim(self, job_id=None):
+        """
+        Mark the oldest queued job (or job_id) running for this worker.
+        Returns its id, or None if another worker got there first.
+        """
+        Job = self.BackgroundJob
+        if job_id is None:
+            row = self.db.session.query(Job.id).filter(
+                Job.status == 'queued'
+            ).order_by(Job.created_at, Job.id).first()
+            if row is None:
+                return None
+            job_id = row.id
+        
+        now = datetime.utcnow()
+        table = Job.__table__
+        claimed = self.db.session.execute(
+            update(table).where(table.c.id == job_id, table.c.status == 'queued').values(
+                status='running', claim_token=uuid.uuid4().hex,
+                started_at=now, updated_at=now
+            )
+        ).rowcount
+        self.db.session.commit()
+        return job_id if claimed else None
+    
+    def run(self, job_id):
+        """Run a claimed job to completion; never raises."""
+        job = self.get(job_id)
+        handler = JOB_HANDLERS.get(job.kind)
+        params = dict(job.params or {})
+        
+        def report(percent, message=None, **checkpoint):
+            # Own connection and transaction: the handler's session work
+            # stays uncommitted until the handler commits it
+            values = {
+                'progress': max(0.0, min(100.0, float(percent))),
+                'updated_at': datetime.utcnow()
+            }
+            if message is not None:
+                values['message'] = message[:200]
+            if checkpoint:
+                params.update(checkpoint)
+                values['params'] = dict(params)
+            table = self.BackgroundJob.__table__
+            try:
+                with self.db.engine.begin() as connection:
+                    connection.execute(update(table).where(table.c.id == job_id).values(**values))
+            except Exception as e:
+                logger.warning(f"Could not record progress of job {job_id}: {e}")
+        
+        try:
+            if handler is None:
+                raise ValueError(f"No handler registered for {job.kind} jobs")
+            result = handler(dict(params), report)
+            if isinstance(result, dict) and result.get('success') is False:
+                raise JobFailed(result.get('error') or 'Job failed', result)
+            job.status = 'completed'
+            job.progress = 100.0
+            job.result = json.loads(json.dumps(result, default=str))
+        except Exception as e:
+            self.db.session.rollback()
+            job = self.get(job_id)
+            job.status = 'failed'
+            job.error = str(e)
+            job.result = json.loads(json.dumps(getattr(e, 'result', None), default=str))
+            logger.warning(f"{job.kind} job {job_id} failed: {e}")
+        
+        job.claim_token = None
+        job.finished_at = job.updated_at = datetime.utcnow()
+        self.db.session.commit()
+        return job
+    
+    def run_pending(self, max_jobs=None):
+        """Claim and run queued jobs until none are left. Returns the count run."""
+        count = 0
+        while max_jobs is None or count < max_jobs:
+            job_id = self.claim()
+            if job_id is None:
+                break
+            self.run(job_id)
+            count += 1
+        return count
+    
+    def submit_recurring(self):
+        """
+        Queue each recurring kind that is not queued or running and has not
+        finished within its interval. Returns the jobs queued; a duplicate
+        from another process at worst runs the job twice.
+        """
+        Job = self.BackgroundJob
+        now = datetime.utcnow()
+        queued = []
+        for kind, every_seconds in RECURRING_JOBS.items():
+            recent = self.db.session.query(Job.id).filter(
+                Job.kind == kind,
+                or_(Job.status.in_(('queued', 'running')),
+                    Job.finished_at >= now - timedelta(seconds=every_seconds))
+            ).first()
+            if recent is None:
+                queued.append(self.submit(kind, {}))
+        return queued
+    
+    def requeue_stale(self, stale_seconds=STALE_SECONDS):
+        """Queue running jobs whose worker stopped reporting again."""
+        table = self.BackgroundJob.__table__
+        cutoff = datetime.utcnow() - timedelta(seconds=stale_seconds)
+        count = self.db.session.execute(
+            update(table).where(table.c.status == 'running', table.c.updated_at < cutoff).values(
+                status='queued', claim_token=None
+            )
+        ).rowcount
+        self.db.session.commit()
+        if count:
+            logger.info(f"Requeued {count} stale background jobs")
+        return count
+
+
+class JobFailed(Exception):
+    """A handler returned success=False; keeps its result for the status endpoint."""
+    
+    def __init__(self, message, result=None):
+        super().__init__(message)
+        self.result = result
+
+
+# ==========================================
+# WORKERS
+# ==========================================
+
+class JobWorkerPool:
+    """
+    Daemon threads that run queued jobs for one process. They wake when a
+    job is submitted and otherwise poll every POLL_SECONDS, queueing any
+    recurring job that is due.
+    """
+    
+    def __init__(self, app, db, models, workers=WORKERS, poll_seconds=POLL_SECONDS):
+        self.app = app
+        self.db = db
+        self.models = models
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self._stopped = threading.Event()
+        self._threads = []
+    
+    def start(self):
+        with self.app.app_context():
+            if self.db.engine.dialect.name == 'sqlite':
+                self.workers = 1
+            try:
+                JobRunner(self.db, self.models).requeue_stale()
+            except Exception as e:
+                logger.warning(f"Could not requeue stale jobs: {e}")
+                self.db.session.rollback()
+        
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'job-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Started {self.workers} background job workers")
+        return self
+    
+    def stop(self, timeout=5):
+        self._stopped.set()
+        _wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+    
+    def _run(self):
+        while not self._stopped.is_set():
+            _wake.clear()
+            with self.app.app_context():
+                runner = JobRunner(self.db, self.models)
+                try:
+                    runner.submit_recurring()
+                    runner.run_pending()
+                except Exception as e:
+                    logger.warning(f"Job worker error: {e}")
+                    self.db.session.rollback()
+            _wake.wait(self.poll_seconds)
+
+
+def start_job_workers(app, db, models, workers=None):
+    """Start this process's job workers (once) and return the pool."""
+    if _workers[0] is None:
+        if workers is None:
+            workers = int(os.environ.get('JOB_WORKERS', WORKERS))
+        _workers[0] = JobWorkerPool(app, db, models, workers=workers).start()
+    return _workers[0]
@@ -0,0 +1,388 @@
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from sqlalchemy import event, insert, update, select, func, and_, or_
+import json
+import logging
+import os
+import smtplib
+import tempfile
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Outbox rows claimed, delivered and recorded per round trip
+BATCH_SIZE = 200
+
+# Delivery attempts before a row is marked failed; the wait before each
+# retry doubles from RETRY_SECONDS
+MAX_ATTEMPTS = 5
+RETRY_SECONDS = 60
+
+# A row left in 'sending' this long (worker died mid-batch) is claimed again
+CLAIM_TIMEOUT_SECONDS = 300
+
+# Idle workers check the outbox this often even without a wake-up
+POLL_SECONDS = 30
+
+# Session.info flag set when a transaction adds outbox rows
+ENQUEUED_KEY = 'notification_outbox_enqueued'
+
+_wake = threading.Event()
+_installed = set()
+_worker = [None]
+
+
+# ==========================================
+# TRANSPORTS
+# ==========================================
+
+class NotificationTransport:
+    """
+    Delivers a batch of messages (dicts with id, recipient_id, email, name,
+    subject, message, notification_type and coverage_request_id).
+    send() returns the ids that could not be delivered; raising fails the
+    whole batch.
+    """
+    
+    def send(self, messages):
+        raise NotImplementedError
+
+
+class FileTransport(NotificationTransport):
+    """Appends each message to a JSON-lines file (development and tests)."""
+    
+    _lock = threading.Lock()
+    
+    def __init__(self, path=None):
+        self.path = path or os.environ.get('NOTIFICATION_FILE') or os.path.join(
+            tempfile.gettempdir(), 'workforce_notifications.jsonl'
+        )
+    
+    def send(self, messages):
+        with self._lock, open(self.path, 'a') as f:
+            for message in messages:
+                f.write(json.dumps(message, default=str) + '\n')
+        return set()
+
+
+class SmtpTransport(NotificationTransport):
+    """
+    Emails each message over one SMTP connection per batch. Configured from
+    SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASSWORD, SMTP_FROM and SMTP_TLS;
+    a local debugging server (python -m aiosmtpd -n) works as a stand-in.
+    Recipients without an email address keep the in-app notification only.
+    """
+    
+    def __init__(self, host=None, port=None, sender=None, username=None,
+                 password=None, use_tls=None):
+        self.host = host or os.environ.get('SMTP_HOST', 'localhost')
+        self.port = int(port or os.environ.get('SMTP_PORT', 25))
+        self.sender = sender or os.environ.get('SMTP_FROM', 'scheduler@localhost')
+        self.username = username or os.environ.get('SMTP_USER')
+        self.password = password or os.environ.get('SMTP_PASSWORD')
+        if use_tls is None:
+            use_tls = os.environ.get('SMTP_TLS', '').lower() in ('1', 'true', 'yes')
+        self.use_tls = use_tls
+    
+    def send(self, messages):
+        failed = set()
+        with smtplib.SMTP(self.host, self.port, timeout=30) as smtp:
+            if self.use_tls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+            
+            for message in messages:
+                if not message.get('email'):
+                    continue
+                email = EmailMessage()
+                email['From'] = self.sender
+                email['To'] = message['email']
+                email['Subject'] = message.get('subject') or 'Workforce Scheduler notification'
+                email.set_content(message['message'])
+                try:
+                    smtp.send_message(email)
+                except smtplib.SMTPException as e:
+                    logger.warning(f"Could not email {message['email']}: {e}")
+                    failed.add(message['id'])
+        return failed
+
+
+class LogTransport(NotificationTransport):
+    """Writes each message to the application log."""
+    
+    def send(self, messages):
+        for message in messages:
+            logger.info(f"Notification to employee {message['recipient_id']}: {message['message']}")
+        return set()
+
+
+TRANSPORTS = {
+    'file': FileTransport,
+    'smtp': SmtpTransport,
+    'log': LogTransport
+}
+
+
+def register_transport(name, transport_class):
+    """Make a transport selectable through NOTIFICATION_TRANSPORT."""
+    TRANSPORTS[name] = transport_class
+
+
+def get_transport(name=None):
+    """Transport named by name or NOTIFICATION_TRANSPORT (default 'file')."""
+    name = name or os.environ.get('NOTIFICATION_TRANSPORT', 'file')
+    if name not in TRANSPORTS:
+        raise ValueError(f"Unknown notification transport: {name}")
+    return TRANSPORTS[name]()
+
+
+def wake_notification_worker():
+    """Ask the worker to drain the outbox now rather than at its next poll."""
+    _wake.set()
+
+
+# ==========================================
+# OUTBOX
+# ==========================================
+
+class NotificationOutbox:
+    """
+    Persisted queue between request handlers and notification delivery.
+    
+    enqueue() adds rows in one insert as part of the caller's transaction;
+    committing wakes the worker. process_batch() claims up to BATCH_SIZE
+    rows, hands them to the transport in one call, records the delivered
+    ones as CoverageNotification rows in one insert and schedules retries
+    for the rest. Claims are single UPDATE statements, so several worker
+    processes can drain the same outbox.
+    """
+    
+    def __init__(self, db, models, transport=None):
+        self.db = db
+        self.NotificationOutbox = models['NotificationOutbox']
+        self.CoverageNotification = models['CoverageNotification']
+        self.Employee = models['Employee']
+        self.transport = transport
+    
+    def install(self):
+        """Wake the worker whenever a commit included new outbox rows (once)."""
+        key = id(self.db.session)
+        if key in _installed:
+            return
+        _installed.add(key)
+        
+        def committed(session):
+            if session.info.pop(ENQUEUED_KEY, False):
+                wake_notification_worker()
+        
+        event.listen(self.db.session, 'after_commit', committed)
+        event.listen(self.db.session, 'after_soft_rollback',
+                     lambda session, previous: session.info.pop(ENQUEUED_KEY, None))
+    
+    def enqueue(self, recipient_ids, message, subject=None, sent_by_id=None,
+                coverage_request_id=None, notification_type='overtime'):
+        """
+        Queue one message for each recipient. Nothing is sent until the
+        caller commits. Returns the number of rows queued.
+        """
+        now = datetime.utcnow()
+        rows = [{
+            'recipient_id': recipient_id,
+            'sent_by_id': sent_by_id,
+            'coverage_request_id': coverage_request_id,
+            'notification_type': notification_type,
+            'subject': subject,
+            'message': message,
+            'status': 'pending',
+            'attempts': 0,
+            'available_at': now,
+            'created_at': now
+        } for recipient_id in dict.fromkeys(recipient_ids)]
+        
+        if rows:
+            self.db.session.execute(insert(self.NotificationOutbox.__table__), rows)
+            self.db.session.info[ENQUEUED_KEY] = True
+        return len(rows)
+    
+    def _claim(self, limit):
+        """Mark up to limit due rows as ours and return them."""
+        table = self.NotificationOutbox.__table__
+        now = datetime.utcnow()
+        token = uuid.uuid4().hex
+        
+        due = or_(
+            and_(table.c.status == 'pending', table.c.available_at <= now),
+            and_(table.c.status == 'sending',
+                 table.c.claimed_at < now - timedelta(seconds=CLAIM_TIMEOUT_SECONDS))
+        )
+        # The outer condition is re-checked against rows another worker
+        # claimed concurrently, so each row goes to one claimer
+        ids = select(table.c.id).where(due).order_by(table.c.id).limit(limit).scalar_subquery()
+        self.db.session.execute(
+            update(table).where(table.c.id.in_(ids), due).values(
+                status='sending', claim_token=token, claimed_at=now
+            )
+        )
+        self.db.session.commit()
+        
+        return self.db.session.execute(
+            select(table).where(table.c.claim_token == token).order_by(table.c.id)
+        ).all()
+    
+    def process_batch(self, limit=BATCH_SIZE):
+        """Deliver one batch. Returns counts of claimed, sent and failed rows."""
+        rows = self._claim(limit)
+        if not rows:
+            return {'claimed': 0, 'sent': 0, 'failed': 0}
+        
+        recipients = {
+            employee_id: (name, email) for employee_id, name, email in
+            self.db.session.query(
+                self.Employee.id, self.Employee.name, self.Employee.email
+            ).filter(self.Employee.id.in_({row.recipient_id for row in rows})).all()
+        }
+        messages = [{
+            'id': row.id,
+            'recipient_id': row.recipient_id,
+            'name': recipients.get(row.recipient_id, (None, None))[0],
+            'email': recipients.get(row.recipient_id, (None, None))[1],
+            'subject': row.subject,
+            'message': row.message,
+            'notification_type': row.notification_type,
+            'coverage_request_id': row.coverage_request_id
+        } for row in rows]
+        
+        error = None
+        try:
+            transport = self.transport or get_transport()
+            failed = set(transport.send(messages) or ())
+        except Exception as e:
+            logger.warning(f"Notification batch of {len(rows)} failed: {e}")
+            failed = {row.id for row in rows}
+            error = str(e)
+        
+        now = datetime.utcnow()
+        delivered = [row for row in rows if row.id not in failed]
+        self._record_delivered(delivered, now)
+        self._schedule_retries([row for row in rows if row.id in failed], now, error)
+        self.db.session.commit()
+        
+        return {'claimed': len(rows), 'sent': len(delivered), 'failed': len(failed)}
+    
+    def _record_delivered(self, rows, now):
+        """One CoverageNotification insert and one outbox update for the batch."""
+        if not rows:
+            return
+        self.db.session.execute(insert(self.CoverageNotification.__table__), [{
+            'employee_id': row.recipient_id,
+            'sent_to_employee_id': row.recipient_id,
+            'sent_to_type': 'individual',
+            'sent_by_id': row.sent_by_id,
+            'coverage_request_id': row.coverage_request_id,
+            'notification_type': row.notification_type,
+            'message': row.message,
+            'sent_at': now,
+            'created_at': now
+        } for row in rows])
+        
+        table = self.NotificationOutbox.__table__
+        self.db.session.execute(
+            update(table).where(table.c.id.in_([row.id for row in rows])).values(
+                status='sent', sent_at=now, claim_token=None, last_error=None,
+                attempts=table.c.attempts + 1
+            )
+        )
+    
+    def _schedule_retries(self, rows, now, error):
+        """Back off failed rows by attempt count; give up after MAX_ATTEMPTS."""
+        table = self.NotificationOutbox.__table__
+        by_attempts = {}
+        for row in rows:
+            by_attempts.setdefault((row.attempts or 0) + 1, []).append(row.id)
+        
+        for attempts, ids in by_attempts.items():
+            self.db.session.execute(
+                update(table).where(table.c.id.in_(ids)).values(
+                    status='failed' if attempts >= MAX_ATTEMPTS else 'pending',
+                    attempts=attempts,
+                    available_at=now + timedelta(seconds=RETRY_SECONDS * 2 ** (attempts - 1)),
+                    claim_token=None,
+                    last_error=error or 'Transport rejected the message'
+                )
+            )
+    
+    def drain(self, max_batches=None):
+        """Process batches until nothing is due. Returns summed counts."""
+        totals = {'claimed': 0, 'sent': 0, 'failed': 0, 'batches': 0}
+        while max_batches is None or totals['batches'] < max_batches:
+            result = self.process_batch()
+            if not result['claimed']:
+                break
+            totals['batches'] += 1
+            for key in ('claimed', 'sent', 'failed'):
+                totals[key] += result[key]
+        return totals
+    
+    def get_status_counts(self):
+        """Outbox rows per delivery status."""
+        counts = dict(self.db.session.query(
+            self.NotificationOutbox.status, func.count(self.NotificationOutbox.id)
+        ).group_by(self.NotificationOutbox.status).all())
+        return {status: counts.get(status, 0) for status in ('pending', 'sending', 'sent', 'failed')}
+
+
+# ==========================================
+# WORKER
+# ==========================================
+
+class NotificationWorker:
+    """
+    Daemon thread that drains the outbox for one process. It wakes when a
+    commit adds outbox rows and otherwise polls every POLL_SECONDS, so
+    request handlers only pay for the enqueue insert.
+    """
+    
+    def __init__(self, app, db, models, transport=None, poll_seconds=POLL_SECONDS):
+        self.app = app
+        self.outbox = NotificationOutbox(db, models, transport)
+        self.poll_seconds = poll_seconds
+        self._stopped = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        self.outbox.install()
+        self._thread = threading.Thread(
+            target=self._run, name='notification-worker', daemon=True
+        )
+        self._thread.start()
+        logger.info("Notification worker started")
+        return self
+    
+    def stop(self, timeout=5):
+        self._stopped.set()
+        _wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+    
+    def _run(self):
+        while not self._stopped.is_set():
+            _wake.clear()
+            with self.app.app_context():
+                try:
+                    result = self.outbox.drain()
+                    if result['claimed']:
+                        logger.info(f"Delivered {result['sent']} notifications "
+                                    f"({result['failed']} failed)")
+                except Exception as e:
+                    logger.warning(f"Notification worker error: {e}")
+                    self.outbox.db.session.rollback()
+            _wake.wait(self.poll_seconds)
+
+
+def start_notification_worker(app, db, models, transport=None):
+    """Start this process's worker (once) and return it."""
+    if _worker[0] is None:
+        _worker[0] = NotificationWorker(app, db, models, transport).start()
+    return _worker[0]
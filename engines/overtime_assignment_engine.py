@@ -1,28 +1,55 @@
-from datetime import datetime, timedelta, date
-from sqlalchemy import func, and_, or_, case
+from datetime import datetime, timedelta, date, time
+from sqlalchemy import func, and_, or_, case, select
 from collections import defaultdict
+import numpy as np
 import json
 
+from engines.crew_calendar import CrewCalendar
+from engines.worked_day_index import WorkedDayIndex, EPOCH
+from engines.overtime_rollup import OvertimeRollupMaintainer
+from engines.assignment_solver import min_cost_assignment
+from engines.fatigue_matrix import FatigueMatrix
+from engines.notification_outbox import NotificationOutbox
+
 class OvertimeAssignmentEngine:
     """
     Manages fair and efficient overtime distribution following priority protocols.
     Implements voluntary and mandatory assignment logic with fatigue management.
     """
     
+    # Multi-gap planning costs (lower is better): one priority step
+    # outweighs 100 hours of 13-week overtime or a 10/10 fatigue score
+    PRIORITY_COST = 10.0
+    OVERTIME_COST_PER_HOUR = 0.1
+    FATIGUE_COST = 0.5
+    MAX_REPAIR_ROUNDS = 25
+    
     def __init__(self, db, models):
         self.db = db
+        self.models = models
         self.Employee = models['Employee']
         self.Schedule = models['Schedule']
         self.Position = models['Position']
         self.OvertimeHistory = models['OvertimeHistory']
         self.OvertimeOpportunity = models.get('OvertimeOpportunity')
         self.EmployeeSkill = models.get('EmployeeSkill')
-        
+        self.VacationCalendar = models.get('VacationCalendar')
+        self.crew_calendar = CrewCalendar(db, models)
+        self.worked_days = WorkedDayIndex(db, models)
+        self.overtime_rollup = OvertimeRollupMaintainer(db, models)
+        self.outbox = NotificationOutbox(db, models) if 'NotificationOutbox' in models else None
+    
     def get_eligible_employees(self, position_id, date_needed, shift_type='day', 
-                              crews_to_consider=None, urgency='standard'):
+                              crews_to_consider=None, urgency='standard',
+                              include_unavailable=False):
         """
         Get list of eligible employees for overtime, sorted by priority.
         Implements the proximity-based approach from the framework.
+        
+        Members of crews_to_consider are listed first. With
+        include_unavailable, employees who fail a rule are returned too
+        (after everyone available) so callers can show the reason.
+        Runs a fixed number of queries however many candidates there are.
         """
         position = self.Position.query.get(position_id)
         if not position:
@@ -34,34 +61,17 @@ class OvertimeAssignmentEngine:
         
         # Get all employees with required skills
         eligible_employees = []
+        skilled_employees = self._get_candidates(position)
         
-        # Query base employee pool
-        base_query = self.Employee.query.filter(
-            self.Employee.is_active == True,
-            self.Employee.is_supervisor == False
+        # Evaluate every candidate from one in-memory schedule window
+        evaluations = self._evaluate_eligibility_batch(
+            skilled_employees, date_needed, shift_type, working_crews, off_duty_crews
         )
         
-        # Filter by position or skills
-        if position.skills_required:
-            # Need to check skills
-            skilled_employees = base_query.join(
-                self.EmployeeSkill
-            ).filter(
-                self.EmployeeSkill.skill_name.in_(position.skills_required.split(','))
-            ).distinct().all()
-        else:
-            # Position-based only
-            skilled_employees = base_query.filter(
-                self.Employee.position_id == position_id
-            ).all()
-        
-        # Evaluate each employee
         for employee in skilled_employees:
-            eligibility = self._evaluate_employee_eligibility(
-                employee, date_needed, shift_type, working_crews, off_duty_crews
-            )
+            eligibility = evaluations[employee.id]
             
-            if eligibility['eligible'] or eligibility['eligible_with_warning']:
+            if eligibility['available'] or include_unavailable:
                 eligible_employees.append({
                     'employee': employee,
                     'priority_score': eligibility['priority_score'],
@@ -75,7 +85,10 @@ class OvertimeAssignmentEngine:
                 })
         
         # Sort by priority
+        preferred = set(crews_to_consider or [])
         eligible_employees.sort(key=lambda x: (
+            not x['availability']['available'],
+            bool(preferred) and x['crew'] not in preferred,
             x['priority_score'],  # Lower is better
             x['overtime_hours_13w'],  # Less OT is better
             x['fatigue_score']  # Lower fatigue is better
@@ -83,42 +96,163 @@ class OvertimeAssignmentEngine:
         
         return eligible_employees
     
+    def _get_candidates(self, position):
+        """Active non-supervisors qualified for the position."""
+        # Query base employee pool
+        base_query = self.Employee.query.filter(
+            self.Employee.is_active == True,
+            self.Employee.is_supervisor == False
+        )
+        
+        # Filter by position or skills
+        if position.skills_required:
+            # Need to check skills
+            Skill = self.EmployeeSkill.skill.property.mapper.class_
+            return base_query.join(
+                self.EmployeeSkill, self.EmployeeSkill.employee_id == self.Employee.id
+            ).join(
+                Skill, self.EmployeeSkill.skill_id == Skill.id
+            ).filter(
+                Skill.name.in_([s.strip() for s in position.skills_required.split(',')])
+            ).distinct().all()
+        
+        # Position-based only
+        return base_query.filter(
+            self.Employee.position_id == position.id
+        ).all()
+    
     def _evaluate_employee_eligibility(self, employee, date_needed, shift_type,
                                      working_crews, off_duty_crews):
         """
         Evaluate individual employee eligibility and calculate priority score.
         """
+        return self._evaluate_eligibility_batch(
+            [employee], date_needed, shift_type, working_crews, off_duty_crews
+        )[employee.id]
+    
+    def _evaluate_eligibility_batch(self, employees, date_needed, shift_type,
+                                    working_crews, off_duty_crews, fatigue=None):
+        """
+        Evaluate many employees at once.
+        Fatigue, recent overtime and recent night shifts come from a
+        FatigueMatrix (one query, or the one passed in as fatigue), 13-week
+        overtime totals from the rollup lookup, run lengths and next shifts
+        from the worked-day index, and approved vacation from one query, so
+        the query count does not grow with the number of employees.
+        """
+        if not employees:
+            return {}
+        
+        employee_ids = [e.id for e in employees]
+        self.worked_days.load(employee_ids)
+        
+        if fatigue is None:
+            fatigue = self.build_fatigue_matrix(employee_ids, date_needed, date_needed)
+        
+        d = (date_needed - fatigue.start_date).days
+        fatigue_scores = fatigue.scores(shift_type)[:, d]
+        recent_overtime = fatigue.recent_overtime_shifts[:, d]
+        recent_nights = fatigue.recent_night_shifts[:, d]
+        scheduled = fatigue.shifts_on(date_needed)
+        previous = fatigue.shifts_on(date_needed - timedelta(days=1))
+        
+        overtime_totals = self.overtime_rollup.get_totals(employee_ids, as_of=date_needed)
+        on_vacation = self._get_on_vacation(employee_ids, date_needed)
+        
+        results = {}
+        
+        for employee in employees:
+            e = fatigue.employee_index[employee.id]
+            bits = self.worked_days.bits(employee.id)
+            consecutive = self.worked_days.run_length(employee.id, date_needed, bits)
+            
+            metrics = {
+                'overtime_hours_13w': overtime_totals[employee.id]['overtime_hours'],
+                'consecutive_days': consecutive,
+                'fatigue_score': float(fatigue_scores[e]),
+                'next_scheduled': self.worked_days.next_worked(employee.id, date_needed, bits),
+                'recent_overtime_shifts': int(recent_overtime[e]),
+                'recent_night_shifts': int(recent_nights[e]),
+                'scheduled_shift': scheduled[e],
+                'previous_shift': previous[e],
+                'on_time_off': employee.id in on_vacation
+            }
+            
+            results[employee.id] = self._score_eligibility(
+                employee, date_needed, shift_type, off_duty_crews, metrics
+            )
+        
+        return results
+    
+    def build_fatigue_matrix(self, employee_ids, start_date, end_date):
+        """
+        FatigueMatrix scoring every employee for every date from start_date
+        to end_date, loaded with one Schedule query.
+        """
+        employee_ids = list(employee_ids)
+        first_day, last_day = FatigueMatrix.matrix_range(start_date, end_date)
+        rows = []
+        if employee_ids:
+            rows = self.db.session.query(
+                self.Schedule.employee_id,
+                self.Schedule.date,
+                self.Schedule.shift_type,
+                self.Schedule.hours,
+                self.Schedule.is_overtime
+            ).filter(
+                self.Schedule.employee_id.in_(employee_ids),
+                self.Schedule.date >= first_day,
+                self.Schedule.date <= last_day
+            ).all()
+        return FatigueMatrix.build(employee_ids, rows, start_date, end_date)
+    
+    def _get_on_vacation(self, employee_ids, check_date):
+        """Ids among employee_ids with approved vacation on check_date."""
+        if self.VacationCalendar is None or not employee_ids:
+            return set()
+        rows = self.db.session.query(self.VacationCalendar.employee_id).filter(
+            self.VacationCalendar.employee_id.in_(employee_ids),
+            self.VacationCalendar.date == check_date,
+            self.VacationCalendar.status == 'approved'
+        ).all()
+        return {employee_id for employee_id, in rows}
+    
+    def _score_eligibility(self, employee, date_needed, shift_type, off_duty_crews, metrics):
+        """Apply the eligibility rules and priority scoring to precomputed metrics."""
         result = {
             'eligible': True,
             'eligible_with_warning': False,
             'reasons': [],
             'warnings': [],
             'priority_score': 0,
-            'overtime_hours_13w': 0,
+            'overtime_hours_13w': metrics['overtime_hours_13w'],
             'last_overtime_date': None,
-            'consecutive_days': 0,
-            'fatigue_score': 0
+            'consecutive_days': metrics['consecutive_days'],
+            'fatigue_score': metrics['fatigue_score'],
+            'scheduled_shift': metrics.get('scheduled_shift')
         }
         
-        # Check 13-week overtime history
-        thirteen_weeks_ago = date_needed - timedelta(weeks=13)
-        overtime_sum = self.db.session.query(
-            func.sum(self.OvertimeHistory.overtime_hours)
-        ).filter(
-            self.OvertimeHistory.employee_id == employee.id,
-            self.OvertimeHistory.week_start_date >= thirteen_weeks_ago
-        ).scalar() or 0
+        consecutive = metrics['consecutive_days']
+        shift_value = getattr(shift_type, 'value', shift_type)
         
-        result['overtime_hours_13w'] = float(overtime_sum)
+        # Availability on the day itself
+        if metrics.get('on_time_off'):
+            result['eligible'] = False
+            result['reasons'].append('On approved time off')
+        if metrics.get('scheduled_shift') == shift_value:
+            result['eligible'] = False
+            result['reasons'].append('Already scheduled for this shift')
+        elif metrics.get('scheduled_shift'):
+            result['eligible_with_warning'] = True
+            result['warnings'].append('Would be double shift')
         
-        # Check consecutive days worked
-        consecutive = self._calculate_consecutive_days(employee.id, date_needed)
-        result['consecutive_days'] = consecutive
+        previous_shift = metrics.get('previous_shift')
+        if previous_shift and previous_shift != shift_value:
+            result['eligible_with_warning'] = True
+            result['warnings'].append('Shift change without rest')
         
         # Maximum consecutive days rules
-        max_consecutive = 14  # Company policy
-        if shift_type == 'night':
-            max_consecutive = 7  # More restrictive for nights
+        max_consecutive = self._max_consecutive(shift_type)
         
         if consecutive >= max_consecutive:
             result['eligible'] = False
@@ -128,18 +262,14 @@ class OvertimeAssignmentEngine:
             result['warnings'].append(f'Approaching {max_consecutive} day limit')
         
         # Fatigue scoring (higher = more fatigued)
-        result['fatigue_score'] = self._calculate_fatigue_score(
-            employee.id, date_needed, shift_type, consecutive
-        )
-        
         if result['fatigue_score'] > 8:
             result['eligible_with_warning'] = True
             result['warnings'].append('High fatigue risk')
         
         # Priority scoring based on crew assignment
-        if employee.crew in off_duty_crews:
+        if employee.crew in off_duty_crews and not metrics.get('scheduled_shift'):
             # Check if they're resting before next shift
-            next_scheduled = self._get_next_scheduled_shift(employee.id, date_needed)
+            next_scheduled = metrics['next_scheduled']
             if next_scheduled and (next_scheduled - date_needed).days <= 2:
                 result['priority_score'] = 1  # Highest priority - natural fit
             else:
@@ -147,117 +277,47 @@ class OvertimeAssignmentEngine:
         else:
             result['priority_score'] = 3  # Would create double - lowest priority
             result['eligible_with_warning'] = True
-            result['warnings'].append('Would create double shift')
-        
-        # Check for recent overtime
-        recent_ot = self.db.session.query(self.Schedule).filter(
-            self.Schedule.employee_id == employee.id,
-            self.Schedule.is_overtime == True,
-            self.Schedule.date >= date_needed - timedelta(days=7),
-            self.Schedule.date < date_needed
-        ).count()
+            if not metrics.get('scheduled_shift'):
+                result['warnings'].append('Would create double shift')
         
-        if recent_ot > 2:
+        if metrics['recent_overtime_shifts'] > 2:
             result['priority_score'] += 1  # Lower priority if lots of recent OT
         
         # Add night shift adjustment
         if shift_type == 'night':
             # Prefer employees already on night schedule
-            recent_nights = self._count_recent_night_shifts(employee.id, date_needed)
-            if recent_nights < 2:
+            if metrics['recent_night_shifts'] < 2:
                 result['priority_score'] += 2  # Discourage day workers from night OT
                 result['warnings'].append('Not on night schedule')
         
-        result['available'] = result['eligible'] or result['eligible_with_warning']
+        # Warnings lower priority; any reason rules the employee out
+        result['available'] = result['eligible']
+        result['reason'] = (result['reasons'] or result['warnings'] or ['Available'])[0]
         
         return result
     
+    @staticmethod
+    def _max_consecutive(shift_type):
+        """Consecutive-day limit for a shift type."""
+        if shift_type == 'night':
+            return 7  # More restrictive for nights
+        return 14  # Company policy
+    
     def _calculate_consecutive_days(self, employee_id, check_date):
         """Calculate consecutive days that would be worked including the OT day."""
-        consecutive = 0
-        current_date = check_date
-        
-        # Check backwards
-        while True:
-            current_date -= timedelta(days=1)
-            scheduled = self.Schedule.query.filter(
-                self.Schedule.employee_id == employee_id,
-                self.Schedule.date == current_date
-            ).first()
-            
-            if scheduled:
-                consecutive += 1
-            else:
-                break
-        
-        # Add the OT day itself
-        consecutive += 1
-        
-        # Check forwards from OT date
-        current_date = check_date
-        while True:
-            current_date += timedelta(days=1)
-            scheduled = self.Schedule.query.filter(
-                self.Schedule.employee_id == employee_id,
-                self.Schedule.date == current_date
-            ).first()
-            
-            if scheduled:
-                consecutive += 1
-            else:
-                break
-        
-        return consecutive
+        return self.worked_days.run_length(employee_id, check_date)
     
-    def _calculate_fatigue_score(self, employee_id, date_needed, shift_type, consecutive_days):
+    def _calculate_fatigue_score(self, employee_id, date_needed, shift_type):
         """
         Calculate fatigue risk score (0-10 scale).
         Considers consecutive days, shift changes, and recent overtime.
         """
-        score = 0
-        
-        # Base score from consecutive days
-        score += min(consecutive_days * 0.7, 5)
-        
-        # Check for shift changes in past week
-        week_ago = date_needed - timedelta(days=7)
-        shifts = self.Schedule.query.filter(
-            self.Schedule.employee_id == employee_id,
-            self.Schedule.date >= week_ago,
-            self.Schedule.date < date_needed
-        ).all()
-        
-        shift_types = set(s.shift_type for s in shifts)
-        if len(shift_types) > 1:
-            score += 2  # Penalty for rotating shifts
-        
-        # Night shift fatigue multiplier
-        if shift_type == 'night':
-            score *= 1.3
-        
-        # Recent overtime penalty
-        recent_ot_hours = sum(s.hours for s in shifts if s.is_overtime)
-        score += min(recent_ot_hours / 24, 3)  # Up to 3 points for recent OT
-        
-        return min(score, 10)  # Cap at 10
+        fatigue = self.build_fatigue_matrix([employee_id], date_needed, date_needed)
+        return fatigue.score(employee_id, date_needed, shift_type)
     
     def _get_working_crews(self, check_date, shift_type):
         """Get crews scheduled to work on given date/shift."""
-        # This should match your rotation pattern
-        # Simplified example - replace with actual logic
-        days_from_start = (check_date - date(2024, 1, 1)).days
-        cycle_day = days_from_start % 4
-        
-        if shift_type == 'day':
-            if cycle_day in [0, 1]:
-                return ['A', 'B']
-            else:
-                return ['C', 'D']
-        else:  # night
-            if cycle_day in [0, 1]:
-                return ['C', 'D']
-            else:
-                return ['A', 'B']
+        return self.crew_calendar.crews_on_duty(check_date, shift_type)
     
     def _get_off_duty_crews(self, check_date, shift_type):
         """Get crews not working on given date/shift."""
@@ -267,22 +327,12 @@ class OvertimeAssignmentEngine:
     
     def _get_next_scheduled_shift(self, employee_id, after_date):
         """Find next scheduled shift for employee after given date."""
-        next_shift = self.Schedule.query.filter(
-            self.Schedule.employee_id == employee_id,
-            self.Schedule.date > after_date
-        ).order_by(self.Schedule.date).first()
-        
-        return next_shift.date if next_shift else None
+        return self.worked_days.next_worked(employee_id, after_date)
     
-    def _count_recent_night_shifts(self, employee_id, before_date):
-        """Count night shifts in past week."""
-        week_ago = before_date - timedelta(days=7)
-        return self.Schedule.query.filter(
-            self.Schedule.employee_id == employee_id,
-            self.Schedule.date >= week_ago,
-            self.Schedule.date < before_date,
-            self.Schedule.shift_type == 'night'
-        ).count()
+    def _shift_enum(self, shift_type):
+        """Schedule.shift_type stores enum names; map 'night' -> ShiftType.NIGHT."""
+        enum_class = self.Schedule.__table__.c.shift_type.type.enum_class
+        return enum_class(getattr(shift_type, 'value', shift_type))
     
     def create_overtime_opportunity(self, position_id, date_needed, shift_type,
                                   posted_by_id, urgency='standard', notes=None):
@@ -335,17 +385,43 @@ class OvertimeAssignmentEngine:
             })
         
         opportunity.notified_employees = json.dumps(notified_employees)
+        
+        # Delivery happens in the notification worker after commit
+        position = self.Position.query.get(position_id)
+        self.queue_notifications(
+            [e['employee_id'] for e in notified_employees],
+            f"Overtime available: {shift_type} shift on {date_needed.strftime('%b %d')} - {position.name}",
+            sent_by_id=posted_by_id,
+            coverage_request_id=opportunity.id
+        )
         self.db.session.commit()
         
         return opportunity, notified_employees
     
+    def queue_notifications(self, recipient_ids, message, sent_by_id=None,
+                             coverage_request_id=None, notification_type='overtime'):
+        """Add notifications to the outbox in the current transaction."""
+        if self.outbox is None:
+            return 0
+        return self.outbox.enqueue(
+            recipient_ids, message,
+            subject='Overtime notification',
+            sent_by_id=sent_by_id,
+            coverage_request_id=coverage_request_id,
+            notification_type=notification_type
+        )
+    
     def assign_mandatory_overtime(self, position_id, date_needed, shift_type, assigned_by_id):
         """
         Assign mandatory overtime using reverse seniority.
         Returns the assigned employee and schedule entry.
         """
-        # Get eligible employees
-        eligible = self.get_eligible_employees(position_id, date_needed, shift_type)
+        # Get eligible employees; anyone already on the schedule that day
+        # would need a second Schedule row for the date, which is not allowed
+        eligible = [
+            e for e in self.get_eligible_employees(position_id, date_needed, shift_type)
+            if not e['availability']['scheduled_shift']
+        ]
         
         # Filter to only truly available (no warnings)
         available = [e for e in eligible if e['availability']['eligible'] 
@@ -365,15 +441,17 @@ class OvertimeAssignmentEngine:
         selected = available[0]['employee']
         
         # Create schedule entry
+        is_day = shift_type == 'day'
         schedule = self.Schedule(
             employee_id=selected.id,
             date=date_needed,
-            shift_type=shift_type,
-            start_time='06:00' if shift_type == 'day' else '18:00',
-            end_time='18:00' if shift_type == 'day' else '06:00',
+            shift_type=self._shift_enum(shift_type),
+            start_time=time(6, 0) if is_day else time(18, 0),
+            end_time=time(18, 0) if is_day else time(6, 0),
             hours=12.0,
             is_overtime=True,
-            overtime_reason='Mandatory assignment - reverse seniority'
+            position_id=position_id,
+            created_by_id=assigned_by_id
         )
         
         self.db.session.add(schedule)
@@ -381,6 +459,13 @@ class OvertimeAssignmentEngine:
         # Update overtime history
         self._update_overtime_history(selected.id, date_needed, 12.0)
         
+        self.queue_notifications(
+            [selected.id],
+            f"You have been assigned mandatory overtime: {shift_type} shift on {date_needed.strftime('%b %d')}",
+            sent_by_id=assigned_by_id,
+            notification_type='mandatory_overtime'
+        )
+        
         # Log the assignment
         assignment_log = {
             'assigned_to': selected.id,
@@ -396,6 +481,221 @@ class OvertimeAssignmentEngine:
         
         return selected, schedule, assignment_log
     
+    def plan_overtime_assignments(self, gaps, max_shifts_per_employee=3, shift_hours=12.0):
+        """
+        Fill many open shifts at once as a min-cost bipartite assignment.
+        
+        gaps is a list of dicts with position_id, date, shift_type and gap
+        (people short). Each person short becomes a row; each employee gets
+        max_shifts_per_employee columns whose cost grows by the overtime a
+        further shift would add, so the same low-OT employee is not handed
+        every gap. Pair costs combine priority score, fatigue and 13-week
+        overtime; ineligible pairs and dates already worked are excluded.
+        Assignments that together break the consecutive-day limits are
+        forbidden and the problem re-solved. Nothing is written.
+        """
+        started = datetime.now()
+        
+        cells = []
+        cell_index = {}
+        rows = []
+        for gap in gaps:
+            key = (gap['position_id'], gap['date'], getattr(gap['shift_type'], 'value', gap['shift_type']))
+            if key not in cell_index:
+                cell_index[key] = len(cells)
+                cells.append(key)
+            rows.extend([cell_index[key]] * int(gap.get('gap', 1) or 0))
+        
+        plan = {
+            'assignments': [],
+            'unfilled': [],
+            'total_cost': 0.0,
+            'rounds': 0
+        }
+        if not rows:
+            plan['elapsed_ms'] = 0
+            return plan
+        
+        # Candidate pools, loaded once per position
+        position_ids = sorted(set(position_id for position_id, _, _ in cells))
+        positions = {p.id: p for p in self.Position.query.filter(self.Position.id.in_(position_ids)).all()}
+        pools = {position_id: self._get_candidates(positions[position_id]) if position_id in positions else []
+                 for position_id in position_ids}
+        
+        employees = []
+        employee_index = {}
+        for pool in pools.values():
+            for employee in pool:
+                if employee.id not in employee_index:
+                    employee_index[employee.id] = len(employees)
+                    employees.append(employee)
+        
+        employee_ids = [e.id for e in employees]
+        first_day = min(day for _, day, _ in cells)
+        last_day = max(day for _, day, _ in cells)
+        self.worked_days.load(employee_ids)
+        fatigue = self.build_fatigue_matrix(employee_ids, first_day, last_day)
+        
+        # base[cell, employee]: cost of one shift, inf where not allowed
+        base = np.full((len(cells), len(employees)), np.inf)
+        evaluations = {}
+        for c, (position_id, day, shift_type) in enumerate(cells):
+            pool = [e for e in pools[position_id] if not self.worked_days.is_worked(e.id, day)]
+            results = self._evaluate_eligibility_batch(
+                pool, day, shift_type,
+                self._get_working_crews(day, shift_type),
+                self._get_off_duty_crews(day, shift_type),
+                fatigue=fatigue
+            )
+            for employee in pool:
+                result = results[employee.id]
+                if not result['available']:
+                    continue
+                base[c, employee_index[employee.id]] = (
+                    self.PRIORITY_COST * result['priority_score'] +
+                    self.OVERTIME_COST_PER_HOUR * result['overtime_hours_13w'] +
+                    self.FATIGUE_COST * result['fatigue_score']
+                )
+                evaluations[(c, employee.id)] = result
+        
+        # Column e * slots + k is employee e's (k + 1)th shift in the period
+        slots = max(int(max_shifts_per_employee), 1)
+        slot_cost = np.arange(slots) * shift_hours * self.OVERTIME_COST_PER_HOUR
+        cost = (base[:, :, None] + slot_cost).reshape(len(cells), -1)[rows]
+        
+        forbidden = np.zeros((len(rows), len(employees)), dtype=bool)
+        for round_number in range(1, self.MAX_REPAIR_ROUNDS + 1):
+            matrix = np.where(np.repeat(forbidden, slots, axis=1), np.inf, cost)
+            pairs = min_cost_assignment(matrix)
+            conflicts = self._find_assignment_conflicts(
+                pairs, matrix, slots, rows, cells, employee_ids
+            )
+            plan['rounds'] = round_number
+            if not conflicts:
+                break
+            for row, e in conflicts:
+                forbidden[row, e] = True
+        
+        # Out of rounds: leave whatever still conflicts unfilled
+        conflicts = set(conflicts)
+        pairs = [(row, col) for row, col in pairs if (row, col // slots) not in conflicts]
+        
+        filled = defaultdict(int)
+        for row, col in sorted(pairs, key=lambda pair: (cells[rows[pair[0]]][1], pair[0])):
+            position_id, day, shift_type = cells[rows[row]]
+            employee = employees[col // slots]
+            result = evaluations[(rows[row], employee.id)]
+            filled[rows[row]] += 1
+            plan['total_cost'] += float(matrix[row, col])
+            plan['assignments'].append({
+                'employee_id': employee.id,
+                'name': employee.name,
+                'crew': employee.crew,
+                'position_id': position_id,
+                'date': day,
+                'shift_type': shift_type,
+                'cost': round(float(matrix[row, col]), 2),
+                'priority_score': result['priority_score'],
+                'overtime_hours_13w': result['overtime_hours_13w'],
+                'fatigue_score': result['fatigue_score'],
+                'warnings': result['warnings']
+            })
+        
+        needed = defaultdict(int)
+        for c in rows:
+            needed[c] += 1
+        for c, (position_id, day, shift_type) in enumerate(cells):
+            if needed[c] > filled[c]:
+                plan['unfilled'].append({
+                    'position_id': position_id,
+                    'date': day,
+                    'shift_type': shift_type,
+                    'count': needed[c] - filled[c]
+                })
+        
+        plan['total_cost'] = round(plan['total_cost'], 2)
+        plan['elapsed_ms'] = int((datetime.now() - started).total_seconds() * 1000)
+        return plan
+    
+    def _find_assignment_conflicts(self, pairs, matrix, slots, rows, cells, employee_ids):
+        """
+        (row, employee index) pairs to forbid: per employee, the costliest
+        of two shifts on one date, or the costliest shift in a run that
+        reaches the consecutive-day limit once all their new shifts are added.
+        """
+        by_employee = defaultdict(list)
+        for row, col in pairs:
+            by_employee[col // slots].append((float(matrix[row, col]), row))
+        
+        conflicts = []
+        for e, assigned in by_employee.items():
+            if len(assigned) < 2:
+                # A single new shift was already checked by _score_eligibility
+                continue
+            
+            employee_id = employee_ids[e]
+            days = [cells[rows[row]][1] for _, row in assigned]
+            bits = self.worked_days.bits(employee_id)
+            for day in days:
+                bits |= 1 << (day - EPOCH).days
+            
+            bad = []
+            for (pair_cost, row), day in zip(assigned, days):
+                shift_type = cells[rows[row]][2]
+                run = self.worked_days.run_length(employee_id, day, bits)
+                if days.count(day) > 1 or run >= self._max_consecutive(shift_type):
+                    bad.append((pair_cost, row))
+            
+            if bad:
+                conflicts.append((max(bad)[1], e))
+        
+        return conflicts
+    
+    def assign_overtime_for_period(self, start_date, end_date, assigned_by_id,
+                                   gaps=None, max_shifts_per_employee=3, dry_run=False):
+        """
+        Fill every open gap between two dates in one optimal pass.
+        Gaps default to the coverage gap engine's projection. Unless
+        dry_run, writes the overtime Schedule rows and history and commits.
+        """
+        if gaps is None:
+            from engines.coverage_gap_engine import CoverageGapDetectionEngine
+            gaps = CoverageGapDetectionEngine(self.db, self.models).build_coverage_tensor(
+                start_date, end_date
+            ).gaps()
+        
+        plan = self.plan_overtime_assignments(gaps, max_shifts_per_employee)
+        plan['start_date'] = start_date
+        plan['end_date'] = end_date
+        plan['assigned_by'] = assigned_by_id
+        if dry_run or not plan['assignments']:
+            return plan
+        
+        schedules = []
+        for assignment in plan['assignments']:
+            is_day = assignment['shift_type'] == 'day'
+            schedule = self.Schedule(
+                employee_id=assignment['employee_id'],
+                date=assignment['date'],
+                shift_type=self._shift_enum(assignment['shift_type']),
+                start_time=time(6, 0) if is_day else time(18, 0),
+                end_time=time(18, 0) if is_day else time(6, 0),
+                hours=12.0,
+                is_overtime=True,
+                position_id=assignment['position_id'],
+                created_by_id=assigned_by_id
+            )
+            self.db.session.add(schedule)
+            schedules.append(schedule)
+            self._update_overtime_history(assignment['employee_id'], assignment['date'], 12.0)
+        
+        self.db.session.commit()
+        
+        for assignment, schedule in zip(plan['assignments'], schedules):
+            assignment['schedule_id'] = schedule.id
+        
+        return plan
+    
     def _update_overtime_history(self, employee_id, work_date, hours):
         """Update the 13-week overtime history tracking."""
         # Find the week this date belongs to (assuming week starts Monday)
@@ -414,59 +714,75 @@ class OvertimeAssignmentEngine:
             history = self.OvertimeHistory(
                 employee_id=employee_id,
                 week_start_date=week_start,
+                week_ending=week_start + timedelta(days=6),
                 overtime_hours=hours
             )
             self.db.session.add(history)
     
+    # Percentiles reported by get_overtime_distribution_report (nearest rank)
+    DISTRIBUTION_PERCENTILES = (25, 50, 75, 90)
+    
     def get_overtime_distribution_report(self, start_date=None, end_date=None):
         """
         Generate overtime distribution analysis for fairness monitoring.
+        Per-employee totals, crew and position totals, percentiles and the
+        Gini coefficient come from one grouped/windowed query, so only one
+        row per employee is read whatever the date range.
         """
         if not start_date:
             start_date = date.today() - timedelta(weeks=13)
         if not end_date:
             end_date = date.today()
         
-        # Get all employees with overtime in period
-        overtime_data = self.db.session.query(
-            self.Employee.id,
-            self.Employee.name,
-            self.Employee.crew,
-            self.Employee.position_id,
-            func.sum(self.OvertimeHistory.overtime_hours).label('total_hours'),
-            func.count(self.OvertimeHistory.id).label('weeks_with_ot')
-        ).join(
-            self.OvertimeHistory
-        ).filter(
-            self.OvertimeHistory.week_start_date >= start_date,
-            self.OvertimeHistory.week_start_date <= end_date
-        ).group_by(
-            self.Employee.id,
-            self.Employee.name,
-            self.Employee.crew,
-            self.Employee.position_id
-        ).all()
+        rows = self.db.session.execute(self._distribution_query(start_date, end_date)).all()
         
-        # Calculate statistics
-        total_ot_hours = sum(d.total_hours for d in overtime_data)
-        avg_ot_hours = total_ot_hours / len(overtime_data) if overtime_data else 0
+        first = rows[0] if rows else None
+        employee_count = first.employee_count if first else 0
+        total_ot_hours = float(first.grand_total or 0) if first else 0.0
+        avg_ot_hours = total_ot_hours / employee_count if employee_count else 0
+        
+        # Gini from the ascending rank: 2 * sum(rank * x) / (n * sum(x)) - (n + 1) / n
+        gini = 0.0
+        if total_ot_hours > 0:
+            gini = (2 * float(first.rank_weighted) / (employee_count * total_ot_hours) -
+                    (employee_count + 1) / employee_count)
         
-        # Identify imbalances
         distribution = []
-        for emp in overtime_data:
-            variance = emp.total_hours - avg_ot_hours
+        crews = {}
+        positions = {}
+        for row in rows:
+            total_hours = float(row.total_hours or 0)
             distribution.append({
-                'employee_id': emp.id,
-                'name': emp.name,
-                'crew': emp.crew,
-                'total_hours': emp.total_hours,
-                'weeks_with_ot': emp.weeks_with_ot,
-                'variance_from_avg': variance,
-                'percentage_of_total': (emp.total_hours / total_ot_hours * 100) if total_ot_hours > 0 else 0
+                'employee_id': row.employee_id,
+                'name': row.name,
+                'crew': row.crew,
+                'position_id': row.position_id,
+                'total_hours': total_hours,
+                'weeks_with_ot': row.weeks_with_ot,
+                'variance_from_avg': total_hours - avg_ot_hours,
+                'percentage_of_total': (total_hours / total_ot_hours * 100) if total_ot_hours > 0 else 0,
+                'percentile': round(row.rank * 100.0 / employee_count, 1)
             })
-        
-        # Sort by total hours descending
-        distribution.sort(key=lambda x: x['total_hours'], reverse=True)
+            if row.crew not in crews:
+                crews[row.crew] = {
+                    'crew': row.crew,
+                    'total_hours': float(row.crew_total or 0),
+                    'employees': row.crew_count,
+                    'average': float(row.crew_total or 0) / row.crew_count
+                }
+            if row.position_id not in positions:
+                positions[row.position_id] = {
+                    'position_id': row.position_id,
+                    'position_name': row.position_name,
+                    'total_hours': float(row.position_total or 0),
+                    'employees': row.position_count,
+                    'average': float(row.position_total or 0) / row.position_count
+                }
+        
+        percentiles = {
+            f'p{p}': float(getattr(first, f'p{p}') or 0) if first else 0.0
+            for p in self.DISTRIBUTION_PERCENTILES
+        }
         
         return {
             'period': {
@@ -476,48 +792,106 @@ class OvertimeAssignmentEngine:
             'summary': {
                 'total_overtime_hours': total_ot_hours,
                 'average_hours_per_employee': avg_ot_hours,
-                'employees_with_overtime': len(overtime_data)
+                'employees_with_overtime': employee_count,
+                'median_hours': percentiles['p50'],
+                'max_hours': float(first.max_hours or 0) if first else 0.0,
+                'percentiles': percentiles,
+                'gini_coefficient': round(gini, 4)
             },
             'distribution': distribution,
-            'alerts': self._identify_distribution_issues(distribution)
+            'crews': sorted(crews.values(), key=lambda c: str(c['crew'])),
+            'positions': sorted(positions.values(), key=lambda p: -p['total_hours']),
+            'alerts': self._identify_distribution_issues(distribution, avg_ot_hours, crews.values())
         }
     
-    def _identify_distribution_issues(self, distribution):
+    def _distribution_query(self, start_date, end_date):
+        """
+        One row per employee with overtime history in the range, ordered by
+        total hours descending, carrying crew/position window totals and
+        overall rank, percentiles and the Gini sum.
+        """
+        history = self.OvertimeHistory
+        in_range = or_(
+            and_(history.week_start_date >= start_date, history.week_start_date <= end_date),
+            and_(
+                history.week_start_date == None,
+                history.week_ending >= start_date + timedelta(days=6),
+                history.week_ending <= end_date + timedelta(days=6)
+            )
+        )
+        
+        per_employee = select(
+            self.Employee.id.label('employee_id'),
+            self.Employee.name,
+            self.Employee.crew,
+            self.Employee.position_id,
+            self.Position.name.label('position_name'),
+            func.coalesce(func.sum(history.overtime_hours), 0).label('total_hours'),
+            func.count(history.id).label('weeks_with_ot')
+        ).join(
+            history, history.employee_id == self.Employee.id
+        ).outerjoin(
+            self.Position, self.Position.id == self.Employee.position_id
+        ).where(in_range).group_by(
+            self.Employee.id,
+            self.Employee.name,
+            self.Employee.crew,
+            self.Employee.position_id,
+            self.Position.name
+        ).subquery()
+        
+        e = per_employee.c
+        ranked = select(
+            per_employee,
+            func.row_number().over(order_by=(e.total_hours, e.employee_id)).label('rank'),
+            func.count().over().label('employee_count'),
+            func.sum(e.total_hours).over().label('grand_total'),
+            func.max(e.total_hours).over().label('max_hours'),
+            func.sum(e.total_hours).over(partition_by=e.crew).label('crew_total'),
+            func.count().over(partition_by=e.crew).label('crew_count'),
+            func.sum(e.total_hours).over(partition_by=e.position_id).label('position_total'),
+            func.count().over(partition_by=e.position_id).label('position_count')
+        ).subquery()
+        
+        r = ranked.c
+        percentiles = [
+            func.min(case((r.rank * 100 >= p * r.employee_count, r.total_hours))).over().label(f'p{p}')
+            for p in self.DISTRIBUTION_PERCENTILES
+        ]
+        return select(
+            ranked,
+            func.sum(r.rank * r.total_hours).over().label('rank_weighted'),
+            *percentiles
+        ).order_by(r.total_hours.desc(), r.employee_id)
+    
+    def _identify_distribution_issues(self, distribution, avg_hours, crews):
         """Identify potential fairness issues in overtime distribution."""
         alerts = []
         
         if not distribution:
             return alerts
         
-        # Check for employees with excessive overtime
-        max_hours = max(d['total_hours'] for d in distribution)
-        avg_hours = sum(d['total_hours'] for d in distribution) / len(distribution)
-        
+        # Check for employees with excessive overtime (distribution is
+        # sorted by hours, so stop at the first one under the line)
         for emp in distribution:
-            if emp['total_hours'] > avg_hours * 2:
-                alerts.append({
-                    'type': 'excessive_overtime',
-                    'employee': emp['name'],
-                    'hours': emp['total_hours'],
-                    'message': f"{emp['name']} has {emp['total_hours']:.1f} hours OT (2x average)"
-                })
+            if emp['total_hours'] <= avg_hours * 2:
+                break
+            alerts.append({
+                'type': 'excessive_overtime',
+                'employee': emp['name'],
+                'hours': emp['total_hours'],
+                'message': f"{emp['name']} has {emp['total_hours']:.1f} hours OT (2x average)"
+            })
         
         # Check for crew imbalances
-        crew_totals = defaultdict(float)
-        crew_counts = defaultdict(int)
-        
-        for emp in distribution:
-            crew_totals[emp['crew']] += emp['total_hours']
-            crew_counts[emp['crew']] += 1
-        
-        for crew, total in crew_totals.items():
-            crew_avg = total / crew_counts[crew]
+        for crew in crews:
+            crew_avg = crew['average']
             if abs(crew_avg - avg_hours) > avg_hours * 0.3:
                 alerts.append({
                     'type': 'crew_imbalance',
-                    'crew': crew,
+                    'crew': crew['crew'],
                     'average': crew_avg,
-                    'message': f"Crew {crew} averaging {crew_avg:.1f} hours vs overall {avg_hours:.1f}"
+                    'message': f"Crew {crew['crew']} averaging {crew_avg:.1f} hours vs overall {avg_hours:.1f}"
                 })
         
         return alerts
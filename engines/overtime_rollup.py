@@ -0,0 +1,328 @@
+from datetime import datetime, timedelta, date
+from collections import OrderedDict
+from sqlalchemy import event, inspect, func, case, and_, or_
+from sqlalchemy.orm import object_session
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+ROLLING_WEEKS = 13
+
+# Other worker processes see overtime writes after this long
+CACHE_TTL_SECONDS = 300
+
+# as_of dates kept in the in-process cache
+CACHE_DATES = 8
+
+# How often the background job checks whether the rollup needs rolling forward
+ROLL_FORWARD_SECONDS = 3600
+
+# Session.info key for employees whose overtime history changed in the transaction
+PENDING_KEY = 'overtime_rollup_pending'
+
+# Session.info flag set while the rollup itself is being written
+REFRESHING_KEY = 'overtime_rollup_refreshing'
+
+EMPTY_TOTALS = {
+    'overtime_hours': 0.0,
+    'total_hours': 0.0,
+    'weeks': 0,
+    'average_total_hours': 0.0,
+    'current_total_hours': 0.0
+}
+
+_totals_cache = OrderedDict()  # as_of -> {employee_id: totals}
+_complete = set()  # as_of dates whose cache holds every employee
+_cache_lock = threading.Lock()
+_cache_stamp = [time.monotonic()]
+_installed = set()
+
+
+def invalidate_overtime_totals(employee_ids=None):
+    """Drop cached totals for some employees, or all of them."""
+    with _cache_lock:
+        if employee_ids is None:
+            _totals_cache.clear()
+            _cache_stamp[0] = time.monotonic()
+        else:
+            for totals in _totals_cache.values():
+                for employee_id in employee_ids:
+                    totals.pop(employee_id, None)
+        _complete.clear()
+
+
+def _make_totals(overtime_hours, total_hours, weeks, current_total_hours):
+    weeks = int(weeks or 0)
+    total_hours = float(total_hours or 0)
+    return {
+        'overtime_hours': float(overtime_hours or 0),
+        'total_hours': total_hours,
+        'weeks': weeks,
+        'average_total_hours': total_hours / weeks if weeks else 0.0,
+        'current_total_hours': float(current_total_hours or 0)
+    }
+
+
+class OvertimeRollupMaintainer:
+    """
+    Rolling 13-week overtime totals per employee.
+    
+    The overtime_rollup table holds each employee's totals as of today and
+    is refreshed just before commit for employees whose OvertimeHistory rows
+    changed (uploads included). The window moves with the date; roll_forward_job
+    brings every row forward in the background, and rows not yet moved are
+    aggregated on read. get_totals() is the bulk lookup used by overtime
+    ranking, and attach_totals() by employee listings; results are cached
+    per process.
+    """
+    
+    def __init__(self, db, models):
+        self.db = db
+        self.OvertimeHistory = models['OvertimeHistory']
+        self.OvertimeRollup = models.get('OvertimeRollup')
+    
+    # ==========================================
+    # SESSION HOOKS
+    # ==========================================
+    
+    def install(self):
+        """Register write listeners for OvertimeHistory and the session (once)."""
+        key = id(self.db.session)
+        if key in _installed:
+            return
+        _installed.add(key)
+        
+        def row_written(mapper, connection, target):
+            employee_ids = {target.employee_id}
+            employee_ids.update(inspect(target).attrs.employee_id.history.deleted or ())
+            employee_ids.discard(None)
+            session = object_session(target)
+            if session is not None:
+                pending = session.info.setdefault(PENDING_KEY, set())
+                if pending is not None:  # None means "everyone"
+                    pending.update(employee_ids)
+        
+        for name in ('after_insert', 'after_update', 'after_delete'):
+            event.listen(self.OvertimeHistory, name, row_written)
+        
+        def bulk_statement(orm_execute_state):
+            if not (orm_execute_state.is_insert or orm_execute_state.is_update or
+                    orm_execute_state.is_delete):
+                return
+            table = getattr(orm_execute_state.statement, 'table', None)
+            if getattr(table, 'name', None) == self.OvertimeHistory.__tablename__:
+                orm_execute_state.session.info[PENDING_KEY] = None
+        
+        def transaction_ended(session):
+            if PENDING_KEY in session.info:
+                invalidate_overtime_totals(session.info.pop(PENDING_KEY))
+        
+        event.listen(self.db.session, 'do_orm_execute', bulk_statement)
+        event.listen(self.db.session, 'before_commit', self._before_commit)
+        event.listen(self.db.session, 'after_commit', transaction_ended)
+        event.listen(self.db.session, 'after_soft_rollback',
+                     lambda session, previous: transaction_ended(session))
+        logger.info("Overtime rollup maintenance installed")
+    
+    def _before_commit(self, session):
+        """Refresh rollup rows for employees whose history changed."""
+        if self.OvertimeRollup is None or session.info.get(REFRESHING_KEY):
+            return
+        
+        # Commit flushes after this hook runs; flush now so the mapper
+        # events have seen every change in the transaction
+        session.flush()
+        everyone = PENDING_KEY in session.info and session.info[PENDING_KEY] is None
+        employee_ids = session.info.get(PENDING_KEY) or set()
+        if not everyone and not employee_ids:
+            return
+        
+        session.info[REFRESHING_KEY] = True
+        try:
+            with session.begin_nested():
+                self.refresh(None if everyone else employee_ids)
+        except Exception as e:
+            # Never block the user's commit; stale rows are recomputed on read
+            logger.warning(f"Overtime rollup maintenance skipped: {e}")
+        finally:
+            session.info.pop(REFRESHING_KEY, None)
+    
+    # ==========================================
+    # AGGREGATION
+    # ==========================================
+    
+    def _in_window(self, as_of):
+        """Rows whose week starts within ROLLING_WEEKS of as_of."""
+        window_start = as_of - timedelta(weeks=ROLLING_WEEKS)
+        return or_(
+            self.OvertimeHistory.week_start_date >= window_start,
+            and_(
+                self.OvertimeHistory.week_start_date == None,
+                self.OvertimeHistory.week_ending >= window_start + timedelta(days=6)
+            )
+        )
+    
+    def _aggregate(self, as_of, employee_ids=None, exclude_ids=None):
+        """Totals for the window ending at as_of in one grouped query."""
+        in_window = self._in_window(as_of)
+        query = self.db.session.query(
+            self.OvertimeHistory.employee_id,
+            func.sum(case((in_window, self.OvertimeHistory.overtime_hours), else_=0)),
+            func.sum(case((in_window, self.OvertimeHistory.total_hours), else_=0)),
+            func.sum(case((in_window, 1), else_=0)),
+            func.max(case((self.OvertimeHistory.is_current == True,
+                           self.OvertimeHistory.total_hours), else_=None))
+        )
+        if employee_ids is not None:
+            query = query.filter(self.OvertimeHistory.employee_id.in_(employee_ids))
+        if exclude_ids:
+            query = query.filter(~self.OvertimeHistory.employee_id.in_(exclude_ids))
+        
+        return {
+            employee_id: _make_totals(overtime_hours, total_hours, weeks, current)
+            for employee_id, overtime_hours, total_hours, weeks, current
+            in query.group_by(self.OvertimeHistory.employee_id).all()
+        }
+    
+    def refresh(self, employee_ids=None):
+        """
+        Recompute rollup rows for some employees (or everyone) as of today.
+        Adds statements to the current session; the caller commits.
+        """
+        today = date.today()
+        if employee_ids is not None:
+            employee_ids = list(employee_ids)
+            if not employee_ids:
+                return 0
+        
+        totals = self._aggregate(today, employee_ids)
+        if employee_ids is not None:
+            for employee_id in employee_ids:
+                totals.setdefault(employee_id, EMPTY_TOTALS)
+        
+        table = self.OvertimeRollup.__table__
+        delete = table.delete()
+        if employee_ids is not None:
+            delete = delete.where(table.c.employee_id.in_(employee_ids))
+        self.db.session.execute(delete)
+        
+        now = datetime.utcnow()
+        rows = [{
+            'employee_id': employee_id,
+            'as_of': today,
+            'overtime_hours_13w': t['overtime_hours'],
+            'total_hours_13w': t['total_hours'],
+            'weeks_13w': t['weeks'],
+            'current_total_hours': t['current_total_hours'],
+            'computed_at': now
+        } for employee_id, t in totals.items()]
+        if rows:
+            self.db.session.execute(table.insert(), rows)
+        
+        invalidate_overtime_totals(None if employee_ids is None else employee_ids)
+        return len(rows)
+    
+    def roll_forward_job(self, params, report):
+        """engines/job_runner.py handler: bring every rollup row to today's window."""
+        if self.OvertimeRollup is None:
+            return {'success': True, 'employees': 0}
+        
+        oldest = self.db.session.query(func.min(self.OvertimeRollup.as_of)).scalar()
+        if oldest is not None and oldest >= date.today():
+            return {'success': True, 'employees': 0}
+        
+        report(0, "Rolling overtime totals forward")
+        count = self.refresh()
+        self.db.session.commit()
+        return {'success': True, 'employees': count}
+    
+    # ==========================================
+    # LOOKUP
+    # ==========================================
+    
+    def get_totals(self, employee_ids=None, as_of=None):
+        """
+        Rolling totals keyed by employee id: overtime_hours, total_hours,
+        weeks, average_total_hours and current_total_hours.
+        
+        With employee_ids=None every employee with overtime history is
+        returned. Today's totals come from overtime_rollup; rows missing or
+        out of date, and other as_of dates, are aggregated in one query.
+        """
+        as_of = as_of or date.today()
+        
+        with _cache_lock:
+            if time.monotonic() - _cache_stamp[0] > CACHE_TTL_SECONDS:
+                _totals_cache.clear()
+                _complete.clear()
+                _cache_stamp[0] = time.monotonic()
+            cached = dict(_totals_cache.get(as_of, {}))
+            complete = as_of in _complete
+        
+        if employee_ids is None:
+            missing = None if not complete else []
+        else:
+            employee_ids = set(employee_ids)
+            missing = [e for e in employee_ids if e not in cached]
+        
+        if missing is None or missing:
+            loaded = self._load(as_of, missing, cached)
+            cached.update(loaded)
+            with _cache_lock:
+                block = _totals_cache.setdefault(as_of, {})
+                block.update(loaded)
+                if missing is None:
+                    _complete.add(as_of)
+                _totals_cache.move_to_end(as_of)
+                while len(_totals_cache) > CACHE_DATES:
+                    evicted, _ = _totals_cache.popitem(last=False)
+                    _complete.discard(evicted)
+        
+        if employee_ids is None:
+            return {e: t for e, t in cached.items() if t['weeks'] or t['current_total_hours']}
+        return {e: cached.get(e, EMPTY_TOTALS) for e in employee_ids}
+    
+    def attach_totals(self, employees, as_of=None):
+        """
+        Look up totals for a listing of employees at once and attach them
+        as employee.overtime_totals, which the Employee overtime properties
+        read instead of looking each employee up.
+        """
+        totals = self.get_totals([emp.id for emp in employees], as_of=as_of)
+        for emp in employees:
+            emp.overtime_totals = totals[emp.id]
+        return totals
+    
+    def _load(self, as_of, employee_ids, cached):
+        """Totals for the given employees (None = everyone not yet cached)."""
+        loaded = {}
+        
+        if self.OvertimeRollup is not None and as_of == date.today():
+            try:
+                query = self.db.session.query(self.OvertimeRollup).filter(
+                    self.OvertimeRollup.as_of == as_of
+                )
+                if employee_ids is not None:
+                    query = query.filter(self.OvertimeRollup.employee_id.in_(employee_ids))
+                for row in query.all():
+                    loaded[row.employee_id] = _make_totals(
+                        row.overtime_hours_13w, row.total_hours_13w,
+                        row.weeks_13w, row.current_total_hours
+                    )
+            except Exception as e:
+                logger.warning(f"Overtime rollup lookup failed, aggregating instead: {e}")
+                loaded = {}
+        
+        if employee_ids is None:
+            known = set(cached) | set(loaded)
+            aggregated = self._aggregate(as_of, exclude_ids=known or None)
+        else:
+            remaining = [e for e in employee_ids if e not in loaded]
+            aggregated = self._aggregate(as_of, remaining) if remaining else {}
+            for employee_id in remaining:
+                aggregated.setdefault(employee_id, EMPTY_TOTALS)
+        
+        loaded.update(aggregated)
+        return loaded
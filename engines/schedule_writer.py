@@ -0,0 +1,329 @@
+from datetime import datetime
+from sqlalchemy import insert, update, delete, select, tuple_, bindparam
+import csv
+import io
+import time
+import logging
+
+from engines.worked_day_index import invalidate_worked_days, PENDING_KEY as WORKED_DAYS_PENDING_KEY
+from engines.coverage_gap_maintainer import note_bulk_schedule_write
+
+logger = logging.getLogger(__name__)
+
+# Rows sent to the database per statement / COPY
+CHUNK_SIZE = 5000
+
+# Columns a bulk write sets on every row
+COLUMNS = ('employee_id', 'date', 'shift_type', 'start_time', 'end_time', 'hours',
+           'position_id', 'created_by_id', 'is_overtime', 'is_training',
+           'created_at', 'updated_at')
+
+# Columns a repeated (employee_id, date) overwrites; see _employee_date_uc.
+# The flags are included so a generated shift never inherits a stale
+# overtime or training flag from the row it replaces.
+UPSERT_COLUMNS = ('shift_type', 'start_time', 'end_time', 'hours', 'position_id',
+                  'created_by_id', 'is_overtime', 'is_training', 'updated_at')
+
+# Columns a diff compares; a row that matches on all of them is left alone
+DIFF_COLUMNS = ('shift_type', 'start_time', 'end_time', 'hours', 'position_id')
+
+
+class ScheduleWriter:
+    """
+    Writes generated Schedule rows without the ORM unit of work.
+    
+    Rows (dicts keyed by COLUMNS, or Schedule objects via from_objects())
+    are streamed in chunks: PostgreSQL COPYs each chunk into a temporary
+    staging table and upserts from it, SQLite runs one executemany
+    INSERT ... ON CONFLICT per chunk, and other databases delete the
+    chunk's (employee_id, date) keys before inserting. An existing shift
+    for the same employee and date is replaced, never duplicated; when
+    rows repeat an (employee_id, date), the last one wins.
+    
+    sync() instead diffs the rows against what is already stored and only
+    inserts, updates and deletes what changed, leaving hand-entered
+    overtime and training shifts in place.
+    
+    Statements run on the current session's connection, so the caller's
+    commit or rollback covers them.
+    """
+    
+    def __init__(self, db, models, chunk_size=CHUNK_SIZE):
+        self.db = db
+        self.Schedule = models['Schedule']
+        self.table = self.Schedule.__table__
+        self.shift_enum = self.table.c.shift_type.type.enum_class
+        self.chunk_size = chunk_size
+    
+    def write(self, rows):
+        """
+        Upsert rows in chunks. Returns counts and throughput:
+        {'rows', 'seconds', 'rows_per_second', 'method'}.
+        """
+        started = time.perf_counter()
+        session = self.db.session
+        dialect = session.get_bind().dialect.name
+        
+        if dialect == 'postgresql' and self._supports_copy(session):
+            method, write_chunk = 'copy', self._copy_chunk
+        elif dialect in ('postgresql', 'sqlite'):
+            method, write_chunk = 'executemany', self._upsert_chunk
+        else:
+            method, write_chunk = 'delete_insert', self._replace_chunk
+        
+        total = 0
+        position_ids = set()
+        first_date = last_date = None
+        now = datetime.utcnow()
+        chunk = {}  # (employee_id, date) -> row; one statement cannot touch a key twice
+        
+        for row in rows:
+            row = self._normalize(row, now)
+            chunk[(row['employee_id'], row['date'])] = row
+            position_ids.add(row['position_id'])
+            if first_date is None or row['date'] < first_date:
+                first_date = row['date']
+            if last_date is None or row['date'] > last_date:
+                last_date = row['date']
+            
+            if len(chunk) >= self.chunk_size:
+                write_chunk(session, list(chunk.values()))
+                total += len(chunk)
+                chunk = {}
+        
+        if chunk:
+            write_chunk(session, list(chunk.values()))
+            total += len(chunk)
+        
+        if total:
+            self._invalidate(session, position_ids, first_date, last_date)
+        
+        seconds = time.perf_counter() - started
+        rate = total / seconds if seconds > 0 else 0.0
+        logger.info(f"Wrote {total} schedules in {seconds:.2f}s "
+                    f"({rate:,.0f} rows/sec, {method})")
+        
+        return {
+            'rows': total,
+            'seconds': round(seconds, 3),
+            'rows_per_second': round(rate),
+            'method': method
+        }
+    
+    def sync(self, rows, start_date, end_date, employee_ids=None):
+        """
+        Make the stored schedule between start_date and end_date match rows.
+        
+        Existing shifts for employee_ids (None means every employee) that
+        are not in rows are deleted, rows without a stored shift are
+        inserted and stored shifts that differ in DIFF_COLUMNS are updated
+        in place; everything else, including ids and created_at, is
+        untouched. Overtime and training shifts are entered by hand, never
+        generated, so a cell holding one is left alone: it is neither
+        deleted nor overwritten. Returns
+        {'rows', 'inserted', 'updated', 'deleted', 'unchanged', 'kept',
+        'seconds', 'rows_per_second', 'method'}.
+        """
+        started = time.perf_counter()
+        session = self.db.session
+        now = datetime.utcnow()
+        scope = set(employee_ids) if employee_ids is not None else None
+        
+        generated = {}
+        for row in rows:
+            row = self._normalize(row, now)
+            generated[(row['employee_id'], row['date'])] = row
+        
+        c = self.table.c
+        existing = {}
+        for stored in session.execute(
+            select(c.id, c.employee_id, c.date, c.is_overtime, c.is_training,
+                   *[c[column] for column in DIFF_COLUMNS])
+            .where(c.date >= start_date, c.date <= end_date)
+        ):
+            existing[(stored.employee_id, stored.date)] = stored
+        
+        inserts, updates, deletes = [], [], []
+        touched = []
+        unchanged = kept = 0
+        for key, row in generated.items():
+            stored = existing.get(key)
+            if stored is None:
+                inserts.append(row)
+                touched.append((row['position_id'], row['date']))
+            elif stored.is_overtime or stored.is_training:
+                kept += 1
+            elif any(stored._mapping[column] != row[column] for column in DIFF_COLUMNS):
+                change = {column: row[column] for column in DIFF_COLUMNS}
+                change['updated_at'] = now
+                change['b_id'] = stored.id
+                updates.append(change)
+                touched.append((row['position_id'], row['date']))
+                touched.append((stored.position_id, stored.date))
+            else:
+                unchanged += 1
+        
+        for key, stored in existing.items():
+            if key in generated or (scope is not None and stored.employee_id not in scope):
+                continue
+            if stored.is_overtime or stored.is_training:
+                kept += 1
+            else:
+                deletes.append(stored.id)
+                touched.append((stored.position_id, stored.date))
+        
+        for chunk in self._chunks(inserts):
+            session.execute(insert(self.table), chunk)
+        
+        if updates:
+            stmt = update(self.table).where(c.id == bindparam('b_id'))
+            for chunk in self._chunks(updates):
+                session.execute(stmt, chunk)
+        
+        for chunk in self._chunks(deletes):
+            session.execute(delete(self.table).where(c.id.in_(chunk)))
+        
+        if touched:
+            days = [day for _, day in touched]
+            self._invalidate(session, {position_id for position_id, _ in touched},
+                             min(days), max(days))
+        
+        seconds = time.perf_counter() - started
+        rate = len(generated) / seconds if seconds > 0 else 0.0
+        logger.info(f"Synced {len(generated)} schedules in {seconds:.2f}s: "
+                    f"{len(inserts)} inserted, {len(updates)} updated, "
+                    f"{len(deletes)} deleted, {unchanged} unchanged, "
+                    f"{kept} overtime/training kept")
+        
+        return {
+            'rows': len(generated),
+            'inserted': len(inserts),
+            'updated': len(updates),
+            'deleted': len(deletes),
+            'unchanged': unchanged,
+            'kept': kept,
+            'seconds': round(seconds, 3),
+            'rows_per_second': round(rate),
+            'method': 'diff'
+        }
+    
+    def _chunks(self, items):
+        for i in range(0, len(items), self.chunk_size):
+            yield items[i:i + self.chunk_size]
+    
+    @staticmethod
+    def from_objects(schedules):
+        """Row dicts for unsaved Schedule objects."""
+        for schedule in schedules:
+            yield {column: getattr(schedule, column, None) for column in COLUMNS}
+    
+    def _normalize(self, row, now):
+        """Fill defaults and store shift_type as the enum member."""
+        row = {column: row.get(column) for column in COLUMNS}
+        row['shift_type'] = self._shift_enum(row['shift_type'])
+        row['is_overtime'] = bool(row['is_overtime'])
+        row['is_training'] = bool(row['is_training'])
+        row['created_at'] = row['created_at'] or now
+        row['updated_at'] = row['updated_at'] or now
+        return row
+    
+    def _shift_enum(self, value):
+        """Enum member from a member, its value ('day') or its name ('DAY')."""
+        if isinstance(value, self.shift_enum):
+            return value
+        try:
+            return self.shift_enum(value)
+        except ValueError:
+            return self.shift_enum[value]
+    
+    # ==========================================
+    # CHUNK WRITERS
+    # ==========================================
+    
+    def _upsert_chunk(self, session, chunk):
+        """One executemany INSERT ... ON CONFLICT DO UPDATE."""
+        if session.get_bind().dialect.name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        
+        stmt = dialect_insert(self.table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['employee_id', 'date'],
+            set_={column: stmt.excluded[column] for column in UPSERT_COLUMNS}
+        )
+        session.execute(stmt, chunk)
+    
+    def _replace_chunk(self, session, chunk):
+        """Delete the chunk's (employee_id, date) keys, then executemany INSERT."""
+        keys = list({(row['employee_id'], row['date']) for row in chunk})
+        session.execute(
+            delete(self.table).where(
+                tuple_(self.table.c.employee_id, self.table.c.date).in_(keys)
+            )
+        )
+        session.execute(insert(self.table), chunk)
+    
+    @staticmethod
+    def _supports_copy(session):
+        cursor = session.connection().connection.cursor()
+        try:
+            return hasattr(cursor, 'copy_expert')
+        finally:
+            cursor.close()
+    
+    def _copy_chunk(self, session, chunk):
+        """COPY into a temporary staging table, then upsert from it."""
+        columns = ', '.join(COLUMNS)
+        updates = ', '.join(f'{column} = EXCLUDED.{column}' for column in UPSERT_COLUMNS)
+        
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in chunk:
+            writer.writerow([self._copy_value(row[column]) for column in COLUMNS])
+        buffer.seek(0)
+        
+        cursor = session.connection().connection.cursor()
+        try:
+            cursor.execute(
+                f"CREATE TEMP TABLE IF NOT EXISTS schedule_stage ON COMMIT DROP AS "
+                f"SELECT {columns} FROM {self.table.name} WITH NO DATA"
+            )
+            cursor.execute("TRUNCATE schedule_stage")
+            cursor.copy_expert(
+                f"COPY schedule_stage ({columns}) FROM STDIN WITH (FORMAT csv)", buffer
+            )
+            cursor.execute(
+                f"INSERT INTO {self.table.name} ({columns}) "
+                f"SELECT {columns} FROM schedule_stage "
+                f"ON CONFLICT (employee_id, date) DO UPDATE SET {updates}"
+            )
+        finally:
+            cursor.close()
+    
+    @staticmethod
+    def _copy_value(value):
+        """CSV text for COPY; empty means NULL."""
+        if value is None:
+            return ''
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        if hasattr(value, 'name') and hasattr(value, 'value'):  # enum member
+            return value.name
+        return value
+    
+    # ==========================================
+    # CACHES
+    # ==========================================
+    
+    def _invalidate(self, session, position_ids, first_date, last_date):
+        """
+        Bulk writes fire no ORM flush events, so drop the worked-day
+        bitsets and queue coverage-gap cells the way those hooks would.
+        """
+        invalidate_worked_days()
+        session.info[WORKED_DAYS_PENDING_KEY] = None
+        try:
+            note_bulk_schedule_write(session, position_ids, first_date, last_date)
+        except Exception as e:
+            logger.warning(f"Could not queue coverage gap refresh: {e}")
@@ -0,0 +1,283 @@
+from datetime import datetime, timedelta
+import logging
+import numpy as np
+
+from utils.pattern_expansion import compile_pattern, SHIFT_TYPE_NAMES
+from utils.pattern_library import PATTERNS, SHIFT_TIMES
+
+logger = logging.getLogger(__name__)
+
+# Where a shift read through VirtualSchedule came from
+SOURCE_PATTERN = 'pattern'      # computed from the active virtual rotation
+SOURCE_SCHEDULE = 'schedule'    # a stored Schedule row
+SOURCE_EXCEPTION = 'exception'  # a ScheduleException row
+
+SHIFT_ORDER = {'day': 0, 'evening': 1, 'night': 2}
+
+EXCEPTION_FIELDS = ('shift_type', 'start_time', 'end_time', 'hours', 'position_id',
+                    'is_overtime', 'is_training', 'is_removed', 'reason', 'created_by_id')
+
+
+class ScheduledShift:
+    """One shift as read through VirtualSchedule; has the attributes of a Schedule row."""
+    
+    __slots__ = ('id', 'employee_id', 'date', 'shift_type', 'start_time', 'end_time',
+                 'hours', 'position_id', 'is_overtime', 'is_training', 'source', 'employee')
+    
+    def __init__(self, employee_id, date, shift_type, start_time=None, end_time=None,
+                 hours=None, position_id=None, is_overtime=False, is_training=False,
+                 source=SOURCE_PATTERN, id=None):
+        self.id = id
+        self.employee_id = employee_id
+        self.date = date
+        self.shift_type = shift_type
+        self.start_time = start_time
+        self.end_time = end_time
+        self.hours = hours
+        self.position_id = position_id
+        self.is_overtime = bool(is_overtime)
+        self.is_training = bool(is_training)
+        self.source = source
+        self.employee = None
+    
+    @property
+    def position(self):
+        return self.employee.position if self.employee is not None else None
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'employee_id': self.employee_id,
+            'employee_name': self.employee.name if self.employee is not None else None,
+            'crew': self.employee.crew if self.employee is not None else None,
+            'date': self.date.isoformat(),
+            'shift_type': getattr(self.shift_type, 'value', self.shift_type),
+            'start_time': self.start_time.strftime('%H:%M') if self.start_time else None,
+            'end_time': self.end_time.strftime('%H:%M') if self.end_time else None,
+            'hours': self.hours,
+            'position_id': self.position_id,
+            'is_overtime': self.is_overtime,
+            'is_training': self.is_training,
+            'source': self.source
+        }
+
+
+class VirtualSchedule:
+    """
+    Read API for schedules that merges a computed rotation with stored rows.
+    
+    When the active ShiftPattern is virtual, nobody's rotation is stored in
+    schedule: each active crew member's base shifts are computed on read
+    from the pattern's cycle table, anchored at the pattern's start date.
+    Stored Schedule rows override the base for their (employee, date), and
+    ScheduleException rows override both (is_removed takes the day off).
+    Without a virtual pattern this is just the stored schedule.
+    
+    Only the schedule views and /schedule/api/shifts read through this
+    class so far. Coverage gaps (tensor and maintainer), time-off impact,
+    overtime eligibility, fatigue, the worked-day index and the employee,
+    main and supervisor dashboards still query Schedule directly, so a
+    virtual rotation never deletes stored rows (see
+    PatternGenerator.generate(virtual=True)) and create-pattern does not
+    offer one yet: those readers would treat its shifts as days off.
+    """
+    
+    def __init__(self, db, models):
+        self.db = db
+        self.Employee = models['Employee']
+        self.Schedule = models['Schedule']
+        self.ShiftPattern = models.get('ShiftPattern')
+        self.ScheduleException = models.get('ScheduleException')
+        self.shift_enum = self.Schedule.__table__.c.shift_type.type.enum_class
+    
+    @property
+    def enabled(self):
+        return self.ShiftPattern is not None and self.ScheduleException is not None
+    
+    def active_pattern(self):
+        """The active ShiftPattern if it is virtual and still in the library, else None."""
+        if not self.enabled:
+            return None
+        pattern = self.ShiftPattern.query.filter_by(
+            is_active=True
+        ).order_by(self.ShiftPattern.id.desc()).first()
+        if pattern and pattern.is_virtual and pattern.pattern_key in PATTERNS:
+            return pattern
+        return None
+    
+    # ==========================================
+    # READ
+    # ==========================================
+    
+    def shifts(self, start_date, end_date, employee_ids=None, crew=None):
+        """
+        Every shift worked from start_date to end_date inclusive, optionally
+        limited to employee_ids and/or one crew, as ScheduledShift objects
+        sorted by date, shift and employee.
+        """
+        if crew is not None:
+            crew_ids = [employee_id for (employee_id,) in self.db.session.query(
+                self.Employee.id
+            ).filter(self.Employee.crew == crew).all()]
+            employee_ids = crew_ids if employee_ids is None else \
+                list(set(employee_ids) & set(crew_ids))
+        if employee_ids is not None and not employee_ids:
+            return []
+        
+        merged = {}
+        pattern = self.active_pattern()
+        if pattern is not None:
+            for shift in self._base_shifts(pattern, start_date, end_date, employee_ids):
+                merged[(shift.employee_id, shift.date)] = shift
+        
+        for shift in self._stored_shifts(start_date, end_date, employee_ids):
+            merged[(shift.employee_id, shift.date)] = shift
+        
+        if self.enabled:
+            for key, shift in self._exception_shifts(start_date, end_date, employee_ids):
+                if shift is None:
+                    merged.pop(key, None)
+                else:
+                    merged[key] = shift
+        
+        self._attach_employees(merged.values())
+        return sorted(merged.values(), key=lambda s: (
+            s.date, SHIFT_ORDER.get(getattr(s.shift_type, 'value', s.shift_type), 9),
+            s.employee_id
+        ))
+    
+    def _base_shifts(self, pattern, start_date, end_date, employee_ids):
+        """Rotation shifts of the current crew rosters, computed from the cycle table."""
+        definition = PATTERNS[pattern.pattern_key]
+        table = compile_pattern(definition)
+        first = max(start_date, pattern.start_date)
+        if first > end_date:
+            return
+        
+        query = self.db.session.query(
+            self.Employee.id, self.Employee.crew, self.Employee.position_id
+        ).filter(
+            self.Employee.is_active == True,
+            self.Employee.is_supervisor == False,
+            self.Employee.crew.in_(list(table.crews))
+        )
+        if employee_ids is not None:
+            query = query.filter(self.Employee.id.in_(list(employee_ids)))
+        members = {}
+        for employee_id, crew, position_id in query.all():
+            members.setdefault(crew, []).append((employee_id, position_id))
+        if not members:
+            return
+        
+        # Day 0 of the cycle is the pattern start (or the Monday before it)
+        first_day = (first - pattern.start_date).days
+        if table.anchor == 'monday':
+            first_day += pattern.start_date.weekday()
+        num_days = (end_date - first).days + 1
+        crew_codes = table.crew_codes(num_days, first_day)
+        
+        shifts = self._shift_times(definition.get('shift_length', '12-hour'))
+        for crew, roster in members.items():
+            codes = crew_codes[crew]
+            for d in np.flatnonzero(codes).tolist():
+                day = first + timedelta(days=d)
+                shift_type, start_time, end_time, hours = shifts[int(codes[d])]
+                for employee_id, position_id in roster:
+                    yield ScheduledShift(employee_id, day, shift_type, start_time, end_time,
+                                         hours, position_id)
+    
+    def _shift_times(self, shift_length):
+        """Shift code -> (ShiftType, start, end, hours) for a SHIFT_TIMES entry"""
+        times = SHIFT_TIMES[shift_length]
+        return {
+            code: (
+                self.shift_enum(name),
+                datetime.strptime(times[name]['start'], '%H:%M').time(),
+                datetime.strptime(times[name]['end'], '%H:%M').time(),
+                times[name]['hours']
+            )
+            for code, name in SHIFT_TYPE_NAMES.items() if name in times
+        }
+    
+    def _stored_shifts(self, start_date, end_date, employee_ids):
+        S = self.Schedule
+        query = self.db.session.query(
+            S.id, S.employee_id, S.date, S.shift_type, S.start_time, S.end_time,
+            S.hours, S.position_id, S.is_overtime, S.is_training
+        ).filter(S.date >= start_date, S.date <= end_date)
+        if employee_ids is not None:
+            query = query.filter(S.employee_id.in_(list(employee_ids)))
+        for row in query.all():
+            yield ScheduledShift(row.employee_id, row.date, row.shift_type, row.start_time,
+                                 row.end_time, row.hours, row.position_id, row.is_overtime,
+                                 row.is_training, source=SOURCE_SCHEDULE, id=row.id)
+    
+    def _exception_shifts(self, start_date, end_date, employee_ids):
+        """((employee_id, date), ScheduledShift or None for a removed day) per exception."""
+        E = self.ScheduleException
+        query = E.query.filter(E.date >= start_date, E.date <= end_date)
+        if employee_ids is not None:
+            query = query.filter(E.employee_id.in_(list(employee_ids)))
+        for exception in query.all():
+            key = (exception.employee_id, exception.date)
+            if exception.is_removed or exception.shift_type is None:
+                yield key, None
+            else:
+                yield key, ScheduledShift(
+                    exception.employee_id, exception.date, exception.shift_type,
+                    exception.start_time, exception.end_time, exception.hours,
+                    exception.position_id, exception.is_overtime, exception.is_training,
+                    source=SOURCE_EXCEPTION, id=exception.id
+                )
+    
+    def _attach_employees(self, shifts):
+        employee_ids = {shift.employee_id for shift in shifts}
+        if not employee_ids:
+            return
+        employees = {employee.id: employee for employee in
+                     self.Employee.query.filter(self.Employee.id.in_(employee_ids)).all()}
+        for shift in shifts:
+            shift.employee = employees.get(shift.employee_id)
+    
+    # ==========================================
+    # EXCEPTIONS
+    # ==========================================
+    
+    def record_exception(self, employee_id, day, **fields):
+        """
+        Store a deviation for (employee_id, day), replacing any earlier one.
+        fields are ScheduleException columns other than employee_id and
+        date; shift_type may be a ShiftType or its value. Adds to the
+        current session; the caller commits.
+        """
+        if not self.enabled:
+            raise ValueError("Schedule exceptions are not available")
+        unknown = set(fields) - set(EXCEPTION_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown exception fields: {sorted(unknown)}")
+        
+        if fields.get('shift_type') is not None and not isinstance(fields['shift_type'],
+                                                                    self.shift_enum):
+            fields['shift_type'] = self.shift_enum(fields['shift_type'])
+        if not fields.get('is_removed') and fields.get('shift_type') is None:
+            raise ValueError("An exception needs a shift_type unless is_removed")
+        
+        exception = self.ScheduleException.query.filter_by(
+            employee_id=employee_id, date=day
+        ).first()
+        if exception is None:
+            exception = self.ScheduleException(employee_id=employee_id, date=day)
+            self.db.session.add(exception)
+        for column in EXCEPTION_FIELDS:
+            if column in fields:
+                setattr(exception, column, fields[column])
+        exception.created_at = datetime.utcnow()
+        return exception
+    
+    def clear_exception(self, employee_id, day):
+        """Drop the deviation for (employee_id, day), if any; the caller commits."""
+        if not self.enabled:
+            return 0
+        return self.ScheduleException.query.filter_by(
+            employee_id=employee_id, date=day
+        ).delete(synchronize_session=False)
@@ -0,0 +1,260 @@
+from datetime import date, timedelta
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy.sql.elements import TextClause
+import re
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Bit 0 of every bitset is this date; earlier days count as not worked
+EPOCH = date(2000, 1, 1)
+
+# Other worker processes see schedule writes after this long
+CACHE_TTL_SECONDS = 300
+
+# Session.info key for employees whose schedules changed in the transaction
+PENDING_KEY = 'worked_day_index_pending'
+
+_bitsets = {}  # employee_id -> int, bit n set when EPOCH + n days is worked
+_cache_lock = threading.Lock()
+_cache_stamp = [time.monotonic()]
+_installed = set()
+
+
+def invalidate_worked_days(employee_ids=None):
+    """Drop cached bitsets for some employees, or all of them."""
+    with _cache_lock:
+        if employee_ids is None:
+            _bitsets.clear()
+            _cache_stamp[0] = time.monotonic()
+        else:
+            for employee_id in employee_ids:
+                _bitsets.pop(employee_id, None)
+
+
+def _bit(day):
+    return (day - EPOCH).days
+
+
+def _shift_down(bits, n):
+    """bits >> n; a negative n pads with the (unworked) days before EPOCH"""
+    return bits >> n if n >= 0 else bits << -n
+
+
+def _day_mask(day):
+    """The bit for one day; 0 before EPOCH, where nothing is worked"""
+    i = _bit(day)
+    return 1 << i if i >= 0 else 0
+
+
+class WorkedDayIndex:
+    """
+    Per-employee worked-day bitsets built from Schedule.
+    
+    Each employee's scheduled dates are packed into a Python int (one bit
+    per day), so run-length, rest-gap and next/previous shift questions are
+    answered with bit operations. Bitsets are cached per process and dropped
+    when that employee's Schedule rows are written.
+    
+    Writes are noticed when they go through a Session: ORM flushes, ORM
+    bulk statements and text() statements that write the schedule table.
+    Code writing Schedule on a raw connection or cursor must call
+    invalidate_worked_days() itself (engines/schedule_writer.py does);
+    other processes pick such writes up within CACHE_TTL_SECONDS.
+    """
+    
+    def __init__(self, db, models):
+        self.db = db
+        self.Schedule = models['Schedule']
+        self._install(self.Schedule)
+    
+    # ==========================================
+    # CACHE
+    # ==========================================
+    
+    def load(self, employee_ids):
+        """Make sure bitsets for these employees are cached (one query for misses)."""
+        with _cache_lock:
+            if time.monotonic() - _cache_stamp[0] > CACHE_TTL_SECONDS:
+                _bitsets.clear()
+                _cache_stamp[0] = time.monotonic()
+            missing = [e for e in set(employee_ids) if e not in _bitsets]
+        
+        if not missing:
+            return
+        
+        built = {employee_id: 0 for employee_id in missing}
+        rows = self.db.session.query(
+            self.Schedule.employee_id,
+            self.Schedule.date
+        ).filter(
+            self.Schedule.employee_id.in_(missing),
+            self.Schedule.date >= EPOCH
+        ).all()
+        for employee_id, day in rows:
+            built[employee_id] |= 1 << _bit(day)
+        
+        with _cache_lock:
+            _bitsets.update(built)
+    
+    def bits(self, employee_id):
+        """Worked-day bitset for one employee."""
+        bits = _bitsets.get(employee_id)
+        if bits is None:
+            self.load([employee_id])
+            bits = _bitsets.get(employee_id, 0)
+        return bits
+    
+    # ==========================================
+    # QUERIES
+    # ==========================================
+    
+    def is_worked(self, employee_id, day):
+        return bool(self.bits(employee_id) & _day_mask(day))
+    
+    def days_before(self, employee_id, check_date, bits=None):
+        """Consecutive worked days immediately before check_date."""
+        bits = self.bits(employee_id) if bits is None else bits
+        i = max(_bit(check_date), 0)
+        off_below = ~bits & ((1 << i) - 1)
+        if not off_below:
+            return i
+        return i - off_below.bit_length()
+    
+    def days_after(self, employee_id, check_date, bits=None):
+        """Consecutive worked days immediately after check_date."""
+        bits = self.bits(employee_id) if bits is None else bits
+        above = _shift_down(bits, _bit(check_date) + 1)
+        return (~above & (above + 1)).bit_length() - 1
+    
+    def run_length(self, employee_id, check_date, bits=None):
+        """Consecutive days worked if check_date is worked too."""
+        bits = self.bits(employee_id) if bits is None else bits
+        return (self.days_before(employee_id, check_date, bits) + 1 +
+                self.days_after(employee_id, check_date, bits))
+    
+    def next_worked(self, employee_id, after_date, bits=None):
+        """First scheduled date after after_date, or None."""
+        bits = self.bits(employee_id) if bits is None else bits
+        i = _bit(after_date) + 1
+        above = _shift_down(bits, i)
+        if not above:
+            return None
+        return EPOCH + timedelta(days=i + (above & -above).bit_length() - 1)
+    
+    def previous_worked(self, employee_id, before_date, bits=None):
+        """Last scheduled date before before_date, or None."""
+        bits = self.bits(employee_id) if bits is None else bits
+        below = bits & ((1 << max(_bit(before_date), 0)) - 1)
+        if not below:
+            return None
+        return EPOCH + timedelta(days=below.bit_length() - 1)
+    
+    def rest_gap(self, employee_id, check_date, bits=None):
+        """
+        Days off on either side of check_date as (before, after); None where
+        there is no scheduled shift on that side.
+        """
+        previous_day = self.previous_worked(employee_id, check_date, bits)
+        next_day = self.next_worked(employee_id, check_date, bits)
+        return (
+            (check_date - previous_day).days - 1 if previous_day else None,
+            (next_day - check_date).days - 1 if next_day else None
+        )
+    
+    def count_worked(self, employee_id, start_date, end_date, bits=None):
+        """Scheduled days between two dates, inclusive."""
+        bits = self.bits(employee_id) if bits is None else bits
+        width = (end_date - start_date).days + 1
+        if width <= 0:
+            return 0
+        return bin(_shift_down(bits, _bit(start_date)) & ((1 << width) - 1)).count('1')
+    
+    def check_swap(self, employee_a, date_a, employee_b, date_b, max_consecutive=14):
+        """
+        Problems with employee_a working date_b instead of date_a, and
+        employee_b working date_a instead of date_b.
+        """
+        self.load([employee_a, employee_b])
+        issues = []
+        
+        for employee_id, gives, takes in ((employee_a, date_a, date_b),
+                                          (employee_b, date_b, date_a)):
+            bits = self.bits(employee_id) & ~_day_mask(gives)
+            if bits & _day_mask(takes):
+                issues.append({
+                    'employee_id': employee_id,
+                    'date': takes,
+                    'issue': 'Already scheduled on that date'
+                })
+                continue
+            
+            run = self.run_length(employee_id, takes, bits)
+            if run > max_consecutive:
+                issues.append({
+                    'employee_id': employee_id,
+                    'date': takes,
+                    'issue': f'Would work {run} consecutive days (limit {max_consecutive})'
+                })
+        
+        return issues
+    
+    # ==========================================
+    # INVALIDATION
+    # ==========================================
+    
+    @staticmethod
+    def _install(Schedule):
+        """Drop cached bitsets whenever Schedule rows are written (once per class)."""
+        if Schedule in _installed:
+            return
+        _installed.add(Schedule)
+        
+        def row_written(mapper, connection, target):
+            employee_ids = {target.employee_id}
+            employee_ids.update(inspect(target).attrs.employee_id.history.deleted or ())
+            employee_ids.discard(None)
+            invalidate_worked_days(employee_ids)
+            
+            # Drop them again once the transaction ends, in case another
+            # request cached the pre-commit state in the meantime
+            session = object_session(target)
+            if session is not None:
+                pending = session.info.setdefault(PENDING_KEY, set())
+                if pending is not None:  # None means "everything"
+                    pending.update(employee_ids)
+        
+        for name in ('after_insert', 'after_update', 'after_delete'):
+            event.listen(Schedule, name, row_written)
+        
+        writes_schedule = re.compile(
+            r'\b(insert\s+into|update|delete\s+from|truncate(\s+table)?|'
+            r'drop\s+table(\s+if\s+exists)?)\s+"?%s"?(\s|;|$)' % re.escape(Schedule.__tablename__),
+            re.IGNORECASE
+        )
+        
+        def bulk_statement(orm_execute_state):
+            statement = orm_execute_state.statement
+            if isinstance(statement, TextClause):
+                written = bool(writes_schedule.search(statement.text))
+            elif (orm_execute_state.is_insert or orm_execute_state.is_update or
+                  orm_execute_state.is_delete):
+                table = getattr(statement, 'table', None)
+                written = getattr(table, 'name', None) == Schedule.__tablename__
+            else:
+                written = False
+            if written:
+                invalidate_worked_days()
+                orm_execute_state.session.info[PENDING_KEY] = None
+        
+        def transaction_ended(session):
+            if PENDING_KEY not in session.info:
+                return
+            invalidate_worked_days(session.info.pop(PENDING_KEY))
+        
+        event.listen(Session, 'do_orm_execute', bulk_statement)
+        event.listen(Session, 'after_commit', transaction_ended)
+        event.listen(Session, 'after_soft_rollback', lambda session, previous: transaction_ended(session))
@@ -72,22 +72,36 @@ class Employee(UserMixin, db.Model):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)  # FIXED: This line was incomplete!
     
+    def _overtime_totals(self):
+        """
+        Rolling overtime totals: attached by a listing through
+        OvertimeRollupMaintainer.attach_totals(), else looked up once for
+        this employee
+        """
+        totals = getattr(self, 'overtime_totals', None)
+        if totals is None:
+            from engines.overtime_rollup import OvertimeRollupMaintainer
+            totals = OvertimeRollupMaintainer(db, {
+                'OvertimeHistory': OvertimeHistory,
+                'OvertimeRollup': OvertimeRollup
+            }).get_totals([self.id])[self.id]
+            self.overtime_totals = totals
+        return totals
+    
     @property
     def current_overtime_hours(self):
         """Get overtime hours for current period"""
-        if hasattr(self, 'overtime_histories'):
-            current = self.overtime_histories.filter_by(is_current=True).first()
-            return current.total_hours if current else 0
-        return 0
+        return self._overtime_totals()['current_total_hours']
     
     @property
     def average_overtime_hours(self):
         """Get 13-week average overtime"""
-        if hasattr(self, 'overtime_histories'):
-            histories = self.overtime_histories.limit(13).all()
-            if histories:
-                return sum(h.total_hours for h in histories) / len(histories)
-        return 0
+        return self._overtime_totals()['average_total_hours']
+    
+    @property
+    def last_13_weeks_overtime(self):
+        """Overtime hours worked in the last 13 weeks"""
+        return self._overtime_totals()['overtime_hours']
 
 class Position(db.Model):
     """Job positions/roles - FIXED to match actual database schema"""
@@ -311,8 +325,20 @@ class OvertimeHistory(db.Model):
     # Unique constraint
     __table_args__ = (
         db.UniqueConstraint('employee_id', 'week_ending', name='_employee_week_uc'),
+        db.Index('ix_overtime_history_week_start', 'week_start_date'),
     )
 
+class OvertimeRollup(db.Model):
+    """Rolling 13-week overtime totals per employee (maintained by engines/overtime_rollup.py)"""
+    id = db.Column(db.Integer, primary_key=True)
+    employee_id = db.Column(db.Integer, db.ForeignKey('employee.id'), nullable=False, unique=True)
+    as_of = db.Column(db.Date, nullable=False)  # Window is the 13 weeks before this date
+    overtime_hours_13w = db.Column(db.Float, default=0)
+    total_hours_13w = db.Column(db.Float, default=0)
+    weeks_13w = db.Column(db.Integer, default=0)
+    current_total_hours = db.Column(db.Float, default=0)  # From the is_current week
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class CoverageGap(db.Model):
     """Identified coverage gaps"""
     id = db.Column(db.Integer, primary_key=True)
@@ -322,6 +348,13 @@ class CoverageGap(db.Model):
     required_count = db.Column(db.Integer, default=1)
     scheduled_count = db.Column(db.Integer, default=0)
     
+    # Materialized counts (maintained by engines/coverage_gap_maintainer.py)
+    available_count = db.Column(db.Integer, default=0)  # On-roster for crews on duty
+    absent_count = db.Column(db.Integer, default=0)     # Approved time off
+    gap_count = db.Column(db.Integer, default=0)
+    crews_on_duty = db.Column(db.String(10))            # e.g. "AB"
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
     # Status
     is_filled = db.Column(db.Boolean, default=False)
     filled_by_id = db.Column(db.Integer, db.ForeignKey('employee.id'))
@@ -329,6 +362,17 @@ class CoverageGap(db.Model):
     # Relationships
     position = db.relationship('Position', backref='coverage_gaps')
     filled_by = db.relationship('Employee')
+    
+    # One row per (position, date, shift) cell
+    __table_args__ = (
+        db.Index('uq_coverage_gap_cell', 'position_id', 'date', 'shift_type', unique=True),
+    )
+
+class CoverageGapWindow(db.Model):
+    """How far ahead coverage_gap has been computed (a single row)"""
+    id = db.Column(db.Integer, primary_key=True)
+    materialized_through = db.Column(db.Date)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 # ==========================================
 # SCHEDULE PREFERENCES MODEL
@@ -644,8 +688,96 @@ class Availability(db.Model):
 
 # Additional placeholder models to prevent import errors
 class ShiftPattern(db.Model):
+    """Generated shift patterns; the latest active one drives the crew calendar"""
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100))
+    pattern_key = db.Column(db.String(50))  # utils/pattern_library.PATTERNS key
+    cycle_days = db.Column(db.Integer)
+    start_date = db.Column(db.Date)
+    end_date = db.Column(db.Date)
+    is_active = db.Column(db.Boolean, default=False)
+    is_virtual = db.Column(db.Boolean, default=False)  # Computed on read, not stored in schedule
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ScheduleException(db.Model):
+    """Deviations from a virtual rotation (read through engines/virtual_schedule.py)"""
+    id = db.Column(db.Integer, primary_key=True)
+    employee_id = db.Column(db.Integer, db.ForeignKey('employee.id'), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    
+    # The shift worked instead of the rotation's, unless is_removed
+    shift_type = db.Column(db.Enum(ShiftType))
+    start_time = db.Column(db.Time)
+    end_time = db.Column(db.Time)
+    hours = db.Column(db.Float)
+    position_id = db.Column(db.Integer, db.ForeignKey('position.id'))
+    is_overtime = db.Column(db.Boolean, default=False)
+    is_training = db.Column(db.Boolean, default=False)
+    is_removed = db.Column(db.Boolean, default=False)  # Off although the rotation works
+    reason = db.Column(db.String(50))  # overtime, swap, training, removed, ...
+    
+    created_by_id = db.Column(db.Integer, db.ForeignKey('employee.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.UniqueConstraint('employee_id', 'date', name='_exception_employee_date_uc'),
+    )
+
+class ScheduleGenerationRun(db.Model):
+    """Checkpoint of a pattern generated in committed chunks (PatternGenerator.generate_stream)"""
+    id = db.Column(db.Integer, primary_key=True)
+    pattern_key = db.Column(db.String(50), nullable=False)
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=False)
+    next_date = db.Column(db.Date)  # First date not yet committed; None when completed
+    chunk_days = db.Column(db.Integer, default=28)
+    replace_existing = db.Column(db.Boolean, default=False)
+    rows_written = db.Column(db.Integer, default=0)
+    
+    # Status: running, completed, failed
+    status = db.Column(db.String(20), default='running', nullable=False)
+    error = db.Column(db.Text)
+    
+    created_by_id = db.Column(db.Integer, db.ForeignKey('employee.id'))
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    completed_at = db.Column(db.DateTime)
+
+class BackgroundJob(db.Model):
+    """Long-running work run by engines/job_runner.py workers"""
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)  # Handler name, e.g. 'pattern', 'pitman'
+    params = db.Column(db.JSON)
+    
+    # Status: queued, running, completed, failed
+    status = db.Column(db.String(20), default='queued', nullable=False)
+    progress = db.Column(db.Float, default=0)  # Percent
+    message = db.Column(db.String(200))
+    result = db.Column(db.JSON)
+    error = db.Column(db.Text)
+    claim_token = db.Column(db.String(32))
+    
+    created_by_id = db.Column(db.Integer, db.ForeignKey('employee.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_background_job_status', 'status', 'created_at'),
+    )
+
+class CrewDutyCalendar(db.Model):
+    """Crews on duty per date and shift, derived from generated patterns"""
+    id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.Date, nullable=False)
+    shift_type = db.Column(db.String(20), nullable=False)  # day, evening, night
+    crews = db.Column(db.String(10), default='')  # e.g. 'AB'
+    pattern_id = db.Column(db.Integer, db.ForeignKey('shift_pattern.id'))
+    
+    __table_args__ = (
+        db.UniqueConstraint('date', 'shift_type', name='_crew_duty_date_shift_uc'),
+    )
 
 class OvertimeOpportunity(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -653,14 +785,27 @@ class OvertimeOpportunity(db.Model):
     position_id = db.Column(db.Integer, db.ForeignKey('position.id'))
     hours = db.Column(db.Float)
     status = db.Column(db.String(20), default='open')
+    shift_type = db.Column(db.String(20))  # day, evening, night
+    urgency = db.Column(db.String(20), default='standard')
+    urgent = db.Column(db.Boolean, default=False)
+    notes = db.Column(db.Text)
+    posted_by_id = db.Column(db.Integer, db.ForeignKey('employee.id'))
+    posted_at = db.Column(db.DateTime, default=datetime.utcnow)
+    response_deadline = db.Column(db.DateTime)
+    notified_employees = db.Column(db.Text)  # JSON list
+    filled_by_id = db.Column(db.Integer, db.ForeignKey('employee.id'))
+    filled_at = db.Column(db.DateTime)
 
 class OvertimeResponse(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     opportunity_id = db.Column(db.Integer)
 
 class PositionCoverage(db.Model):
+    """Minimum headcount per position and shift (read by the coverage engines)"""
     id = db.Column(db.Integer, primary_key=True)
     position_id = db.Column(db.Integer)
+    shift_type = db.Column(db.String(20), default='day')  # day, evening, night
+    min_required = db.Column(db.Integer, default=1)
 
 class FatigueTracking(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -673,6 +818,38 @@ class MandatoryOvertimeLog(db.Model):
 class CoverageNotification(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     employee_id = db.Column(db.Integer)
+    coverage_request_id = db.Column(db.Integer)  # OvertimeOpportunity / CoverageRequest id
+    notification_type = db.Column(db.String(50))
+    sent_to_type = db.Column(db.String(20))  # individual, crew, position
+    sent_to_employee_id = db.Column(db.Integer, db.ForeignKey('employee.id'))
+    sent_by_id = db.Column(db.Integer, db.ForeignKey('employee.id'))
+    message = db.Column(db.Text)
+    sent_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class NotificationOutbox(db.Model):
+    """Notifications waiting to be delivered (drained by engines/notification_outbox.py)"""
+    id = db.Column(db.Integer, primary_key=True)
+    recipient_id = db.Column(db.Integer, db.ForeignKey('employee.id'), nullable=False)
+    sent_by_id = db.Column(db.Integer, db.ForeignKey('employee.id'))
+    coverage_request_id = db.Column(db.Integer)
+    notification_type = db.Column(db.String(50), default='overtime')
+    subject = db.Column(db.String(200))
+    message = db.Column(db.Text, nullable=False)
+    
+    # Delivery state: pending, sending, sent, failed
+    status = db.Column(db.String(20), default='pending', nullable=False)
+    attempts = db.Column(db.Integer, default=0)
+    last_error = db.Column(db.Text)
+    claim_token = db.Column(db.String(32))
+    claimed_at = db.Column(db.DateTime)
+    available_at = db.Column(db.DateTime, default=datetime.utcnow)  # Retry backoff
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_notification_outbox_status', 'status', 'available_at'),
+    )
 
 class CoverageNotificationResponse(db.Model):
     id = db.Column(db.Integer, primary_key=True)
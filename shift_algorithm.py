@@ -8,6 +8,8 @@ from dataclasses import dataclass, field
 from typing import List, Dict, Tuple, Optional
 from enum import Enum
 import math
+import time
+import numpy as np
 from datetime import datetime, timedelta
 
 # ==========================================
@@ -22,6 +24,12 @@ TARGET_WORK_WEEK = 42  # Actual average for 24/7 coverage with 4 crews
 OVERTIME_THRESHOLD = 40  # Hours before overtime kicks in
 OVERTIME_MULTIPLIER = 1.5
 
+# Preference scoring: tradeoffs in the order of a preference vector, the
+# most a pattern can score, and the share of it an employee accepts
+PREFERENCE_KEYS = ["shift_length", "work_stretch", "weekend_distribution", "rotation_type"]
+MAX_PATTERN_SCORE = 45
+ACCEPTANCE_THRESHOLD = 0.6
+
 @dataclass
 class ShiftConstants:
     """Fundamental constraints based on shift length"""
@@ -412,6 +420,270 @@ class PatternAnalyzer:
             "is_fair": (max(work_hours) - min(work_hours)) < 2
         }
 
+# ==========================================
+# PATTERN SEARCH
+# ==========================================
+
+class PatternSearch:
+    """
+    Synthesizes rotating crew patterns: every crew works the same base
+    cycle of work/off days, staggered by its own offset.
+    
+    Base cycles are built run by run (work stretch, off stretch) with the
+    stretch limits and days-on count pruned as they grow; offsets whose
+    calendar weeks break the weekly hours cap are dropped up front.
+    Rotations of a base cycle are the same pattern, so only the canonical
+    rotation is kept. Crews are interchangeable, so offsets are chosen in
+    increasing order, and the offset search memoizes which partial
+    coverage vectors can still be completed. A base cycle must pass
+    PatternRule.validate_consecutive_shifts.
+    """
+    
+    def __init__(self, shift_length: int, cycle_days: int, crews: int,
+                 crews_per_day: Optional[int] = None,
+                 max_consecutive: Optional[int] = None,
+                 min_work_stretch: int = 2, min_off_stretch: int = 2,
+                 max_off_stretch: int = 7,
+                 max_weekly_hours: Optional[float] = None,
+                 allow_overstaffing: bool = False):
+        if not isinstance(cycle_days, int) or cycle_days < 7 or cycle_days % 7:
+            raise ValueError("Cycle length must be a whole number of weeks")
+        if shift_length not in (8, 12):
+            raise ValueError("Shift length must be 8 or 12 hours")
+        if not isinstance(crews, int) or crews < 1:
+            raise ValueError("Number of crews must be at least 1")
+        if crews_per_day is not None and (not isinstance(crews_per_day, int) or crews_per_day < 1):
+            raise ValueError("Crews per day must be at least 1")
+        if max_consecutive is not None and max_consecutive < 1:
+            raise ValueError("Maximum consecutive shifts must be at least 1")
+        if max_weekly_hours is not None and max_weekly_hours <= 0:
+            raise ValueError("Maximum weekly hours must be positive")
+        
+        self.shift_type = f"{shift_length}-hour"
+        constants = ShiftConstants.for_8_hour() if shift_length == 8 else ShiftConstants.for_12_hour()
+        
+        self.shift_length = shift_length
+        self.cycle_days = cycle_days
+        self.crews = crews
+        # Crews needed each day for 24/7 coverage: one per shift
+        self.crews_per_day = crews_per_day or 24 // shift_length
+        self.max_work = min(max_consecutive or constants.max_consecutive_shifts,
+                            constants.max_consecutive_shifts)
+        self.min_work = max(1, min_work_stretch)
+        self.min_off = max(1, min_off_stretch)
+        self.max_off = max(self.min_off, max_off_stretch)
+        self.max_weekly_hours = max_weekly_hours or max(constants.typical_pattern_weeks)
+        self.allow_overstaffing = allow_overstaffing
+        
+        self.nodes = 0
+        self.deadline = None
+    
+    @property
+    def days_on(self) -> Optional[int]:
+        """
+        Work days per crew per cycle; None if crews cannot share the load
+        evenly (with overstaffing allowed, rounded up instead)
+        """
+        total = self.cycle_days * self.crews_per_day
+        if self.allow_overstaffing:
+            return -(-total // self.crews)
+        return total // self.crews if total % self.crews == 0 else None
+    
+    def _tick(self):
+        """Count a search node; stop the search once past the deadline"""
+        self.nodes += 1
+        if self.deadline and self.nodes % 4096 == 0 and time.monotonic() > self.deadline:
+            raise SearchTimeout()
+    
+    # ------------------------------------------
+    # Base cycles
+    # ------------------------------------------
+    
+    def base_cycles(self):
+        """Canonical base cycles: start on a work stretch, end on an off stretch"""
+        days_on = self.days_on
+        if days_on is None or not self.crews_per_day <= self.crews:
+            return
+        cycle = []
+        
+        def extend(on_left):
+            self._tick()
+            remaining = self.cycle_days - len(cycle)
+            if remaining == 0:
+                if on_left == 0:
+                    yield tuple(cycle)
+                return
+            off_left = remaining - on_left
+            working = bool(cycle) and cycle[-1] == 0 or not cycle
+            if working:
+                # Next stretch is work; at least one off stretch must follow
+                for run in range(self.min_work, min(self.max_work, on_left) + 1):
+                    if off_left < self.min_off:
+                        break
+                    cycle.extend([1] * run)
+                    yield from extend(on_left - run)
+                    del cycle[-run:]
+            else:
+                for run in range(self.min_off, min(self.max_off, off_left) + 1):
+                    # Either the cycle ends here or a work stretch fits after it
+                    rest = off_left - run
+                    if rest == 0 and on_left:
+                        continue
+                    if on_left and on_left < self.min_work:
+                        break
+                    if rest and not on_left:
+                        continue
+                    cycle.extend([0] * run)
+                    yield from extend(on_left)
+                    del cycle[-run:]
+        
+        for base in extend(days_on):
+            if self._is_canonical(base):
+                valid, _ = PatternRule.validate_consecutive_shifts(list(base), self.shift_type)
+                if valid:
+                    yield base
+    
+    @staticmethod
+    def _is_canonical(base: Tuple[int, ...]) -> bool:
+        """Keep one rotation per cycle: the lexicographically largest"""
+        doubled = base + base
+        n = len(base)
+        return all(doubled[r:r + n] <= base for r in range(1, n))
+    
+    @staticmethod
+    def _period(base: Tuple[int, ...]) -> int:
+        """Shortest repeat of the cycle (offsets that differ by it are the same crew)"""
+        n = len(base)
+        for p in range(1, n + 1):
+            if n % p == 0 and base[p:] == base[:-p]:
+                return p
+        return n
+    
+    # ------------------------------------------
+    # Crew offsets
+    # ------------------------------------------
+    
+    def offsets(self, base: Tuple[int, ...]):
+        """Increasing crew offsets that give the required coverage every day"""
+        n = self.cycle_days
+        target = self.crews_per_day
+        max_week_shifts = int(self.max_weekly_hours // self.shift_length)
+        
+        # Crew with offset o works base[(d + o) % n] on day d; offsets whose
+        # calendar weeks exceed the weekly hours cap are never placed. Rows
+        # are bitmasks, bit d set when the crew works day d.
+        masks = []
+        for o in range(self._period(base)):
+            row = [base[(d + o) % n] for d in range(n)]
+            if all(sum(row[w:w + 7]) <= max_week_shifts for w in range(0, n, 7)):
+                masks.append((o, sum(1 << d for d, day in enumerate(row) if day)))
+        full = (1 << n) - 1
+        memo = {}
+        
+        def complete(k, start, layers):
+            """
+            Offset tuples for crews k.. (memoized). layers[j] is the bitmask
+            of days already covered by more than j crews.
+            """
+            key = (k, start, layers)
+            if key in memo:
+                return memo[key]
+            self._tick()
+            left = self.crews - k
+            if left == 0:
+                result = [()] if layers[target - 1] == full else []
+                memo[key] = result
+                return result
+            
+            # Days still short after this crew must be coverable by the rest
+            need = target - (left - 1)
+            result = []
+            for i in range(start, len(masks) - left + 1):
+                o, row = masks[i]
+                # Exact coverage: no day above target
+                if not self.allow_overstaffing and row & layers[target - 1]:
+                    continue
+                new = tuple(
+                    layers[j] | (row & (layers[j - 1] if j else full)) for j in range(target)
+                )
+                if need > 0 and new[need - 1] != full:
+                    continue
+                for rest in complete(k + 1, i + 1, new):
+                    result.append((o,) + rest)
+            memo[key] = result
+            return result
+        
+        return complete(0, 0, (0,) * target)
+    
+    # ------------------------------------------
+    # Results
+    # ------------------------------------------
+    
+    def pattern(self, base: Tuple[int, ...], offsets: Tuple[int, ...]) -> Dict:
+        """Pattern dict in the CommonPatterns format"""
+        n = self.cycle_days
+        crews = {
+            f"Crew {chr(ord('A') + k)}": [base[(d + o) % n] for d in range(n)]
+            for k, o in enumerate(offsets)
+        }
+        
+        weeks = n // 7
+        weekends_off = [
+            sum(1 for w in range(weeks) if crew[w * 7 + 5] == 0 and crew[w * 7 + 6] == 0)
+            for crew in crews.values()
+        ]
+        if all(2 * off == weeks for off in weekends_off):
+            weekends = "Every other weekend"
+        else:
+            weekends = f"{min(weekends_off)}-{max(weekends_off)} of {weeks} weekends"
+        
+        # Work stretches of the base cycle, e.g. 2-2-3
+        stretches, run = [], 0
+        for day in base:
+            if day:
+                run += 1
+            elif run:
+                stretches.append(run)
+                run = 0
+        
+        return {
+            "name": f"Custom {'-'.join(map(str, stretches))} ({n}-day)",
+            "shift_length": self.shift_length,
+            "cycle_days": n,
+            "pattern": crews,
+            "features": {
+                "max_consecutive": max(stretches),
+                "weekends_off": weekends,
+                "weekends_off_per_crew": weekends_off,
+                "avg_hours_week": sum(base) * self.shift_length / weeks,
+                "base_cycle": list(base),
+                "offsets": list(offsets)
+            }
+        }
+    
+    @staticmethod
+    def signature(pattern: Dict) -> Tuple:
+        """Crew rows cut to their shortest whole-week repeat, in crew-independent order"""
+        rows = [tuple(row) for row in pattern["pattern"].values()]
+        n = len(rows[0])
+        weeks = next(p for p in range(7, n + 1, 7)
+                     if n % p == 0 and all(row[p:] == row[:-p] for row in rows))
+        return (pattern["shift_length"], tuple(sorted(row[:weeks] for row in rows)))
+    
+    def search(self, deadline: Optional[float] = None):
+        """Yield every pattern satisfying the constraints (until deadline)"""
+        self.deadline = deadline
+        try:
+            for base in self.base_cycles():
+                for offsets in self.offsets(base):
+                    yield self.pattern(base, offsets)
+        except SearchTimeout:
+            return
+
+
+class SearchTimeout(Exception):
+    """PatternSearch ran past its deadline"""
+
 # ==========================================
 # MAIN ALGORITHM
 # ==========================================
@@ -456,45 +728,218 @@ class ShiftPatternAlgorithm:
     
     def _score_pattern(self, pattern: Dict) -> float:
         """Score a pattern based on current preferences"""
-        score = 0
+        constant, weights = self._score_terms(pattern)
+        return constant + sum(
+            weight * self.tradeoffs.tradeoffs[key].current_value for key, weight in weights.items()
+        )
+    
+    @staticmethod
+    def _score_terms(pattern: Dict) -> Tuple[float, Dict[str, float]]:
+        """
+        A pattern's score as constant + sum(weight * preference value):
+        each tradeoff adds value * 10 toward option B or (1 - value) * 10
+        toward option A
+        """
+        constant = 0.0
+        weights = {key: 0.0 for key in PREFERENCE_KEYS}
+        
+        def prefer(key, option_b):
+            nonlocal constant
+            if option_b:
+                weights[key] += 10
+            else:
+                constant += 10
+                weights[key] -= 10
         
         # Shift length preference
-        shift_pref = self.tradeoffs.tradeoffs["shift_length"].current_value
-        if pattern["shift_length"] == 12:
-            score += shift_pref * 10
-        else:
-            score += (1 - shift_pref) * 10
+        prefer("shift_length", pattern["shift_length"] == 12)
         
         # Weekend preference
         if "Every other" in pattern.get("features", {}).get("weekends_off", ""):
-            score += 15  # Most people prefer this
+            constant += 15  # Most people prefer this
         
         # Work stretch preference
         max_consecutive = pattern.get("features", {}).get("max_consecutive", 5)
-        if max_consecutive <= 3:
-            score += (1 - self.tradeoffs.tradeoffs["work_stretch"].current_value) * 10
-        else:
-            score += self.tradeoffs.tradeoffs["work_stretch"].current_value * 10
+        prefer("work_stretch", max_consecutive > 3)
         
         # Rotation preference
-        if "fixed" in pattern["name"].lower():
-            score += (1 - self.tradeoffs.tradeoffs["rotation_type"].current_value) * 10
-        else:
-            score += self.tradeoffs.tradeoffs["rotation_type"].current_value * 10
+        prefer("rotation_type", "fixed" not in pattern["name"].lower())
         
-        return score
+        return constant, weights
     
-    def generate_custom_pattern(self, requirements: Dict) -> Dict:
-        """Generate a custom pattern based on specific requirements"""
-        # This would implement the full generation logic
-        # For now, return a template
+    # ------------------------------------------
+    # Workforce scoring
+    # ------------------------------------------
+    
+    def score_matrix(self, preferences: np.ndarray, patterns: Optional[Dict] = None) -> np.ndarray:
+        """
+        Scores of every pattern for every employee
+        
+        Args:
+            preferences: (employees x PREFERENCE_KEYS) array of 0-1 values
+            patterns: name -> pattern dict (default: the pattern library)
+        
+        Returns:
+            (employees x patterns) array, patterns in dict order
+        """
+        patterns = patterns or self.patterns
+        terms = [self._score_terms(pattern) for pattern in patterns.values()]
+        constants = np.array([constant for constant, _ in terms])
+        weights = np.array([[w[key] for key in PREFERENCE_KEYS] for _, w in terms]).T
+        return np.asarray(preferences, dtype=float).reshape(-1, len(PREFERENCE_KEYS)) @ weights + constants
+    
+    def score_workforce(self, preferences: np.ndarray, groups: Optional[Dict[str, List]] = None,
+                        patterns: Optional[Dict] = None,
+                        threshold: float = ACCEPTANCE_THRESHOLD) -> Dict:
+        """
+        Satisfaction with every pattern across a workforce
+        
+        Args:
+            preferences: (employees x PREFERENCE_KEYS) array of 0-1 values
+            groups: grouping name -> label per employee, e.g.
+                {"crew": [...], "site": [...]}
+            patterns: name -> pattern dict (default: the pattern library)
+            threshold: satisfaction (score / MAX_PATTERN_SCORE) at which
+                an employee accepts a pattern
+        
+        Returns:
+            Satisfaction distribution per pattern overall and per group
+            label, and the pattern with the highest acceptance
+        """
+        patterns = patterns or self.patterns
+        names = list(patterns)
+        satisfaction = self.score_matrix(preferences, patterns) / MAX_PATTERN_SCORE
+        
+        result = {
+            "employees": len(satisfaction),
+            "patterns": names,
+            "threshold": threshold,
+            "overall": self._satisfaction_distribution(satisfaction, names, threshold)
+        }
+        
+        for group, labels in (groups or {}).items():
+            labels = np.asarray([str(label) if label else "Unassigned" for label in labels])
+            result[f"by_{group}"] = {
+                label: self._satisfaction_distribution(satisfaction[labels == label], names, threshold)
+                for label in np.unique(labels).tolist()
+            }
+        
+        overall = result["overall"]
+        result["best_pattern"] = max(
+            names, key=lambda name: (overall[name]["acceptance"], overall[name]["mean"])
+        ) if len(satisfaction) else None
+        return result
+    
+    @staticmethod
+    def _satisfaction_distribution(satisfaction: np.ndarray, names: List[str],
+                                   threshold: float) -> Dict:
+        """Per pattern: mean, quartiles, acceptance rate and a 10-bin histogram"""
+        if not len(satisfaction):
+            return {name: {"count": 0, "mean": 0.0, "median": 0.0, "p25": 0.0, "p75": 0.0,
+                           "acceptance": 0.0, "histogram": [0] * 10} for name in names}
+        
+        p25, median, p75 = np.percentile(satisfaction, [25, 50, 75], axis=0)
+        mean = satisfaction.mean(axis=0)
+        acceptance = (satisfaction >= threshold).mean(axis=0)
+        bins = np.clip((satisfaction * 10).astype(int), 0, 9)
+        
         return {
-            "name": "Custom Generated",
-            "shift_length": requirements.get("shift_length", 8),
-            "cycle_days": 28,
-            "pattern": {},  # Would be generated
-            "features": {}
+            name: {
+                "count": len(satisfaction),
+                "mean": round(float(mean[i]), 3),
+                "median": round(float(median[i]), 3),
+                "p25": round(float(p25[i]), 3),
+                "p75": round(float(p75[i]), 3),
+                "acceptance": round(float(acceptance[i]), 3),
+                "histogram": np.bincount(bins[:, i], minlength=10).tolist()
+            }
+            for i, name in enumerate(names)
         }
+    
+    def generate_custom_pattern(self, requirements: Dict) -> Dict:
+        """
+        Generate a custom pattern based on specific requirements
+        
+        requirements (each of the first three may be a value or a list to
+        search over):
+            shift_length: 8 or 12 (default 8)
+            cycle_days: whole weeks (default 28)
+            crews: number of crews (default 4)
+            crews_per_day, max_consecutive, min_work_stretch,
+            min_off_stretch, max_off_stretch, max_weekly_hours,
+            allow_overstaffing: PatternSearch constraints
+            limit: alternatives to return (default 5)
+            time_limit: seconds before the search stops (default 10)
+        
+        Returns the best pattern by _score_pattern (ties broken by
+        weekend fairness), with the runners-up under "alternatives".
+        """
+        def options(key, default):
+            value = requirements.get(key, default)
+            return list(value) if isinstance(value, (list, tuple)) else [value]
+        
+        constraints = {key: requirements[key] for key in (
+            "crews_per_day", "max_consecutive", "min_work_stretch", "min_off_stretch",
+            "max_off_stretch", "max_weekly_hours", "allow_overstaffing"
+        ) if key in requirements}
+        limit = requirements.get("limit", 5)
+        started = time.monotonic()
+        deadline = started + requirements.get("time_limit", 10)
+        
+        ranked = []
+        seen = set()
+        nodes = 0
+        for shift_length in options("shift_length", 8):
+            for cycle_days in options("cycle_days", 28):
+                for crews in options("crews", STANDARD_CREWS):
+                    engine = PatternSearch(shift_length, cycle_days, crews, **constraints)
+                    for pattern in engine.search(deadline):
+                        # The same rotation is also found at multiples of its cycle length
+                        signature = PatternSearch.signature(pattern)
+                        if signature in seen:
+                            continue
+                        seen.add(signature)
+                        
+                        weeks = cycle_days // 7
+                        fairness = [off / weeks for off in pattern["features"]["weekends_off_per_crew"]]
+                        ranked.append((
+                            -self._score_pattern(pattern),
+                            max(fairness) - min(fairness),
+                            -min(fairness),
+                            pattern["features"]["max_consecutive"],
+                            len(ranked),
+                            pattern
+                        ))
+                    nodes += engine.nodes
+        
+        ranked.sort(key=lambda entry: entry[:5])
+        search_info = {
+            "patterns_found": len(ranked),
+            "nodes": nodes,
+            "seconds": round(time.monotonic() - started, 2),
+            "complete": time.monotonic() <= deadline
+        }
+        
+        if not ranked:
+            return {
+                "name": "Custom Generated",
+                "shift_length": options("shift_length", 12)[0],
+                "cycle_days": options("cycle_days", 28)[0],
+                "pattern": {},
+                "features": {},
+                "error": "No pattern satisfies these requirements",
+                "search": search_info
+            }
+        
+        best = dict(ranked[0][-1])
+        best["score"] = -ranked[0][0]
+        best["alternatives"] = [
+            {"name": entry[-1]["name"], "score": -entry[0], "pattern": entry[-1]["pattern"],
+             "features": entry[-1]["features"]}
+            for entry in ranked[1:limit + 1]
+        ]
+        best["search"] = search_info
+        return best
 
 # ==========================================
 # USAGE EXAMPLE
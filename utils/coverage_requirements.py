@@ -0,0 +1,159 @@
+# utils/coverage_requirements.py
+"""
+Coverage requirements as arrays
+
+PositionCoverage (minimum per position and shift) and
+CrewCoverageRequirement (minimum per crew, shift and position while that
+crew is on duty) are loaded once into a RequirementMatrix. Generated
+schedules are then counted into a [date, shift, position] array and
+compared against it in one step, with no query per date or shift.
+"""
+
+from datetime import date, timedelta
+import numpy as np
+import logging
+
+from models import db, PositionCoverage, CrewCoverageRequirement
+
+logger = logging.getLogger(__name__)
+
+SHIFT_TYPES = ['day', 'evening', 'night']
+
+
+class RequirementMatrix:
+    """
+    position_minimum[s, p]: PositionCoverage.min_required
+    crew_minimum[c, s, p]: CrewCoverageRequirement.minimum_count
+    
+    A (date, shift, position) cell requires the larger of the position
+    minimum and the sum of the crew minimums of the crews on duty.
+    """
+    
+    def __init__(self, position_minimums=None, crew_minimums=None):
+        position_minimums = position_minimums or {}  # (position_id, shift) -> count
+        crew_minimums = crew_minimums or {}  # (crew, shift, position_id) -> count
+        
+        self.positions = sorted(
+            {p for p, _ in position_minimums} | {p for _, _, p in crew_minimums}
+        )
+        self.crews = sorted({c for c, _, _ in crew_minimums})
+        self.position_index = {p: i for i, p in enumerate(self.positions)}
+        self.crew_index = {c: i for i, c in enumerate(self.crews)}
+        shift_index = {s: i for i, s in enumerate(SHIFT_TYPES)}
+        
+        self.position_minimum = np.zeros((len(SHIFT_TYPES), len(self.positions)), dtype=np.int64)
+        for (position_id, shift), count in position_minimums.items():
+            if shift in shift_index:
+                self.position_minimum[shift_index[shift], self.position_index[position_id]] = count or 0
+        
+        self.crew_minimum = np.zeros(
+            (len(self.crews), len(SHIFT_TYPES), len(self.positions)), dtype=np.int64
+        )
+        for (crew, shift, position_id), count in crew_minimums.items():
+            if shift in shift_index:
+                self.crew_minimum[self.crew_index[crew], shift_index[shift],
+                                  self.position_index[position_id]] = count or 0
+    
+    @classmethod
+    def load(cls):
+        """Both requirement tables in two queries (empty if they cannot be read)"""
+        position_minimums = {}
+        crew_minimums = {}
+        try:
+            # First row per key, as CoverageGapDetectionEngine reads them
+            rows = db.session.query(
+                PositionCoverage.position_id, PositionCoverage.shift_type, PositionCoverage.min_required
+            ).filter(PositionCoverage.position_id.isnot(None)).order_by(PositionCoverage.id).all()
+            for position_id, shift, count in rows:
+                position_minimums.setdefault((position_id, shift), count)
+            
+            rows = db.session.query(
+                CrewCoverageRequirement.crew,
+                CrewCoverageRequirement.shift_type,
+                CrewCoverageRequirement.position_id,
+                CrewCoverageRequirement.minimum_count
+            ).all()
+            for crew, shift, position_id, count in rows:
+                crew_minimums[(crew, getattr(shift, 'value', shift), position_id)] = count
+        except Exception as e:
+            logger.warning(f"Could not load coverage requirements: {e}")
+            db.session.rollback()
+        
+        return cls(position_minimums, crew_minimums)
+    
+    def __bool__(self):
+        return bool(self.position_minimum.any() or self.crew_minimum.any())
+    
+    def evaluate(self, schedules, crew_by_employee):
+        """
+        Count schedules into the requirement grid
+        
+        Args:
+            schedules: Schedule objects (employee_id, date, shift_type, position_id)
+            crew_by_employee: employee id -> crew letter
+        
+        Returns:
+            (first date, scheduled, required, shifts used): scheduled and
+            required are [day offset, shift, position] arrays over
+            self.positions; shifts used flags the SHIFT_TYPES that appear
+            in the schedules at all.
+        """
+        if not schedules:
+            shape = (0, len(SHIFT_TYPES), len(self.positions))
+            return None, np.zeros(shape, dtype=np.int64), np.zeros(shape, dtype=np.int64), \
+                np.zeros(len(SHIFT_TYPES), dtype=bool)
+        
+        shift_index = {s: i for i, s in enumerate(SHIFT_TYPES)}
+        n = len(schedules)
+        days = np.empty(n, dtype=np.int64)
+        shifts = np.empty(n, dtype=np.int64)
+        positions = np.empty(n, dtype=np.int64)
+        crews = np.empty(n, dtype=np.int64)
+        for i, s in enumerate(schedules):
+            days[i] = s.date.toordinal()
+            shifts[i] = shift_index.get(getattr(s.shift_type, 'value', s.shift_type), -1)
+            positions[i] = self.position_index.get(s.position_id, -1)
+            crews[i] = self.crew_index.get(crew_by_employee.get(s.employee_id), -1)
+        
+        first = int(days.min())
+        days -= first
+        num_days = int(days.max()) + 1
+        
+        known = shifts >= 0
+        shifts_used = np.bincount(shifts[known], minlength=len(SHIFT_TYPES)) > 0
+        
+        scheduled = np.zeros((num_days, len(SHIFT_TYPES), len(self.positions)), dtype=np.int64)
+        staffed = known & (positions >= 0)
+        np.add.at(scheduled, (days[staffed], shifts[staffed], positions[staffed]), 1)
+        
+        # on_duty[d, s, c]: some member of crew c works shift s on day d
+        on_duty = np.zeros((num_days, len(SHIFT_TYPES), len(self.crews)), dtype=np.int64)
+        crewed = known & (crews >= 0)
+        on_duty[days[crewed], shifts[crewed], crews[crewed]] = 1
+        
+        required = np.maximum(
+            self.position_minimum[np.newaxis],
+            np.einsum('dsc,csp->dsp', on_duty, self.crew_minimum)
+        )
+        
+        first_date = date.fromordinal(first)
+        return first_date, scheduled, required, shifts_used
+    
+    def shortfalls(self, schedules, crew_by_employee):
+        """
+        Cells with fewer scheduled than required, by date, shift and
+        position; shifts the schedules never use are not checked.
+        """
+        first_date, scheduled, required, shifts_used = self.evaluate(schedules, crew_by_employee)
+        short = (scheduled < required) & shifts_used[np.newaxis, :, np.newaxis]
+        
+        return [
+            {
+                'date': first_date + timedelta(days=d),
+                'shift': SHIFT_TYPES[s],
+                'position_id': self.positions[p],
+                'scheduled': int(scheduled[d, s, p]),
+                'required': int(required[d, s, p])
+            }
+            for d, s, p in np.argwhere(short).tolist()
+        ]
@@ -0,0 +1,282 @@
+# utils/pattern_expansion.py
+"""
+Vectorized expansion of cyclic crew patterns
+
+A pattern is a CycleTable: one repeating list of shift codes per crew plus
+the crew's phase in it. Expanding it over a date range and a crew roster
+produces flat (employee_id, date, shift_code) arrays with NumPy tiling and
+fancy indexing; no per-day, per-employee Python loop runs and no ORM
+objects are built until the rows are persisted.
+
+CycleTables are normally compiled from declarative pattern definitions
+(see utils/pattern_library.py) with compile_pattern():
+
+    {
+        'name': 'Pitman 2-2-3',
+        'shift_length': '12-hour',          # key of pattern_library.SHIFT_TIMES
+        'anchor': 'monday',                 # optional: day 0 is the Monday on
+                                            # or before the start date
+        'crews': {
+            'A': {'cycle': 'XXOOXXXOOXXOOO', 'shift': 'D'},
+            'B': {'cycle': 'XXOOXXXOOXXOOO', 'shift': 'D', 'offset': 7},
+            'C': 'NNOONNNOONNOOO',          # plain string = {'cycle': ...}
+            'D': {'cycle': 'XXOOXXXOOXXOOO', 'rotation': 'ND', 'rotate_every': 14}
+        }
+    }
+
+Per crew, day c of the crew's own calendar (c = day - starts; the crew is
+off before it starts) works cycle[(c + offset) % len(cycle)]. Cycle
+letters are D, E, N, O (whitespace ignored); X days take the crew's fixed
+'shift' letter, or rotation[((c + rotation_offset) // rotate_every) %
+len(rotation)] for crews that rotate between shift types.
+"""
+
+from collections import namedtuple, defaultdict
+from datetime import timedelta
+from functools import reduce
+from math import gcd
+from types import MappingProxyType
+import threading
+import numpy as np
+
+# Shift codes; the same numbering as engines/fatigue_matrix.py
+SHIFT_CODES = {'O': 0, 'D': 1, 'E': 2, 'N': 3}
+SHIFT_TYPE_NAMES = {1: 'day', 2: 'evening', 3: 'night'}
+
+
+def parse_cycle(pattern):
+    """'DDNNOOOO' or ['D', 'D', ...] -> read-only int8 array of shift codes"""
+    codes = np.array([SHIFT_CODES[c] for c in pattern], dtype=np.int8)
+    codes.setflags(write=False)
+    return codes
+
+
+def overlay(work, shifts):
+    """
+    Combine a work/off cycle ('X' works, 'O' is off) with a same-length
+    string of shift letters, e.g. overlay('XXOO', 'DDDD') -> 'DDOO'.
+    """
+    if len(work) != len(shifts):
+        raise ValueError("Work and shift cycles must be the same length")
+    return ''.join(s if w == 'X' else 'O' for w, s in zip(work, shifts))
+
+
+class CrewCycle(namedtuple('CrewCycle', ['codes', 'phase', 'start_day'])):
+    """
+    One crew's repeating shift codes. Day d of a generated range works
+    codes[(d + phase) % len(codes)], or is off while d < start_day (crews
+    that join the rotation late).
+    """
+    
+    @classmethod
+    def of(cls, pattern, phase=0, start_day=0):
+        return cls(parse_cycle(pattern), phase, start_day)
+
+
+class CycleTable:
+    """Crew letter -> CrewCycle for one pattern (read-only once built)"""
+    
+    def __init__(self, crews, anchor=None):
+        self.crews = MappingProxyType(dict(crews))
+        self.anchor = anchor
+    
+    @property
+    def cycle_days(self):
+        """Days after which every crew is back at the same point"""
+        lengths = [len(cycle.codes) for cycle in self.crews.values()]
+        return reduce(lambda a, b: a * b // gcd(a, b), lengths, 1)
+    
+    def crew_codes(self, num_days, first_day=0):
+        """
+        Crew -> int8 array of the shift code worked on each of num_days
+        day offsets, counting from cycle day first_day.
+        """
+        days = np.arange(first_day, first_day + num_days)
+        result = {}
+        for crew, cycle in self.crews.items():
+            codes = cycle.codes[(days + cycle.phase) % len(cycle.codes)]
+            if cycle.start_day:
+                codes[days < cycle.start_day] = 0
+            result[crew] = codes
+        return result
+    
+    def first_day(self, start_date, origin=None):
+        """
+        Cycle day of start_date for a rotation that began on origin
+        (default start_date itself).
+        """
+        origin = origin or start_date
+        first_day = (start_date - origin).days
+        if self.anchor == 'monday':
+            first_day += origin.weekday()
+        return first_day
+    
+    def expand(self, crew_members, start_date, end_date, origin=None):
+        """
+        ExpandedSchedule for crew_members (crew -> list of employee ids)
+        from start_date to end_date inclusive. origin is the date the
+        rotation began, for expanding one window of a longer range.
+        """
+        num_days = (end_date - start_date).days + 1
+        crew_codes = self.crew_codes(num_days, self.first_day(start_date, origin))
+        
+        employee_parts, day_parts, code_parts = [], [], []
+        for crew, members in crew_members.items():
+            if crew not in crew_codes or not members:
+                continue
+            codes = crew_codes[crew]
+            worked = np.flatnonzero(codes)
+            members = np.asarray(members, dtype=np.int64)
+            
+            # Every member works every worked day of the crew
+            employee_parts.append(np.tile(members, len(worked)))
+            day_parts.append(np.repeat(worked.astype(np.int32), len(members)))
+            code_parts.append(np.repeat(codes[worked], len(members)))
+        
+        if employee_parts:
+            employee_ids = np.concatenate(employee_parts)
+            day_index = np.concatenate(day_parts)
+            shift_codes = np.concatenate(code_parts)
+        else:
+            employee_ids = np.zeros(0, dtype=np.int64)
+            day_index = np.zeros(0, dtype=np.int32)
+            shift_codes = np.zeros(0, dtype=np.int8)
+        
+        staffed = {crew: codes for crew, codes in crew_codes.items() if crew_members.get(crew)}
+        return ExpandedSchedule(start_date, num_days, employee_ids, day_index,
+                                shift_codes, staffed)
+
+
+# ==========================================
+# PATTERN DEFINITIONS
+# ==========================================
+
+_compiled = {}
+_compile_lock = threading.Lock()
+
+
+def _freeze(value):
+    """Hashable, order-independent cache key for a definition"""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def compile_pattern(definition):
+    """
+    CycleTable for a pattern definition (see the module docstring).
+    Compiled tables are cached and shared, so they must not be modified.
+    """
+    key = _freeze(definition)
+    table = _compiled.get(key)
+    if table is None:
+        table = CycleTable(
+            {crew: _compile_crew(crew, spec) for crew, spec in definition['crews'].items()},
+            anchor=definition.get('anchor')
+        )
+        with _compile_lock:
+            table = _compiled.setdefault(key, table)
+    return table
+
+
+def _compile_crew(crew, spec):
+    """One crew's definition -> CrewCycle with its offsets folded in"""
+    if isinstance(spec, str):
+        spec = {'cycle': spec}
+    
+    cycle = ''.join(spec['cycle'].split()).upper()
+    offset = spec.get('offset', 0)
+    starts = spec.get('starts', 0)
+    shift = spec.get('shift')
+    rotation = ''.join(spec.get('rotation', '').split()).upper()
+    rotate_every = spec.get('rotate_every', 1)
+    rotation_offset = spec.get('rotation_offset', 0)
+    
+    if not cycle:
+        raise ValueError(f"Crew {crew}: empty cycle")
+    unknown = set(cycle) - set(SHIFT_CODES) - {'X'}
+    if unknown:
+        raise ValueError(f"Crew {crew}: unknown cycle letters {sorted(unknown)}")
+    if 'X' in cycle and not (shift or rotation):
+        raise ValueError(f"Crew {crew}: 'X' days need a 'shift' or 'rotation'")
+    for letter in (shift or '') + rotation:
+        if letter not in SHIFT_CODES or letter == 'O':
+            raise ValueError(f"Crew {crew}: unknown shift letter {letter!r}")
+    if rotation and rotate_every < 1:
+        raise ValueError(f"Crew {crew}: rotate_every must be at least 1")
+    
+    length = len(cycle)
+    if rotation:
+        period = len(rotation) * rotate_every
+        length = length * period // gcd(length, period)
+    
+    letters = []
+    for c in range(length):
+        letter = cycle[(c + offset) % len(cycle)]
+        if letter == 'X':
+            if rotation:
+                letter = rotation[((c + rotation_offset) // rotate_every) % len(rotation)]
+            else:
+                letter = shift
+        letters.append(letter)
+    
+    return CrewCycle.of(letters, phase=-starts, start_day=starts)
+
+
+class ExpandedSchedule:
+    """
+    Flat arrays of generated shifts: row i is employee_ids[i] working
+    shift_codes[i] on start_date + day_index[i].
+    """
+    
+    def __init__(self, start_date, num_days, employee_ids, day_index, shift_codes, crew_codes):
+        self.start_date = start_date
+        self.num_days = num_days
+        self.employee_ids = employee_ids
+        self.day_index = day_index
+        self.shift_codes = shift_codes
+        self.crew_codes = crew_codes  # crew -> code per day offset
+    
+    def __len__(self):
+        return len(self.employee_ids)
+    
+    @property
+    def dates(self):
+        """numpy datetime64[D] date of each row"""
+        return np.datetime64(self.start_date, 'D') + self.day_index
+    
+    @property
+    def first_date(self):
+        return self.start_date + timedelta(days=int(self.day_index.min())) if len(self) else None
+    
+    @property
+    def last_date(self):
+        return self.start_date + timedelta(days=int(self.day_index.max())) if len(self) else None
+    
+    def rows(self):
+        """(employee_id, date, shift_code) tuples as Python values"""
+        calendar = [self.start_date + timedelta(days=i) for i in range(self.num_days)]
+        return zip(self.employee_ids.tolist(),
+                   [calendar[d] for d in self.day_index.tolist()],
+                   self.shift_codes.tolist())
+    
+    def duty_table(self):
+        """
+        (date, shift type) -> set of crews working it, plus the set of shift
+        types used; the input CrewCalendar.record_duty_table() expects.
+        """
+        return duty_table(self.crew_codes, self.start_date)
+
+
+def duty_table(crew_codes, start_date):
+    """duty_table() for crew -> code per day offset from start_date"""
+    table = defaultdict(set)
+    shift_types = set()
+    for crew, codes in crew_codes.items():
+        for d in np.flatnonzero(codes).tolist():
+            shift_type = SHIFT_TYPE_NAMES[int(codes[d])]
+            shift_types.add(shift_type)
+            table[(start_date + timedelta(days=d), shift_type)].add(crew)
+    return table, shift_types
@@ -1,8 +1,29 @@
 # utils/pattern_generators.py
 # COMPLETE FILE - Pattern Generators for Workforce Scheduler
-# Last Updated: 2025-10-30 - RENAMED Fixed-Fixed to Consistent Days Off
+# Last Updated: 2026-10-16 - Background generation jobs
 # 
 # Change Log:
+#   2026-10-16: pattern_job() runs generation as an engines/job_runner.py job;
+#               up to a year in one transaction, longer ranges streamed with
+#               progress reported per committed chunk
+#   2026-10-16: generate_stream() expands and commits long horizons (up to 5 years)
+#               in bounded chunks with a resumable ScheduleGenerationRun checkpoint
+#   2026-10-16: generate(virtual=True) stores only the pattern; shifts are computed
+#               on read by engines/virtual_schedule.py, deviations go to
+#               ScheduleException
+#               - virtual=True with replace_existing is refused until every reader
+#                 of Schedule goes through VirtualSchedule
+#               - Not exposed through create-pattern or pattern_job() yet:
+#                 overtime, fatigue, coverage and the dashboards would see
+#                 the computed shifts as unscheduled days
+#   2026-10-16: replace_existing diffs the pattern against stored schedules and
+#               only inserts, updates and deletes the shifts that changed
+#   2026-10-16: Patterns are now declarative definitions in utils/pattern_library.py
+#               compiled to cycle tables and expanded for all crews at once
+#               by utils/pattern_expansion.py
+#               - One shared generate(); per-class statistics() keep result keys
+#               - save_schedules() streams rows through engines/schedule_writer.py
+#               - get_pattern_generator() serves any other library pattern
 #   2025-10-30: RENAMED Fixed-Fixed pattern to "Consistent Days Off"
 #               - FixedFixedRotating → ConsistentDaysOffRotating
 #               - FixedFixedShifts → ConsistentDaysOffFixed
@@ -38,29 +59,134 @@
 #   2025-10-10: FINAL FIX - Correct Modified 4-on-4-off pattern
 #   2025-10-09: Added FourOnFourOffModified class with 8-week (56-day) cycle
 
-from models import db, Employee, Schedule, ShiftType
-from datetime import datetime, date, timedelta, time
-from sqlalchemy import and_
+from models import (db, Employee, Schedule, ShiftType, ShiftPattern, CrewDutyCalendar,
+                    ScheduleGenerationRun)
+from engines.crew_calendar import CrewCalendar, invalidate_crew_calendar
+from engines.schedule_writer import ScheduleWriter
+from utils.pattern_expansion import compile_pattern, duty_table, SHIFT_TYPE_NAMES
+from utils.pattern_library import PATTERNS, SHIFT_TIMES
+from datetime import datetime, date, timedelta
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Longest range generate() expands in memory
+MAX_GENERATE_DAYS = 365
+
+# Longest range generate_stream() accepts (5 years)
+MAX_STREAM_DAYS = 5 * 366
+
+# Days expanded and committed per chunk by generate_stream()
+STREAM_CHUNK_DAYS = 28
+
+
+def shift_table(shift_length):
+    """Shift code -> (ShiftType, start, end, hours) for a SHIFT_TIMES entry"""
+    times = SHIFT_TIMES[shift_length]
+    return {
+        code: (
+            ShiftType(name),
+            datetime.strptime(times[name]['start'], '%H:%M').time(),
+            datetime.strptime(times[name]['end'], '%H:%M').time(),
+            times[name]['hours']
+        )
+        for code, name in SHIFT_TYPE_NAMES.items() if name in times
+    }
+
 
 class PatternGenerator:
-    """Base class for all schedule pattern generators"""
+    """
+    Base class for all schedule pattern generators
     
-    def __init__(self):
-        self.schedules = []
+    The rotation itself is a declarative definition in
+    utils/pattern_library.PATTERNS (pattern_key); generate() compiles it to
+    a cycle table, expands it for every crew member at once and bulk-writes
+    the rows. Subclasses only add their own result statistics().
+    """
+    
+    pattern_key = None
+    
+    def __init__(self, pattern_key=None):
+        self.expanded = None
+        self.definition = None
+        self.pattern_key = pattern_key or self.pattern_key
         self.pattern_name = "Base Pattern"
         self.cycle_days = 14
+        self.shifts = shift_table('12-hour')
+        
+        if self.pattern_key:
+            self.definition = PATTERNS[self.pattern_key]
+            self.pattern_name = self.definition['name']
+            self.cycle_days = self.cycle_table().cycle_days
+            self.shifts = shift_table(self.definition.get('shift_length', '12-hour'))
+    
+    def cycle_table(self):
+        """Compiled (cached) CycleTable for this pattern's definition"""
+        if self.definition is None:
+            raise NotImplementedError("Pattern has no definition")
+        return compile_pattern(self.definition)
+    
+    def statistics(self, crews, start_date, end_date):
+        """Pattern-specific entries for result['statistics']"""
+        return {}
+    
+    def generate(self, start_date, end_date, created_by_id=None, replace_existing=False,
+                 virtual=False):
+        """
+        Generate and save this pattern for all crews
+        
+        With virtual, no schedule rows are written: the pattern becomes the
+        active virtual rotation and shifts are computed on read. It cannot
+        be combined with replace_existing: coverage, overtime, fatigue and
+        the dashboards still read stored Schedule rows only, so deleting
+        them would leave those readers with an empty schedule.
+        """
+        logger.info(f"Generating {self.pattern_name}: {start_date} to {end_date}"
+                    f"{' (virtual)' if virtual else ''}")
+        
+        if virtual and replace_existing:
+            raise ValueError("A virtual rotation cannot replace existing schedules; "
+                             "generate stored schedules to replace them")
+        
+        self.validate_date_range(start_date, end_date)
+        crews = self.get_crew_employees()
+        self.validate_crews(crews)
+        
+        self.expand(crews, start_date, end_date)
+        employee_ids = [emp.id for members in crews.values() for emp in members]
+        
+        if virtual:
+            result = self.save_virtual(start_date, end_date)
+        else:
+            result = self.save_schedules(replace_existing=replace_existing,
+                                         created_by_id=created_by_id,
+                                         date_range=(start_date, end_date),
+                                         employee_ids=employee_ids)
+        result['statistics'] = {
+            'total_schedules': len(self.expanded),
+            'pattern_name': self.pattern_name,
+            **self.statistics(crews, start_date, end_date)
+        }
+        
+        return result
     
-    def validate_date_range(self, start_date, end_date):
+    def expand(self, crews, start_date, end_date):
+        """Expand the cycle table into (employee, date, shift) arrays"""
+        self._positions = {emp.id: emp.position_id for members in crews.values() for emp in members}
+        self.expanded = self.cycle_table().expand(
+            {crew: [emp.id for emp in members] for crew, members in crews.items()},
+            start_date, end_date
+        )
+        logger.info(f"Expanded {len(self.expanded)} schedule entries for {self.pattern_name}")
+        return self.expanded
+    
+    def validate_date_range(self, start_date, end_date, max_days=MAX_GENERATE_DAYS):
         """Validate date range is reasonable"""
         if start_date > end_date:
             raise ValueError("Start date must be before end date")
         
-        if (end_date - start_date).days > 365:
-            raise ValueError("Date range cannot exceed 365 days")
+        if (end_date - start_date).days > max_days:
+            raise ValueError(f"Date range cannot exceed {max_days} days")
     
     def get_crew_employees(self):
         """Get active employees organized by crew"""
@@ -78,48 +204,269 @@ class PatternGenerator:
         if not any(crews.values()):
             raise ValueError("No active employees found in any crew")
     
-    def clear_existing_schedules(self, start_date, end_date, crews):
-        """Remove existing schedules in date range for these crews"""
-        employee_ids = []
-        for crew_employees in crews.values():
-            employee_ids.extend([emp.id for emp in crew_employees])
-        
-        if employee_ids:
-            Schedule.query.filter(
-                and_(
-                    Schedule.employee_id.in_(employee_ids),
-                    Schedule.date >= start_date,
-                    Schedule.date <= end_date
-                )
-            ).delete(synchronize_session=False)
+    def schedule_rows(self, created_by_id=None):
+        """Schedule row dicts for the expanded pattern, one per shift"""
+        positions = getattr(self, '_positions', {})
+        for employee_id, day, code in self.expanded.rows():
+            shift_type, start_time, end_time, hours = self.shifts[code]
+            yield {
+                'employee_id': employee_id,
+                'date': day,
+                'shift_type': shift_type,
+                'start_time': start_time,
+                'end_time': end_time,
+                'hours': hours,
+                'position_id': positions.get(employee_id),
+                'created_by_id': created_by_id
+            }
+    
+    def record_crew_calendar(self, start_date=None, end_date=None, is_virtual=False, crews=None):
+        """
+        Rebuild the crew-on-duty calendar from the expanded pattern, or,
+        given crews, from the cycle table over start_date..end_date
+        """
+        calendar = CrewCalendar(db, {
+            'Employee': Employee,
+            'ShiftPattern': ShiftPattern,
+            'CrewDutyCalendar': CrewDutyCalendar
+        })
+        if crews is not None:
+            cycle_table = self.cycle_table()
+            crew_codes = cycle_table.crew_codes((end_date - start_date).days + 1,
+                                                cycle_table.first_day(start_date))
+            table, shift_types = duty_table(
+                {crew: codes for crew, codes in crew_codes.items() if crews.get(crew)},
+                start_date
+            )
+        else:
+            table, shift_types = self.expanded.duty_table()
+        return calendar.record_duty_table(self.pattern_name, table, shift_types,
+                                          start_date or self.expanded.first_date,
+                                          end_date or self.expanded.last_date,
+                                          self.cycle_days, pattern_key=self.pattern_key,
+                                          is_virtual=is_virtual)
+    
+    def save_virtual(self, start_date, end_date):
+        """
+        Make this pattern the active virtual rotation from start_date on
+        
+        The crew calendar is still recorded for start_date..end_date; the
+        shifts themselves are computed by engines/virtual_schedule.py on
+        read. Stored schedules are left in place and override the rotation.
+        """
+        try:
+            if not len(self.expanded):
+                raise ValueError("Pattern produced no shifts for the selected dates")
+            
+            self.record_crew_calendar(start_date, end_date, is_virtual=True)
             db.session.commit()
-            logger.info(f"Cleared existing schedules from {start_date} to {end_date}")
+            
+            logger.info(f"{self.pattern_name} is now the virtual rotation from {start_date}")
+            
+            return {
+                'success': True,
+                'virtual': True,
+                'schedules_saved': 0,
+                'schedules_computed': len(self.expanded),
+                'date_range': {
+                    'start': start_date.isoformat(),
+                    'end': end_date.isoformat()
+                }
+            }
+            
+        except Exception as e:
+            db.session.rollback()
+            invalidate_crew_calendar()
+            logger.error(f"Error saving virtual pattern: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'schedules_saved': 0
+            }
     
-    def save_schedules(self, replace_existing=False):
-        """Save all generated schedules to database"""
+    def save_schedules(self, replace_existing=False, created_by_id=None,
+                       date_range=None, employee_ids=None):
+        """
+        Save all generated schedules to database
+        
+        With replace_existing, the employees' existing schedules in
+        date_range are diffed against the pattern: only changed shifts are
+        written and shifts the pattern no longer has are removed.
+        """
         try:
-            db.session.add_all(self.schedules)
+            if not len(self.expanded):
+                raise ValueError("Pattern produced no shifts for the selected dates")
+            
+            writer = ScheduleWriter(db, {'Schedule': Schedule})
+            if replace_existing:
+                start_date, end_date = date_range or (self.expanded.first_date,
+                                                      self.expanded.last_date)
+                written = writer.sync(self.schedule_rows(created_by_id),
+                                      start_date, end_date, employee_ids)
+            else:
+                written = writer.write(self.schedule_rows(created_by_id))
+            
+            self.record_crew_calendar()
             db.session.commit()
             
-            logger.info(f"Successfully saved {len(self.schedules)} schedules")
+            logger.info(f"Successfully saved {written['rows']} schedules")
             
             return {
                 'success': True,
-                'schedules_saved': len(self.schedules),
+                'schedules_saved': written['rows'],
+                'rows_per_second': written['rows_per_second'],
+                'changes': {key: written[key] for key in
+                            ('inserted', 'updated', 'deleted', 'unchanged', 'kept') if key in written},
                 'date_range': {
-                    'start': min(s.date for s in self.schedules).isoformat(),
-                    'end': max(s.date for s in self.schedules).isoformat()
+                    'start': self.expanded.first_date.isoformat(),
+                    'end': self.expanded.last_date.isoformat()
                 }
             }
             
         except Exception as e:
             db.session.rollback()
+            invalidate_crew_calendar()
             logger.error(f"Error saving schedules: {e}")
             return {
                 'success': False,
                 'error': str(e),
                 'schedules_saved': 0
             }
+    
+    # ==========================================
+    # STREAMING (LONG HORIZONS)
+    # ==========================================
+    
+    def iter_chunks(self, crews, start_date, end_date, origin=None,
+                    chunk_days=STREAM_CHUNK_DAYS, created_by_id=None):
+        """
+        Yield (chunk_start, chunk_end, rows) for consecutive windows of
+        chunk_days from start_date to end_date; rows is a generator of
+        schedule_rows() for that window only. origin is the date the
+        rotation began (default start_date).
+        """
+        cycle_table = self.cycle_table()
+        members = {crew: [emp.id for emp in employees] for crew, employees in crews.items()}
+        self._positions = {emp.id: emp.position_id for employees in crews.values()
+                           for emp in employees}
+        
+        chunk_start = start_date
+        while chunk_start <= end_date:
+            chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), end_date)
+            self.expanded = cycle_table.expand(members, chunk_start, chunk_end,
+                                               origin=origin or start_date)
+            yield chunk_start, chunk_end, self.schedule_rows(created_by_id)
+            chunk_start = chunk_end + timedelta(days=1)
+    
+    def generate_stream(self, start_date=None, end_date=None, created_by_id=None,
+                        replace_existing=False, chunk_days=STREAM_CHUNK_DAYS,
+                        run_id=None, progress=None, crews=None):
+        """
+        Generate a long horizon in chunks, committing each one
+        
+        Only one chunk of rows is held in memory. After every commit the
+        ScheduleGenerationRun checkpoint records the next date to write;
+        pass run_id (instead of dates) to resume a failed or interrupted
+        run from there. progress(run) is called after each chunk. crews
+        ({crew: [Employee]}) replaces get_crew_employees() for callers that
+        select their own roster.
+        """
+        if run_id is not None:
+            run = db.session.get(ScheduleGenerationRun, run_id)
+            if run is None:
+                raise ValueError(f"Generation run {run_id} not found")
+            if run.pattern_key != self.pattern_key:
+                raise ValueError(f"Generation run {run_id} is for {run.pattern_key}")
+            if run.status == 'completed':
+                return self.stream_result(run)
+        else:
+            self.validate_date_range(start_date, end_date, max_days=MAX_STREAM_DAYS)
+            run = ScheduleGenerationRun(
+                pattern_key=self.pattern_key,
+                start_date=start_date,
+                end_date=end_date,
+                next_date=start_date,
+                chunk_days=chunk_days,
+                replace_existing=replace_existing,
+                rows_written=0,
+                created_by_id=created_by_id
+            )
+            db.session.add(run)
+            db.session.commit()
+        
+        logger.info(f"Streaming {self.pattern_name} (run {run.id}): "
+                    f"{run.next_date} to {run.end_date}")
+        
+        try:
+            if crews is None:
+                crews = self.get_crew_employees()
+            self.validate_crews(crews)
+            employee_ids = [emp.id for members in crews.values() for emp in members]
+            writer = ScheduleWriter(db, {'Schedule': Schedule})
+            
+            run.status = 'running'
+            run.error = None
+            for chunk_start, chunk_end, rows in self.iter_chunks(
+                crews, run.next_date, run.end_date, origin=run.start_date,
+                chunk_days=run.chunk_days, created_by_id=run.created_by_id
+            ):
+                if run.replace_existing:
+                    written = writer.sync(rows, chunk_start, chunk_end, employee_ids)
+                else:
+                    written = writer.write(rows)
+                
+                run.rows_written = (run.rows_written or 0) + written['rows']
+                run.next_date = chunk_end + timedelta(days=1)
+                run.updated_at = datetime.utcnow()
+                db.session.commit()
+                
+                if progress:
+                    progress(run)
+            
+            self.record_crew_calendar(run.start_date, run.end_date, crews=crews)
+            run.status = 'completed'
+            run.next_date = None
+            run.completed_at = run.updated_at = datetime.utcnow()
+            db.session.commit()
+            
+            self.expanded = None
+            result = self.stream_result(run)
+            result['statistics'].update(self.statistics(crews, run.start_date, run.end_date))
+            return result
+            
+        except Exception as e:
+            db.session.rollback()
+            invalidate_crew_calendar()
+            run.status = 'failed'
+            run.error = str(e)
+            run.updated_at = datetime.utcnow()
+            db.session.commit()
+            logger.error(f"Generation run {run.id} failed at {run.next_date}: {e}")
+        
+        self.expanded = None
+        return self.stream_result(run)
+    
+    def stream_result(self, run):
+        """generate()-style result for a ScheduleGenerationRun"""
+        result = {
+            'success': run.status == 'completed',
+            'run_id': run.id,
+            'status': run.status,
+            'schedules_saved': run.rows_written or 0,
+            'date_range': {
+                'start': run.start_date.isoformat(),
+                'end': run.end_date.isoformat()
+            },
+            'statistics': {
+                'total_schedules': run.rows_written or 0,
+                'pattern_name': self.pattern_name,
+                'cycle_length': f"{self.cycle_days} days"
+            }
+        }
+        if run.status != 'completed':
+            result['error'] = run.error
+            result['resume_from'] = run.next_date.isoformat() if run.next_date else None
+        return result
 
 
 class FourOnFourOffWeekly(PatternGenerator):
@@ -136,107 +483,11 @@ class FourOnFourOffWeekly(PatternGenerator):
     - Crew D: Week 13 (day 84)
     """
     
+    pattern_key = 'four_on_four_off_weekly'
+    
     def __init__(self):
         super().__init__()
-        self.pattern_name = "4-on-4-off Weekly Rotation"
-        self.cycle_days = 16  # Per crew cycle
         self.full_rotation_days = 112  # 16 weeks
-    
-    def generate(self, start_date, end_date, created_by_id=None, replace_existing=False):
-        """Generate 4-on-4-off weekly rotation schedule"""
-        logger.info(f"Generating 4-on-4-off Weekly: {start_date} to {end_date}")
-        
-        # Validate inputs
-        self.validate_date_range(start_date, end_date)
-        
-        # Get employees by crew
-        crews = self.get_crew_employees()
-        self.validate_crews(crews)
-        
-        # Clear existing if requested
-        if replace_existing:
-            self.clear_existing_schedules(start_date, end_date, crews)
-        
-        # Define the 16-day pattern for one crew
-        # D=Day, N=Night, O=Off
-        pattern = [
-            'D', 'D', 'D', 'D',  # Days 0-3: Work days
-            'O', 'O', 'O', 'O',  # Days 4-7: Off
-            'N', 'N', 'N', 'N',  # Days 8-11: Work nights
-            'O', 'O', 'O', 'O'   # Days 12-15: Off
-        ]
-        
-        # Crew start offsets (in days from schedule start)
-        crew_offsets = {
-            'A': 0,    # Starts Week 1
-            'B': 28,   # Starts Week 5 (4 weeks later)
-            'C': 56,   # Starts Week 9 (8 weeks later)
-            'D': 84    # Starts Week 13 (12 weeks later)
-        }
-        
-        # Shift times
-        day_start = time(6, 0)    # 06:00
-        day_end = time(18, 0)     # 18:00
-        night_start = time(18, 0)  # 18:00
-        night_end = time(6, 0)     # 06:00 (next day)
-        
-        # Generate schedules
-        current_date = start_date
-        while current_date <= end_date:
-            day_offset = (current_date - start_date).days
-            
-            for crew_letter, employees in crews.items():
-                if not employees:
-                    continue
-                
-                crew_offset = crew_offsets[crew_letter]
-                days_since_crew_start = day_offset - crew_offset
-                
-                # Skip if this crew hasn't started yet
-                if days_since_crew_start < 0:
-                    continue
-                
-                # Determine position in 16-day cycle
-                cycle_position = days_since_crew_start % self.cycle_days
-                shift_code = pattern[cycle_position]
-                
-                # Skip off days
-                if shift_code == 'O':
-                    continue
-                
-                # Determine shift type and times
-                if shift_code == 'D':
-                    shift_type = ShiftType.DAY
-                    start_time = day_start
-                    end_time = day_end
-                else:  # N
-                    shift_type = ShiftType.NIGHT
-                    start_time = night_start
-                    end_time = night_end
-                
-                # Create schedule for each employee in this crew
-                for employee in employees:
-                    schedule = Schedule(
-                        employee_id=employee.id,
-                        date=current_date,
-                        shift_type=shift_type,
-                        start_time=start_time,
-                        end_time=end_time,
-                        hours=12.0,
-                        position_id=employee.position_id,
-                        created_by_id=created_by_id
-                    )
-                    self.schedules.append(schedule)
-            
-            current_date += timedelta(days=1)
-        
-        result = self.save_schedules(replace_existing=replace_existing)
-        result['statistics'] = {
-            'total_schedules': len(self.schedules),
-            'pattern_name': self.pattern_name
-        }
-        
-        return result
 
 
 class FourOnFourOffFast(PatternGenerator):
@@ -246,79 +497,7 @@ class FourOnFourOffFast(PatternGenerator):
     All crews rotate through this pattern with offsets
     """
     
-    def __init__(self):
-        super().__init__()
-        self.pattern_name = "4-on-4-off Fast Rotation"
-        self.cycle_days = 8
-    
-    def generate(self, start_date, end_date, created_by_id=None, replace_existing=False):
-        """Generate fast rotation schedule"""
-        logger.info(f"Generating 4-on-4-off Fast: {start_date} to {end_date}")
-        
-        self.validate_date_range(start_date, end_date)
-        crews = self.get_crew_employees()
-        self.validate_crews(crews)
-        
-        if replace_existing:
-            self.clear_existing_schedules(start_date, end_date, crews)
-        
-        # 8-day pattern: D=Day, N=Night, O=Off
-        pattern = ['D', 'D', 'N', 'N', 'O', 'O', 'O', 'O']
-        
-        # Crew offsets
-        crew_offsets = {
-            'A': 0,
-            'B': 2,
-            'C': 4,
-            'D': 6
-        }
-        
-        current_date = start_date
-        while current_date <= end_date:
-            day_offset = (current_date - start_date).days
-            
-            for crew_letter, employees in crews.items():
-                if not employees:
-                    continue
-                
-                crew_offset = crew_offsets[crew_letter]
-                cycle_position = (day_offset + crew_offset) % self.cycle_days
-                shift_code = pattern[cycle_position]
-                
-                if shift_code == 'O':
-                    continue
-                
-                if shift_code == 'D':
-                    shift_type = ShiftType.DAY
-                    start_time = time(6, 0)
-                    end_time = time(18, 0)
-                else:  # N
-                    shift_type = ShiftType.NIGHT
-                    start_time = time(18, 0)
-                    end_time = time(6, 0)
-                
-                for employee in employees:
-                    schedule = Schedule(
-                        employee_id=employee.id,
-                        date=current_date,
-                        shift_type=shift_type,
-                        start_time=start_time,
-                        end_time=end_time,
-                        hours=12.0,
-                        position_id=employee.position_id,
-                        created_by_id=created_by_id
-                    )
-                    self.schedules.append(schedule)
-            
-            current_date += timedelta(days=1)
-        
-        result = self.save_schedules(replace_existing=replace_existing)
-        result['statistics'] = {
-            'total_schedules': len(self.schedules),
-            'pattern_name': self.pattern_name
-        }
-        
-        return result
+    pattern_key = 'four_on_four_off_fast'
 
 
 class FourOnFourOffFixed(PatternGenerator):
@@ -328,79 +507,7 @@ class FourOnFourOffFixed(PatternGenerator):
     Crews A&B work days only, C&D work nights only
     """
     
-    def __init__(self):
-        super().__init__()
-        self.pattern_name = "4-on-4-off Fixed Shifts"
-        self.cycle_days = 8
-    
-    def generate(self, start_date, end_date, created_by_id=None, replace_existing=False):
-        """Generate fixed shift schedule"""
-        logger.info(f"Generating 4-on-4-off Fixed: {start_date} to {end_date}")
-        
-        self.validate_date_range(start_date, end_date)
-        crews = self.get_crew_employees()
-        self.validate_crews(crews)
-        
-        if replace_existing:
-            self.clear_existing_schedules(start_date, end_date, crews)
-        
-        # 8-day pattern: 4 on, 4 off
-        pattern = ['X', 'X', 'X', 'X', 'O', 'O', 'O', 'O']
-        
-        # Crew offsets (B and D offset by 4 days)
-        crew_offsets = {
-            'A': 0,
-            'B': 4,
-            'C': 0,
-            'D': 4
-        }
-        
-        current_date = start_date
-        while current_date <= end_date:
-            day_offset = (current_date - start_date).days
-            
-            for crew_letter, employees in crews.items():
-                if not employees:
-                    continue
-                
-                crew_offset = crew_offsets[crew_letter]
-                cycle_position = (day_offset + crew_offset) % self.cycle_days
-                
-                if pattern[cycle_position] == 'O':
-                    continue
-                
-                # A and B work days, C and D work nights
-                if crew_letter in ['A', 'B']:
-                    shift_type = ShiftType.DAY
-                    start_time = time(6, 0)
-                    end_time = time(18, 0)
-                else:  # C or D
-                    shift_type = ShiftType.NIGHT
-                    start_time = time(18, 0)
-                    end_time = time(6, 0)
-                
-                for employee in employees:
-                    schedule = Schedule(
-                        employee_id=employee.id,
-                        date=current_date,
-                        shift_type=shift_type,
-                        start_time=start_time,
-                        end_time=end_time,
-                        hours=12.0,
-                        position_id=employee.position_id,
-                        created_by_id=created_by_id
-                    )
-                    self.schedules.append(schedule)
-            
-            current_date += timedelta(days=1)
-        
-        result = self.save_schedules(replace_existing=replace_existing)
-        result['statistics'] = {
-            'total_schedules': len(self.schedules),
-            'pattern_name': self.pattern_name
-        }
-        
-        return result
+    pattern_key = 'four_on_four_off_fixed'
 
 
 class FourOnFourOffModified(PatternGenerator):
@@ -427,127 +534,15 @@ class FourOnFourOffModified(PatternGenerator):
     - Maintains 24/7 coverage with exactly 1 day crew + 1 night crew at all times
     """
     
-    def __init__(self):
-        super().__init__()
-        self.pattern_name = "4-on-4-off Modified (Full Weekends Off)"
-        self.cycle_days = 56  # 8 weeks
+    pattern_key = 'four_on_four_off_modified'
     
-    def generate(self, start_date, end_date, created_by_id=None, replace_existing=False):
-        """Generate modified 4-on-4-off schedule with Saturday swaps for full weekends"""
-        logger.info(f"Generating 4-on-4-off Modified: {start_date} to {end_date}")
-        
-        self.validate_date_range(start_date, end_date)
-        crews = self.get_crew_employees()
-        self.validate_crews(crews)
-        
-        if replace_existing:
-            self.clear_existing_schedules(start_date, end_date, crews)
-        
-        # CORRECT Modified Pattern with Saturday Swaps
-        # 'X' = Work, 'O' = Off
-        # Monday-Sunday format, 56 days total (8 weeks)
-        
-        # CREW A - DAY SHIFT
-        # Standard 4-on-4-off with Week 3 Sat given to B, Week 7 Sat taken from B
-        crew_a_pattern = [
-            'X', 'X', 'X', 'X', 'O', 'O', 'O',  # Week 1: Mon-Thu work, Fri-Sun off
-            'O', 'X', 'X', 'X', 'X', 'O', 'O',  # Week 2: Mon off, Tue-Fri work, Sat-Sun off
-            'O', 'O', 'X', 'X', 'X', 'O', 'O',  # Week 3: Wed-Fri work (gave Sat), Sat-Sun off (FULL WEEKEND!)
-            'O', 'O', 'O', 'X', 'X', 'X', 'X',  # Week 4: Thu-Sun work, Mon off
-            'O', 'O', 'O', 'O', 'X', 'X', 'X',  # Week 5: Mon-Wed off, Thu-Sat work
-            'X', 'O', 'O', 'O', 'O', 'X', 'X',  # Week 6: Sun work, Mon-Thu off, Fri-Sat work
-            'X', 'X', 'O', 'O', 'O', 'X', 'X',  # Week 7: Mon-Tue work, Wed-Fri off, Sat-Sun work (took Sat)
-            'X', 'X', 'X', 'O', 'O', 'O', 'O',  # Week 8: Mon-Wed work, Thu-Sun off
-        ]
-        
-        # CREW B - DAY SHIFT
-        # Inverse of Crew A (offset by 4 days), takes Week 3 Sat, gives Week 7 Sat
-        crew_b_pattern = [
-            'O', 'O', 'O', 'O', 'X', 'X', 'X',  # Week 1
-            'X', 'O', 'O', 'O', 'O', 'X', 'X',  # Week 2
-            'X', 'X', 'O', 'O', 'O', 'X', 'X',  # Week 3: took Sat (5-day stretch)
-            'X', 'X', 'X', 'O', 'O', 'O', 'O',  # Week 4
-            'X', 'X', 'X', 'X', 'O', 'O', 'O',  # Week 5
-            'O', 'X', 'X', 'X', 'X', 'O', 'O',  # Week 6
-            'O', 'O', 'X', 'X', 'X', 'O', 'O',  # Week 7: gave Sat (FULL WEEKEND!)
-            'O', 'O', 'O', 'X', 'X', 'X', 'X',  # Week 8
-        ]
-        
-        # CREWS C & D - NIGHT SHIFT (same pattern as A & B)
-        crew_c_pattern = crew_a_pattern.copy()
-        crew_d_pattern = crew_b_pattern.copy()
-        
-        crew_patterns = {
-            'A': crew_a_pattern,
-            'B': crew_b_pattern,
-            'C': crew_c_pattern,
-            'D': crew_d_pattern
-        }
-        
-        # Shift times
-        day_start = time(6, 0)
-        day_end = time(18, 0)
-        night_start = time(18, 0)
-        night_end = time(6, 0)
-        
-        # Generate schedule
-        current_date = start_date
-        while current_date <= end_date:
-            day_offset = (current_date - start_date).days
-            cycle_day = day_offset % self.cycle_days
-            
-            for crew_letter, employees in crews.items():
-                if not employees:
-                    continue
-                
-                # Check if this crew works today
-                pattern = crew_patterns[crew_letter]
-                if pattern[cycle_day] == 'O':
-                    continue
-                
-                # Determine shift type based on crew
-                # A & B work DAYS, C & D work NIGHTS
-                if crew_letter in ['A', 'B']:
-                    shift_type = ShiftType.DAY
-                    start_time = day_start
-                    end_time = day_end
-                else:  # C or D
-                    shift_type = ShiftType.NIGHT
-                    start_time = night_start
-                    end_time = night_end
-                
-                # Create schedule for each employee in this crew
-                for employee in employees:
-                    schedule = Schedule(
-                        employee_id=employee.id,
-                        date=current_date,
-                        shift_type=shift_type,
-                        start_time=start_time,
-                        end_time=end_time,
-                        hours=12.0,
-                        position_id=employee.position_id,
-                        created_by_id=created_by_id
-                    )
-                    self.schedules.append(schedule)
-            
-            current_date += timedelta(days=1)
-        
-        logger.info(f"Generated {len(self.schedules)} schedule entries for Modified 4-on-4-off")
-        
-        # Save to database
-        result = self.save_schedules(replace_existing=replace_existing)
-        
-        # Add statistics
-        result['statistics'] = {
-            'total_schedules': len(self.schedules),
+    def statistics(self, crews, start_date, end_date):
+        return {
             'date_range_days': (end_date - start_date).days + 1,
-            'pattern_name': self.pattern_name,
             'cycle_length': f"{self.cycle_days} days (8 weeks)",
             'crews_scheduled': [crew for crew, emps in crews.items() if emps],
             'full_weekends_per_crew': '4 out of 8 weeks'
         }
-        
-        return result
 
 
 # ============================================================================
@@ -574,119 +569,13 @@ class ThreeOnThreeOffFast(PatternGenerator):
     - Good work-life balance
     """
     
-    def __init__(self):
-        super().__init__()
-        self.pattern_name = "3-on-3-off Fast Rotation"
-        self.cycle_days = 84  # 12 weeks
+    pattern_key = 'three_on_three_off_fast'
     
-    def generate(self, start_date, end_date, created_by_id=None, replace_existing=False):
-        """Generate fast rotation 3-on-3-off schedule with 12-week pattern"""
-        logger.info(f"Generating 3-on-3-off Fast (12-week): {start_date} to {end_date}")
-        
-        self.validate_date_range(start_date, end_date)
-        crews = self.get_crew_employees()
-        self.validate_crews(crews)
-        
-        if replace_existing:
-            self.clear_existing_schedules(start_date, end_date, crews)
-        
-        # 84-day pattern (12 weeks × 7 days, Monday start)
-        # D=Day, N=Night, O=Off
-        full_pattern = [
-            # Week 1: Mon-Sun
-            'D', 'D', 'D', 'O', 'O', 'O', 'N',
-            # Week 2: Mon-Sun
-            'N', 'N', 'O', 'O', 'O', 'D', 'D',
-            # Week 3: Mon-Sun
-            'D', 'O', 'O', 'O', 'N', 'N', 'N',
-            # Week 4: Mon-Sun
-            'O', 'O', 'O', 'D', 'D', 'D', 'O',
-            # Week 5: Mon-Sun
-            'O', 'O', 'N', 'N', 'N', 'O', 'O',
-            # Week 6: Mon-Sun
-            'O', 'D', 'D', 'D', 'O', 'O', 'O',
-            # Week 7: Mon-Sun
-            'N', 'N', 'N', 'O', 'O', 'O', 'D',
-            # Week 8: Mon-Sun
-            'D', 'D', 'O', 'O', 'O', 'N', 'N',
-            # Week 9: Mon-Sun
-            'N', 'O', 'O', 'O', 'D', 'D', 'D',
-            # Week 10: Mon-Sun
-            'O', 'O', 'O', 'N', 'N', 'N', 'O',
-            # Week 11: Mon-Sun
-            'O', 'O', 'D', 'D', 'D', 'O', 'O',
-            # Week 12: Mon-Sun
-            'O', 'N', 'N', 'N', 'O', 'O', 'O'
-        ]
-        
-        # Crew start offsets (when each crew begins in the pattern)
-        crew_offsets = {
-            'A': 0,   # Week 1 = day 0
-            'B': 21,  # Week 4 = day 21 (3 weeks × 7 days)
-            'C': 42,  # Week 7 = day 42 (6 weeks × 7 days)
-            'D': 63   # Week 10 = day 63 (9 weeks × 7 days)
-        }
-        
-        # Shift times
-        day_start = time(6, 0)
-        day_end = time(18, 0)
-        night_start = time(18, 0)
-        night_end = time(6, 0)
-        
-        # Generate schedules
-        current_date = start_date
-        while current_date <= end_date:
-            day_offset = (current_date - start_date).days
-            
-            for crew_letter, employees in crews.items():
-                if not employees:
-                    continue
-                
-                # Calculate where this crew is in their pattern
-                crew_offset = crew_offsets[crew_letter]
-                pattern_position = (day_offset + crew_offset) % self.cycle_days
-                
-                shift_code = full_pattern[pattern_position]
-                
-                # Skip off days
-                if shift_code == 'O':
-                    continue
-                
-                # Determine shift type
-                if shift_code == 'D':
-                    shift_type = ShiftType.DAY
-                    start_time = day_start
-                    end_time = day_end
-                else:  # N
-                    shift_type = ShiftType.NIGHT
-                    start_time = night_start
-                    end_time = night_end
-                
-                # Create schedule for each employee
-                for employee in employees:
-                    schedule = Schedule(
-                        employee_id=employee.id,
-                        date=current_date,
-                        shift_type=shift_type,
-                        start_time=start_time,
-                        end_time=end_time,
-                        hours=12.0,
-                        position_id=employee.position_id,
-                        created_by_id=created_by_id
-                    )
-                    self.schedules.append(schedule)
-            
-            current_date += timedelta(days=1)
-        
-        result = self.save_schedules(replace_existing=replace_existing)
-        result['statistics'] = {
-            'total_schedules': len(self.schedules),
-            'pattern_name': self.pattern_name,
+    def statistics(self, crews, start_date, end_date):
+        return {
             'cycle_length': f"{self.cycle_days} days (12 weeks)",
             'crew_offsets': 'A:Wk1, B:Wk4, C:Wk7, D:Wk10'
         }
-        
-        return result
 
 
 class ThreeOnThreeOffSlow(PatternGenerator):
@@ -710,111 +599,14 @@ class ThreeOnThreeOffSlow(PatternGenerator):
     - All crews experience both shifts
     """
     
-    def __init__(self):
-        super().__init__()
-        self.pattern_name = "3-on-3-off Slow Rotation"
-        self.cycle_days = 84  # 12 weeks
+    pattern_key = 'three_on_three_off_slow'
     
-    def generate(self, start_date, end_date, created_by_id=None, replace_existing=False):
-        """Generate slow rotation 3-on-3-off schedule with 12-week cycle"""
-        logger.info(f"Generating 3-on-3-off Slow (12-week): {start_date} to {end_date}")
-        
-        self.validate_date_range(start_date, end_date)
-        crews = self.get_crew_employees()
-        self.validate_crews(crews)
-        
-        if replace_existing:
-            self.clear_existing_schedules(start_date, end_date, crews)
-        
-        # 6-day basic pattern: 3 on, 3 off
-        work_pattern = ['X', 'X', 'X', 'O', 'O', 'O']
-        
-        # CRITICAL: Crew offsets designed to ensure crews are OFF at week boundaries
-        # For a Monday start, we need A & C to start at day 0 (Monday)
-        # This gives them Mon-Tue-Wed work, Thu-Fri-Sat off
-        # Week boundary (Sunday) falls on their OFF cycle
-        crew_offsets = {
-            'A': 0,  # Start Monday: Mon-Tue-Wed work
-            'B': 3,  # Start Thursday: Thu-Fri-Sat work (opposite of A)
-            'C': 0,  # Start Monday: Mon-Tue-Wed work (same as A)
-            'D': 3   # Start Thursday: Thu-Fri-Sat work (same as B)
-        }
-        
-        # Shift times
-        day_start = time(6, 0)
-        day_end = time(18, 0)
-        night_start = time(18, 0)
-        night_end = time(6, 0)
-        
-        # Generate schedules
-        current_date = start_date
-        while current_date <= end_date:
-            day_offset = (current_date - start_date).days
-            cycle_day = day_offset % self.cycle_days
-            current_week = cycle_day // 7  # 0-11 for weeks 1-12
-            
-            for crew_letter, employees in crews.items():
-                if not employees:
-                    continue
-                
-                # Determine if this crew works today
-                crew_offset = crew_offsets[crew_letter]
-                pattern_position = (day_offset + crew_offset) % 6
-                
-                # Check if working today based on 3-on-3-off pattern
-                if work_pattern[pattern_position] == 'O':
-                    continue
-                
-                # Determine shift type based on crew and current week
-                # Weeks 0-5 (1-6): A&B on days, C&D on nights
-                # Weeks 6-11 (7-12): C&D on days, A&B on nights
-                if current_week < 6:
-                    # First 6 weeks
-                    if crew_letter in ['A', 'B']:
-                        shift_type = ShiftType.DAY
-                        start_time = day_start
-                        end_time = day_end
-                    else:  # C or D
-                        shift_type = ShiftType.NIGHT
-                        start_time = night_start
-                        end_time = night_end
-                else:
-                    # Last 6 weeks (shift swap)
-                    if crew_letter in ['C', 'D']:
-                        shift_type = ShiftType.DAY
-                        start_time = day_start
-                        end_time = day_end
-                    else:  # A or B
-                        shift_type = ShiftType.NIGHT
-                        start_time = night_start
-                        end_time = night_end
-                
-                # Create schedule for each employee
-                for employee in employees:
-                    schedule = Schedule(
-                        employee_id=employee.id,
-                        date=current_date,
-                        shift_type=shift_type,
-                        start_time=start_time,
-                        end_time=end_time,
-                        hours=12.0,
-                        position_id=employee.position_id,
-                        created_by_id=created_by_id
-                    )
-                    self.schedules.append(schedule)
-            
-            current_date += timedelta(days=1)
-        
-        result = self.save_schedules(replace_existing=replace_existing)
-        result['statistics'] = {
-            'total_schedules': len(self.schedules),
-            'pattern_name': self.pattern_name,
+    def statistics(self, crews, start_date, end_date):
+        return {
             'cycle_length': f"{self.cycle_days} days (12 weeks)",
             'rotation_frequency': '6 weeks per shift type',
             'shift_swap': 'Week 7 (crews swap day/night)'
         }
-        
-        return result
 
 
 class ThreeOnThreeOffFixed(PatternGenerator):
@@ -838,90 +630,13 @@ class ThreeOnThreeOffFixed(PatternGenerator):
     - Crew D: Nights, starting Thursday (3 on, 3 off)
     """
     
-    def __init__(self):
-        super().__init__()
-        self.pattern_name = "3-on-3-off Fixed Shifts"
-        self.cycle_days = 6
+    pattern_key = 'three_on_three_off_fixed'
     
-    def generate(self, start_date, end_date, created_by_id=None, replace_existing=False):
-        """Generate fixed shift 3-on-3-off schedule"""
-        logger.info(f"Generating 3-on-3-off Fixed: {start_date} to {end_date}")
-        
-        self.validate_date_range(start_date, end_date)
-        crews = self.get_crew_employees()
-        self.validate_crews(crews)
-        
-        if replace_existing:
-            self.clear_existing_schedules(start_date, end_date, crews)
-        
-        # 6-day pattern: 3 on, 3 off
-        pattern = ['X', 'X', 'X', 'O', 'O', 'O']
-        
-        # Crew offsets - A & C start together, B & D start 3 days later
-        crew_offsets = {
-            'A': 0,
-            'B': 3,
-            'C': 0,
-            'D': 3
-        }
-        
-        # Shift times
-        day_start = time(6, 0)
-        day_end = time(18, 0)
-        night_start = time(18, 0)
-        night_end = time(6, 0)
-        
-        # Generate schedules
-        current_date = start_date
-        while current_date <= end_date:
-            day_offset = (current_date - start_date).days
-            
-            for crew_letter, employees in crews.items():
-                if not employees:
-                    continue
-                
-                crew_offset = crew_offsets[crew_letter]
-                cycle_position = (day_offset + crew_offset) % self.cycle_days
-                
-                # Skip off days
-                if pattern[cycle_position] == 'O':
-                    continue
-                
-                # A & B work days, C & D work nights (fixed)
-                if crew_letter in ['A', 'B']:
-                    shift_type = ShiftType.DAY
-                    start_time = day_start
-                    end_time = day_end
-                else:  # C or D
-                    shift_type = ShiftType.NIGHT
-                    start_time = night_start
-                    end_time = night_end
-                
-                # Create schedule for each employee
-                for employee in employees:
-                    schedule = Schedule(
-                        employee_id=employee.id,
-                        date=current_date,
-                        shift_type=shift_type,
-                        start_time=start_time,
-                        end_time=end_time,
-                        hours=12.0,
-                        position_id=employee.position_id,
-                        created_by_id=created_by_id
-                    )
-                    self.schedules.append(schedule)
-            
-            current_date += timedelta(days=1)
-        
-        result = self.save_schedules(replace_existing=replace_existing)
-        result['statistics'] = {
-            'total_schedules': len(self.schedules),
-            'pattern_name': self.pattern_name,
+    def statistics(self, crews, start_date, end_date):
+        return {
             'cycle_length': f"{self.cycle_days} days",
             'shift_assignment': 'A&B days, C&D nights (fixed)'
         }
-        
-        return result
 
 
 class ThreeOnThreeOffModified(PatternGenerator):
@@ -946,115 +661,13 @@ class ThreeOnThreeOffModified(PatternGenerator):
     - Maintains 24/7 coverage with fixed shifts
     """
     
-    def __init__(self):
-        super().__init__()
-        self.pattern_name = "3-on-3-off Modified (Optimized Distribution)"
-        self.cycle_days = 42  # 6 weeks
+    pattern_key = 'three_on_three_off_modified'
     
-    def generate(self, start_date, end_date, created_by_id=None, replace_existing=False):
-        """Generate modified 3-on-3-off with optimized distribution"""
-        logger.info(f"Generating 3-on-3-off Modified: {start_date} to {end_date}")
-        
-        self.validate_date_range(start_date, end_date)
-        crews = self.get_crew_employees()
-        self.validate_crews(crews)
-        
-        if replace_existing:
-            self.clear_existing_schedules(start_date, end_date, crews)
-        
-        # 42-day patterns (Mon-Sun format, 6 weeks)
-        # 'X' = Work, 'O' = Off
-        
-        # CREW A - DAY SHIFT
-        # Pattern: Work 3, off 4, work 2, off 3, work 3, off 3, work 3, off 3,
-        #          work 4, off 2, work 3, off 3, work 3, off 3
-        crew_a_pattern = [
-            'X', 'X', 'X', 'O', 'O', 'O', 'O',  # Week 1: Mon-Wed work, Thu-Sun off
-            'X', 'X', 'O', 'O', 'O', 'X', 'X',  # Week 2: Mon-Tue work, Wed-Fri off, Sat-Sun work
-            'X', 'O', 'O', 'O', 'X', 'X', 'X',  # Week 3: Mon work, Tue-Thu off, Fri-Sun work
-            'O', 'O', 'O', 'X', 'X', 'X', 'X',  # Week 4: Mon-Wed off, Thu-Sun work
-            'O', 'O', 'X', 'X', 'X', 'O', 'O',  # Week 5: Mon-Tue off, Wed-Fri work, Sat-Sun off
-            'O', 'X', 'X', 'X', 'O', 'O', 'O',  # Week 6: Mon off, Tue-Thu work, Fri-Sun off
-        ]
-        
-        # CREW B - DAY SHIFT (opposite of A)
-        crew_b_pattern = [
-            'O', 'O', 'O', 'X', 'X', 'X', 'X',  # Week 1
-            'O', 'O', 'X', 'X', 'X', 'O', 'O',  # Week 2
-            'O', 'X', 'X', 'X', 'O', 'O', 'O',  # Week 3
-            'X', 'X', 'X', 'O', 'O', 'O', 'O',  # Week 4
-            'X', 'X', 'O', 'O', 'O', 'X', 'X',  # Week 5
-            'X', 'O', 'O', 'O', 'X', 'X', 'X',  # Week 6
-        ]
-        
-        # CREWS C & D - NIGHT SHIFT (same patterns as A & B)
-        crew_c_pattern = crew_a_pattern.copy()
-        crew_d_pattern = crew_b_pattern.copy()
-        
-        crew_patterns = {
-            'A': crew_a_pattern,
-            'B': crew_b_pattern,
-            'C': crew_c_pattern,
-            'D': crew_d_pattern
-        }
-        
-        # Shift times
-        day_start = time(6, 0)
-        day_end = time(18, 0)
-        night_start = time(18, 0)
-        night_end = time(6, 0)
-        
-        # Generate schedules
-        current_date = start_date
-        while current_date <= end_date:
-            day_offset = (current_date - start_date).days
-            cycle_day = day_offset % self.cycle_days
-            
-            for crew_letter, employees in crews.items():
-                if not employees:
-                    continue
-                
-                # Check if this crew works today
-                pattern = crew_patterns[crew_letter]
-                if pattern[cycle_day] == 'O':
-                    continue
-                
-                # Determine shift type based on crew
-                # A & B work DAYS, C & D work NIGHTS
-                if crew_letter in ['A', 'B']:
-                    shift_type = ShiftType.DAY
-                    start_time = day_start
-                    end_time = day_end
-                else:  # C or D
-                    shift_type = ShiftType.NIGHT
-                    start_time = night_start
-                    end_time = night_end
-                
-                # Create schedule for each employee in this crew
-                for employee in employees:
-                    schedule = Schedule(
-                        employee_id=employee.id,
-                        date=current_date,
-                        shift_type=shift_type,
-                        start_time=start_time,
-                        end_time=end_time,
-                        hours=12.0,
-                        position_id=employee.position_id,
-                        created_by_id=created_by_id
-                    )
-                    self.schedules.append(schedule)
-            
-            current_date += timedelta(days=1)
-        
-        result = self.save_schedules(replace_existing=replace_existing)
-        result['statistics'] = {
-            'total_schedules': len(self.schedules),
-            'pattern_name': self.pattern_name,
+    def statistics(self, crews, start_date, end_date):
+        return {
             'cycle_length': f"{self.cycle_days} days (6 weeks)",
             'work_distribution': '21 days work, 21 days off per 6-week cycle'
         }
-        
-        return result
 
 
 # ============================================================================
@@ -1100,112 +713,15 @@ class SouthernSwingClockwise(PatternGenerator):
     - Traditional 8-hour shifts
     """
     
-    def __init__(self):
-        super().__init__()
-        self.pattern_name = "Southern Swing Clockwise (Days→Evenings→Nights)"
-        self.cycle_days = 28  # 4 weeks
+    pattern_key = 'southern_swing_clockwise'
     
-    def generate(self, start_date, end_date, created_by_id=None, replace_existing=False):
-        """Generate Southern Swing clockwise rotation schedule"""
-        logger.info(f"Generating Southern Swing Clockwise: {start_date} to {end_date}")
-        
-        self.validate_date_range(start_date, end_date)
-        crews = self.get_crew_employees()
-        self.validate_crews(crews)
-        
-        if replace_existing:
-            self.clear_existing_schedules(start_date, end_date, crews)
-        
-        # 28-day pattern (Mon-Sun format, 4 weeks)
-        # D=Day (d8), E=Evening (e8), N=Night (n8), O=Off
-        # CORRECTED 2025-10-22: Fixed to match actual Southern Swing clockwise rotation
-        base_pattern = [
-            # Week 1: Mon-Fri days, Sat-Sun off
-            'D', 'D', 'D', 'D', 'D', 'O', 'O',
-            # Week 2: Mon-Tue off, Wed-Sun evenings
-            'O', 'O', 'E', 'E', 'E', 'E', 'E',
-            # Week 3: Mon-Tue evenings, Wed off, Thu-Sun nights
-            'E', 'E', 'O', 'N', 'N', 'N', 'N',
-            # Week 4: Mon-Wed nights, Thu-Fri off, Sat-Sun days
-            'N', 'N', 'N', 'O', 'O', 'D', 'D'
-        ]
-        
-        # Crew offsets (each crew starts at a different week)
-        crew_offsets = {
-            'A': 0,   # Starts Week 1 (day 0)
-            'B': 7,   # Starts Week 2 (day 7)
-            'C': 14,  # Starts Week 3 (day 14)
-            'D': 21   # Starts Week 4 (day 21)
-        }
-        
-        # Shift times (8-hour shifts)
-        day_start = time(7, 0)      # 07:00
-        day_end = time(15, 0)       # 15:00
-        evening_start = time(15, 0) # 15:00
-        evening_end = time(23, 0)   # 23:00
-        night_start = time(23, 0)   # 23:00
-        night_end = time(7, 0)      # 07:00 next day
-        
-        # Generate schedules
-        current_date = start_date
-        while current_date <= end_date:
-            day_offset = (current_date - start_date).days
-            
-            for crew_letter, employees in crews.items():
-                if not employees:
-                    continue
-                
-                # Calculate position in pattern for this crew
-                crew_offset = crew_offsets[crew_letter]
-                pattern_position = (day_offset + crew_offset) % self.cycle_days
-                
-                shift_code = base_pattern[pattern_position]
-                
-                # Skip off days
-                if shift_code == 'O':
-                    continue
-                
-                # Determine shift type and times
-                if shift_code == 'D':
-                    shift_type = ShiftType.DAY
-                    start_time = day_start
-                    end_time = day_end
-                elif shift_code == 'E':
-                    shift_type = ShiftType.EVENING
-                    start_time = evening_start
-                    end_time = evening_end
-                else:  # N
-                    shift_type = ShiftType.NIGHT
-                    start_time = night_start
-                    end_time = night_end
-                
-                # Create schedule for each employee in this crew
-                for employee in employees:
-                    schedule = Schedule(
-                        employee_id=employee.id,
-                        date=current_date,
-                        shift_type=shift_type,
-                        start_time=start_time,
-                        end_time=end_time,
-                        hours=8.0,  # 8-hour shifts
-                        position_id=employee.position_id,
-                        created_by_id=created_by_id
-                    )
-                    self.schedules.append(schedule)
-            
-            current_date += timedelta(days=1)
-        
-        result = self.save_schedules(replace_existing=replace_existing)
-        result['statistics'] = {
-            'total_schedules': len(self.schedules),
-            'pattern_name': self.pattern_name,
+    def statistics(self, crews, start_date, end_date):
+        return {
             'cycle_length': f"{self.cycle_days} days (4 weeks)",
             'rotation_type': 'Forward (clockwise)',
             'working_days_per_cycle': '21 days',
             'shift_distribution': '7 days, 7 evenings, 7 nights per cycle'
         }
-        
-        return result
 
 
 class SouthernSwingCounter(PatternGenerator):
@@ -1234,108 +750,15 @@ class SouthernSwingCounter(PatternGenerator):
     - 7 consecutive night shifts (Wed-Sun Week 2 + Mon-Tue Week 3) for circadian adjustment
     """
     
-    def __init__(self):
-        super().__init__()
-        self.pattern_name = "Southern Swing Counter-Clockwise (Days→Nights→Evenings)"
-        self.cycle_days = 28  # 4 weeks
+    pattern_key = 'southern_swing_counter'
     
-    def generate(self, start_date, end_date, created_by_id=None, replace_existing=False):
-        """Generate Southern Swing counter-clockwise rotation schedule"""
-        logger.info(f"Generating Southern Swing Counter-Clockwise: {start_date} to {end_date}")
-        
-        self.validate_date_range(start_date, end_date)
-        crews = self.get_crew_employees()
-        self.validate_crews(crews)
-        
-        if replace_existing:
-            self.clear_existing_schedules(start_date, end_date, crews)
-        
-        # 28-day pattern for counter-clockwise rotation
-        # D=Day, E=Evening, N=Night, O=Off
-        # CORRECTED 2025-10-22: Fixed to match actual Southern Swing counter-clockwise rotation
-        base_pattern = [
-            # Week 1: Mon-Fri days, Sat-Sun off
-            'D', 'D', 'D', 'D', 'D', 'O', 'O',
-            # Week 2: Mon-Tue off, Wed-Sun nights
-            'O', 'O', 'N', 'N', 'N', 'N', 'N',
-            # Week 3: Mon-Tue nights, Wed off, Thu-Sun evenings
-            'N', 'N', 'O', 'E', 'E', 'E', 'E',
-            # Week 4: Mon-Wed evenings, Thu-Fri off, Sat-Sun days
-            'E', 'E', 'E', 'O', 'O', 'D', 'D'
-        ]
-        
-        # Crew offsets
-        crew_offsets = {
-            'A': 0,   # Starts Week 1
-            'B': 7,   # Starts Week 2
-            'C': 14,  # Starts Week 3
-            'D': 21   # Starts Week 4
-        }
-        
-        # Shift times
-        day_start = time(7, 0)
-        day_end = time(15, 0)
-        evening_start = time(15, 0)
-        evening_end = time(23, 0)
-        night_start = time(23, 0)
-        night_end = time(7, 0)
-        
-        # Generate schedules
-        current_date = start_date
-        while current_date <= end_date:
-            day_offset = (current_date - start_date).days
-            
-            for crew_letter, employees in crews.items():
-                if not employees:
-                    continue
-                
-                crew_offset = crew_offsets[crew_letter]
-                pattern_position = (day_offset + crew_offset) % self.cycle_days
-                
-                shift_code = base_pattern[pattern_position]
-                
-                if shift_code == 'O':
-                    continue
-                
-                if shift_code == 'D':
-                    shift_type = ShiftType.DAY
-                    start_time = day_start
-                    end_time = day_end
-                elif shift_code == 'E':
-                    shift_type = ShiftType.EVENING
-                    start_time = evening_start
-                    end_time = evening_end
-                else:  # N
-                    shift_type = ShiftType.NIGHT
-                    start_time = night_start
-                    end_time = night_end
-                
-                for employee in employees:
-                    schedule = Schedule(
-                        employee_id=employee.id,
-                        date=current_date,
-                        shift_type=shift_type,
-                        start_time=start_time,
-                        end_time=end_time,
-                        hours=8.0,
-                        position_id=employee.position_id,
-                        created_by_id=created_by_id
-                    )
-                    self.schedules.append(schedule)
-            
-            current_date += timedelta(days=1)
-        
-        result = self.save_schedules(replace_existing=replace_existing)
-        result['statistics'] = {
-            'total_schedules': len(self.schedules),
-            'pattern_name': self.pattern_name,
+    def statistics(self, crews, start_date, end_date):
+        return {
             'cycle_length': f"{self.cycle_days} days (4 weeks)",
             'rotation_type': 'Backward (counter-clockwise)',
             'working_days_per_cycle': '20 days',
             'consecutive_nights': '7 nights (Week 2 Wed-Sun + Week 3 Mon-Tue)'
         }
-        
-        return result
 
 
 class SouthernSwingFixed(PatternGenerator):
@@ -1354,122 +777,14 @@ class SouthernSwingFixed(PatternGenerator):
     Good for those who prefer fixed shifts and can't handle rotation.
     """
     
-    def __init__(self):
-        super().__init__()
-        self.pattern_name = "Southern Swing Fixed Shifts"
-        self.cycle_days = 28
+    pattern_key = 'southern_swing_fixed'
     
-    def generate(self, start_date, end_date, created_by_id=None, replace_existing=False):
-        """Generate Southern Swing fixed shifts schedule"""
-        logger.info(f"Generating Southern Swing Fixed: {start_date} to {end_date}")
-        
-        self.validate_date_range(start_date, end_date)
-        crews = self.get_crew_employees()
-        self.validate_crews(crews)
-        
-        if replace_existing:
-            self.clear_existing_schedules(start_date, end_date, crews)
-        
-        # Weekly pattern: Mon-Fri work, Sat-Sun off
-        weekly_pattern = ['X', 'X', 'X', 'X', 'X', 'O', 'O']
-        
-        # Crew D follows the rotating pattern to provide coverage
-        # CORRECTED: Matches clockwise rotation with 7 consecutive nights
-        crew_d_pattern = [
-            'D', 'D', 'D', 'D', 'D', 'O', 'O',  # Week 1: Days
-            'O', 'O', 'E', 'E', 'E', 'N', 'N',  # Week 2: Evenings then nights
-            'N', 'N', 'N', 'N', 'N', 'O', 'O',  # Week 3: Nights (7 consecutive total)
-            'O', 'O', 'D', 'D', 'D', 'D', 'D'   # Week 4: Back to days
-        ]
-        
-        # Shift assignments
-        crew_shifts = {
-            'A': ShiftType.DAY,
-            'B': ShiftType.EVENING,
-            'C': ShiftType.NIGHT,
-            'D': None  # Special handling
-        }
-        
-        # Shift times
-        day_start = time(7, 0)
-        day_end = time(15, 0)
-        evening_start = time(15, 0)
-        evening_end = time(23, 0)
-        night_start = time(23, 0)
-        night_end = time(7, 0)
-        
-        # Generate schedules
-        current_date = start_date
-        while current_date <= end_date:
-            day_offset = (current_date - start_date).days
-            week_day = day_offset % 7
-            
-            for crew_letter, employees in crews.items():
-                if not employees:
-                    continue
-                
-                # Handle Crew D specially (rotating)
-                if crew_letter == 'D':
-                    cycle_position = day_offset % self.cycle_days
-                    shift_code = crew_d_pattern[cycle_position]
-                    
-                    if shift_code == 'O':
-                        continue
-                    
-                    if shift_code == 'D':
-                        shift_type = ShiftType.DAY
-                        start_time = day_start
-                        end_time = day_end
-                    elif shift_code == 'E':
-                        shift_type = ShiftType.EVENING
-                        start_time = evening_start
-                        end_time = evening_end
-                    else:  # N
-                        shift_type = ShiftType.NIGHT
-                        start_time = night_start
-                        end_time = night_end
-                else:
-                    # Crews A, B, C - fixed shifts, Mon-Fri only
-                    if weekly_pattern[week_day] == 'O':
-                        continue
-                    
-                    shift_type = crew_shifts[crew_letter]
-                    
-                    if shift_type == ShiftType.DAY:
-                        start_time = day_start
-                        end_time = day_end
-                    elif shift_type == ShiftType.EVENING:
-                        start_time = evening_start
-                        end_time = evening_end
-                    else:  # NIGHT
-                        start_time = night_start
-                        end_time = night_end
-                
-                for employee in employees:
-                    schedule = Schedule(
-                        employee_id=employee.id,
-                        date=current_date,
-                        shift_type=shift_type,
-                        start_time=start_time,
-                        end_time=end_time,
-                        hours=8.0,
-                        position_id=employee.position_id,
-                        created_by_id=created_by_id
-                    )
-                    self.schedules.append(schedule)
-            
-            current_date += timedelta(days=1)
-        
-        result = self.save_schedules(replace_existing=replace_existing)
-        result['statistics'] = {
-            'total_schedules': len(self.schedules),
-            'pattern_name': self.pattern_name,
+    def statistics(self, crews, start_date, end_date):
+        return {
             'cycle_length': f"{self.cycle_days} days (4 weeks)",
             'shift_assignment': 'A:Days, B:Evenings, C:Nights, D:Rotating',
             'working_days_per_cycle': '20 days'
         }
-        
-        return result
 
 
 # ============================================================================
@@ -1513,108 +828,15 @@ class ConsistentDaysOffRotating(PatternGenerator):
     - Wednesday swap provides smoother transitions
     """
     
-    def __init__(self):
-        super().__init__()
-        self.pattern_name = "Consistent Days Off with 2-Week Rotation"
-        self.cycle_days = 28  # 4 weeks
+    pattern_key = 'consistent_days_off_rotating'
     
-    def generate(self, start_date, end_date, created_by_id=None, replace_existing=False):
-        """Generate Consistent Days Off 2-week rotation schedule with Wednesday swap"""
-        logger.info(f"Generating Consistent Days Off 2-Week Rotation: {start_date} to {end_date}")
-        
-        self.validate_date_range(start_date, end_date)
-        crews = self.get_crew_employees()
-        self.validate_crews(crews)
-        
-        if replace_existing:
-            self.clear_existing_schedules(start_date, end_date, crews)
-        
-        # 14-day work pattern with Wednesday swap (repeats twice in 28-day cycle)
-        # X = Work, O = Off
-        # Week 1: Sun-Wed work (4 on), Thu-Sat off (3 off)
-        # Week 2: Sun-Tue work (3 on), Wed-Sat off (4 off)
-        work_pattern = [
-            'X', 'X', 'X', 'X', 'O', 'O', 'O',  # Week 1: Sun-Wed work, Thu-Sat off
-            'X', 'X', 'X', 'O', 'O', 'O', 'O'   # Week 2: Sun-Tue work, Wed-Sat off
-        ]
-        
-        # Crew offsets (in days from schedule start)
-        crew_offsets = {
-            'A': 0,   # Starts Week 1 (days)
-            'B': 7,   # Starts Week 2 (days) 
-            'C': 14,  # Starts Week 3 (nights)
-            'D': 21   # Starts Week 4 (nights)
-        }
-        
-        # Shift times (12-hour shifts)
-        day_start = time(6, 0)    # 06:00
-        day_end = time(18, 0)     # 18:00
-        night_start = time(18, 0)  # 18:00
-        night_end = time(6, 0)     # 06:00 (next day)
-        
-        # Generate schedules
-        current_date = start_date
-        while current_date <= end_date:
-            day_offset = (current_date - start_date).days
-            
-            for crew_letter, employees in crews.items():
-                if not employees:
-                    continue
-                
-                crew_offset = crew_offsets[crew_letter]
-                
-                # Determine position in 14-day work pattern
-                days_since_crew_start = day_offset - crew_offset
-                if days_since_crew_start < 0:
-                    continue
-                
-                work_cycle_position = days_since_crew_start % 14
-                
-                # Check if working today
-                if work_pattern[work_cycle_position] == 'O':
-                    continue
-                
-                # Determine if on day or night shift
-                # First 14 days = days, second 14 days = nights
-                cycle_position_28 = days_since_crew_start % 28
-                if cycle_position_28 < 14:
-                    # First 2 weeks: Day shift
-                    shift_type = ShiftType.DAY
-                    start_time = day_start
-                    end_time = day_end
-                else:
-                    # Second 2 weeks: Night shift
-                    shift_type = ShiftType.NIGHT
-                    start_time = night_start
-                    end_time = night_end
-                
-                # Create schedule for each employee in this crew
-                for employee in employees:
-                    schedule = Schedule(
-                        employee_id=employee.id,
-                        date=current_date,
-                        shift_type=shift_type,
-                        start_time=start_time,
-                        end_time=end_time,
-                        hours=12.0,
-                        position_id=employee.position_id,
-                        created_by_id=created_by_id
-                    )
-                    self.schedules.append(schedule)
-            
-            current_date += timedelta(days=1)
-        
-        result = self.save_schedules(replace_existing=replace_existing)
-        result['statistics'] = {
-            'total_schedules': len(self.schedules),
-            'pattern_name': self.pattern_name,
+    def statistics(self, crews, start_date, end_date):
+        return {
             'cycle_length': f"{self.cycle_days} days (4 weeks)",
             'rotation_type': '2-week rotation (days/nights)',
             'working_days_per_cycle': '14 days (50%)',
             'pattern': '4 on, 3 off / 3 on, 4 off (with Wednesday swap)'
         }
-        
-        return result
 
 
 class ConsistentDaysOffFixed(PatternGenerator):
@@ -1647,107 +869,16 @@ class ConsistentDaysOffFixed(PatternGenerator):
     - Wednesday swap ensures smooth transitions
     """
     
-    def __init__(self):
-        super().__init__()
-        self.pattern_name = "Consistent Days Off with Fixed Shifts"
-        self.cycle_days = 14  # 2 weeks
+    pattern_key = 'consistent_days_off_fixed'
     
-    def generate(self, start_date, end_date, created_by_id=None, replace_existing=False):
-        """Generate Consistent Days Off fixed shifts schedule with Wednesday swap"""
-        logger.info(f"Generating Consistent Days Off Fixed Shifts: {start_date} to {end_date}")
-        
-        self.validate_date_range(start_date, end_date)
-        crews = self.get_crew_employees()
-        self.validate_crews(crews)
-        
-        if replace_existing:
-            self.clear_existing_schedules(start_date, end_date, crews)
-        
-        # 14-day work pattern with Wednesday swap
-        # X = Work, O = Off
-        # Week 1: Sun-Wed work (4 on), Thu-Sat off (3 off)
-        # Week 2: Sun-Tue work (3 on), Wed-Sat off (4 off)
-        work_pattern = [
-            'X', 'X', 'X', 'X', 'O', 'O', 'O',  # Week 1: 4 on, 3 off
-            'X', 'X', 'X', 'O', 'O', 'O', 'O'   # Week 2: 3 on, 4 off
-        ]
-        
-        # Crew offsets
-        # A & C start together, B & D start 1 week later
-        crew_offsets = {
-            'A': 0,   # Day shift, starts Week 1
-            'B': 7,   # Day shift, starts Week 2
-            'C': 0,   # Night shift, starts Week 1
-            'D': 7    # Night shift, starts Week 2
-        }
-        
-        # Shift times (12-hour shifts)
-        day_start = time(6, 0)    # 06:00
-        day_end = time(18, 0)     # 18:00
-        night_start = time(18, 0)  # 18:00
-        night_end = time(6, 0)     # 06:00 (next day)
-        
-        # Generate schedules
-        current_date = start_date
-        while current_date <= end_date:
-            day_offset = (current_date - start_date).days
-            
-            for crew_letter, employees in crews.items():
-                if not employees:
-                    continue
-                
-                crew_offset = crew_offsets[crew_letter]
-                
-                # Determine position in 14-day work pattern
-                days_since_crew_start = day_offset - crew_offset
-                if days_since_crew_start < 0:
-                    continue
-                
-                work_cycle_position = days_since_crew_start % 14
-                
-                # Check if working today
-                if work_pattern[work_cycle_position] == 'O':
-                    continue
-                
-                # Determine shift type (FIXED - no rotation)
-                # A & B always days, C & D always nights
-                if crew_letter in ['A', 'B']:
-                    shift_type = ShiftType.DAY
-                    start_time = day_start
-                    end_time = day_end
-                else:  # C or D
-                    shift_type = ShiftType.NIGHT
-                    start_time = night_start
-                    end_time = night_end
-                
-                # Create schedule for each employee in this crew
-                for employee in employees:
-                    schedule = Schedule(
-                        employee_id=employee.id,
-                        date=current_date,
-                        shift_type=shift_type,
-                        start_time=start_time,
-                        end_time=end_time,
-                        hours=12.0,
-                        position_id=employee.position_id,
-                        created_by_id=created_by_id
-                    )
-                    self.schedules.append(schedule)
-            
-            current_date += timedelta(days=1)
-        
-        result = self.save_schedules(replace_existing=replace_existing)
-        result['statistics'] = {
-            'total_schedules': len(self.schedules),
-            'pattern_name': self.pattern_name,
+    def statistics(self, crews, start_date, end_date):
+        return {
             'cycle_length': f"{self.cycle_days} days (2 weeks)",
             'rotation_type': 'No rotation (fixed shifts)',
             'working_days_per_cycle': '7 days (50%)',
             'shift_assignment': 'A&B: Days, C&D: Nights',
             'pattern': '4 on, 3 off / 3 on, 4 off (with Wednesday swap)'
         }
-        
-        return result
 
 
 # ============================================================================
@@ -1809,6 +940,72 @@ def get_pattern_generator(pattern, variation=None):
         elif variation == 'fixed':
             return ConsistentDaysOffFixed()
     
+    # Any other pattern defined in utils/pattern_library.py
+    # (e.g. 'dupont', or 'pitman' + 'rapid' -> 'pitman_rapid')
+    key = f"{pattern}_{variation}" if variation else pattern
+    if key in PATTERNS:
+        return PatternGenerator(key)
+    
     return None
 
+# ============================================================================
+# BACKGROUND JOB
+# ============================================================================
+
+def pattern_job(params, report):
+    """
+    engines/job_runner.py handler for pattern generation jobs
+    
+    params: pattern and variation (or pattern_key), start_date, end_date
+    (ISO dates), created_by_id, replace_existing. Up to
+    MAX_GENERATE_DAYS the schedule is saved in one transaction, so a
+    failure leaves nothing behind. Longer ranges are streamed in committed
+    chunks; the run id is checkpointed into the job so a requeued job
+    resumes instead of starting over.
+    """
+    if params.get('pattern_key'):
+        generator = PatternGenerator(params['pattern_key'])
+    else:
+        generator = get_pattern_generator(params.get('pattern'), params.get('variation'))
+    if not generator:
+        return {'success': False,
+                'error': f'Pattern "{params.get("pattern")}" with variation '
+                         f'"{params.get("variation")}" is not yet implemented'}
+    
+    if params.get('run_id'):
+        run = db.session.get(ScheduleGenerationRun, params['run_id'])
+        if run is None:
+            return {'success': False, 'error': f"Generation run {params['run_id']} not found"}
+        start_date, end_date = run.start_date, run.end_date
+    else:
+        start_date = date.fromisoformat(params['start_date'])
+        end_date = date.fromisoformat(params['end_date'])
+    
+    # Not offered by create-pattern until every Schedule reader goes
+    # through engines/virtual_schedule.py
+    if params.get('virtual'):
+        return {'success': False, 'error': 'Virtual rotations are not available yet'}
+    
+    if not params.get('run_id') and (end_date - start_date).days <= MAX_GENERATE_DAYS:
+        report(0, f"Generating {generator.pattern_name}")
+        return generator.generate(start_date, end_date,
+                                  created_by_id=params.get('created_by_id'),
+                                  replace_existing=params.get('replace_existing', False))
+    
+    total_days = (end_date - start_date).days + 1
+    
+    def progress(run):
+        done_days = (run.next_date - run.start_date).days
+        report(100.0 * done_days / total_days,
+               f"Saved {run.rows_written} schedules through "
+               f"{run.next_date - timedelta(days=1)}",
+               run_id=run.id)
+    
+    report(0, f"Generating {generator.pattern_name}")
+    return generator.generate_stream(start_date, end_date,
+                                     created_by_id=params.get('created_by_id'),
+                                     replace_existing=params.get('replace_existing', False),
+                                     run_id=params.get('run_id'),
+                                     progress=progress)
+
 # This file is not truncated.
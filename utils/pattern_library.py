@@ -0,0 +1,456 @@
+# utils/pattern_library.py
+"""
+Declarative shift pattern definitions
+
+Every rotation the scheduler can generate is described here as data and
+compiled to a cycle table by utils/pattern_expansion.compile_pattern();
+see that module for the definition format. Adding a pattern only needs a
+new entry in PATTERNS: get_pattern_generator('<key>') picks it up.
+
+Cycle letters: D=Day, E=Evening, N=Night, O=Off, X=Work (the crew's
+'shift', or its 'rotation').
+"""
+
+# Shift times by shift length
+SHIFT_TIMES = {
+    '12-hour': {
+        'day': {'start': '06:00', 'end': '18:00', 'hours': 12.0},
+        'night': {'start': '18:00', 'end': '06:00', 'hours': 12.0}
+    },
+    '8-hour': {
+        'day': {'start': '07:00', 'end': '15:00', 'hours': 8.0},
+        'evening': {'start': '15:00', 'end': '23:00', 'hours': 8.0},
+        'night': {'start': '23:00', 'end': '07:00', 'hours': 8.0}
+    }
+}
+
+# Pitman 2-2-3: Work 2, off 2, work 3, off 2, work 2, off 3
+PITMAN_CYCLE = 'XXOOXXXOOXXOOO'
+
+# 4-on-4-off Modified (56 days, Monday start) with Saturday swaps
+# Crew A: Standard 4-on-4-off with Week 3 Sat given to B, Week 7 Sat taken from B
+MODIFIED_4_ON_4_OFF_A = (
+    'XXXXOOO'  # Week 1: Mon-Thu work, Fri-Sun off
+    'OXXXXOO'  # Week 2: Mon off, Tue-Fri work, Sat-Sun off
+    'OOXXXOO'  # Week 3: Wed-Fri work (gave Sat), Sat-Sun off (FULL WEEKEND!)
+    'OOOXXXX'  # Week 4: Thu-Sun work, Mon off
+    'OOOOXXX'  # Week 5: Mon-Wed off, Thu-Sat work
+    'XOOOOXX'  # Week 6: Sun work, Mon-Thu off, Fri-Sat work
+    'XXOOOXX'  # Week 7: Mon-Tue work, Wed-Fri off, Sat-Sun work (took Sat)
+    'XXXOOOO'  # Week 8: Mon-Wed work, Thu-Sun off
+)
+
+# Crew B: Inverse of Crew A (offset by 4 days), takes Week 3 Sat, gives Week 7 Sat
+MODIFIED_4_ON_4_OFF_B = (
+    'OOOOXXX'  # Week 1
+    'XOOOOXX'  # Week 2
+    'XXOOOXX'  # Week 3: took Sat (5-day stretch)
+    'XXXOOOO'  # Week 4
+    'XXXXOOO'  # Week 5
+    'OXXXXOO'  # Week 6
+    'OOXXXOO'  # Week 7: gave Sat (FULL WEEKEND!)
+    'OOOXXXX'  # Week 8
+)
+
+# 3-on-3-off Modified (42 days, Mon-Sun format)
+# Crew A: Work 3, off 4, work 2, off 3, work 3, off 3, work 3, off 3,
+#         work 4, off 2, work 3, off 3, work 3, off 3
+MODIFIED_3_ON_3_OFF_A = (
+    'XXXOOOO'  # Week 1: Mon-Wed work, Thu-Sun off
+    'XXOOOXX'  # Week 2: Mon-Tue work, Wed-Fri off, Sat-Sun work
+    'XOOOXXX'  # Week 3: Mon work, Tue-Thu off, Fri-Sun work
+    'OOOXXXX'  # Week 4: Mon-Wed off, Thu-Sun work
+    'OOXXXOO'  # Week 5: Mon-Tue off, Wed-Fri work, Sat-Sun off
+    'OXXXOOO'  # Week 6: Mon off, Tue-Thu work, Fri-Sun off
+)
+
+# Crew B: opposite of A
+MODIFIED_3_ON_3_OFF_B = (
+    'OOOXXXX'  # Week 1
+    'OOXXXOO'  # Week 2
+    'OXXXOOO'  # Week 3
+    'XXXOOOO'  # Week 4
+    'XXOOOXX'  # Week 5
+    'XOOOXXX'  # Week 6
+)
+
+# Consistent Days Off work pattern with Wednesday swap
+CONSISTENT_DAYS_OFF = (
+    'XXXXOOO'  # Week 1: Sun-Wed work (4 on), Thu-Sat off (3 off)
+    'XXXOOOO'  # Week 2: Sun-Tue work (3 on), Wed-Sat off (4 off)
+)
+
+
+PATTERNS = {
+    # ============================================================
+    # 4-ON-4-OFF
+    # ============================================================
+    
+    # 16-day cycle per crew: 4D, 4Off, 4N, 4Off; crews join 4 weeks apart
+    'four_on_four_off_weekly': {
+        'name': '4-on-4-off Weekly Rotation',
+        'shift_length': '12-hour',
+        'crews': {
+            'A': {'cycle': 'DDDD OOOO NNNN OOOO', 'starts': 0},   # Week 1
+            'B': {'cycle': 'DDDD OOOO NNNN OOOO', 'starts': 28},  # Week 5
+            'C': {'cycle': 'DDDD OOOO NNNN OOOO', 'starts': 56},  # Week 9
+            'D': {'cycle': 'DDDD OOOO NNNN OOOO', 'starts': 84}   # Week 13
+        }
+    },
+    
+    # 8-day cycle: 2 days, 2 nights, 4 off
+    'four_on_four_off_fast': {
+        'name': '4-on-4-off Fast Rotation',
+        'shift_length': '12-hour',
+        'crews': {
+            'A': {'cycle': 'DDNNOOOO', 'offset': 0},
+            'B': {'cycle': 'DDNNOOOO', 'offset': 2},
+            'C': {'cycle': 'DDNNOOOO', 'offset': 4},
+            'D': {'cycle': 'DDNNOOOO', 'offset': 6}
+        }
+    },
+    
+    # 8-day cycle: 4 on, 4 off; A & B days, C & D nights
+    'four_on_four_off_fixed': {
+        'name': '4-on-4-off Fixed Shifts',
+        'shift_length': '12-hour',
+        'crews': {
+            'A': {'cycle': 'XXXXOOOO', 'shift': 'D', 'offset': 0},
+            'B': {'cycle': 'XXXXOOOO', 'shift': 'D', 'offset': 4},
+            'C': {'cycle': 'XXXXOOOO', 'shift': 'N', 'offset': 0},
+            'D': {'cycle': 'XXXXOOOO', 'shift': 'N', 'offset': 4}
+        }
+    },
+    
+    # 8-week cycle with Saturday swaps for full weekends off
+    'four_on_four_off_modified': {
+        'name': '4-on-4-off Modified (Full Weekends Off)',
+        'shift_length': '12-hour',
+        'crews': {
+            'A': {'cycle': MODIFIED_4_ON_4_OFF_A, 'shift': 'D'},
+            'B': {'cycle': MODIFIED_4_ON_4_OFF_B, 'shift': 'D'},
+            'C': {'cycle': MODIFIED_4_ON_4_OFF_A, 'shift': 'N'},
+            'D': {'cycle': MODIFIED_4_ON_4_OFF_B, 'shift': 'N'}
+        }
+    },
+    
+    # ============================================================
+    # 3-ON-3-OFF
+    # ============================================================
+    
+    # 84-day (12-week) pattern; crews start at weeks 1, 4, 7 and 10
+    'three_on_three_off_fast': {
+        'name': '3-on-3-off Fast Rotation',
+        'shift_length': '12-hour',
+        'crews': {
+            crew: {
+                'cycle': (
+                    'DDDOOON'  # Week 1: Mon-Sun
+                    'NNOOODD'  # Week 2
+                    'DOOONNN'  # Week 3
+                    'OOODDDO'  # Week 4
+                    'OONNNOO'  # Week 5
+                    'ODDDOOO'  # Week 6
+                    'NNNOOOD'  # Week 7
+                    'DDOOONN'  # Week 8
+                    'NOOODDD'  # Week 9
+                    'OOONNNO'  # Week 10
+                    'OODDDOO'  # Week 11
+                    'ONNNOOO'  # Week 12
+                ),
+                'offset': offset
+            }
+            for crew, offset in (('A', 0), ('B', 21), ('C', 42), ('D', 63))
+        }
+    },
+    
+    # 3 on, 3 off; weeks 1-6 A&B days / C&D nights, weeks 7-12 swapped.
+    # A & C start Monday, B & D Thursday, so crews are off at the swap.
+    'three_on_three_off_slow': {
+        'name': '3-on-3-off Slow Rotation',
+        'shift_length': '12-hour',
+        'crews': {
+            'A': {'cycle': 'XXXOOO', 'offset': 0, 'rotation': 'DN', 'rotate_every': 42},
+            'B': {'cycle': 'XXXOOO', 'offset': 3, 'rotation': 'DN', 'rotate_every': 42},
+            'C': {'cycle': 'XXXOOO', 'offset': 0, 'rotation': 'ND', 'rotate_every': 42},
+            'D': {'cycle': 'XXXOOO', 'offset': 3, 'rotation': 'ND', 'rotate_every': 42}
+        }
+    },
+    
+    # 6-day cycle: 3 on, 3 off; A & B days, C & D nights (fixed)
+    'three_on_three_off_fixed': {
+        'name': '3-on-3-off Fixed Shifts',
+        'shift_length': '12-hour',
+        'crews': {
+            'A': {'cycle': 'XXXOOO', 'shift': 'D', 'offset': 0},
+            'B': {'cycle': 'XXXOOO', 'shift': 'D', 'offset': 3},
+            'C': {'cycle': 'XXXOOO', 'shift': 'N', 'offset': 0},
+            'D': {'cycle': 'XXXOOO', 'shift': 'N', 'offset': 3}
+        }
+    },
+    
+    # 6-week optimized distribution; A & B days, C & D nights
+    'three_on_three_off_modified': {
+        'name': '3-on-3-off Modified (Optimized Distribution)',
+        'shift_length': '12-hour',
+        'crews': {
+            'A': {'cycle': MODIFIED_3_ON_3_OFF_A, 'shift': 'D'},
+            'B': {'cycle': MODIFIED_3_ON_3_OFF_B, 'shift': 'D'},
+            'C': {'cycle': MODIFIED_3_ON_3_OFF_A, 'shift': 'N'},
+            'D': {'cycle': MODIFIED_3_ON_3_OFF_B, 'shift': 'N'}
+        }
+    },
+    
+    # ============================================================
+    # SOUTHERN SWING (8-hour shifts)
+    # ============================================================
+    
+    # 28 days, forward rotation; crews start at weeks 1-4
+    'southern_swing_clockwise': {
+        'name': 'Southern Swing Clockwise (Days→Evenings→Nights)',
+        'shift_length': '8-hour',
+        'crews': {
+            crew: {
+                'cycle': (
+                    'DDDDDOO'  # Week 1: Mon-Fri days, Sat-Sun off
+                    'OOEEEEE'  # Week 2: Mon-Tue off, Wed-Sun evenings
+                    'EEONNNN'  # Week 3: Mon-Tue evenings, Wed off, Thu-Sun nights
+                    'NNNOODD'  # Week 4: Mon-Wed nights, Thu-Fri off, Sat-Sun days
+                ),
+                'offset': offset
+            }
+            for crew, offset in (('A', 0), ('B', 7), ('C', 14), ('D', 21))
+        }
+    },
+    
+    # 28 days, backward rotation; crews start at weeks 1-4
+    'southern_swing_counter': {
+        'name': 'Southern Swing Counter-Clockwise (Days→Nights→Evenings)',
+        'shift_length': '8-hour',
+        'crews': {
+            crew: {
+                'cycle': (
+                    'DDDDDOO'  # Week 1: Mon-Fri days, Sat-Sun off
+                    'OONNNNN'  # Week 2: Mon-Tue off, Wed-Sun nights
+                    'NNOEEEE'  # Week 3: Mon-Tue nights, Wed off, Thu-Sun evenings
+                    'EEEOODD'  # Week 4: Mon-Wed evenings, Thu-Fri off, Sat-Sun days
+                ),
+                'offset': offset
+            }
+            for crew, offset in (('A', 0), ('B', 7), ('C', 14), ('D', 21))
+        }
+    },
+    
+    # A, B, C on fixed Mon-Fri shifts; D rotates to provide relief
+    'southern_swing_fixed': {
+        'name': 'Southern Swing Fixed Shifts',
+        'shift_length': '8-hour',
+        'crews': {
+            'A': {'cycle': 'XXXXXOO', 'shift': 'D'},
+            'B': {'cycle': 'XXXXXOO', 'shift': 'E'},
+            'C': {'cycle': 'XXXXXOO', 'shift': 'N'},
+            'D': (
+                'DDDDDOO'  # Week 1: Days
+                'OOEEENN'  # Week 2: Evenings then nights
+                'NNNNNOO'  # Week 3: Nights (7 consecutive total)
+                'OODDDDD'  # Week 4: Back to days
+            )
+        }
+    },
+    
+    # ============================================================
+    # CONSISTENT DAYS OFF (formerly Fixed-Fixed)
+    # ============================================================
+    
+    # 2 weeks of days then 2 of nights, counted from each crew's start
+    'consistent_days_off_rotating': {
+        'name': 'Consistent Days Off with 2-Week Rotation',
+        'shift_length': '12-hour',
+        'crews': {
+            crew: {'cycle': CONSISTENT_DAYS_OFF, 'rotation': 'DN', 'rotate_every': 14,
+                   'starts': starts}
+            for crew, starts in (('A', 0), ('B', 7), ('C', 14), ('D', 21))
+        }
+    },
+    
+    # No rotation: A & B days, C & D nights; B & D start a week later
+    'consistent_days_off_fixed': {
+        'name': 'Consistent Days Off with Fixed Shifts',
+        'shift_length': '12-hour',
+        'crews': {
+            'A': {'cycle': CONSISTENT_DAYS_OFF, 'shift': 'D', 'starts': 0},
+            'B': {'cycle': CONSISTENT_DAYS_OFF, 'shift': 'D', 'starts': 7},
+            'C': {'cycle': CONSISTENT_DAYS_OFF, 'shift': 'N', 'starts': 0},
+            'D': {'cycle': CONSISTENT_DAYS_OFF, 'shift': 'N', 'starts': 7}
+        }
+    },
+    
+    # ============================================================
+    # PITMAN 2-2-3
+    # ============================================================
+    
+    # Traditional: A & B days, C & D nights; B & D a week apart from A & C
+    'pitman_fixed': {
+        'name': 'Pitman 2-2-3',
+        'shift_length': '12-hour',
+        'crews': {
+            'A': {'cycle': PITMAN_CYCLE, 'shift': 'D', 'offset': 0},
+            'B': {'cycle': PITMAN_CYCLE, 'shift': 'D', 'offset': 7},
+            'C': {'cycle': PITMAN_CYCLE, 'shift': 'N', 'offset': 0},
+            'D': {'cycle': PITMAN_CYCLE, 'shift': 'N', 'offset': 7}
+        }
+    },
+    
+    # Day/night swap every 2 weeks; A & C start on days, B & D on nights
+    'pitman_rotating': {
+        'name': 'Pitman 2-2-3 (2-Week Rotation)',
+        'shift_length': '12-hour',
+        'crews': {
+            'A': {'cycle': PITMAN_CYCLE, 'offset': 0, 'rotation': 'DN', 'rotate_every': 14},
+            'B': {'cycle': PITMAN_CYCLE, 'offset': 7, 'rotation': 'ND', 'rotate_every': 14},
+            'C': {'cycle': PITMAN_CYCLE, 'offset': 0, 'rotation': 'DN', 'rotate_every': 14},
+            'D': {'cycle': PITMAN_CYCLE, 'offset': 7, 'rotation': 'ND', 'rotate_every': 14}
+        }
+    },
+    
+    # Day/night swap every 4 days
+    'pitman_rapid': {
+        'name': 'Pitman 2-2-3 (Rapid Rotation)',
+        'shift_length': '12-hour',
+        'crews': {
+            'A': {'cycle': PITMAN_CYCLE, 'offset': 0, 'rotation': 'DN', 'rotate_every': 4},
+            'B': {'cycle': PITMAN_CYCLE, 'offset': 7, 'rotation': 'ND', 'rotate_every': 4},
+            'C': {'cycle': PITMAN_CYCLE, 'offset': 0, 'rotation': 'DN', 'rotate_every': 4},
+            'D': {'cycle': PITMAN_CYCLE, 'offset': 7, 'rotation': 'ND', 'rotate_every': 4}
+        }
+    },
+    
+    # Day/night swap every 4 weeks
+    'pitman_4_week': {
+        'name': 'Pitman 2-2-3 (4-Week Rotation)',
+        'shift_length': '12-hour',
+        'crews': {
+            'A': {'cycle': PITMAN_CYCLE, 'offset': 0, 'rotation': 'DN', 'rotate_every': 28},
+            'B': {'cycle': PITMAN_CYCLE, 'offset': 7, 'rotation': 'ND', 'rotate_every': 28},
+            'C': {'cycle': PITMAN_CYCLE, 'offset': 0, 'rotation': 'DN', 'rotate_every': 28},
+            'D': {'cycle': PITMAN_CYCLE, 'offset': 7, 'rotation': 'ND', 'rotate_every': 28}
+        }
+    },
+    
+    # No rotation, A & C days, B & D nights
+    'pitman_alternating': {
+        'name': 'Pitman 2-2-3 (Alternating Crews)',
+        'shift_length': '12-hour',
+        'crews': {
+            'A': {'cycle': PITMAN_CYCLE, 'shift': 'D', 'offset': 0},
+            'B': {'cycle': PITMAN_CYCLE, 'shift': 'N', 'offset': 7},
+            'C': {'cycle': PITMAN_CYCLE, 'shift': 'D', 'offset': 0},
+            'D': {'cycle': PITMAN_CYCLE, 'shift': 'N', 'offset': 7}
+        }
+    },
+    
+    # All crews on days (fallback for unknown Pitman variations)
+    'pitman_days': {
+        'name': 'Pitman 2-2-3 (Days Only)',
+        'shift_length': '12-hour',
+        'crews': {
+            'A': {'cycle': PITMAN_CYCLE, 'shift': 'D', 'offset': 0},
+            'B': {'cycle': PITMAN_CYCLE, 'shift': 'D', 'offset': 7},
+            'C': {'cycle': PITMAN_CYCLE, 'shift': 'D', 'offset': 0},
+            'D': {'cycle': PITMAN_CYCLE, 'shift': 'D', 'offset': 7}
+        }
+    },
+    
+    # ============================================================
+    # OTHER 12-HOUR PATTERNS
+    # ============================================================
+    
+    # 28-day rotating cycle with 7 consecutive days off:
+    # 4N-3off-3D-1off-3N-3off-4D-7off; crews start a week apart
+    'dupont': {
+        'name': 'DuPont',
+        'shift_length': '12-hour',
+        'crews': {
+            crew: {'cycle': 'NNNNOOO DDDO NNNOOO DDDD OOOOOOO', 'offset': offset}
+            for crew, offset in (('A', 0), ('B', 7), ('C', 14), ('D', 21))
+        }
+    },
+    
+    # Southern Swing by calendar week (weeks start Monday)
+    'southern_swing_weekly': {
+        'name': 'Southern Swing',
+        'shift_length': '8-hour',
+        'anchor': 'monday',
+        'crews': {
+            crew: {
+                'cycle': (
+                    'DDDDDOO'  # Week 1: Mon-Fri days, weekend off
+                    'OOEEEEE'  # Week 2: Mon-Tue off, Wed-Sun evenings
+                    'EEONNNN'  # Week 3: Mon-Tue evenings, Wed off, Thu-Sun nights
+                    'NNNOODD'  # Week 4: Mon-Wed nights, Thu-Fri off, Sat-Sun days
+                ),
+                'offset': offset
+            }
+            for crew, offset in (('A', 0), ('B', 7), ('C', 14), ('D', 21))
+        }
+    },
+    
+    # Mon-Thu crews work 4 days (48 hrs/week), Fri-Sun crews 3 (36 hrs/week)
+    'weekday_weekend': {
+        'name': 'Fixed-Fixed (Mon-Thu / Fri-Sun)',
+        'shift_length': '12-hour',
+        'anchor': 'monday',
+        'crews': {
+            'A': 'DDDDOOO',
+            'B': 'NNNNOOO',
+            'C': 'OOOODDD',
+            'D': 'OOOONNN'
+        }
+    },
+    
+    # 5&2: work stretches of 5 and 2, off stretches of 5 and 2
+    'five_and_two': {
+        'name': '5&2',
+        'shift_length': '12-hour',
+        'crews': {
+            'A': {'cycle': 'XXXXXOOXXOOOOO', 'shift': 'D'},  # 5 on, 2 off, 2 on, 5 off
+            'B': {'cycle': 'OOOOOXXOOXXXXX', 'shift': 'D'},  # Opposite of A
+            'C': {'cycle': 'XXOOOOOXXXXXOO', 'shift': 'N'},  # 2 on, 5 off, 5 on, 2 off
+            'D': {'cycle': 'OOXXXXXOOOOOXX', 'shift': 'N'}   # Opposite of C
+        }
+    },
+    
+    # Panama (2-3-2 variation of Pitman)
+    'panama': {
+        'name': 'Panama',
+        'shift_length': '12-hour',
+        'crews': {
+            'A': {'cycle': 'XXOOOXXXOOXXOO', 'shift': 'D', 'offset': 0},
+            'B': {'cycle': 'XXOOOXXXOOXXOO', 'shift': 'D', 'offset': 7},
+            'C': {'cycle': 'XXOOOXXXOOXXOO', 'shift': 'N', 'offset': 0},
+            'D': {'cycle': 'XXOOOXXXOOXXOO', 'shift': 'N', 'offset': 7}
+        }
+    },
+    
+    # Continental: 2D-2O-3D-2O-2D-3O-2N-2O-3N-2O-2N-3O, then 14 days rest
+    'continental': {
+        'name': 'Continental',
+        'shift_length': '12-hour',
+        'crews': {
+            crew: {
+                'cycle': (
+                    'DDOODDDOODDOOO'  # Days
+                    'NNOONNNOONNOOO'  # Nights
+                    'OOOOOOOOOOOOOO'  # Rest period
+                ),
+                'offset': offset
+            }
+            for crew, offset in (('A', 0), ('B', 10), ('C', 21), ('D', 31))
+        }
+    }
+}
+
+
+def get_pattern_definition(key):
+    """Definition for a PATTERNS key, or None"""
+    return PATTERNS.get(key)
@@ -12,7 +12,12 @@ The Pitman Schedule Pattern:
 
 from datetime import datetime, date, timedelta
 from typing import Dict, List, Tuple, Optional
-from models import db, Schedule, Employee, Position
+from models import db, Schedule, Employee, Position, ShiftPattern, CrewDutyCalendar
+from engines.crew_calendar import CrewCalendar, invalidate_crew_calendar
+from engines.schedule_writer import ScheduleWriter
+from utils.pattern_expansion import compile_pattern, SHIFT_TYPE_NAMES
+from utils.pattern_library import PATTERNS
+from utils.schedule_stats import ScheduleIndex
 import logging
 
 logger = logging.getLogger(__name__)
@@ -20,19 +25,15 @@ logger = logging.getLogger(__name__)
 class RealPitmanSchedule:
     """Production-ready Pitman schedule generator for actual deployment"""
     
+    # Variation -> utils/pattern_library.py definition. The TRUE Pitman
+    # 2-2-3 pattern (14-day cycle); B & D start a week after A & C.
+    # Unknown variations put every crew on days.
+    VARIATIONS = {
+        'fixed': 'pitman_fixed',        # A,B = days, C,D = nights
+        'rotating': 'pitman_rotating'   # Day/night swap every 2 weeks
+    }
+    
     def __init__(self):
-        # TRUE Pitman 2-2-3 pattern (14-day cycle)
-        # 1 = work day, 0 = off day
-        self.pitman_base_pattern = [1, 1, 0, 0, 1, 1, 1, 0, 0, 1, 1, 0, 0, 0]
-        
-        # Crew rotations to ensure 24/7 coverage
-        self.crew_offsets = {
-            'A': 0,   # Starts on day 1 of pattern
-            'B': 7,   # Starts on day 8 of pattern (opposite of A)
-            'C': 0,   # Same pattern as A but on nights
-            'D': 7    # Same pattern as B but on nights  
-        }
-        
         # Shift configurations
         self.shift_config = {
             'day': {
@@ -80,25 +81,20 @@ class RealPitmanSchedule:
         if not validation['valid']:
             logger.error(f"Crew validation failed: {validation['issues']}")
         
-        schedules = []
-        current_date = start_date
-        day_index = 0
-        
-        # Generate schedule day by day
-        while current_date <= end_date:
-            daily_schedules = self._generate_daily_schedule(
-                current_date, day_index, crew_employees, variation, created_by_id
-            )
-            schedules.extend(daily_schedules)
-            
-            current_date += timedelta(days=1)
-            day_index += 1
-        
-        # Calculate statistics
-        stats = self._calculate_schedule_stats(schedules, crew_employees)
-        
-        # Validate generated schedule
-        validation_results = self._validate_schedule(schedules)
+        # Expand the pattern for every crew member at once
+        table = compile_pattern(PATTERNS[self.VARIATIONS.get(variation, 'pitman_days')])
+        expanded = table.expand(
+            {crew: [emp['id'] for emp in employees] for crew, employees in crew_employees.items()},
+            start_date, end_date
+        )
+        schedules = self._build_schedules(expanded, crew_employees, created_by_id)
+        
+        # Statistics and validation read one index of the expanded rows
+        index = ScheduleIndex.from_expanded(expanded, {
+            shift_type: config['hours'] for shift_type, config in self.shift_config.items()
+        })
+        stats = self._calculate_schedule_stats(schedules, crew_employees, index)
+        validation_results = self._validate_schedule(schedules, index)
         
         return {
             'schedules': schedules,
@@ -113,24 +109,31 @@ class RealPitmanSchedule:
             }
         }
     
-    def _get_crew_employees(self) -> Dict:
-        """Get all active employees organized by crew"""
-        crew_employees = {'A': [], 'B': [], 'C': [], 'D': []}
+    def _get_crew_members(self) -> Dict:
+        """Active employees (supervisors included) organized by crew, as Employee objects"""
+        crew_members = {'A': [], 'B': [], 'C': [], 'D': []}
         
         employees = Employee.query.filter_by(is_active=True).all()
         
         for emp in employees:
-            if emp.crew in crew_employees:
-                crew_employees[emp.crew].append({
-                    'id': emp.id,
-                    'name': emp.name,
-                    'position_id': emp.position_id,
-                    'position_name': emp.position.name if emp.position else 'Unassigned'
-                })
+            if emp.crew in crew_members:
+                crew_members[emp.crew].append(emp)
             else:
                 logger.warning(f"Employee {emp.name} has invalid crew assignment: {emp.crew}")
         
-        return crew_employees
+        return crew_members
+    
+    def _get_crew_employees(self) -> Dict:
+        """Get all active employees organized by crew"""
+        return {
+            crew: [{
+                'id': emp.id,
+                'name': emp.name,
+                'position_id': emp.position_id,
+                'position_name': emp.position.name if emp.position else 'Unassigned'
+            } for emp in members]
+            for crew, members in self._get_crew_members().items()
+        }
     
     def _validate_crews(self, crew_employees: Dict) -> Dict:
         """Validate crew assignments for Pitman schedule"""
@@ -169,123 +172,95 @@ class RealPitmanSchedule:
             'ideal_crew_size': ideal_crew_size
         }
     
-    def _generate_daily_schedule(self, current_date: date, day_index: int, 
-                               crew_employees: Dict, variation: str, 
-                               created_by_id: int) -> List[Schedule]:
-        """Generate schedule for a single day"""
-        daily_schedules = []
+    def _build_schedules(self, expanded, crew_employees: Dict,
+                         created_by_id: int) -> List[Schedule]:
+        """Schedule entries for the expanded (employee, date, shift) rows"""
+        positions = {
+            emp['id']: emp['position_id']
+            for employees in crew_employees.values() for emp in employees
+        }
         
-        for crew in ['A', 'B', 'C', 'D']:
-            # Calculate if this crew works today
-            cycle_day = (day_index + self.crew_offsets[crew]) % 14
-            works_today = self.pitman_base_pattern[cycle_day] == 1
-            
-            if not works_today:
-                continue  # Crew is off today
-            
-            # Determine shift type based on variation
-            if variation == 'fixed':
-                # Traditional: A,B = days, C,D = nights
-                shift_type = 'day' if crew in ['A', 'B'] else 'night'
-            elif variation == 'rotating':
-                # Crews alternate between day/night every few weeks
-                shift_type = self._get_rotating_shift_type(crew, current_date, day_index)
-            else:
-                shift_type = 'day'  # Default fallback
-            
-            # Create schedules for all employees in this crew
-            for emp_data in crew_employees[crew]:
-                schedule = Schedule(
-                    employee_id=emp_data['id'],
-                    date=current_date,
-                    shift_type=shift_type,
-                    start_time=datetime.strptime(
-                        self.shift_config[shift_type]['start_time'], '%H:%M'
-                    ).time(),
-                    hours=self.shift_config[shift_type]['hours'],
-                    position_id=emp_data['position_id'],
-                    created_by_id=created_by_id,
-                    is_overtime=False,  # Regular scheduled shift
-                    created_at=datetime.utcnow(),
-                    updated_at=datetime.utcnow()
-                )
-                
-                # Calculate end time
-                start_datetime = datetime.combine(current_date, schedule.start_time)
-                end_datetime = start_datetime + timedelta(hours=schedule.hours)
-                schedule.end_time = end_datetime.time()
-                
-                daily_schedules.append(schedule)
+        # Start and end time per shift type
+        shift_times = {}
+        for shift_type, config in self.shift_config.items():
+            start_time = datetime.strptime(config['start_time'], '%H:%M').time()
+            end_datetime = datetime.combine(date.min, start_time) + timedelta(hours=config['hours'])
+            shift_times[shift_type] = (start_time, end_datetime.time(), config['hours'])
         
-        return daily_schedules
-    
-    def _get_rotating_shift_type(self, crew: str, current_date: date, day_index: int) -> str:
-        """Determine shift type for rotating Pitman variation"""
-        # Rotate every 2 weeks (14 days) 
-        rotation_cycle = (day_index // 14) % 2
-        
-        if crew in ['A', 'C']:
-            return 'day' if rotation_cycle == 0 else 'night'
-        else:  # crews B, D
-            return 'night' if rotation_cycle == 0 else 'day'
+        now = datetime.utcnow()
+        schedules = []
+        for emp_id, day, code in expanded.rows():
+            shift_type = SHIFT_TYPE_NAMES[code]
+            start_time, end_time, hours = shift_times[shift_type]
+            schedules.append(Schedule(
+                employee_id=emp_id,
+                date=day,
+                shift_type=shift_type,
+                start_time=start_time,
+                end_time=end_time,
+                hours=hours,
+                position_id=positions.get(emp_id),
+                created_by_id=created_by_id,
+                is_overtime=False,  # Regular scheduled shift
+                created_at=now,
+                updated_at=now
+            ))
+        
+        return schedules
     
     def _calculate_schedule_stats(self, schedules: List[Schedule], 
-                                 crew_employees: Dict) -> Dict:
-        """Calculate comprehensive schedule statistics"""
+                                 crew_employees: Dict,
+                                 index: Optional[ScheduleIndex] = None) -> Dict:
+        """
+        Calculate comprehensive schedule statistics
+        
+        index (utils/schedule_stats.py) is built from schedules when not
+        given; every figure below is one aggregate over it.
+        """
         if not schedules:
             return {'error': 'No schedules generated'}
         
+        if index is None:
+            index = ScheduleIndex.from_schedules(schedules)
+        
         # Basic counts
-        total_schedules = len(schedules)
-        unique_employees = len(set(s.employee_id for s in schedules))
-        date_range = f"{min(s.date for s in schedules)} to {max(s.date for s in schedules)}"
+        total_schedules = len(index)
+        unique_employees = len(index.employees)
+        date_range = f"{index.first_date} to {index.last_date}"
         
         # Hours analysis  
-        total_hours = sum(s.hours for s in schedules)
+        total_hours = index.total_hours
         avg_hours_per_employee = total_hours / unique_employees if unique_employees > 0 else 0
         
         # Shift distribution
-        shift_counts = {}
-        for schedule in schedules:
-            shift_type = schedule.shift_type
-            shift_counts[shift_type] = shift_counts.get(shift_type, 0) + 1
+        shift_counts = index.shift_counts()
         
         # Crew workload analysis
+        crew_totals = index.group_totals({
+            crew: [emp['id'] for emp in employees] for crew, employees in crew_employees.items()
+        })
         crew_stats = {}
         for crew, employees in crew_employees.items():
-            crew_schedules = [s for s in schedules if any(
-                s.employee_id == emp['id'] for emp in employees
-            )]
+            crew_shifts, crew_hours = crew_totals[crew]
             
             crew_stats[crew] = {
                 'employee_count': len(employees),
-                'total_shifts': len(crew_schedules),
-                'total_hours': sum(s.hours for s in crew_schedules),
-                'avg_shifts_per_employee': len(crew_schedules) / len(employees) if employees else 0,
-                'avg_hours_per_employee': sum(s.hours for s in crew_schedules) / len(employees) if employees else 0
+                'total_shifts': crew_shifts,
+                'total_hours': crew_hours,
+                'avg_shifts_per_employee': crew_shifts / len(employees) if employees else 0,
+                'avg_hours_per_employee': crew_hours / len(employees) if employees else 0
             }
         
-        # Weekly hours analysis (important for Pitman)
-        start_date = min(s.date for s in schedules)
-        end_date = max(s.date for s in schedules)
-        
-        # Find first Monday
-        days_to_monday = start_date.weekday()
-        week_start = start_date - timedelta(days=days_to_monday)
-        
-        weekly_analysis = []
-        while week_start <= end_date:
-            week_end = week_start + timedelta(days=6)
-            week_schedules = [s for s in schedules if week_start <= s.date <= week_end]
-            
-            weekly_analysis.append({
+        # Weekly hours analysis (important for Pitman), Monday to Sunday
+        weekly_analysis = [
+            {
                 'week_start': week_start,
-                'total_shifts': len(week_schedules),
-                'total_hours': sum(s.hours for s in week_schedules),
-                'unique_employees': len(set(s.employee_id for s in week_schedules))
-            })
-            
-            week_start += timedelta(days=7)
+                'total_shifts': week_shifts,
+                'total_hours': week_hours,
+                'unique_employees': week_employees
+            }
+            for week_start, week_shifts, week_hours, week_employees in index.weekly_totals()
+        ]
         
         return {
             'basic_stats': {
@@ -300,50 +275,27 @@ class RealPitmanSchedule:
             'weekly_analysis': weekly_analysis
         }
     
-    def _validate_schedule(self, schedules: List[Schedule]) -> Dict:
-        """Validate the generated Pitman schedule"""
+    def _validate_schedule(self, schedules: Optional[List[Schedule]],
+                           index: Optional[ScheduleIndex] = None) -> Dict:
+        """Validate the generated Pitman schedule (or just its index)"""
         issues = []
         warnings = []
         
-        if not schedules:
+        if index is None and schedules:
+            index = ScheduleIndex.from_schedules(schedules)
+        
+        if index is None or not len(index):
             return {'valid': False, 'issues': ['No schedules generated']}
         
         # Check for conflicts (employee scheduled multiple times per day)
-        dates_employees = {}
-        for schedule in schedules:
-            date_key = schedule.date.strftime('%Y-%m-%d')
-            if date_key not in dates_employees:
-                dates_employees[date_key] = set()
-            
-            if schedule.employee_id in dates_employees[date_key]:
-                issues.append(f"Employee {schedule.employee_id} scheduled multiple times on {date_key}")
-            else:
-                dates_employees[date_key].add(schedule.employee_id)
-        
-        # Check coverage consistency 
-        daily_coverage = {}
-        for schedule in schedules:
-            date_key = schedule.date.strftime('%Y-%m-%d')
-            if date_key not in daily_coverage:
-                daily_coverage[date_key] = {'day': 0, 'night': 0}
-            daily_coverage[date_key][schedule.shift_type] += 1
-        
-        # Validate Pitman pattern compliance
-        for date_str, coverage in daily_coverage.items():
-            total_coverage = coverage['day'] + coverage['night']
-            if total_coverage == 0:
-                warnings.append(f"No coverage on {date_str}")
-            elif coverage['day'] == 0 and coverage['night'] > 0:
-                # Night-only coverage might be intentional
-                pass
-            elif coverage['night'] == 0 and coverage['day'] > 0:
-                # Day-only coverage might be intentional
-                pass
-        
-        # Check for reasonable coverage levels
-        avg_daily_coverage = sum(
-            sum(coverage.values()) for coverage in daily_coverage.values()
-        ) / len(daily_coverage) if daily_coverage else 0
+        for row in index.duplicate_rows():
+            issues.append(f"Employee {int(index.employee_ids[row])} scheduled multiple times "
+                          f"on {index.date_of(index.day_index[row]).isoformat()}")
+        
+        # Every indexed date has at least one shift, so coverage is never
+        # empty; check for reasonable coverage levels
+        total_dates_covered = index.days_covered()
+        avg_daily_coverage = len(index) / total_dates_covered if total_dates_covered else 0
         
         if avg_daily_coverage < 10:
             warnings.append("Average daily coverage seems low - may indicate understaffing")
@@ -355,9 +307,29 @@ class RealPitmanSchedule:
             'issues': issues,
             'warnings': warnings,
             'avg_daily_coverage': round(avg_daily_coverage, 1),
-            'total_dates_covered': len(daily_coverage)
+            'total_dates_covered': total_dates_covered
         }
     
+    def validate_cycle(self, start_date: date, variation: str = 'fixed') -> Dict:
+        """
+        Run _validate_schedule on the rotation's first full cycle from
+        start_date (crews starting late included). The pattern repeats
+        after that, so this stands in for horizons streamed to the database
+        without being held in memory.
+        """
+        crew_employees = self._get_crew_employees()
+        table = compile_pattern(PATTERNS[self.VARIATIONS.get(variation, 'pitman_days')])
+        span = table.cycle_days + max((cycle.start_day or 0) for cycle in table.crews.values())
+        
+        expanded = table.expand(
+            {crew: [emp['id'] for emp in employees] for crew, employees in crew_employees.items()},
+            start_date, start_date + timedelta(days=span - 1)
+        )
+        index = ScheduleIndex.from_expanded(expanded, {
+            shift_type: config['hours'] for shift_type, config in self.shift_config.items()
+        })
+        return self._validate_schedule(None, index)
+    
     def commit_schedules_to_database(self, schedules: List[Schedule], 
                                    replace_existing: bool = False) -> Dict:
         """
@@ -365,8 +337,9 @@ class RealPitmanSchedule:
         
         Args:
             schedules: List of Schedule objects to save
-            replace_existing: If True, delete existing schedules in date range first
-            
+            replace_existing: If True, make the date range match these schedules,
+                touching only the rows that differ
+        
         Returns:
             Dict with results and any errors
         """
@@ -378,39 +351,43 @@ class RealPitmanSchedule:
             start_date = min(s.date for s in schedules)
             end_date = max(s.date for s in schedules)
             
+            writer = ScheduleWriter(db, {'Schedule': Schedule})
             if replace_existing:
-                # Delete existing schedules in this date range
-                logger.info(f"Deleting existing schedules from {start_date} to {end_date}")
-                existing_count = Schedule.query.filter(
-                    Schedule.date >= start_date,
-                    Schedule.date <= end_date
-                ).count()
-                
-                Schedule.query.filter(
-                    Schedule.date >= start_date,
-                    Schedule.date <= end_date
-                ).delete()
-                
-                logger.info(f"Deleted {existing_count} existing schedules")
+                # Diff against the existing schedules in this date range:
+                # only changed shifts are written, stale ones deleted
+                written = writer.sync(writer.from_objects(schedules), start_date, end_date)
+                logger.info(f"Replaced schedules from {start_date} to {end_date}: "
+                            f"{written['inserted']} inserted, {written['updated']} updated, "
+                            f"{written['deleted']} deleted")
+            else:
+                # Add new schedules (bulk upsert, no ORM unit of work)
+                written = writer.write(writer.from_objects(schedules))
             
-            # Add new schedules
-            for schedule in schedules:
-                db.session.add(schedule)
+            # Rebuild the crew-on-duty calendar from this pattern
+            CrewCalendar(db, {
+                'Employee': Employee,
+                'ShiftPattern': ShiftPattern,
+                'CrewDutyCalendar': CrewDutyCalendar
+            }).record_pattern('Pitman 2-2-3', schedules, 14)
             
             # Commit all changes
             db.session.commit()
             
-            logger.info(f"Successfully saved {len(schedules)} Pitman schedules to database")
+            logger.info(f"Successfully saved {written['rows']} Pitman schedules to database")
             
             return {
                 'success': True,
-                'schedules_saved': len(schedules),
+                'schedules_saved': written['rows'],
+                'rows_per_second': written['rows_per_second'],
+                'changes': {key: written[key] for key in
+                            ('inserted', 'updated', 'deleted', 'unchanged', 'kept') if key in written},
                 'date_range': f"{start_date} to {end_date}",
                 'replaced_existing': replace_existing
             }
             
         except Exception as e:
             db.session.rollback()
+            invalidate_crew_calendar()
             logger.error(f"Error saving schedules to database: {e}")
             return {'success': False, 'error': str(e)}
     
@@ -422,18 +399,16 @@ class RealPitmanSchedule:
         preview = "PITMAN SCHEDULE PATTERN PREVIEW (2-2-3)\n"
         preview += "=" * 50 + "\n\n"
         
-        # Show pattern for each crew over specified days
+        # Show pattern for each crew over specified days (fixed variation)
+        letters = {0: 'O', 1: 'D', 2: 'E', 3: 'N'}
+        crew_codes = compile_pattern(PATTERNS['pitman_fixed']).crew_codes(days)
         for crew in ['A', 'B', 'C', 'D']:
             preview += f"CREW {crew}:\n"
             pattern_line = ""
             
-            for day in range(days):
-                cycle_day = (day + self.crew_offsets[crew]) % 14
-                works = self.pitman_base_pattern[cycle_day]
-                
-                if works:
-                    shift_type = 'D' if crew in ['A', 'B'] else 'N'  # Fixed pattern
-                    pattern_line += f"{shift_type:2}"
+            for day, code in enumerate(crew_codes[crew].tolist()):
+                if code:
+                    pattern_line += f"{letters[code]:2}"
                 else:
                     pattern_line += " O"
                 
@@ -480,3 +455,107 @@ def generate_pitman_for_production(start_date_str: str, weeks: int = 4,
     )
     
     return results
+
+
+def pitman_job(params: Dict, report) -> Dict:
+    """
+    engines/job_runner.py handler behind /schedule/pitman/generate
+    
+    params: start_date ('YYYY-MM-DD'), weeks, variation, supervisor_id,
+    replace_existing. Up to 52 weeks the schedule is built, validated and
+    saved in one go; longer ranges are validated over one full cycle and
+    then streamed in committed chunks.
+    """
+    start_date = datetime.strptime(params['start_date'], '%Y-%m-%d').date()
+    weeks = int(params['weeks'])
+    variation = params.get('variation', 'fixed')
+    pattern_info = {
+        'type': 'Pitman 2-2-3',
+        'variation': variation,
+        'cycle_length': 14,
+        'total_days': weeks * 7 + 1
+    }
+    
+    if weeks > 52:
+        from utils.pattern_generators import PatternGenerator
+        
+        total_days = weeks * 7 + 1
+        
+        report(0, 'Validating Pitman rotation')
+        pitman = RealPitmanSchedule()
+        validation = pitman.validate_cycle(start_date, variation)
+        if not validation['valid']:
+            return {
+                'success': False,
+                'error': 'Schedule validation failed',
+                'issues': validation['issues']
+            }
+        if validation['warnings']:
+            logger.warning(f"Schedule warnings: {validation['warnings']}")
+        
+        def progress(run):
+            report(100.0 * (run.next_date - run.start_date).days / total_days,
+                   f"Saved {run.rows_written} schedules", run_id=run.id)
+        
+        result = PatternGenerator(
+            RealPitmanSchedule.VARIATIONS.get(variation, 'pitman_days')
+        ).generate_stream(
+            start_date=start_date,
+            end_date=start_date + timedelta(weeks=weeks),
+            created_by_id=params.get('supervisor_id'),
+            replace_existing=params.get('replace_existing', False),
+            run_id=params.get('run_id'),
+            progress=progress,
+            crews=pitman._get_crew_members()
+        )
+        if not result['success']:
+            return {
+                'success': False,
+                'error': f"Failed to save schedules: {result.get('error')}",
+                'run_id': result['run_id'],
+                'resume_from': result.get('resume_from')
+            }
+        return {
+            'success': True,
+            'schedules_created': result['schedules_saved'],
+            'statistics': result['statistics'],
+            'date_range': f"{result['date_range']['start']} to {result['date_range']['end']}",
+            'run_id': result['run_id'],
+            'validation': validation,
+            'pattern_info': pattern_info
+        }
+    
+    report(0, 'Generating Pitman schedule')
+    results = generate_pitman_for_production(
+        start_date_str=params['start_date'],
+        weeks=weeks,
+        variation=variation,
+        supervisor_id=params.get('supervisor_id')
+    )
+    
+    if not results['validation']['valid']:
+        return {
+            'success': False,
+            'error': 'Schedule validation failed',
+            'issues': results['validation']['issues']
+        }
+    if results['validation']['warnings']:
+        logger.warning(f"Schedule warnings: {results['validation']['warnings']}")
+    
+    report(50, f"Saving {len(results['schedules'])} schedules")
+    save_results = RealPitmanSchedule().commit_schedules_to_database(
+        results['schedules'],
+        replace_existing=params.get('replace_existing', False)
+    )
+    if not save_results['success']:
+        return {'success': False, 'error': f"Failed to save schedules: {save_results['error']}"}
+    
+    logger.info(f"Successfully generated {save_results['schedules_saved']} Pitman schedules")
+    return {
+        'success': True,
+        'schedules_created': save_results['schedules_saved'],
+        'statistics': results['statistics'],
+        'date_range': save_results['date_range'],
+        'validation': results['validation'],
+        'pattern_info': results['pattern_info']
+    }
@@ -3,11 +3,18 @@
 Core schedule generation engine for all shift patterns
 Implements Pitman, DuPont, Southern Swing, and other patterns
 UPDATED WITH COMPLETE HOURS SUPPORT
+
+The rotations themselves are declarative definitions in
+utils/pattern_library.py, expanded by utils/pattern_expansion.py
 """
 
 from datetime import datetime, date, timedelta
 from typing import Dict, List, Tuple, Optional
 from models import db, Schedule, Employee, Position
+from utils.pattern_expansion import compile_pattern, SHIFT_TYPE_NAMES
+from utils.pattern_library import PATTERNS
+from utils.coverage_requirements import RequirementMatrix, SHIFT_TYPES
+import numpy as np
 import logging
 
 logger = logging.getLogger(__name__)
@@ -34,6 +41,30 @@ class SchedulePatternEngine:
         }
     }
     
+    # Pattern name -> utils/pattern_library.py definition
+    PATTERN_KEYS = {
+        'dupont': 'dupont',
+        'southern_swing': 'southern_swing_weekly',
+        'fixed_fixed': 'weekday_weekend',
+        'five_and_two': 'five_and_two',
+        'four_on_four_off': 'four_on_four_off_fixed',
+        'panama': 'panama',
+        'continental': 'continental'
+    }
+    
+    # Pitman variation -> definition; other variations alternate A&C days,
+    # B&D nights without rotating
+    PITMAN_VARIATIONS = {
+        'fixed': 'pitman_fixed',
+        'rapid': 'pitman_rapid',
+        '2_week': 'pitman_rotating',
+        '4_week': 'pitman_4_week'
+    }
+    
+    # Used only when no PositionCoverage / CrewCoverageRequirement rows exist
+    DEFAULT_MIN_PER_SHIFT = 8
+    DEFAULT_TARGET_COVERAGE = {'day': 12, 'night': 10, 'evening': 8}
+    
     def __init__(self):
         self.crews = ['A', 'B', 'C', 'D']
         
@@ -58,25 +89,23 @@ class SchedulePatternEngine:
             List of Schedule objects (not yet committed to DB)
         """
         
-        pattern_generators = {
-            'pitman': self._generate_pitman,
-            'dupont': self._generate_dupont,
-            'southern_swing': self._generate_southern_swing,
-            'fixed_fixed': self._generate_fixed_fixed,
-            'five_and_two': self._generate_five_and_two,
-            'four_on_four_off': self._generate_four_on_four_off,
-            'panama': self._generate_panama,
-            'continental': self._generate_continental
-        }
-        
-        generator = pattern_generators.get(pattern)
-        if not generator:
+        key = self._pattern_key(pattern, config)
+        if not key:
             raise ValueError(f"Unknown pattern: {pattern}")
         
         # Set up shift times based on configuration
         self._setup_shift_times(config)
         
-        return generator(start_date, end_date, config)
+        return self._generate_from_definition(PATTERNS[key], start_date, end_date, config)
+    
+    def _pattern_key(self, pattern: str, config: Dict) -> Optional[str]:
+        """utils/pattern_library.py key for a pattern name (and Pitman variation)"""
+        if pattern == 'pitman':
+            variation = config.get('variation', 'fixed')  # fixed, rapid, 2_week, 4_week
+            return self.PITMAN_VARIATIONS.get(variation, 'pitman_alternating')
+        if pattern in self.PATTERN_KEYS:
+            return self.PATTERN_KEYS[pattern]
+        return pattern if pattern in PATTERNS else None
     
     def _setup_shift_times(self, config: Dict):
         """Setup shift times based on configuration"""
@@ -146,477 +175,36 @@ class SchedulePatternEngine:
             updated_at=datetime.utcnow()
         )
     
-    def _generate_pitman(self, start_date: date, end_date: date, config: Dict) -> List[Schedule]:
-        """
-        Generate Pitman (2-2-3) schedule
-        Pattern: Work 2, off 2, work 3, off 2, work 2, off 3
-        """
-        schedules = []
-        
-        # Get configuration
-        variation = config.get('variation', 'fixed')  # fixed, rapid, 2_week, 4_week
-        created_by_id = config.get('created_by_id')
-        
-        # Pitman pattern (14-day cycle)
-        # 1 = work, 0 = off
-        base_pattern = [1,1,0,0,1,1,1,0,0,1,1,0,0,0]
-        
-        # Crew patterns - each crew starts at different point in cycle
-        crew_patterns = {
-            'A': base_pattern,
-            'B': self._rotate_pattern(base_pattern, 7),  # Offset by 7 days
-            'C': base_pattern,  # Same as A but nights
-            'D': self._rotate_pattern(base_pattern, 7)   # Same as B but nights
-        }
-        
-        current_date = start_date
-        day_index = 0
-        
-        # Determine which crews work which shifts based on variation
-        if variation == 'fixed':
-            day_crews = ['A', 'B']
-            night_crews = ['C', 'D']
-        else:
-            # For rotating variations, we'll need to track rotation periods
-            day_crews = self.crews
-            night_crews = self.crews
-            
-        while current_date <= end_date:
-            cycle_day = day_index % 14
-            
-            # Get employees for each crew
-            for crew in self.crews:
-                if crew_patterns[crew][cycle_day] == 1:  # Working day
-                    crew_employees = Employee.query.filter_by(
-                        crew=crew, 
-                        is_active=True
-                    ).all()
-                    
-                    # Determine shift type
-                    if variation == 'fixed':
-                        shift_type = 'day' if crew in day_crews else 'night'
-                    else:
-                        # Handle rotating variations
-                        shift_type, _ = self._get_rotating_shift(
-                            crew, current_date, start_date, variation
-                        )
-                    
-                    # Create schedules for all employees in this crew
-                    for emp in crew_employees:
-                        schedule = self._create_schedule(
-                            employee_id=emp.id,
-                            date=current_date,
-                            shift_type=shift_type,
-                            position_id=emp.position_id,
-                            created_by_id=created_by_id
-                        )
-                        schedules.append(schedule)
-            
-            current_date += timedelta(days=1)
-            day_index += 1
-            
-        return schedules
-    
-    def _generate_dupont(self, start_date: date, end_date: date, config: Dict) -> List[Schedule]:
-        """
-        Generate DuPont schedule
-        28-day rotating cycle with 7 consecutive days off
-        Pattern: 4N-3off-3D-1off-3N-3off-4D-7off
-        """
-        schedules = []
-        created_by_id = config.get('created_by_id')
-        
-        # DuPont pattern (28-day cycle)
-        # D = day, N = night, O = off
-        pattern = [
-            'N','N','N','N','O','O','O',  # 4 nights, 3 off
-            'D','D','D','O',               # 3 days, 1 off
-            'N','N','N','O','O','O',       # 3 nights, 3 off
-            'D','D','D','D',               # 4 days
-            'O','O','O','O','O','O','O'    # 7 off
-        ]
-        
-        # Each crew starts at different week
-        crew_start_offsets = {'A': 0, 'B': 7, 'C': 14, 'D': 21}
-        
-        current_date = start_date
-        day_index = 0
-        
-        while current_date <= end_date:
-            for crew in self.crews:
-                # Calculate position in pattern for this crew
-                crew_day_index = (day_index + crew_start_offsets[crew]) % 28
-                shift = pattern[crew_day_index]
-                
-                if shift != 'O':  # Not an off day
-                    crew_employees = Employee.query.filter_by(
-                        crew=crew, 
-                        is_active=True
-                    ).all()
-                    
-                    shift_type = 'day' if shift == 'D' else 'night'
-                    
-                    for emp in crew_employees:
-                        schedule = self._create_schedule(
-                            employee_id=emp.id,
-                            date=current_date,
-                            shift_type=shift_type,
-                            position_id=emp.position_id,
-                            created_by_id=created_by_id
-                        )
-                        schedules.append(schedule)
-            
-            current_date += timedelta(days=1)
-            day_index += 1
-            
-        return schedules
-    
-    def _generate_southern_swing(self, start_date: date, end_date: date, config: Dict) -> List[Schedule]:
+    def _generate_from_definition(self, definition: Dict, start_date: date, end_date: date,
+                                  config: Dict) -> List[Schedule]:
         """
-        Generate Southern Swing schedule
-        8-hour shifts rotating through days, evenings, nights over 4 weeks
+        Expand a pattern definition for every active crew member and build
+        the Schedule entries
         """
-        schedules = []
         created_by_id = config.get('created_by_id')
         
-        # Southern Swing pattern (28-day cycle)
-        # Each week has different shift pattern
-        weekly_patterns = [
-            # Week 1: Mon-Fri days, weekend off
-            ['D','D','D','D','D','O','O'],
-            # Week 2: Mon-Tue off, Wed-Sun evenings
-            ['O','O','E','E','E','E','E'],
-            # Week 3: Mon-Tue evenings, Wed off, Thu-Sun nights
-            ['E','E','O','N','N','N','N'],
-            # Week 4: Mon-Wed nights, Thu-Fri off, Sat-Sun days
-            ['N','N','N','O','O','D','D']
+        crew_members = {crew: [] for crew in self.crews}
+        positions = {}
+        employees = db.session.query(Employee.id, Employee.crew, Employee.position_id).filter(
+            Employee.is_active == True,
+            Employee.crew.in_(self.crews)
+        ).all()
+        for emp_id, crew, position_id in employees:
+            crew_members[crew].append(emp_id)
+            positions[emp_id] = position_id
+        
+        expanded = compile_pattern(definition).expand(crew_members, start_date, end_date)
+        
+        return [
+            self._create_schedule(
+                employee_id=emp_id,
+                date=day,
+                shift_type=SHIFT_TYPE_NAMES[code],
+                position_id=positions.get(emp_id),
+                created_by_id=created_by_id
+            )
+            for emp_id, day, code in expanded.rows()
         ]
-        
-        # Crew rotation - each crew starts at different week
-        crew_week_offsets = {'A': 0, 'B': 1, 'C': 2, 'D': 3}
-        
-        current_date = start_date
-        
-        while current_date <= end_date:
-            # Determine week and day
-            days_from_start = (current_date - start_date).days
-            week_index = (days_from_start // 7) % 4
-            day_of_week = current_date.weekday()  # 0 = Monday
-            
-            for crew in self.crews:
-                # Calculate which week pattern this crew is on
-                crew_week = (week_index + crew_week_offsets[crew]) % 4
-                shift = weekly_patterns[crew_week][day_of_week]
-                
-                if shift != 'O':  # Not an off day
-                    crew_employees = Employee.query.filter_by(
-                        crew=crew, 
-                        is_active=True
-                    ).all()
-                    
-                    # Map shift type
-                    shift_mapping = {
-                        'D': 'day',
-                        'E': 'evening',
-                        'N': 'night'
-                    }
-                    
-                    shift_type = shift_mapping[shift]
-                    
-                    for emp in crew_employees:
-                        schedule = self._create_schedule(
-                            employee_id=emp.id,
-                            date=current_date,
-                            shift_type=shift_type,
-                            position_id=emp.position_id,
-                            created_by_id=created_by_id
-                        )
-                        schedules.append(schedule)
-            
-            current_date += timedelta(days=1)
-            
-        return schedules
-    
-    def _generate_fixed_fixed(self, start_date: date, end_date: date, config: Dict) -> List[Schedule]:
-        """
-        Generate Fixed-Fixed schedule
-        Mon-Thu crews work 4 days (48 hrs/week)
-        Fri-Sun crews work 3 days (36 hrs/week)
-        """
-        schedules = []
-        created_by_id = config.get('created_by_id')
-        
-        # Crew assignments for Fixed-Fixed
-        weekday_crews = ['A', 'B']  # Mon-Thu
-        weekend_crews = ['C', 'D']  # Fri-Sun
-        
-        current_date = start_date
-        
-        while current_date <= end_date:
-            day_of_week = current_date.weekday()  # 0 = Monday
-            
-            # Determine which crews work today
-            if day_of_week < 4:  # Monday-Thursday
-                working_crews = weekday_crews
-            else:  # Friday-Sunday
-                working_crews = weekend_crews
-            
-            # Assign shifts
-            for i, crew in enumerate(working_crews):
-                crew_employees = Employee.query.filter_by(
-                    crew=crew, 
-                    is_active=True
-                ).all()
-                
-                # Alternate day/night between crews
-                shift_type = 'day' if i == 0 else 'night'
-                
-                for emp in crew_employees:
-                    schedule = self._create_schedule(
-                        employee_id=emp.id,
-                        date=current_date,
-                        shift_type=shift_type,
-                        position_id=emp.position_id,
-                        created_by_id=created_by_id
-                    )
-                    schedules.append(schedule)
-            
-            current_date += timedelta(days=1)
-            
-        return schedules
-    
-    def _generate_five_and_two(self, start_date: date, end_date: date, config: Dict) -> List[Schedule]:
-        """
-        Generate 5&2 schedule
-        Work stretches of 5 and 2 days, off stretches of 5 and 2 days
-        """
-        schedules = []
-        created_by_id = config.get('created_by_id')
-        
-        # 5&2 patterns (14-day cycles)
-        # Different patterns for day and night crews
-        day_patterns = {
-            'A': [1,1,1,1,1,0,0,1,1,0,0,0,0,0],  # 5 on, 2 off, 2 on, 5 off
-            'B': [0,0,0,0,0,1,1,0,0,1,1,1,1,1]   # Opposite of A
-        }
-        night_patterns = {
-            'C': [1,1,0,0,0,0,0,1,1,1,1,1,0,0],  # 2 on, 5 off, 5 on, 2 off
-            'D': [0,0,1,1,1,1,1,0,0,0,0,0,1,1]   # Opposite of C
-        }
-        
-        current_date = start_date
-        day_index = 0
-        
-        while current_date <= end_date:
-            cycle_day = day_index % 14
-            
-            # Process each crew
-            for crew in self.crews:
-                pattern = day_patterns.get(crew, night_patterns.get(crew))
-                
-                if pattern and pattern[cycle_day] == 1:  # Working day
-                    crew_employees = Employee.query.filter_by(
-                        crew=crew, 
-                        is_active=True
-                    ).all()
-                    
-                    shift_type = 'day' if crew in ['A', 'B'] else 'night'
-                    
-                    for emp in crew_employees:
-                        schedule = self._create_schedule(
-                            employee_id=emp.id,
-                            date=current_date,
-                            shift_type=shift_type,
-                            position_id=emp.position_id,
-                            created_by_id=created_by_id
-                        )
-                        schedules.append(schedule)
-            
-            current_date += timedelta(days=1)
-            day_index += 1
-            
-        return schedules
-    
-    def _generate_four_on_four_off(self, start_date: date, end_date: date, config: Dict) -> List[Schedule]:
-        """
-        Generate 4-on-4-off schedule
-        Simple pattern: Work 4 days, off 4 days
-        """
-        schedules = []
-        created_by_id = config.get('created_by_id')
-        
-        # 4-on-4-off pattern (8-day cycle)
-        base_pattern = [1,1,1,1,0,0,0,0]
-        
-        # Each crew starts at different point
-        crew_patterns = {
-            'A': base_pattern,
-            'B': self._rotate_pattern(base_pattern, 4),
-            'C': base_pattern,  # Same as A but nights
-            'D': self._rotate_pattern(base_pattern, 4)  # Same as B but nights
-        }
-        
-        current_date = start_date
-        day_index = 0
-        
-        while current_date <= end_date:
-            cycle_day = day_index % 8
-            
-            for crew in self.crews:
-                if crew_patterns[crew][cycle_day] == 1:
-                    crew_employees = Employee.query.filter_by(
-                        crew=crew, 
-                        is_active=True
-                    ).all()
-                    
-                    # A & B work days, C & D work nights
-                    shift_type = 'day' if crew in ['A', 'B'] else 'night'
-                    
-                    for emp in crew_employees:
-                        schedule = self._create_schedule(
-                            employee_id=emp.id,
-                            date=current_date,
-                            shift_type=shift_type,
-                            position_id=emp.position_id,
-                            created_by_id=created_by_id
-                        )
-                        schedules.append(schedule)
-            
-            current_date += timedelta(days=1)
-            day_index += 1
-            
-        return schedules
-    
-    def _generate_panama(self, start_date: date, end_date: date, config: Dict) -> List[Schedule]:
-        """
-        Generate Panama schedule (2-3-2 variation)
-        Similar to Pitman but different rhythm
-        """
-        schedules = []
-        created_by_id = config.get('created_by_id')
-        
-        # Panama pattern - variation of 2-2-3
-        base_pattern = [1,1,0,0,0,1,1,1,0,0,1,1,0,0]  # 14-day cycle
-        
-        crew_patterns = {
-            'A': base_pattern,
-            'B': self._rotate_pattern(base_pattern, 7),
-            'C': base_pattern,
-            'D': self._rotate_pattern(base_pattern, 7)
-        }
-        
-        current_date = start_date
-        day_index = 0
-        
-        while current_date <= end_date:
-            cycle_day = day_index % 14
-            
-            for crew in self.crews:
-                if crew_patterns[crew][cycle_day] == 1:
-                    crew_employees = Employee.query.filter_by(
-                        crew=crew, 
-                        is_active=True
-                    ).all()
-                    
-                    shift_type = 'day' if crew in ['A', 'B'] else 'night'
-                    
-                    for emp in crew_employees:
-                        schedule = self._create_schedule(
-                            employee_id=emp.id,
-                            date=current_date,
-                            shift_type=shift_type,
-                            position_id=emp.position_id,
-                            created_by_id=created_by_id
-                        )
-                        schedules.append(schedule)
-            
-            current_date += timedelta(days=1)
-            day_index += 1
-            
-        return schedules
-    
-    def _generate_continental(self, start_date: date, end_date: date, config: Dict) -> List[Schedule]:
-        """
-        Generate Continental schedule
-        Pattern: 2D-2O-3D-2O-2D-3O-2N-2O-3N-2O-2N-3O
-        """
-        schedules = []
-        created_by_id = config.get('created_by_id')
-        
-        # Continental pattern (42-day cycle)
-        pattern = [
-            'D','D','O','O','D','D','D','O','O','D','D','O','O','O',  # Days
-            'N','N','O','O','N','N','N','O','O','N','N','O','O','O',  # Nights
-            'O','O','O','O','O','O','O','O','O','O','O','O','O','O'   # Rest period
-        ]
-        
-        # Crew offsets
-        crew_offsets = {'A': 0, 'B': 10, 'C': 21, 'D': 31}
-        
-        current_date = start_date
-        day_index = 0
-        
-        while current_date <= end_date:
-            for crew in self.crews:
-                crew_day = (day_index + crew_offsets[crew]) % 42
-                shift = pattern[crew_day]
-                
-                if shift != 'O':
-                    crew_employees = Employee.query.filter_by(
-                        crew=crew, 
-                        is_active=True
-                    ).all()
-                    
-                    shift_type = 'day' if shift == 'D' else 'night'
-                    
-                    for emp in crew_employees:
-                        schedule = self._create_schedule(
-                            employee_id=emp.id,
-                            date=current_date,
-                            shift_type=shift_type,
-                            position_id=emp.position_id,
-                            created_by_id=created_by_id
-                        )
-                        schedules.append(schedule)
-            
-            current_date += timedelta(days=1)
-            day_index += 1
-            
-        return schedules
-    
-    # Helper methods
-    def _rotate_pattern(self, pattern: List[int], offset: int) -> List[int]:
-        """Rotate a pattern by offset days"""
-        return pattern[offset:] + pattern[:offset]
-    
-    def _get_rotating_shift(self, crew: str, current_date: date, start_date: date, 
-                           variation: str) -> Tuple[str, str]:
-        """
-        Determine shift type for rotating variations
-        Returns (shift_type, shift_start_time)
-        """
-        days_from_start = (current_date - start_date).days
-        
-        if variation == 'rapid':
-            # Change every break period (roughly every 3-4 days)
-            rotation_period = days_from_start // 4
-        elif variation == '2_week':
-            # Change every 2 weeks
-            rotation_period = days_from_start // 14
-        elif variation == '4_week':
-            # Change every 4 weeks
-            rotation_period = days_from_start // 28
-        else:
-            rotation_period = 0
-        
-        # Determine if on days or nights based on rotation
-        crew_index = self.crews.index(crew)
-        is_day_shift = ((crew_index + rotation_period) % 2) == 0
-        
-        shift_type = 'day' if is_day_shift else 'night'
-        shift_start = self.current_shift_times[shift_type]['start']
-        
-        return shift_type, shift_start
     
     def calculate_weekly_hours(self, schedules: List[Schedule], employee_id: int, 
                               week_start: date) -> Dict[str, float]:
@@ -651,10 +239,54 @@ class SchedulePatternEngine:
             'shifts_worked': len(employee_week_schedules)
         }
     
-    def validate_schedule(self, schedules: List[Schedule]) -> Dict[str, any]:
+    def weekly_hours(self, schedules: List[Schedule]) -> Tuple[List[int], date, np.ndarray, np.ndarray]:
+        """
+        Hours per employee per week in one pass over the schedules
+        
+        Returns:
+            (employee ids, Monday of the first week, hours array of shape
+            (employees, weeks), shift count array of the same shape)
+        """
+        first_monday = min(s.date for s in schedules)
+        first_monday -= timedelta(days=first_monday.weekday())
+        
+        employee_index = {}
+        rows = np.empty(len(schedules), dtype=np.int64)
+        weeks = np.empty(len(schedules), dtype=np.int64)
+        hours = np.empty(len(schedules), dtype=np.float64)
+        for i, s in enumerate(schedules):
+            rows[i] = employee_index.setdefault(s.employee_id, len(employee_index))
+            weeks[i] = (s.date - first_monday).days // 7
+            hours[i] = s.hours
+        
+        shape = (len(employee_index), int(weeks.max()) + 1)
+        cells = rows * shape[1] + weeks
+        size = shape[0] * shape[1]
+        hours_by_week = np.bincount(cells, weights=hours, minlength=size).reshape(shape)
+        shifts_by_week = np.bincount(cells, minlength=size).reshape(shape)
+        
+        return list(employee_index), first_monday, hours_by_week, shifts_by_week
+    
+    def _crew_by_employee(self, schedules: List[Schedule]) -> Dict[int, str]:
+        """Employee id -> crew for everyone in schedules (one query)"""
+        employee_ids = {s.employee_id for s in schedules}
+        if not employee_ids:
+            return {}
+        return dict(db.session.query(Employee.id, Employee.crew).filter(
+            Employee.id.in_(employee_ids)
+        ).all())
+    
+    def validate_schedule(self, schedules: List[Schedule],
+                          requirements: Optional[RequirementMatrix] = None) -> Dict[str, any]:
         """
         Validate generated schedules for coverage and conflicts
         Returns validation results with any issues found
+        
+        Schedules are grouped once by date, and weekly hours come from a
+        single (employee x week) array rather than a rescan per employee
+        and week. Coverage is checked per date, shift and position against
+        requirements (loaded from the database when not given); without
+        any configured requirements each shift needs DEFAULT_MIN_PER_SHIFT.
         """
         validation_results = {
             'is_valid': True,
@@ -670,104 +302,86 @@ class SchedulePatternEngine:
             validation_results['error'] = "No schedules generated"
             return validation_results
         
-        # Group schedules by date and employee
-        schedules_by_date = {}
-        schedules_by_employee = {}
+        # Group schedules by date: shift counts and employees seen that day
+        shifts_by_date = {}
+        employees_by_date = {}
+        conflicts_by_date = {}
         
         for schedule in schedules:
             date_key = schedule.date
             emp_id = schedule.employee_id
             
-            if date_key not in schedules_by_date:
-                schedules_by_date[date_key] = []
-            schedules_by_date[date_key].append(schedule)
+            counts = shifts_by_date.get(date_key)
+            if counts is None:
+                counts = shifts_by_date[date_key] = {}
+                employees_by_date[date_key] = set()
+            counts[schedule.shift_type] = counts.get(schedule.shift_type, 0) + 1
             
-            if emp_id not in schedules_by_employee:
-                schedules_by_employee[emp_id] = []
-            schedules_by_employee[emp_id].append(schedule)
-        
-        # Check for scheduling conflicts (employee scheduled multiple times per day)
-        for date_key, date_schedules in schedules_by_date.items():
-            employee_schedules_today = {}
-            for schedule in date_schedules:
-                emp_id = schedule.employee_id
-                if emp_id in employee_schedules_today:
-                    validation_results['conflicts'].append({
-                        'date': date_key,
-                        'employee_id': emp_id,
-                        'issue': 'Multiple schedules on same day'
-                    })
-                    validation_results['is_valid'] = False
-                else:
-                    employee_schedules_today[emp_id] = schedule
-        
-        # Check coverage for each date
-        for date_key, date_schedules in schedules_by_date.items():
-            # Check minimum coverage requirements
-            day_count = sum(1 for s in date_schedules if s.shift_type == 'day')
-            night_count = sum(1 for s in date_schedules if s.shift_type == 'night')
-            evening_count = sum(1 for s in date_schedules if s.shift_type == 'evening')
-            
-            # Configurable minimum coverage (adjust as needed)
-            min_per_shift = 8  # Minimum staff per shift
-            
-            if day_count > 0 and day_count < min_per_shift:
-                validation_results['coverage_gaps'].append({
+            # Check for scheduling conflicts (employee scheduled multiple times per day)
+            if emp_id in employees_by_date[date_key]:
+                conflicts_by_date.setdefault(date_key, []).append({
                     'date': date_key,
-                    'shift': 'day',
-                    'scheduled': day_count,
-                    'required': min_per_shift
-                })
-            
-            if night_count > 0 and night_count < min_per_shift:
-                validation_results['coverage_gaps'].append({
-                    'date': date_key,
-                    'shift': 'night',
-                    'scheduled': night_count,
-                    'required': min_per_shift
+                    'employee_id': emp_id,
+                    'issue': 'Multiple schedules on same day'
                 })
+            else:
+                employees_by_date[date_key].add(emp_id)
         
-        # Analyze hours and overtime
-        start_date = min(s.date for s in schedules)
-        end_date = max(s.date for s in schedules)
-        
-        # Get first Monday on or before start date
-        days_to_monday = start_date.weekday()
-        week_start = start_date - timedelta(days=days_to_monday)
+        for date_key in shifts_by_date:
+            validation_results['conflicts'].extend(conflicts_by_date.get(date_key, []))
+        if validation_results['conflicts']:
+            validation_results['is_valid'] = False
         
-        total_overtime_hours = 0
-        employees_with_overtime = 0
+        # Check coverage for each date
+        if requirements is None:
+            requirements = RequirementMatrix.load()
         
-        while week_start <= end_date:
-            for emp_id in schedules_by_employee:
-                weekly_hours = self.calculate_weekly_hours(schedules, emp_id, week_start)
-                
-                if weekly_hours['overtime_hours'] > 0:
-                    total_overtime_hours += weekly_hours['overtime_hours']
-                    
-                    if weekly_hours['overtime_hours'] > 16:  # High overtime threshold
-                        validation_results['overtime_concerns'].append({
-                            'employee_id': emp_id,
-                            'week_start': week_start,
-                            'total_hours': weekly_hours['total_hours'],
-                            'overtime_hours': weekly_hours['overtime_hours']
+        if requirements:
+            validation_results['coverage_gaps'] = requirements.shortfalls(
+                schedules, self._crew_by_employee(schedules)
+            )
+        else:
+            min_per_shift = self.DEFAULT_MIN_PER_SHIFT
+            for date_key, counts in shifts_by_date.items():
+                for shift in ('day', 'night'):
+                    count = counts.get(shift, 0)
+                    if count > 0 and count < min_per_shift:
+                        validation_results['coverage_gaps'].append({
+                            'date': date_key,
+                            'shift': shift,
+                            'scheduled': count,
+                            'required': min_per_shift
                         })
-            
-            week_start += timedelta(days=7)
+        
+        # Analyze hours and overtime
+        employee_ids, first_monday, hours_by_week, _ = self.weekly_hours(schedules)
+        overtime_by_week = np.maximum(hours_by_week - 40.0, 0.0)
+        
+        total_overtime_hours = float(overtime_by_week.sum())
+        employees_with_overtime = int(np.count_nonzero(overtime_by_week.any(axis=1)))
+        
+        # Week by week, employees in order of first appearance
+        for week, emp in np.argwhere(overtime_by_week.T > 16).tolist():  # High overtime threshold
+            validation_results['overtime_concerns'].append({
+                'employee_id': employee_ids[emp],
+                'week_start': first_monday + timedelta(days=7 * week),
+                'total_hours': float(hours_by_week[emp, week]),
+                'overtime_hours': float(overtime_by_week[emp, week])
+            })
         
         # Calculate statistics
         validation_results['statistics'] = {
             'total_schedules': len(schedules),
-            'unique_employees': len(set(s.employee_id for s in schedules)),
-            'date_range': f"{min(s.date for s in schedules)} to {max(s.date for s in schedules)}",
-            'avg_shifts_per_day': len(schedules) / len(schedules_by_date) if schedules_by_date else 0,
+            'unique_employees': len(employee_ids),
+            'date_range': f"{min(shifts_by_date)} to {max(shifts_by_date)}",
+            'avg_shifts_per_day': len(schedules) / len(shifts_by_date),
             'total_coverage_gaps': len(validation_results['coverage_gaps']),
             'total_conflicts': len(validation_results['conflicts'])
         }
         
         # Hours analysis
-        total_scheduled_hours = sum(s.hours for s in schedules)
-        avg_hours_per_employee = total_scheduled_hours / len(schedules_by_employee) if schedules_by_employee else 0
+        total_scheduled_hours = float(hours_by_week.sum())
+        avg_hours_per_employee = total_scheduled_hours / len(employee_ids)
         
         validation_results['hours_analysis'] = {
             'total_scheduled_hours': total_scheduled_hours,
@@ -780,13 +394,20 @@ class SchedulePatternEngine:
         return validation_results
     
     def generate_overtime_opportunities(self, schedules: List[Schedule], 
-                                      target_date: date) -> List[Dict]:
+                                      target_date: date,
+                                      requirements: Optional[RequirementMatrix] = None) -> List[Dict]:
         """
         Identify overtime opportunities based on coverage gaps
         
+        Only shift types the schedules use are checked (with no schedules,
+        those of the configured shift length), so a 12-hour pattern gets
+        no evening opportunities.
+        
         Args:
             schedules: Current schedule list
             target_date: Date to analyze for overtime needs
+            requirements: Coverage requirements (loaded when not given);
+                without any, DEFAULT_TARGET_COVERAGE per shift
             
         Returns:
             List of overtime opportunity dictionaries
@@ -796,22 +417,50 @@ class SchedulePatternEngine:
         # Get schedules for target date
         date_schedules = [s for s in schedules if s.date == target_date]
         
+        shifts_used = {getattr(s.shift_type, 'value', s.shift_type) for s in schedules}
+        if not shifts_used:
+            shifts_used = set(self.current_shift_times)
+        
         # Analyze coverage by shift
         shift_coverage = {}
         for schedule in date_schedules:
-            shift_type = schedule.shift_type
+            shift_type = getattr(schedule.shift_type, 'value', schedule.shift_type)
             if shift_type not in shift_coverage:
                 shift_coverage[shift_type] = []
             shift_coverage[shift_type].append(schedule)
         
         # Determine if additional coverage is needed
-        target_coverage = {'day': 12, 'night': 10, 'evening': 8}  # Configurable
+        if requirements is None:
+            requirements = RequirementMatrix.load()
+        
+        position_gaps = {}
+        if requirements:
+            # Required headcount per shift: the requirement matrix for the day
+            target_coverage = {}
+            _, scheduled, required, _ = requirements.evaluate(
+                date_schedules, self._crew_by_employee(date_schedules)
+            )
+            for s, shift_type in enumerate(SHIFT_TYPES):
+                if shift_type not in shifts_used:
+                    continue
+                cells = required[0, s] if len(required) else requirements.position_minimum[s]
+                if cells.any():
+                    target_coverage[shift_type] = int(cells.sum())
+                    staffed = scheduled[0, s] if len(scheduled) else np.zeros_like(cells)
+                    position_gaps[shift_type] = {
+                        requirements.positions[p]: int(cells[p] - staffed[p])
+                        for p in np.flatnonzero(staffed < cells).tolist()
+                    }
+        else:
+            target_coverage = {shift_type: count for shift_type, count
+                               in self.DEFAULT_TARGET_COVERAGE.items() if shift_type in shifts_used}
         
         for shift_type, target_count in target_coverage.items():
             current_count = len(shift_coverage.get(shift_type, []))
             
-            if current_count < target_count:
-                gap = target_count - current_count
+            if current_count < target_count or position_gaps.get(shift_type):
+                gap = max(target_count - current_count,
+                          sum(position_gaps.get(shift_type, {}).values()))
                 
                 # Create overtime opportunity
                 shift_info = self.current_shift_times.get(shift_type, self.current_shift_times['day'])
@@ -823,7 +472,8 @@ class SchedulePatternEngine:
                     'hours': shift_info['hours'],
                     'start_time': shift_info['start'],
                     'priority': 'high' if gap > 3 else 'medium',
-                    'reason': f'Coverage gap: {current_count}/{target_count}'
+                    'reason': f'Coverage gap: {current_count}/{target_count}',
+                    'position_gaps': position_gaps.get(shift_type, {})
                 })
         
         return opportunities
@@ -0,0 +1,155 @@
+# utils/schedule_stats.py
+"""
+Indexed schedule statistics
+
+A ScheduleIndex holds one generated schedule as flat arrays (employee,
+day offset, shift, hours per row), built once either from the expanded
+pattern (utils/pattern_expansion.py) or from a list of Schedule objects.
+Per-crew, per-week and per-day figures are then bincounts over those
+arrays instead of rescans of the schedule list.
+"""
+
+from datetime import date, timedelta
+import numpy as np
+
+from utils.pattern_expansion import SHIFT_TYPE_NAMES
+
+
+class ScheduleIndex:
+    """Row i is employee_ids[i] working shift_names[shift_index[i]] on start_date + day_index[i]"""
+    
+    def __init__(self, start_date, employee_ids, day_index, shift_index, hours, shift_names):
+        self.start_date = start_date
+        self.employee_ids = np.asarray(employee_ids, dtype=np.int64)
+        self.day_index = np.asarray(day_index, dtype=np.int64)
+        self.shift_index = np.asarray(shift_index, dtype=np.int64)
+        self.hours = np.asarray(hours, dtype=np.float64)
+        self.shift_names = list(shift_names)
+        
+        # Dense employee numbering: employees[employee_rows[i]] == employee_ids[i]
+        self.employees, self.employee_rows = np.unique(self.employee_ids, return_inverse=True)
+        self.num_days = int(self.day_index.max()) + 1 if len(self) else 0
+    
+    @classmethod
+    def from_expanded(cls, expanded, hours_by_shift):
+        """Index an ExpandedSchedule; hours_by_shift maps shift type name -> hours"""
+        codes = sorted(SHIFT_TYPE_NAMES)
+        names = [SHIFT_TYPE_NAMES[code] for code in codes]
+        lookup = np.zeros(max(codes) + 1, dtype=np.int64)
+        lookup[codes] = np.arange(len(codes))
+        hours = np.array([hours_by_shift.get(name, 0.0) for name in names], dtype=np.float64)
+        
+        shift_index = lookup[expanded.shift_codes]
+        return cls(expanded.start_date, expanded.employee_ids, expanded.day_index,
+                   shift_index, hours[shift_index], names)
+    
+    @classmethod
+    def from_schedules(cls, schedules):
+        """Index Schedule objects (anything with employee_id, date, shift_type, hours)"""
+        if not schedules:
+            return cls(None, [], [], [], [], [])
+        
+        shift_numbers = {}
+        ordinals = np.empty(len(schedules), dtype=np.int64)
+        employee_ids = np.empty(len(schedules), dtype=np.int64)
+        shift_index = np.empty(len(schedules), dtype=np.int64)
+        hours = np.empty(len(schedules), dtype=np.float64)
+        for i, s in enumerate(schedules):
+            ordinals[i] = s.date.toordinal()
+            employee_ids[i] = s.employee_id
+            shift_type = getattr(s.shift_type, 'value', s.shift_type)
+            shift_index[i] = shift_numbers.setdefault(shift_type, len(shift_numbers))
+            hours[i] = s.hours or 0.0
+        
+        first = int(ordinals.min())
+        start_date = date.fromordinal(first)
+        return cls(start_date, employee_ids, ordinals - first, shift_index, hours,
+                   list(shift_numbers))
+    
+    def __len__(self):
+        return len(self.employee_ids)
+    
+    def date_of(self, day):
+        return self.start_date + timedelta(days=int(day))
+    
+    @property
+    def first_date(self):
+        return self.date_of(self.day_index.min()) if len(self) else None
+    
+    @property
+    def last_date(self):
+        return self.date_of(self.day_index.max()) if len(self) else None
+    
+    @property
+    def total_hours(self):
+        return float(self.hours.sum())
+    
+    # ==========================================
+    # AGGREGATES
+    # ==========================================
+    
+    def shift_counts(self):
+        """Shift type -> rows, in order of first appearance"""
+        counts = np.bincount(self.shift_index, minlength=len(self.shift_names))
+        _, first_rows = np.unique(self.shift_index, return_index=True)
+        order = self.shift_index[np.sort(first_rows)]
+        return {self.shift_names[i]: int(counts[i]) for i in order.tolist()}
+    
+    def employee_totals(self):
+        """(shift count, hours) arrays aligned with self.employees"""
+        size = len(self.employees)
+        return (np.bincount(self.employee_rows, minlength=size),
+                np.bincount(self.employee_rows, weights=self.hours, minlength=size))
+    
+    def group_totals(self, groups):
+        """
+        group -> (shift count, hours) for groups mapping a group name to
+        its employee ids (e.g. crew -> members); one lookup per employee.
+        """
+        shifts, hours = self.employee_totals()
+        position = {emp_id: i for i, emp_id in enumerate(self.employees.tolist())}
+        totals = {}
+        for group, employee_ids in groups.items():
+            rows = [position[emp_id] for emp_id in employee_ids if emp_id in position]
+            totals[group] = (int(shifts[rows].sum()), float(hours[rows].sum()))
+        return totals
+    
+    def weekly_totals(self):
+        """
+        Per week from the Monday on or before the first date: list of
+        (week start, shift count, hours, unique employees), empty weeks
+        included.
+        """
+        if not len(self):
+            return []
+        first_day = int(self.day_index.min())
+        first_date = self.date_of(first_day)
+        offset = first_date.weekday()
+        week = (self.day_index - first_day + offset) // 7
+        num_weeks = int(week.max()) + 1
+        
+        shifts = np.bincount(week, minlength=num_weeks)
+        hours = np.bincount(week, weights=self.hours, minlength=num_weeks)
+        
+        # Unique employees per week: distinct (week, employee) pairs
+        pairs = np.unique(week * len(self.employees) + self.employee_rows)
+        employees = np.bincount(pairs // len(self.employees), minlength=num_weeks)
+        
+        first_monday = first_date - timedelta(days=offset)
+        return [
+            (first_monday + timedelta(days=7 * w), int(shifts[w]), float(hours[w]), int(employees[w]))
+            for w in range(num_weeks)
+        ]
+    
+    def days_covered(self):
+        """Number of distinct dates with at least one row"""
+        return int(np.count_nonzero(np.bincount(self.day_index, minlength=self.num_days)))
+    
+    def duplicate_rows(self):
+        """Rows repeating an (employee, date) seen in an earlier row, in row order"""
+        if not len(self):
+            return []
+        keys = self.employee_rows * self.num_days + self.day_index
+        order = np.argsort(keys, kind='stable')
+        repeated = np.flatnonzero(keys[order][1:] == keys[order][:-1]) + 1
+        return np.sort(order[repeated]).tolist()